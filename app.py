@@ -7,6 +7,7 @@ logger = logging.getLogger(__name__)
 DEFAULT_ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD") or "ChangeThis2024!"
 from datetime import datetime
 
+import click
 from flask import Flask, flash, redirect, url_for, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user, login_user
@@ -21,8 +22,9 @@ logging.basicConfig(level=logging.DEBUG)
 class Base(DeclarativeBase):
     pass
 
-# Inicializar SQLAlchemy
-db = SQLAlchemy(model_class=Base)
+# Inicializar SQLAlchemy (a sessão direciona as leituras das rotas de consulta à réplica, se houver)
+from utils.db_routing import RoutingSession, REPLICA_BIND, engine_options
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 
 # Criar aplicação Flask
 app = Flask(__name__)
@@ -41,16 +43,64 @@ if database_url and database_url.startswith('postgres://'):
 
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url or "sqlite:///zelopack.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 10))  # Conexões mantidas abertas por processo
+app.config["DB_MAX_OVERFLOW"] = int(os.environ.get("DB_MAX_OVERFLOW", 20))  # Conexões extras em picos
+app.config["DB_POOL_TIMEOUT"] = int(os.environ.get("DB_POOL_TIMEOUT", 30))  # Espera máxima por uma conexão livre, em segundos
+app.config["DB_POOL_RECYCLE"] = int(os.environ.get("DB_POOL_RECYCLE", 300))  # Conexões mais antigas que isso são renovadas
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+    app.config["SQLALCHEMY_DATABASE_URI"], app.config["DB_POOL_SIZE"], app.config["DB_MAX_OVERFLOW"],
+    app.config["DB_POOL_TIMEOUT"], app.config["DB_POOL_RECYCLE"]
+)
+
+# Réplica de leitura opcional para estatísticas, dashboard e busca de laudos
+replica_url = os.environ.get("DATABASE_REPLICA_URL")
+if replica_url and replica_url.startswith('postgres://'):
+    replica_url = replica_url.replace('postgres://', 'postgresql://', 1)
+app.config["DB_REPLICA_URL"] = replica_url  # Réplica de leitura (opcional)
+if replica_url:
+    app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: dict(engine_options(
+        replica_url, app.config["DB_POOL_SIZE"], app.config["DB_MAX_OVERFLOW"],
+        app.config["DB_POOL_TIMEOUT"], app.config["DB_POOL_RECYCLE"]
+    ), url=replica_url)}
+app.config["DB_REPLICA_ENDPOINTS"] = ["estatisticas.*", "dashboard.*", "reports.search", "reports.api_search", "reports.export_search"]  # Rotas que leem da réplica
+app.config["DB_REPLICA_STICKY_SECONDS"] = 10  # Após gravar, o usuário lê as tabelas alteradas do primário por este tempo
 
 # Configurações para upload de arquivos
 app.config["UPLOAD_FOLDER"] = os.path.join(os.getcwd(), "uploads")
 app.config["ATTACHED_ASSETS_FOLDER"] = os.path.join(os.getcwd(), "attached_assets")
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB limite máximo
+app.config["UPLOAD_CHUNK_SIZE"] = 4 * 1024 * 1024  # Bloco dos uploads em partes (abaixo do limite por requisição)
+app.config["MAX_CHUNKED_UPLOAD_SIZE"] = 512 * 1024 * 1024  # 512MB para arquivos enviados em partes
+app.config["ARTIFACT_FOLDER"] = os.path.join(app.config["UPLOAD_FOLDER"], "artifacts")  # Documentos gerados (temporários)
+app.config["ARTIFACT_TTL"] = 3600  # Expiração dos documentos gerados, em segundos
+app.config["ARTIFACT_MAX_BYTES"] = 1024 * 1024 * 1024  # Espaço máximo dos documentos gerados (1GB)
+app.config["BATCH_FILL_MAX_ROWS"] = 500  # Linhas por preenchimento em lote
+app.config["BATCH_FILL_WORKERS"] = min(4, os.cpu_count() or 1)  # Processos por lote
+app.config["BATCH_FILL_MAX_JOBS"] = 2  # Lotes executando ao mesmo tempo
+app.config["PREVIEW_CACHE_FOLDER"] = os.path.join(app.config["UPLOAD_FOLDER"], "previews")  # Pré-visualizações geradas
+app.config["PREVIEW_CONVERTER"] = os.environ.get("PREVIEW_CONVERTER")  # Executável do LibreOffice (padrão: soffice no PATH)
 app.config["ALLOWED_EXTENSIONS"] = {"pdf", "doc", "docx", "xls", "xlsx"}
+app.config["LAZY_STARTUP"] = os.environ.get("LAZY_STARTUP", "").lower() in ("1", "true", "yes")  # Banco preparado via CLI
+app.config["PERF_PROFILING_ENABLED"] = os.environ.get("PERF_PROFILING", "1").lower() not in ("0", "false", "no")  # Medidas por requisição
+app.config["PERF_WINDOW_SIZE"] = 500  # Amostras mantidas por rota
+app.config["PERF_N_PLUS_ONE_THRESHOLD"] = 10  # Repetições do mesmo SQL que sinalizam N+1
+app.config["PERF_SLOW_REQUEST_MS"] = 1000  # Requisições acima deste tempo vão para o log
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")  # Token Bearer para /metrics (sem token: apenas administrador autenticado)
+app.config["QUERY_CACHE_MAX_ENTRIES"] = 1024  # Consultas mantidas no cache
+app.config["QUERY_CACHE_TTL"] = 300  # Validade padrão das consultas em cache, em segundos
+app.config["QUERY_CACHE_BACKEND"] = os.environ.get("QUERY_CACHE_BACKEND", "memory")  # "memory" ou "sqlite:///arquivo.db" (compartilhado entre workers)
+app.config["SPC_SUBGROUP_SIZE"] = 5  # Laudos consecutivos por subgrupo da carta X̄/R (2 a 10)
+app.config["SPC_MIN_SAMPLES"] = 20  # Medidas antes de avaliar as regras de controle
+app.config["SPC_HISTORY_SIZE"] = 60  # Subgrupos mantidos para as cartas
+app.config["EXPORT_CHUNK_SIZE"] = 1000  # Linhas lidas do banco e enviadas por vez nas exportações
+app.config["IMPORT_CHUNK_SIZE"] = 5000  # Laudos gravados por transação na importação de planilhas
+app.config["ANALYTICS_SNAPSHOT_FOLDER"] = os.environ.get("ANALYTICS_SNAPSHOT_FOLDER", os.path.join(os.getcwd(), "analytics"))  # Snapshots Parquet para análises
+app.config["ANALYTICS_SNAPSHOT_COMPRESSION"] = "zstd"  # Compressão dos arquivos Parquet
+app.config["ANALYTICS_SNAPSHOT_CHUNK_SIZE"] = 50000  # Linhas lidas do banco por vez (um row group por mês)
+app.config["LAB_SCHEDULE_RULES_FILE"] = os.environ.get("LAB_SCHEDULE_RULES_FILE")  # JSON com as regras da escala do laboratório (padrão: regras embutidas)
+app.config["BACKUP_VERIFY_INTERVAL_DAYS"] = 7  # Dias entre verificações de integridade de cada backup
+app.config["BACKUP_WORKERS"] = None  # Threads de compressão do backup (None = número de CPUs)
+app.config["BACKUP_COMPRESSION_LEVEL"] = 6  # Nível deflate dos arquivos comprimíveis do backup (1 a 9)
 
 # Garantir que a pasta de uploads exista
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
@@ -58,6 +108,27 @@ os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 # Inicializar o banco de dados
 db.init_app(app)
 
+# Cache de consultas com invalidação por tabela alterada
+from utils.query_cache import query_cache
+query_cache.init_app(app)
+
+# Roteamento de leituras para a réplica e telemetria do pool de conexões
+from utils import db_routing
+db_routing.init_app(app, db)
+
+# Instrumentação de desempenho por requisição (registrada primeiro para
+# que seu after_request seja o último a executar)
+from utils.request_profiler import request_profiler
+request_profiler.init_app(app)
+
+# Métricas no formato do Prometheus (/metrics)
+from utils import metrics
+request_profiler.add_observer(metrics.observe_request)
+metrics.registry.register_collector(metrics.process_collector())
+metrics.registry.register_collector(metrics.db_pool_collector(db, app))
+metrics.registry.register_collector(metrics.socketio_collector(socketio))
+metrics.registry.register_collector(metrics.auto_check_collector(os.path.join("tests", "last_check.json")))
+
 # Inicializar proteção CSRF
 csrf = CSRFProtect()
 csrf.init_app(app)
@@ -567,6 +638,9 @@ from blueprints.estoque import estoque_bp
 # Importar novos blueprints
 from blueprints.editor import editor_bp as document_editor_bp
 from blueprints.technical import technical_bp
+from blueprints.uploads import uploads_bp
+from blueprints.desempenho import desempenho_bp, metrics_bp
+from blueprints.cep import cep_bp
 
 app.register_blueprint(reports_bp)
 app.register_blueprint(dashboard_bp)
@@ -589,6 +663,26 @@ app.register_blueprint(forms_editor_bp)
 app.register_blueprint(document_editor_bp)
 app.register_blueprint(technical_bp)
 app.register_blueprint(laboratorio_bp)
+app.register_blueprint(uploads_bp)
+app.register_blueprint(desempenho_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(cep_bp)
+
+# Controle estatístico de processo atualizado a cada laudo salvo
+from utils import spc
+spc.init_app(app)
+
+# Scorecards de qualidade dos fornecedores atualizados a cada laudo salvo
+from utils import scorecards
+scorecards.init_app(app)
+
+# Linhagens de versões de laudos e documentos mantidas a cada gravação
+from utils import version_chain
+version_chain.init_app(app)
+
+# Contadores de documentos técnicos por tipo, status, categoria e dia
+from utils import document_counters
+document_counters.init_app(app)
 
 # Função para atualizar o banco de dados de forma incremental
 def setup_database():
@@ -634,8 +728,9 @@ def setup_database():
         logger.debug(f"Erro ao adicionar fornecedores: {error_info['user_message']}")
         db.session.rollback()
 
-# Inicializar o banco de dados
-with app.app_context():
+
+def bootstrap_database():
+    """Cria as tabelas e os registros iniciais (categorias, fornecedores e usuário admin)."""
     setup_database()
     
     try:
@@ -670,3 +765,196 @@ with app.app_context():
     except Exception as e:
         logger.debug(f"Erro ao criar usuário admin: {e}")
         db.session.rollback()
+
+
+@app.cli.command('bootstrap-db')
+def bootstrap_db_command():
+    """Cria as tabelas do banco de dados e os registros iniciais."""
+    bootstrap_database()
+    click.echo('Banco de dados inicializado.')
+
+
+@app.cli.command('startup-profile')
+@click.option('--top', default=25, help='Quantidade de módulos listados.')
+@click.option('--runs', default=5, help='Execuções para medir o tempo de inicialização.')
+@click.option('--budget', type=float, default=None, help='Tempo máximo de importação, em segundos.')
+def startup_profile_command(top, runs, budget):
+    """Mostra o custo de importação por módulo e mede o tempo de inicialização."""
+    from utils.startup_profile import run_report
+    raise SystemExit(run_report(top=top, runs=runs, budget=budget))
+
+
+@app.cli.command('spc-rebuild')
+def spc_rebuild_command():
+    """Recalcula as estatísticas de CEP a partir de todos os laudos."""
+    from utils import spc
+    processed = spc.rebuild(db.session)
+    click.echo(f'Estatísticas de CEP recalculadas a partir de {processed} laudos.')
+
+
+@app.cli.command('scorecards-rebuild')
+def scorecards_rebuild_command():
+    """Recalcula os scorecards de fornecedores a partir de todos os laudos."""
+    from utils import scorecards
+    processed = scorecards.rebuild(db.session)
+    click.echo(f'Scorecards de fornecedores recalculados a partir de {processed} laudos.')
+
+
+@app.cli.command('analytics-snapshot')
+@click.option('--full', is_flag=True, help='Refaz os snapshots do zero (propaga exclusões).')
+@click.option('--compact', 'compact_months', is_flag=True, help='Reescreve cada mês num único arquivo após exportar.')
+@click.option('--table', 'tables', multiple=True, help='Tabela exportada (pode repetir; padrão: todas).')
+def analytics_snapshot_command(full, compact_months, tables):
+    """Acrescenta aos snapshots Parquet as linhas alteradas desde a última execução."""
+    from utils import analytics_snapshot
+    folder = app.config["ANALYTICS_SNAPSHOT_FOLDER"]
+    try:
+        exported = analytics_snapshot.export_snapshots(
+            db.session, folder, tables=tables or None, full=full,
+            chunk_size=app.config["ANALYTICS_SNAPSHOT_CHUNK_SIZE"],
+            compression=app.config["ANALYTICS_SNAPSHOT_COMPRESSION"],
+        )
+    except analytics_snapshot.SnapshotBusy as e:
+        raise click.ClickException(str(e))
+    for name, count in exported.items():
+        click.echo(f'{name}: {count} linha(s) exportada(s)')
+        if compact_months:
+            rewritten = analytics_snapshot.compact(folder, name, compression=app.config["ANALYTICS_SNAPSHOT_COMPRESSION"])
+            click.echo(f'{name}: {rewritten} mês(es) compactado(s)')
+
+
+@app.cli.command('version-chains-rebuild')
+def version_chains_rebuild_command():
+    """Recalcula as linhagens de versões de laudos e documentos."""
+    from utils import version_chain
+    processed = version_chain.rebuild(db.session)
+    click.echo('Linhagens recalculadas: ' + ', '.join(f'{name}: {count}' for name, count in processed.items()))
+
+
+@app.cli.command('document-counters-reconcile')
+def document_counters_reconcile_command():
+    """Confere os contadores de documentos com as contagens reais e corrige as diferenças."""
+    from utils import document_counters
+    corrected = document_counters.reconcile(db.session)
+    click.echo(f'Contadores de documentos conferidos: {corrected} valor(es) corrigido(s).')
+
+
+@app.cli.command('lab-schedule-check')
+@click.argument('path', required=False)
+def lab_schedule_check_command(path):
+    """Valida um arquivo de regras da escala do laboratório (padrão: LAB_SCHEDULE_RULES_FILE)."""
+    from utils import lab_schedule
+    path = path or app.config["LAB_SCHEDULE_RULES_FILE"]
+    try:
+        ruleset = lab_schedule.load_rules_file(path) if path else lab_schedule.RuleSet(lab_schedule.DEFAULT_RULES)
+    except (OSError, lab_schedule.InvalidRules) as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{len(ruleset.rules)} regra(s) válidas ({ruleset.source}), versão {ruleset.version}.')
+    for rule in ruleset.rules:
+        click.echo(f"  - {rule['atividade']} ({rule['tipo']})")
+
+
+@app.cli.command('backup-create')
+@click.option('--no-uploads', is_flag=True, help='Não inclui os arquivos de upload')
+@click.option('--logs', 'include_logs', is_flag=True, help='Inclui os arquivos de log')
+def backup_create_command(no_uploads, include_logs):
+    """Cria um backup completo do sistema, mostrando o andamento."""
+    from utils.backup_manager import BackupManager
+
+    def show_progress(data):
+        click.echo(f"  {data['percent']}% - {data['files_done']}/{data['files_total']} arquivo(s), "
+                   f"{data['throughput_mb_s']} MB/s")
+
+    result = BackupManager(app).create_system_backup(
+        include_uploads=not no_uploads, include_logs=include_logs, progress=show_progress
+    )
+    if not result['success']:
+        raise click.ClickException(f"Erro ao criar backup: {result.get('error')}")
+    archive = result['archive']
+    click.echo(f"Backup criado: {result['file_path']}")
+    click.echo(f"  {archive['files_done']} arquivo(s), {archive['bytes_done'] / 1024 / 1024:.1f} MB lidos, "
+               f"{result['size'] / 1024 / 1024:.1f} MB gravados em {result['timings']['total']:.1f} s "
+               f"({archive['throughput_mb_s']} MB/s, {archive['workers']} thread(s))")
+    for name in archive['skipped']:
+        click.echo(f'  - ignorado: {name}')
+
+
+@app.cli.command('backups-verify')
+@click.option('--deep', is_flag=True, help='Descompacta cada arquivo e confere o CRC')
+@click.option('--all', 'verify_all', is_flag=True, help='Verifica todos, não só os pendentes')
+def backups_verify_command(deep, verify_all):
+    """Verifica a integridade dos backups do sistema (para agendamento via cron)."""
+    from utils.backup_manager import BackupManager
+    manager = BackupManager(app)
+    if verify_all:
+        names = [backup['file_name'] for backup in manager.get_available_backups()]
+    else:
+        names = manager.catalog.due_for_verification(app.config["BACKUP_VERIFY_INTERVAL_DAYS"])
+    failed = 0
+    for name in names:
+        result = manager.verify_backup(name, deep=deep)
+        click.echo(f"{name}: {result['status']} ({result['seconds']:.1f} s)")
+        for problem in result['problems']:
+            click.echo(f'  - {problem}')
+        failed += result['status'] != 'ok'
+    click.echo(f'{len(names)} backup(s) verificado(s), {failed} com falha.')
+    if failed:
+        raise SystemExit(1)
+
+
+@app.cli.command('import-laudos')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Apenas valida e mostra o que seria importado.')
+@click.option('--user', 'username', default='admin', help='Usuário registrado como criador dos laudos.')
+@click.option('--map', 'mappings', multiple=True, help='Coluna da planilha para um campo: "Coluna=campo" (pode repetir).')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False), help='Grava o resultado completo em JSON.')
+def import_laudos_command(paths, dry_run, username, mappings, report_path):
+    """Importa laudos históricos de planilhas (.xlsx, .xls ou .csv)."""
+    import json
+    from models import User
+    from utils import report_import
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'Usuário não encontrado: {username}')
+    mapping = {}
+    for item in mappings:
+        header, separator, field = item.rpartition('=')
+        if not separator:
+            raise click.ClickException(f'Mapeamento inválido (use "Coluna=campo"): {item}')
+        mapping[header] = field.strip()
+
+    try:
+        result = report_import.import_reports(
+            db.session, paths, user_id=user.id, dry_run=dry_run,
+            chunk_size=app.config["IMPORT_CHUNK_SIZE"], mapping=mapping,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if result.imported and not dry_run:
+        report_import.rebuild_derived_tables(db.session)
+
+    summary = result.to_dict()
+    for location, columns in summary['columns'].items():
+        click.echo(f"{location}: " + ', '.join(f'{header} -> {field}' for header, field in columns.items()))
+    for error in summary['errors'][:20]:
+        click.echo(f'  {error}')
+    if summary['invalid'] > 20:
+        click.echo(f"  ... mais {summary['invalid'] - 20} linha(s) com erro")
+    verb = 'seriam importados' if dry_run else 'importados'
+    click.echo(
+        f"{summary['rows_read']} linha(s) lidas, {summary['imported']} laudo(s) {verb}, "
+        f"{summary['invalid']} com erro, {summary['duplicates_in_files']} repetidos nas planilhas, "
+        f"{summary['duplicates_existing']} já cadastrados."
+    )
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+# Na inicialização rápida (LAZY_STARTUP=1) o banco não é tocado durante a
+# importação: tabelas e registros iniciais são criados pelo comando
+# `flask --app main bootstrap-db`, executado uma vez antes de subir os workers.
+if not app.config["LAZY_STARTUP"]:
+    with app.app_context():
+        bootstrap_database()
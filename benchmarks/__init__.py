@@ -0,0 +1,34 @@
+"""
+Benchmarks da aplicação com volumes realistas.
+
+    python -m benchmarks seed --scale 0.01      # popula o banco de benchmark
+    python -m benchmarks run -o resultado.json  # mede as rotas principais
+    python -m benchmarks compare base.json resultado.json
+    python -m benchmarks load --url http://127.0.0.1:5000 --users 20
+
+O banco usado é o de BENCHMARK_DATABASE_URL (ou --database); o padrão é um
+arquivo SQLite próprio (benchmarks/benchmark.db), nunca o banco da aplicação.
+"""
+
+import os
+
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark.db')
+
+
+def load_app(database_url=None):
+    """
+    Importa a aplicação apontando para o banco de benchmark.
+
+    A variável DATABASE_URL precisa ser definida antes da importação de app,
+    que lê a configuração no carregamento do módulo.
+
+    Returns:
+        Tupla (app, db)
+    """
+    os.environ['DATABASE_URL'] = database_url or os.environ.get('BENCHMARK_DATABASE_URL') or DEFAULT_DATABASE_URL
+    os.environ['LAZY_STARTUP'] = '1'
+    from main import app, db
+    with app.app_context():
+        from app import bootstrap_database
+        bootstrap_database()
+    return app, db
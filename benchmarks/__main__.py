@@ -0,0 +1,149 @@
+"""
+Linha de comando dos benchmarks (python -m benchmarks --help).
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+from benchmarks import load_app
+from benchmarks.compare import (
+    DEFAULT_THRESHOLD, DEFAULT_MIN_DELTA_MS, compare_results, format_comparison, has_regressions
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def _seed(args):
+    from benchmarks.seed import scaled_volumes, seed
+
+    overrides = {}
+    for item in args.volume or []:
+        name, _, value = item.partition('=')
+        overrides[name] = int(value)
+    volumes = scaled_volumes(args.scale, overrides)
+    print('Volumes:', json.dumps(volumes, ensure_ascii=False))
+
+    app, db = load_app(args.database)
+    with app.app_context():
+        try:
+            inserted = seed(db, volumes, seed=args.seed, append=args.append)
+        except RuntimeError as e:
+            print(f'Erro: {e}', file=sys.stderr)
+            return 2
+    print('Inseridos:', json.dumps(inserted, ensure_ascii=False))
+    return 0
+
+
+def _run(args):
+    from benchmarks.suite import run_suite, save_results
+
+    app, db = load_app(args.database)
+    results = run_suite(app, db, repeat=args.repeat, warmup=args.warmup, only=args.case)
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    save_results(results, output)
+
+    for name, case in results['cases'].items():
+        sql = f" {case['sql_queries']:>4} SQL" if 'sql_queries' in case else ''
+        print(f"{name:<34} mediana {case['median_ms']:>9.1f} ms  p95 {case['p95_ms']:>9.1f} ms{sql}  {case['status']}")
+    print(f'Resultado gravado em {output}')
+
+    if args.baseline:
+        return _print_comparison(args.baseline, output, args.threshold, args.min_delta)
+    return 0
+
+
+def _load(args):
+    from benchmarks.load import run_load, format_report
+    from benchmarks.seed import BENCHMARK_PASSWORD
+    from benchmarks.suite import save_results, first_form
+
+    if args.user:
+        credentials = [tuple(item.split(':', 1)) for item in args.user]
+    else:
+        # Usuários criados pelo comando seed
+        credentials = [(f'bench{index:04d}', BENCHMARK_PASSWORD) for index in range(1, args.bench_users + 1)]
+
+    result = run_load(
+        args.url, users=args.users, duration=args.duration, think_time=args.think_time,
+        ramp_up=args.ramp_up, credentials=credentials, form_path=args.form or first_form('.xlsx'),
+        seed=args.seed
+    )
+    print(format_report(result))
+    if args.output:
+        save_results(result, args.output)
+        print(f'Resultado gravado em {args.output}')
+    return 1 if result['total']['error_rate'] > args.max_error_rate else 0
+
+
+def _print_comparison(baseline_path, current_path, threshold, min_delta):
+    from benchmarks.suite import load_results
+
+    rows = compare_results(load_results(baseline_path), load_results(current_path), threshold, min_delta)
+    print(format_comparison(rows))
+    if has_regressions(rows):
+        print('Regressões encontradas.')
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks com volumes realistas.')
+    parser.add_argument('--database', help='URL do banco (padrão: BENCHMARK_DATABASE_URL ou benchmarks/benchmark.db)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Mostrar o progresso detalhado')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Gerar dados sintéticos')
+    seed_parser.add_argument('--scale', type=float, default=1.0, help='Fator sobre os volumes completos (ex.: 0.01)')
+    seed_parser.add_argument('--volume', action='append', metavar='TABELA=N',
+                             help='Volume explícito de uma tabela (ex.: reports=200000)')
+    seed_parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+    seed_parser.add_argument('--append', action='store_true', help='Acrescentar a um banco que já possui laudos')
+    seed_parser.set_defaults(handler=_seed)
+
+    run_parser = commands.add_parser('run', help='Medir as rotas principais')
+    run_parser.add_argument('-o', '--output', help='Arquivo JSON de saída (padrão: benchmarks/results/)')
+    run_parser.add_argument('--repeat', type=int, default=10, help='Repetições medidas por caso')
+    run_parser.add_argument('--warmup', type=int, default=2, help='Execuções de aquecimento por caso')
+    run_parser.add_argument('--case', action='append', help='Executar apenas este caso (pode repetir)')
+    run_parser.add_argument('--baseline', help='Comparar com este resultado ao final')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Tolerância relativa')
+    run_parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA_MS, help='Diferença mínima (ms)')
+    run_parser.set_defaults(handler=_run)
+
+    compare_parser = commands.add_parser('compare', help='Comparar duas execuções')
+    compare_parser.add_argument('baseline', help='Resultado de referência')
+    compare_parser.add_argument('current', help='Resultado novo')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Tolerância relativa')
+    compare_parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA_MS, help='Diferença mínima (ms)')
+    compare_parser.set_defaults(
+        handler=lambda args: _print_comparison(args.baseline, args.current, args.threshold, args.min_delta)
+    )
+
+    load_parser = commands.add_parser('load', help='Teste de carga contra uma instância em execução')
+    load_parser.add_argument('--url', default='http://127.0.0.1:5000', help='Endereço da instância')
+    load_parser.add_argument('--users', type=int, default=10, help='Usuários virtuais simultâneos')
+    load_parser.add_argument('--duration', type=float, default=120, help='Duração total, em segundos')
+    load_parser.add_argument('--think-time', type=float, default=3.0, help='Reflexão média entre passos (s)')
+    load_parser.add_argument('--ramp-up', type=float, default=10, help='Tempo para iniciar todos os usuários (s)')
+    load_parser.add_argument('--user', action='append', metavar='USUARIO:SENHA',
+                             help='Credencial usada em rodízio (padrão: usuários do comando seed)')
+    load_parser.add_argument('--bench-users', type=int, default=5, help='Usuários do seed usados em rodízio')
+    load_parser.add_argument('--form', help='Formulário da jornada de preenchimento (relativo a extracted_forms/)')
+    load_parser.add_argument('--seed', type=int, default=42, help='Semente das escolhas aleatórias')
+    load_parser.add_argument('--max-error-rate', type=float, default=0.01,
+                             help='Taxa de erros acima da qual o comando termina com código 1')
+    load_parser.add_argument('-o', '--output', help='Arquivo JSON de saída')
+    load_parser.set_defaults(handler=_load)
+
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger('zelopack.benchmarks').setLevel(logging.INFO)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Comparação entre duas execuções da suíte de benchmarks.
+
+Um caso é considerado regressão quando a mediana fica mais lenta que a da
+execução de referência além da tolerância relativa e também além de um
+mínimo absoluto (para não acusar ruído em rotas de poucos milissegundos),
+quando passa a executar mais comandos SQL ou quando o status HTTP muda.
+"""
+
+DEFAULT_THRESHOLD = 0.10  # 10% mais lento
+DEFAULT_MIN_DELTA_MS = 5.0
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compara duas execuções.
+
+    Args:
+        baseline: Resultado de referência (dicionário de run_suite)
+        current: Resultado novo
+        threshold: Tolerância relativa da mediana (0.10 = 10%)
+        min_delta_ms: Diferença absoluta mínima para considerar regressão
+
+    Returns:
+        Lista de dicionários por caso com name, baseline_ms, current_ms, change
+        (proporção), verdict ('regressao', 'melhoria', 'estavel', 'novo',
+        'removido') e reasons
+    """
+    rows = []
+    base_cases = baseline.get('cases', {})
+    current_cases = current.get('cases', {})
+
+    for name in sorted(set(base_cases) | set(current_cases)):
+        base = base_cases.get(name)
+        cur = current_cases.get(name)
+        if base is None or cur is None:
+            rows.append({
+                'name': name,
+                'baseline_ms': base and base['median_ms'],
+                'current_ms': cur and cur['median_ms'],
+                'change': None,
+                'verdict': 'novo' if base is None else 'removido',
+                'reasons': [],
+            })
+            continue
+
+        base_ms, cur_ms = base['median_ms'], cur['median_ms']
+        change = (cur_ms - base_ms) / base_ms if base_ms else 0.0
+        reasons = []
+        if change > threshold and cur_ms - base_ms > min_delta_ms:
+            reasons.append(f'mediana {change:+.0%}')
+        if cur.get('sql_queries') is not None and base.get('sql_queries') is not None \
+                and cur['sql_queries'] > base['sql_queries']:
+            reasons.append(f"SQL {base['sql_queries']} -> {cur['sql_queries']}")
+        if cur.get('status') != base.get('status'):
+            reasons.append(f"status {base.get('status')} -> {cur.get('status')}")
+
+        if reasons:
+            verdict = 'regressao'
+        elif change < -threshold and base_ms - cur_ms > min_delta_ms:
+            verdict = 'melhoria'
+        else:
+            verdict = 'estavel'
+        rows.append({
+            'name': name,
+            'baseline_ms': base_ms,
+            'current_ms': cur_ms,
+            'change': change,
+            'verdict': verdict,
+            'reasons': reasons,
+        })
+    return rows
+
+
+def format_comparison(rows):
+    """Tabela em texto da comparação."""
+    lines = [f"{'caso':<34} {'ref. (ms)':>10} {'atual (ms)':>10} {'variação':>9}  resultado"]
+    for row in rows:
+        base = f"{row['baseline_ms']:.1f}" if row['baseline_ms'] is not None else '-'
+        cur = f"{row['current_ms']:.1f}" if row['current_ms'] is not None else '-'
+        change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+        verdict = row['verdict'].upper() if row['verdict'] == 'regressao' else row['verdict']
+        detail = f" ({', '.join(row['reasons'])})" if row['reasons'] else ''
+        lines.append(f"{row['name']:<34} {base:>10} {cur:>10} {change:>9}  {verdict}{detail}")
+    return '\n'.join(lines)
+
+
+def has_regressions(rows):
+    return any(row['verdict'] == 'regressao' for row in rows)
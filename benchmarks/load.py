@@ -0,0 +1,350 @@
+"""
+Teste de carga em malha fechada contra uma instância local.
+
+Cada usuário virtual é uma thread com sua própria sessão HTTP: faz login,
+escolhe uma jornada do turno (consulta, recebimento de laudo, preenchimento
+de formulário, cálculos, edição colaborativa) e executa seus passos com um
+tempo de reflexão entre eles. Só inicia o próximo passo depois de receber a
+resposta do anterior, como um terminal real; a carga cresce com o número de
+usuários e não com uma taxa fixa de requisições.
+
+Ao final são informados, por passo, a vazão, os percentis de latência e a
+taxa de erros, além da concorrência média observada, que serve de base para
+dimensionar os workers do gunicorn e o pool de conexões do banco.
+
+Use apenas contra uma instância de teste: as jornadas criam laudos.
+"""
+
+import io
+import logging
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.benchmarks')
+
+DEFAULT_USERS = 10
+DEFAULT_DURATION = 120  # segundos
+DEFAULT_THINK_TIME = 3.0  # média, em segundos (distribuição exponencial)
+DEFAULT_RAMP_UP = 10  # segundos até todos os usuários estarem ativos
+REQUEST_TIMEOUT = 60
+
+SEARCH_TERMS = ('laranja', 'maçã', 'uva', 'maracujá', 'manga', 'Fornecedor 001', 'L25', 'AM000')
+
+# Jornadas do turno: (nome, peso)
+JOURNEYS = (
+    ('consulta', 40),  # painel, busca de laudos e alertas
+    ('recebimento', 15),  # envio de laudo e busca do laudo enviado
+    ('formulario', 15),  # preenchimento e download de formulário
+    ('calculos', 20),  # cálculos técnicos
+    ('editor', 10),  # sessão de edição colaborativa (Socket.IO)
+)
+
+_CSRF_META_RE = re.compile(r'<meta name="csrf-token" content="([^"]+)"')
+_CSRF_INPUT_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+
+# PDF mínimo válido usado no envio de laudos
+_SAMPLE_PDF = (
+    b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+    b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n'
+    b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n'
+    b'trailer<</Root 1 0 R>>\n%%EOF\n'
+)
+
+
+class StepRecorder:
+    """Registro das medidas de cada passo, compartilhado pelos usuários virtuais."""
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+        self.logged_in = 0
+        self._busy_time = 0.0
+
+    def user_logged_in(self):
+        with self._lock:
+            self.logged_in += 1
+
+    def record(self, step, seconds, ok, error=None):
+        with self._lock:
+            self._samples[step].append((seconds, ok, error))
+            self._busy_time += seconds
+
+    def measure(self, step, func, *args, **kwargs):
+        """Executa func e registra sua duração. Retorna o resultado (ou None em caso de erro)."""
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record(step, time.perf_counter() - started, False, f'{type(e).__name__}: {str(e)[:120]}')
+            return None
+        ok = getattr(result, 'status_code', 200) < 400 if result is not None else False
+        error = None if ok else f'HTTP {getattr(result, "status_code", "?")}'
+        self.record(step, time.perf_counter() - started, ok, error)
+        return result
+
+    def report(self, elapsed):
+        """
+        Resumo por passo e total.
+
+        Args:
+            elapsed: Duração do teste, em segundos
+
+        Returns:
+            Dicionário {'steps': {...}, 'total': {...}, 'concurrency': ...}
+        """
+        def summarize(samples):
+            durations = sorted(seconds * 1000 for seconds, _, _ in samples)
+            errors = [error for _, ok, error in samples if not ok]
+            count = len(durations)
+            return {
+                'requests': count,
+                'throughput_rps': round(count / elapsed, 3) if elapsed else 0.0,
+                'p50_ms': round(_percentile(durations, 50), 1),
+                'p95_ms': round(_percentile(durations, 95), 1),
+                'p99_ms': round(_percentile(durations, 99), 1),
+                'max_ms': round(durations[-1], 1) if durations else 0.0,
+                'mean_ms': round(statistics.fmean(durations), 1) if durations else 0.0,
+                'error_rate': round(len(errors) / count, 4) if count else 0.0,
+                'errors': sorted(set(errors))[:5],
+            }
+
+        with self._lock:
+            steps = {step: summarize(samples) for step, samples in sorted(self._samples.items())}
+            everything = [sample for samples in self._samples.values() for sample in samples]
+            busy = self._busy_time
+        return {
+            'steps': steps,
+            'total': summarize(everything),
+            # Lei de Little: requisições em andamento, em média
+            'concurrency': round(busy / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+class VirtualUser(threading.Thread):
+    """Terminal simulado que executa jornadas até o fim do teste."""
+
+    def __init__(self, index, base_url, credentials, recorder, deadline, think_time, form_path, seed):
+        super().__init__(name=f'usuario-{index}', daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.username, self.password = credentials
+        self.recorder = recorder
+        self.deadline = deadline
+        self.think_time = think_time
+        self.form_path = form_path
+        self.random = random.Random(seed)
+        self.session = None
+        self.csrf_token = None
+
+    # Utilitários ----------------------------------------------------------
+
+    def _url(self, path):
+        return self.base_url + path
+
+    def _think(self):
+        if self.think_time > 0:
+            time.sleep(min(self.random.expovariate(1.0 / self.think_time), self.think_time * 5))
+
+    def _get(self, step, path, **kwargs):
+        response = self.recorder.measure(step, self.session.get, self._url(path), timeout=REQUEST_TIMEOUT, **kwargs)
+        if response is not None:
+            match = _CSRF_META_RE.search(response.text) if 'html' in response.headers.get('Content-Type', '') else None
+            if match:
+                self.csrf_token = match.group(1)
+        return response
+
+    def _post(self, step, path, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if self.csrf_token:
+            headers.setdefault('X-CSRFToken', self.csrf_token)
+        return self.recorder.measure(
+            step, self.session.post, self._url(path), headers=headers, timeout=REQUEST_TIMEOUT, **kwargs
+        )
+
+    # Jornadas -------------------------------------------------------------
+
+    def login(self):
+        import requests
+
+        self.session = requests.Session()
+        page = self._get('login_pagina', '/login')
+        if page is None:
+            return False
+        match = _CSRF_INPUT_RE.search(page.text)
+        token = (match.group(1) or match.group(2)) if match else self.csrf_token
+        response = self._post('login', '/login', data={
+            'csrf_token': token or '',
+            'username': self.username,
+            'password': self.password,
+        })
+        # Login bem-sucedido redireciona para fora da página de login
+        return response is not None and not response.url.rstrip('/').endswith('/login')
+
+    def journey_consulta(self):
+        self._get('painel', '/dashboard/')
+        self._think()
+        self._get('busca_laudos', '/reports/api/search', params={'query': self.random.choice(SEARCH_TERMS)})
+        self._think()
+        self._get('alertas', '/alertas/api/alertas-nao-lidos')
+
+    def journey_recebimento(self):
+        self._get('upload_pagina', '/reports/upload')
+        self._think()
+        title = f'Carga {self.name} {int(time.time() * 1000)}'
+        self._post('upload_laudo', '/reports/upload', data={
+            'csrf_token': self.csrf_token or '',
+            'title': title,
+            'batch_number': f'LT{self.random.randrange(1000, 9999)}',
+        }, files={'file': ('laudo_carga.pdf', io.BytesIO(_SAMPLE_PDF), 'application/pdf')})
+        self._think()
+        self._get('busca_laudos', '/reports/api/search', params={'query': title})
+
+    def journey_formulario(self):
+        if not self.form_path:
+            return self.journey_consulta()
+        self._get('formulario_campos', f'/forms/fill/{self.form_path}')
+        self._think()
+        self._post('formulario_download', f'/forms/download_filled/{self.form_path}',
+                   data={'csrf_token': self.csrf_token or ''})
+
+    def journey_calculos(self):
+        self._get('calculos_pagina', '/calculos/')
+        for _ in range(self.random.randint(1, 3)):
+            self._think()
+            self._post('calculo_ratio', '/calculos/api/calcular/ratio', json={
+                'brix': round(self.random.gauss(11.5, 0.8), 2),
+                'acidez': round(self.random.gauss(0.85, 0.07), 3),
+            })
+
+    def journey_editor(self):
+        import socketio
+
+        client = socketio.Client(reconnection=False)
+        joined = threading.Event()
+        client.on('current_users', lambda data: joined.set())
+        cookie = '; '.join(f'{name}={value}' for name, value in self.session.cookies.items())
+        document_id = f'carga-{self.random.randrange(5)}'  # Poucos documentos: usuários compartilham salas
+
+        started = time.perf_counter()
+        try:
+            client.connect(self.base_url, headers={'Cookie': cookie}, wait_timeout=REQUEST_TIMEOUT)
+            client.emit('join_document', {'document_id': document_id, 'user_info': {'name': self.username}})
+            ok = joined.wait(REQUEST_TIMEOUT)
+            self.recorder.record('editor_entrar', time.perf_counter() - started, ok,
+                                 None if ok else 'sem resposta ao entrar no documento')
+            for revision in range(self.random.randint(3, 8)):
+                self._think()
+                started = time.perf_counter()
+                client.emit('update_content', {
+                    'document_id': document_id,
+                    'content': f'<p>Revisão {revision} de {self.username}</p>',
+                    'user_id': self.username,
+                })
+                self.recorder.record('editor_atualizar', time.perf_counter() - started, True)
+            client.emit('leave_document', {'document_id': document_id})
+        except Exception as e:
+            self.recorder.record('editor_entrar', time.perf_counter() - started, False,
+                                 f'{type(e).__name__}: {str(e)[:120]}')
+        finally:
+            if client.connected:
+                client.disconnect()
+
+    # Execução -------------------------------------------------------------
+
+    def run(self):
+        names, weights = zip(*JOURNEYS)
+        try:
+            if not self.login():
+                logger.warning(f"{self.name}: login falhou para {self.username}")
+                return
+            self.recorder.user_logged_in()
+            while time.monotonic() < self.deadline:
+                journey = self.random.choices(names, weights)[0]
+                getattr(self, f'journey_{journey}')()
+                self._think()
+        finally:
+            if self.session is not None:
+                self.session.close()
+
+
+def run_load(base_url, users=DEFAULT_USERS, duration=DEFAULT_DURATION, think_time=DEFAULT_THINK_TIME,
+             ramp_up=DEFAULT_RAMP_UP, credentials=None, form_path=None, seed=42):
+    """
+    Executa o teste de carga.
+
+    Args:
+        base_url: Endereço da instância (ex.: http://127.0.0.1:5000)
+        users: Quantidade de usuários virtuais simultâneos
+        duration: Duração total, em segundos (inclui a rampa)
+        think_time: Tempo médio de reflexão entre passos, em segundos
+        ramp_up: Tempo para iniciar todos os usuários, em segundos
+        credentials: Lista de tuplas (usuário, senha), usada em rodízio
+        form_path: Formulário (relativo a extracted_forms/) da jornada de preenchimento
+        seed: Semente das escolhas aleatórias
+
+    Returns:
+        Dicionário com a configuração e o resumo por passo (StepRecorder.report)
+    """
+    credentials = credentials or [('admin', 'admin')]
+    recorder = StepRecorder()
+    started = time.monotonic()
+    deadline = started + duration
+
+    threads = []
+    for index in range(users):
+        thread = VirtualUser(
+            index + 1, base_url, credentials[index % len(credentials)], recorder,
+            deadline, think_time, form_path, seed + index
+        )
+        threads.append(thread)
+        thread.start()
+        if ramp_up and users > 1:
+            time.sleep(ramp_up / users)
+
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()) + REQUEST_TIMEOUT)
+    elapsed = time.monotonic() - started
+
+    result = recorder.report(elapsed)
+    result['config'] = {
+        'base_url': base_url,
+        'users': users,
+        'logged_in': recorder.logged_in,
+        'duration_s': round(elapsed, 1),
+        'think_time_s': think_time,
+        'ramp_up_s': ramp_up,
+    }
+    return result
+
+
+def format_report(result):
+    """Tabela em texto do resultado."""
+    config = result['config']
+    lines = [
+        f"{config['logged_in']}/{config['users']} usuários, {config['duration_s']}s, "
+        f"reflexão média {config['think_time_s']}s",
+        f"{'passo':<22} {'req':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>7}",
+    ]
+    rows = list(result['steps'].items()) + [('TOTAL', result['total'])]
+    for step, stats in rows:
+        lines.append(
+            f"{step:<22} {stats['requests']:>6} {stats['throughput_rps']:>7.2f} {stats['p50_ms']:>8.1f} "
+            f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate']:>7.1%}"
+        )
+        for error in stats['errors']:
+            lines.append(f"{'':<22}   {error}")
+    lines.append(f"Requisições simultâneas em média: {result['concurrency']}")
+    return '\n'.join(lines)
@@ -0,0 +1,443 @@
+"""
+Gerador de dados sintéticos para os benchmarks.
+
+Os volumes do perfil completo reproduzem alguns anos de operação do
+laboratório (1M de laudos, 5M de atividades de usuários, 100k movimentações
+de estoque, milhares de documentos técnicos). O parâmetro scale reduz todos
+os volumes proporcionalmente para execuções rápidas.
+
+As distribuições seguem o padrão observado na operação: poucos fornecedores
+concentram a maior parte dos laudos, a laranja domina as matérias-primas,
+os registros se concentram nos turnos de trabalho dos dias úteis e os
+valores físico-químicos variam em torno da média de cada fruta.
+"""
+
+import logging
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, insert
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.benchmarks')
+
+# Volumes do perfil completo
+FULL_VOLUMES = {
+    'users': 60,
+    'suppliers': 120,
+    'reports': 1_000_000,
+    'user_activities': 5_000_000,
+    'stock_items': 500,
+    'stock_movements': 100_000,
+    'technical_documents': 5_000,
+    'alerts': 2_000,
+}
+
+# Volumes mínimos (tabelas de apoio continuam úteis em escalas pequenas)
+MIN_VOLUMES = {'users': 5, 'suppliers': 10, 'stock_items': 20}
+
+BATCH_SIZE = 10_000
+HISTORY_DAYS = 3 * 365
+SYNTHETIC_PREFIX = 'benchmark/'  # Prefixo dos caminhos de arquivo sintéticos
+BENCHMARK_PASSWORD = 'benchmark'  # Senha dos usuários sintéticos (bench0001, bench0002, ...)
+
+# Matéria-prima: (peso, brix médio, pH médio, acidez média)
+RAW_MATERIALS = {
+    'laranja': (45, 11.5, 3.7, 0.85),
+    'maçã': (15, 12.5, 3.5, 0.45),
+    'uva': (12, 15.5, 3.3, 0.65),
+    'maracujá': (10, 13.5, 2.9, 3.20),
+    'manga': (8, 14.5, 4.0, 0.40),
+    'pêssego': (5, 11.0, 3.8, 0.55),
+    'abacaxi': (5, 12.5, 3.6, 0.75),
+}
+
+MATERIAL_WEIGHTS = tuple((name, spec[0]) for name, spec in RAW_MATERIALS.items())
+
+REPORT_CATEGORIES = (('Matéria-prima', 60), ('Produto acabado', 20), ('Embalagem', 8),
+                     ('Microbiologia', 8), ('Água', 4))
+REPORT_STATUS = (('aprovado', 75), ('pendente', 15), ('rejeitado', 10))
+REPORT_STAGE = {'aprovado': 'assinado', 'pendente': 'rascunho', 'rejeitado': 'validado'}
+REPORT_PRIORITY = (('normal', 70), ('alta', 15), ('baixa', 10), ('urgente', 5))
+VALIDATION = (('ok', 85), ('não padrão', 10), ('não verificado', 5))
+FILE_TYPES = (('pdf', 80), ('docx', 12), ('xlsx', 8))
+
+ACTIONS = (('view', 55), ('update', 12), ('create', 10), ('login', 8), ('logout', 6),
+           ('download', 6), ('print', 2), ('delete', 1))
+MODULES = (('reports', 45), ('documents', 15), ('forms', 12), ('calculos', 10), ('estoque', 8),
+           ('dashboard', 6), ('users', 2), ('alertas', 2))
+
+DOCUMENT_TYPES = (('pop', 30), ('formulario', 25), ('ficha_tecnica', 15), ('instrucao', 10),
+                  ('certificado', 8), ('planilha', 7), ('manual', 3), ('outro', 2))
+DOCUMENT_CATEGORIES = ('laboratorio', 'qualidade', 'blender', 'portaria', 'tba')
+DOCUMENT_STATUS = (('ativo', 80), ('em_revisao', 10), ('obsoleto', 10))
+
+STOCK_CATEGORIES = ('Reagentes', 'Vidrarias', 'EPI', 'Meios de cultura', 'Padrões', 'Limpeza',
+                    'Embalagens de amostra', 'Consumíveis')
+GLOVE_SIZES = (('M', 40), ('G', 30), ('P', 20), ('XG', 10))
+
+ALERT_TYPES = (('info', 50), ('warning', 30), ('danger', 15), ('success', 5))
+
+# Peso relativo das horas do dia (turnos das 6h às 22h)
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 8, 10, 10, 10, 9, 6, 5, 8, 10, 10, 9, 8, 6, 5, 4, 3, 2, 1]
+
+
+def scaled_volumes(scale=1.0, overrides=None):
+    """
+    Volumes do perfil completo multiplicados por scale.
+
+    Args:
+        scale: Fator aplicado a todos os volumes (ex.: 0.01 para 1%)
+        overrides: Dicionário {tabela: quantidade} com valores explícitos
+
+    Returns:
+        Dicionário {tabela: quantidade}
+    """
+    volumes = {}
+    for name, volume in FULL_VOLUMES.items():
+        volumes[name] = max(MIN_VOLUMES.get(name, 0), int(round(volume * scale)))
+    volumes.update(overrides or {})
+    return volumes
+
+
+class _Sampler:
+    """Amostragem reprodutível com as distribuições do laboratório."""
+
+    def __init__(self, seed, days=HISTORY_DAYS):
+        self.random = random.Random(seed)
+        self.end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        self.days = days
+        self._hours = list(range(24))
+        self._zipf = {}
+
+    def choice(self, weighted):
+        values, weights = zip(*weighted)
+        return self.random.choices(values, weights)[0]
+
+    def zipf_index(self, size, exponent=1.1):
+        """Índice em [0, size) com distribuição de Zipf (poucos itens muito frequentes)."""
+        cumulative = self._zipf.get((size, exponent))
+        if cumulative is None:
+            cumulative = list(accumulate(1.0 / math.pow(rank, exponent) for rank in range(1, size + 1)))
+            self._zipf[(size, exponent)] = cumulative
+        return self.random.choices(range(size), cum_weights=cumulative)[0]
+
+    def timestamp(self):
+        """Momento no histórico, concentrado nos turnos dos dias úteis."""
+        while True:
+            day = self.end - timedelta(days=self.random.randrange(self.days))
+            # Fins de semana têm cerca de 30% do movimento
+            if day.weekday() < 5 or self.random.random() < 0.3:
+                break
+        hour = self.random.choices(self._hours, HOUR_WEIGHTS)[0]
+        return day.replace(hour=hour) + timedelta(seconds=self.random.randrange(3600))
+
+    def normal(self, mean, sd, digits=2):
+        return round(self.random.gauss(mean, sd), digits)
+
+    def lognormal(self, median, sigma):
+        return self.random.lognormvariate(math.log(median), sigma)
+
+
+def _insert_batches(db, table, rows, total, label):
+    """Insere as linhas geradas em lotes, registrando o progresso."""
+    started = time.perf_counter()
+    batch = []
+    inserted = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(insert(table), batch)
+            db.session.commit()
+            inserted += len(batch)
+            batch = []
+            if inserted % (BATCH_SIZE * 10) == 0:
+                logger.info(f"{label}: {inserted}/{total}")
+    if batch:
+        db.session.execute(insert(table), batch)
+        db.session.commit()
+        inserted += len(batch)
+    elapsed = time.perf_counter() - started
+    logger.info(f"{label}: {inserted} linhas em {elapsed:.1f}s")
+    return inserted
+
+
+def _seed_users(db, sampler, count):
+    from werkzeug.security import generate_password_hash
+    from models import User
+
+    # Um único hash para todos (o custo do hash não faz parte do benchmark)
+    password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+    roles = (('analista', 80), ('gestor', 15), ('admin', 5))
+    existing = {name for (name,) in db.session.query(User.username)}
+    rows = []
+    for index in range(1, count + 1):
+        username = f'bench{index:04d}'
+        if username in existing:
+            continue
+        rows.append({
+            'username': username,
+            'email': f'{username}@benchmark.local',
+            'password_hash': password_hash,
+            'name': f'Analista {index:04d}',
+            'role': sampler.choice(roles),
+            'is_active': True,
+        })
+    if rows:
+        _insert_batches(db, User.__table__, rows, len(rows), 'usuários')
+    return [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+
+
+def _seed_suppliers(db, sampler, count):
+    from models import Supplier
+
+    existing = {name for (name,) in db.session.query(Supplier.name)}
+    rows = [
+        {'name': f'Fornecedor {index:03d}', 'type': sampler.choice((('fruta', 70), ('insumo', 20), ('embalagem', 10)))}
+        for index in range(1, count + 1) if f'Fornecedor {index:03d}' not in existing
+    ]
+    if rows:
+        _insert_batches(db, Supplier.__table__, rows, len(rows), 'fornecedores')
+    return [name for (name,) in db.session.query(Supplier.name).order_by(Supplier.id)]
+
+
+def _report_rows(sampler, count, users, suppliers, start_index):
+    for index in range(start_index, start_index + count):
+        material = sampler.choice(MATERIAL_WEIGHTS)
+        _, brix_mean, ph_mean, acidity_mean = RAW_MATERIALS[material]
+        status = sampler.choice(REPORT_STATUS)
+        uploaded = sampler.timestamp()
+        file_type = sampler.choice(FILE_TYPES)
+        brix = sampler.normal(brix_mean, 0.8)
+        ph = sampler.normal(ph_mean, 0.12)
+        acidity = sampler.normal(acidity_mean, acidity_mean * 0.08, 3)
+        analysis_minutes = sampler.lognormal(45, 0.6)
+        creator = users[sampler.zipf_index(len(users), 0.8)]
+        yield {
+            'title': f'Laudo {material} {index:07d}',
+            'description': None,
+            'filename': f'laudo_{index:07d}.{file_type}',
+            'original_filename': f'Laudo {index:07d}.{file_type}',
+            'file_path': f'{SYNTHETIC_PREFIX}laudo_{index:07d}.{file_type}',
+            'file_type': file_type,
+            'file_size': int(sampler.lognormal(300_000, 0.7)),
+            'category': sampler.choice(REPORT_CATEGORIES),
+            'supplier': suppliers[sampler.zipf_index(len(suppliers))],
+            'batch_number': f'L{uploaded:%y%m%d}-{sampler.random.randrange(1, 40):02d}',
+            'raw_material_type': material,
+            'sample_code': f'AM{index:08d}',
+            'brix': brix,
+            'ph': ph,
+            'acidity': acidity,
+            'lab_brix': sampler.normal(brix, 0.15),
+            'lab_ph': sampler.normal(ph, 0.03),
+            'lab_acidity': sampler.normal(acidity, acidity * 0.02, 3),
+            'physicochemical_validation': sampler.choice(VALIDATION),
+            'report_archived': sampler.random.random() < 0.6,
+            'microbiology_collected': sampler.random.random() < 0.35,
+            'has_report_document': True,
+            'manufacturing_date': (uploaded - timedelta(days=sampler.random.randrange(1, 20))).date(),
+            'expiration_date': (uploaded + timedelta(days=sampler.random.choice((180, 270, 365)))).date(),
+            'report_date': uploaded.date(),
+            'upload_date': uploaded,
+            'updated_date': uploaded,
+            'status': status,
+            'stage': REPORT_STAGE[status],
+            'priority': sampler.choice(REPORT_PRIORITY),
+            'created_by': creator,
+            'assigned_to': users[sampler.random.randrange(len(users))],
+            'approved_by': creator if status == 'aprovado' else None,
+            'version': 1,
+            'analysis_start_time': uploaded,
+            'analysis_end_time': uploaded + timedelta(minutes=analysis_minutes),
+        }
+
+
+def _activity_rows(sampler, count, users):
+    terminals = [f'10.0.{sampler.random.randrange(1, 4)}.{host}' for host in range(10, 40)]
+    agents = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/124.0',
+              'Mozilla/5.0 (X11; Linux x86_64) Firefox/125.0',
+              'Mozilla/5.0 (Linux; Android 13) Chrome/124.0 Mobile')
+    for _ in range(count):
+        module = sampler.choice(MODULES)
+        action = sampler.choice(ACTIONS)
+        yield {
+            'user_id': users[sampler.zipf_index(len(users), 0.8)],
+            'action': action,
+            'module': module,
+            'entity_id': sampler.random.randrange(1, 1_000_000) if action not in ('login', 'logout') else None,
+            'entity_type': 'Report' if module == 'reports' else None,
+            'details': None,
+            'ip_address': sampler.random.choice(terminals),
+            'user_agent': sampler.random.choice(agents),
+            'created_at': sampler.timestamp(),
+            'status': 'success' if sampler.random.random() < 0.97 else 'failed',
+        }
+
+
+def _seed_stock(db, sampler, item_count, movement_count, users):
+    from models import CategoriaEstoque, ItemEstoque, MovimentacaoEstoque
+
+    categories = {}
+    for name in STOCK_CATEGORIES:
+        category = CategoriaEstoque.query.filter_by(nome=name).first()
+        if category is None:
+            category = CategoriaEstoque(nome=name)
+            db.session.add(category)
+            db.session.flush()
+        categories[name] = category.id
+    db.session.commit()
+
+    existing = {code for (code,) in db.session.query(ItemEstoque.codigo)}
+    rows = []
+    for index in range(1, item_count + 1):
+        code = f'BENCH-{index:05d}'
+        if code in existing:
+            continue
+        category = sampler.random.choice(STOCK_CATEGORIES)
+        rows.append({
+            'codigo': code,
+            'nome': f'{category} {index:05d}',
+            'categoria_id': categories[category],
+            'unidade_medida': sampler.random.choice(('un', 'ml', 'g', 'cx', 'par')),
+            'quantidade_minima': float(sampler.random.randrange(5, 50)),
+            'quantidade_atual': float(sampler.random.randrange(0, 500)),
+            'e_reagente': category == 'Reagentes',
+            'e_perigoso': category == 'Reagentes' and sampler.random.random() < 0.3,
+            'data_validade': sampler.end + timedelta(days=sampler.random.randrange(-60, 720)),
+        })
+    if rows:
+        _insert_batches(db, ItemEstoque.__table__, rows, len(rows), 'itens de estoque')
+
+    items = db.session.query(ItemEstoque.id, ItemEstoque.categoria_id).order_by(ItemEstoque.id).all()
+    epi = categories['EPI']
+
+    def movements():
+        for _ in range(movement_count):
+            item_id, category_id = items[sampler.zipf_index(len(items), 0.9)]
+            kind = 'saida' if sampler.random.random() < 0.7 else 'entrada'
+            row = {
+                'item_id': item_id,
+                'tipo': kind,
+                'quantidade': round(sampler.lognormal(5 if kind == 'saida' else 50, 0.8), 2),
+                'data_movimentacao': sampler.timestamp(),
+                'lote': f'LT{sampler.random.randrange(1000, 9999)}',
+                'responsavel': f'Analista {users[sampler.random.randrange(len(users))]:04d}',
+            }
+            if category_id == epi and kind == 'saida':
+                row['tamanho_luva'] = sampler.choice(GLOVE_SIZES)
+                row['pessoa_retirada'] = f'Operador {sampler.random.randrange(1, 120):03d}'
+            yield row
+
+    _insert_batches(db, MovimentacaoEstoque.__table__, movements(), movement_count, 'movimentações de estoque')
+
+
+def _document_rows(sampler, count, users, first_id):
+    for offset in range(count):
+        doc_id = first_id + offset
+        document_type = sampler.choice(DOCUMENT_TYPES)
+        uploaded = sampler.timestamp()
+        # Cerca de 15% são novas versões de um documento anterior do lote
+        parent_id = None
+        version = 1
+        if offset and sampler.random.random() < 0.15:
+            parent_id = first_id + sampler.random.randrange(offset)
+            version = sampler.random.randrange(2, 6)
+        yield {
+            'title': f'{document_type.upper()} {doc_id:05d}',
+            'document_type': document_type,
+            'category': sampler.random.choice(DOCUMENT_CATEGORIES),
+            'filename': f'doc_{doc_id:05d}.pdf',
+            'original_filename': f'Documento {doc_id:05d}.pdf',
+            'file_path': f'{SYNTHETIC_PREFIX}doc_{doc_id:05d}.pdf',
+            'file_type': 'pdf',
+            'file_size': int(sampler.lognormal(500_000, 0.8)),
+            'revision': f'{version:02d}',
+            'status': sampler.choice(DOCUMENT_STATUS),
+            'uploaded_by': users[sampler.random.randrange(len(users))],
+            'upload_date': uploaded,
+            'updated_at': uploaded,
+            'parent_id': parent_id,
+            'version': version,
+            'tags': 'benchmark',
+        }
+
+
+def _alert_rows(sampler, count, users):
+    for index in range(count):
+        created = sampler.timestamp()
+        yield {
+            'title': f'Alerta {index:05d}',
+            'message': 'Alerta sintético gerado para benchmark.',
+            'type': sampler.choice(ALERT_TYPES),
+            'module': sampler.choice(MODULES),
+            'is_read': sampler.random.random() < 0.7,
+            'is_active': sampler.random.random() < 0.9,
+            'created_at': created,
+            'expires_at': created + timedelta(days=30),
+            # Metade dos alertas é geral, a outra metade tem destinatário
+            'target_user_id': users[sampler.random.randrange(len(users))] if sampler.random.random() < 0.5 else None,
+        }
+
+
+def seed(db, volumes, seed=42, append=False):
+    """
+    Popula o banco com dados sintéticos.
+
+    Args:
+        db: Instância do Flask-SQLAlchemy (com contexto de aplicação ativo)
+        volumes: Dicionário {tabela: quantidade} (ver scaled_volumes)
+        seed: Semente do gerador aleatório (mesma semente, mesmos dados)
+        append: Permite acrescentar dados a um banco que já tem laudos
+
+    Returns:
+        Dicionário {tabela: linhas inseridas}
+
+    Raises:
+        RuntimeError: Se o banco já tiver laudos e append for falso
+    """
+    from models import Report, UserActivity, TechnicalDocument, Alert
+
+    existing_reports = db.session.query(func.count(Report.id)).scalar()
+    if existing_reports and not append:
+        raise RuntimeError(
+            f'O banco já possui {existing_reports} laudos. Use um banco vazio ou a opção de acrescentar.'
+        )
+
+    sampler = _Sampler(seed)
+    started = time.perf_counter()
+    inserted = {}
+
+    users = _seed_users(db, sampler, volumes['users'])
+    suppliers = _seed_suppliers(db, sampler, volumes['suppliers'])
+    inserted['users'] = len(users)
+    inserted['suppliers'] = len(suppliers)
+
+    inserted['reports'] = _insert_batches(
+        db, Report.__table__,
+        _report_rows(sampler, volumes['reports'], users, suppliers, existing_reports + 1),
+        volumes['reports'], 'laudos'
+    )
+    inserted['user_activities'] = _insert_batches(
+        db, UserActivity.__table__, _activity_rows(sampler, volumes['user_activities'], users),
+        volumes['user_activities'], 'atividades'
+    )
+    _seed_stock(db, sampler, volumes['stock_items'], volumes['stock_movements'], users)
+    inserted['stock_items'] = volumes['stock_items']
+    inserted['stock_movements'] = volumes['stock_movements']
+
+    first_document = (db.session.query(func.max(TechnicalDocument.id)).scalar() or 0) + 1
+    inserted['technical_documents'] = _insert_batches(
+        db, TechnicalDocument.__table__,
+        _document_rows(sampler, volumes['technical_documents'], users, first_document),
+        volumes['technical_documents'], 'documentos técnicos'
+    )
+    inserted['alerts'] = _insert_batches(
+        db, Alert.__table__, _alert_rows(sampler, volumes['alerts'], users), volumes['alerts'], 'alertas'
+    )
+
+    logger.info(f"Dados sintéticos gerados em {time.perf_counter() - started:.1f}s")
+    return inserted
@@ -0,0 +1,229 @@
+"""
+Suíte de benchmarks das rotas principais.
+
+Cada caso é uma requisição feita pelo cliente de testes do Flask com um
+usuário administrador autenticado. Após as execuções de aquecimento, o caso
+é repetido e são guardados os tempos (mínimo, mediana, p95, média, máximo),
+o status HTTP e, quando a instrumentação de requisições está ativa, o tempo
+de banco e a quantidade de comandos SQL informados no cabeçalho
+Server-Timing.
+"""
+
+import glob
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.benchmarks')
+
+DEFAULT_REPEAT = 10
+DEFAULT_WARMUP = 2
+
+FORMS_DIR = 'extracted_forms'
+
+_SERVER_TIMING_DB_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) SQL"')
+
+
+class BenchmarkCase:
+    """Requisição medida pela suíte."""
+
+    def __init__(self, name, url, method='GET', data=None, before=None):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data
+        self.before = before  # Preparação executada antes de cada requisição (fora da medição)
+
+
+def first_form(extension):
+    """Primeiro formulário com a extensão em extracted_forms/ (caminho relativo)."""
+    matches = sorted(glob.glob(os.path.join(FORMS_DIR, '**', f'*{extension}'), recursive=True))
+    if not matches:
+        return None
+    return os.path.relpath(matches[0], FORMS_DIR).replace(os.sep, '/')
+
+
+def default_cases(report_id=None, reset_report_pdf=None):
+    """
+    Casos padrão: busca de laudos, painéis, estatísticas, estoque, alertas,
+    extração de campos de formulários e geração de PDF.
+
+    Args:
+        report_id: Laudo usado na geração de PDF (None omite o caso)
+        reset_report_pdf: Função que descarta o PDF já gerado do laudo, para
+            que cada execução meça a geração e não apenas o envio do arquivo
+    """
+    cases = [
+        BenchmarkCase('reports_api_search', '/reports/api/search?query=laranja'),
+        BenchmarkCase('reports_api_search_supplier', '/reports/api/search?supplier=Fornecedor%20001&sort_by=date'),
+        BenchmarkCase('reports_api_search_period',
+                      '/reports/api/search?date_from=2025-01-01&date_to=2025-03-31&sort_by=title'),
+        BenchmarkCase('dashboard', '/dashboard/'),
+        BenchmarkCase('estatisticas', '/estatisticas/'),
+        BenchmarkCase('estatisticas_documentos', '/estatisticas/documentos'),
+        BenchmarkCase('estatisticas_usuarios', '/estatisticas/usuarios'),
+        BenchmarkCase('estatisticas_atividades', '/estatisticas/atividades'),
+        BenchmarkCase('estoque', '/estoque/'),
+        BenchmarkCase('alertas_nao_lidos', '/alertas/api/alertas-nao-lidos'),
+    ]
+    for extension in ('.xlsx', '.docx', '.pdf'):
+        form = first_form(extension)
+        if form:
+            cases.append(BenchmarkCase(f'form_fields{extension.replace(".", "_")}', f'/forms/fill/{form}'))
+    if report_id is not None:
+        cases.append(BenchmarkCase('report_pdf', f'/reports/print-pdf/{report_id}', before=reset_report_pdf))
+    return cases
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=False, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _summarize(durations):
+    ordered = sorted(durations)
+    p95_index = max(0, int(round(0.95 * len(ordered))) - 1)
+    return {
+        'min_ms': round(ordered[0], 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[p95_index], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def run_case(client, case, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP):
+    """
+    Mede um caso.
+
+    Returns:
+        Dicionário com os tempos em milissegundos, status e dados do banco
+    """
+    def request():
+        return client.open(case.url, method=case.method, data=case.data)
+
+    for _ in range(warmup):
+        if case.before:
+            case.before()
+        request().close()
+
+    durations, db_times, queries = [], [], []
+    statuses = set()
+    for _ in range(repeat):
+        if case.before:
+            case.before()
+        started = time.perf_counter()
+        response = request()
+        response.get_data()
+        durations.append((time.perf_counter() - started) * 1000)
+        statuses.add(response.status_code)
+        match = _SERVER_TIMING_DB_RE.search(response.headers.get('Server-Timing', ''))
+        if match:
+            db_times.append(float(match.group(1)))
+            queries.append(int(match.group(2)))
+        response.close()
+
+    result = {'url': case.url, 'method': case.method, 'runs': repeat, 'status': sorted(statuses)}
+    result.update(_summarize(durations))
+    if db_times:
+        result['db_median_ms'] = round(statistics.median(db_times), 3)
+        result['sql_queries'] = int(statistics.median(queries))
+    return result
+
+
+def run_suite(app, db, cases=None, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP, only=None):
+    """
+    Executa a suíte com um administrador autenticado.
+
+    Args:
+        app, db: Aplicação e banco (ver benchmarks.load_app)
+        cases: Lista de BenchmarkCase (padrão: default_cases)
+        repeat: Repetições medidas por caso
+        warmup: Execuções descartadas antes da medição
+        only: Nomes de casos a executar (None para todos)
+
+    Returns:
+        Dicionário pronto para gravar em JSON
+    """
+    from sqlalchemy import func, select, update
+    from models import User, Report
+
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').order_by(User.id).first()
+        if admin is None:
+            raise RuntimeError('Nenhum usuário administrador no banco de benchmark.')
+        admin_id = admin.id
+        report_id = db.session.query(func.min(Report.id)).scalar()
+        volumes = {
+            table.name: db.session.execute(select(func.count()).select_from(table)).scalar()
+            for table in db.metadata.sorted_tables
+            if table.name in ('reports', 'user_activities', 'movimentacoes_estoque',
+                              'technical_document', 'alerts', 'users')
+        }
+        backend = db.engine.url.get_backend_name()
+
+    def reset_report_pdf():
+        with app.app_context():
+            db.session.execute(update(Report).where(Report.id == report_id).values(has_print_version=False))
+            db.session.commit()
+
+    if cases is None:
+        cases = default_cases(report_id, reset_report_pdf)
+    if only:
+        cases = [case for case in cases if case.name in only]
+
+    # PDFs e demais arquivos gerados durante a medição ficam numa pasta temporária
+    original_upload_folder = app.config['UPLOAD_FOLDER']
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='zelopack-bench-') as upload_folder:
+        app.config['UPLOAD_FOLDER'] = upload_folder
+        try:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(admin_id)
+                session['_fresh'] = True
+            for case in cases:
+                logger.info(f"Medindo {case.name} ({case.url})")
+                results[case.name] = run_case(client, case, repeat, warmup)
+        finally:
+            app.config['UPLOAD_FOLDER'] = original_upload_folder
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': backend,
+            'volumes': volumes,
+            'repeat': repeat,
+            'warmup': warmup,
+        },
+        'cases': results,
+    }
+
+
+def save_results(results, path):
+    """Grava o resultado em JSON."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
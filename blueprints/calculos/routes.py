@@ -2,7 +2,6 @@ import logging
 import os
 import json
 import math
-import numpy as np
 from io import BytesIO
 import base64
 from flask import render_template, request, jsonify, current_app, flash, redirect, url_for
@@ -708,31 +707,277 @@ def api_obter_configuracoes():
     })
 
 
+@calculos_bp.route('/api/formulas/<int:formula_id>/avaliar', methods=['POST'])
+@login_required
+def api_avaliar_formula(formula_id):
+    """API para avaliar uma fórmula personalizada com um conjunto de entradas."""
+    from models import CustomFormula
+    from utils.formula_engine import get_compiled_formula, FormulaError
+
+    formula = CustomFormula.query.get_or_404(formula_id)
+    if not formula.is_active:
+        return jsonify({'success': False, 'message': 'Fórmula inativa.'}), 400
+
+    data = request.get_json() or {}
+
+    try:
+        compiled = get_compiled_formula(formula)
+        valor = compiled.evaluate(data.get('inputs', {}))
+
+        registrar_historico_calculo(f'formula-{formula.id}', {
+            'inputs': data.get('inputs', {}),
+            'resultado': valor
+        })
+
+        return jsonify({
+            'success': True,
+            'formula_id': formula.id,
+            'resultado': valor
+        })
+
+    except FormulaError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro ao avaliar fórmula {formula_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'Ocorreu um erro ao processar o cálculo.'
+        }), 500
+
+
+@calculos_bp.route('/api/formulas/<int:formula_id>/avaliar-laudos', methods=['POST'])
+@login_required
+def api_avaliar_formula_laudos(formula_id):
+    """
+    API para avaliar uma fórmula personalizada sobre vários laudos de uma vez.
+    Aceita uma lista de IDs ('report_ids') ou um período ('date_from'/'date_to').
+    """
+    from datetime import datetime
+    from app import db
+    from models import CustomFormula, Report
+    from utils.formula_engine import evaluate_formula_for_reports, FormulaError
+
+    formula = CustomFormula.query.get_or_404(formula_id)
+    if not formula.is_active:
+        return jsonify({'success': False, 'message': 'Fórmula inativa.'}), 400
+
+    data = request.get_json() or {}
+
+    try:
+        query = Report.query
+        if data.get('report_ids'):
+            query = query.filter(Report.id.in_([int(i) for i in data['report_ids']]))
+        elif data.get('date_from') and data.get('date_to'):
+            date_from = datetime.strptime(data['date_from'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(data['date_to'], '%Y-%m-%d').date()
+            query = query.filter(Report.report_date.between(date_from, date_to))
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'Informe os laudos (report_ids) ou o período (date_from/date_to).'
+            }), 400
+
+        salvar = bool(data.get('salvar', True))
+        resultado = evaluate_formula_for_reports(
+            formula,
+            query.all(),
+            current_user.id,
+            session=db.session if salvar else None
+        )
+
+        return jsonify({
+            'success': True,
+            'formula_id': formula.id,
+            'resultados': resultado['results'],
+            'gravados': resultado['saved'],
+            'ignorados': resultado['skipped']
+        })
+
+    except (FormulaError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Erro ao avaliar fórmula {formula_id} em lote: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'Ocorreu um erro ao processar o cálculo.'
+        }), 500
+
+
+# Tipos de cálculo registrados no histórico e seus rótulos
+TIPOS_CALCULO = {
+    'producao-200g': 'Produção 200g',
+    'producao-litro': 'Produção (Litro)',
+    'densidade': 'Densidade',
+    'ratio': 'Ratio',
+    'acidez': 'Acidez',
+    'finalizacao-tanque': 'Finalização de Tanque',
+}
+
+HISTORICO_POR_PAGINA = 20
+
+
+def _consulta_historico():
+    """
+    Monta a consulta do histórico a partir dos filtros da requisição
+    (start_date, end_date, type, user). Usuários comuns veem apenas os
+    próprios cálculos; administradores podem filtrar por usuário.
+    """
+    from datetime import datetime, timedelta
+    from app import db
+    from models import HistoricoCalculo, User
+
+    query = db.session.query(HistoricoCalculo, User.name).outerjoin(
+        User, HistoricoCalculo.usuario_id == User.id
+    )
+
+    if current_user.is_admin:
+        usuario_id = request.args.get('user', type=int)
+        if usuario_id:
+            query = query.filter(HistoricoCalculo.usuario_id == usuario_id)
+    else:
+        query = query.filter(HistoricoCalculo.usuario_id == current_user.id)
+
+    tipo = request.args.get('type')
+    if tipo:
+        query = query.filter(HistoricoCalculo.tipo_calculo == tipo)
+
+    try:
+        if request.args.get('start_date'):
+            inicio = datetime.strptime(request.args['start_date'], '%Y-%m-%d')
+            query = query.filter(HistoricoCalculo.criado_em >= inicio)
+        if request.args.get('end_date'):
+            fim = datetime.strptime(request.args['end_date'], '%Y-%m-%d') + timedelta(days=1)
+            query = query.filter(HistoricoCalculo.criado_em < fim)
+    except ValueError:
+        flash('Período inválido. Use datas no formato AAAA-MM-DD.', 'warning')
+
+    return query
+
+
 @calculos_bp.route('/historico')
 @login_required
-def historico_calculos():
+def historico():
     """Página de histórico de cálculos realizados."""
-    return render_template('calculos/historico.html')
+    from sqlalchemy import func
+    from app import db
+    from models import HistoricoCalculo, User
+    from utils.calculation_history import flush_history
+
+    # Garantir que os cálculos recém-enviados já estejam gravados
+    flush_history()
+
+    query = _consulta_historico()
+    page = request.args.get('page', 1, type=int)
+    pagination = query.order_by(HistoricoCalculo.criado_em.desc()).paginate(
+        page=page, per_page=HISTORICO_POR_PAGINA, error_out=False
+    )
+
+    calculations = []
+    for registro, nome_usuario in pagination.items:
+        dados = json.loads(registro.dados) if registro.dados else {}
+        resultado = dados.pop('resultado', None)
+        calculations.append({
+            'id': registro.id,
+            'type': registro.tipo_calculo,
+            'title': TIPOS_CALCULO.get(registro.tipo_calculo, registro.tipo_calculo),
+            'user_name': nome_usuario or 'Anônimo',
+            'created_at': registro.criado_em,
+            'data': dados,
+            'result': resultado
+        })
+
+    # Estatísticas agregadas no banco (usam os índices por tipo/data)
+    filtrada = query.with_entities(HistoricoCalculo.id).subquery()
+    por_tipo = db.session.query(HistoricoCalculo.tipo_calculo, func.count(HistoricoCalculo.id)).filter(
+        HistoricoCalculo.id.in_(db.select(filtrada.c.id))
+    ).group_by(HistoricoCalculo.tipo_calculo).all()
+    por_dia = db.session.query(func.date(HistoricoCalculo.criado_em), func.count(HistoricoCalculo.id)).filter(
+        HistoricoCalculo.id.in_(db.select(filtrada.c.id))
+    ).group_by(func.date(HistoricoCalculo.criado_em)).order_by(func.date(HistoricoCalculo.criado_em)).all()
+
+    stats = {
+        'type_distribution': {
+            'labels': [TIPOS_CALCULO.get(tipo, tipo) for tipo, _ in por_tipo],
+            'counts': [total for _, total in por_tipo]
+        },
+        'time_series': {
+            'labels': [str(dia) for dia, _ in por_dia],
+            'counts': [total for _, total in por_dia]
+        }
+    }
+
+    filtros = {k: v for k, v in request.args.items() if k != 'page'}
+    usuarios = User.query.order_by(User.name).all() if current_user.is_admin else []
+
+    return render_template(
+        'calculos/historico.html',
+        calculations=calculations,
+        pagination=pagination,
+        stats=stats,
+        filtros=filtros,
+        tipos=TIPOS_CALCULO,
+        usuarios=usuarios
+    )
+
+
+@calculos_bp.route('/historico/exportar')
+@login_required
+def exportar_historico():
+    """Exporta o histórico filtrado em CSV, gerado em fluxo (streaming)."""
+    import csv
+    import io
+    from datetime import datetime
+    from flask import Response, stream_with_context
+    from models import HistoricoCalculo
+    from utils.calculation_history import flush_history
+
+    flush_history()
+    query = _consulta_historico().order_by(HistoricoCalculo.criado_em)
+
+    def gerar():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Data', 'Tipo', 'Usuário', 'Dados'])
+        for registro, nome_usuario in query.yield_per(1000):
+            writer.writerow([
+                registro.criado_em.strftime('%d/%m/%Y %H:%M:%S'),
+                registro.tipo_calculo,
+                nome_usuario or 'Anônimo',
+                registro.dados
+            ])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    nome_arquivo = f"historico_calculos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment;filename={nome_arquivo}'}
+    )
 
 
 # Função auxiliar para registrar histórico de cálculos
 def registrar_historico_calculo(tipo_calculo, dados):
     """
     Registra um cálculo no histórico para referência futura.
-    Futuramente pode ser expandido para salvar no banco de dados.
+    A gravação é feita em lote por uma thread em segundo plano
+    (ver utils.calculation_history).
     """
-    # Por enquanto, apenas registra no log
+    from utils.calculation_history import record_calculation
+
     usuario = current_user.username if current_user.is_authenticated else "Anônimo"
-    logging.info(f"Cálculo [{tipo_calculo}] realizado por {usuario}: {dados}")
-    
-    # Implementação futura: salvar no banco de dados
-    # from app import db
-    # from models import HistoricoCalculo
-    # 
-    # historico = HistoricoCalculo(
-    #     tipo_calculo=tipo_calculo,
-    #     usuario_id=current_user.id,
-    #     dados=json.dumps(dados)
-    # )
-    # db.session.add(historico)
-    # db.session.commit()
\ No newline at end of file
+    logging.debug(f"Cálculo [{tipo_calculo}] realizado por {usuario}: {dados}")
+
+    try:
+        record_calculation(
+            current_app._get_current_object(),
+            tipo_calculo,
+            dados,
+            usuario_id=current_user.id if current_user.is_authenticated else None
+        )
+    except Exception as e:
+        # O histórico nunca deve impedir a resposta do cálculo
+        logging.error(f"Erro ao registrar histórico do cálculo [{tipo_calculo}]: {str(e)}")
@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+cep_bp = Blueprint('cep', __name__, url_prefix='/cep')
+
+# Importação das rotas após a definição do blueprint para evitar importações circulares
+from . import routes
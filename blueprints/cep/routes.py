@@ -0,0 +1,67 @@
+"""
+Controle estatístico de processo (CEP): cartas X̄/R e violações de regras
+a partir das estatísticas acumuladas em SpcStatistic.
+"""
+
+import logging
+
+from flask import render_template, jsonify, request
+from flask_login import login_required
+
+from blueprints.cep import cep_bp
+from models import SpcStatistic
+from utils import spc
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.cep')
+
+
+def _filtered_statistics():
+    query = SpcStatistic.query
+    for field in ('raw_material_type', 'supplier', 'metric'):
+        value = request.args.get(field)
+        if value is not None:
+            query = query.filter(getattr(SpcStatistic, field) == value)
+    return query.order_by(SpcStatistic.raw_material_type, SpcStatistic.supplier, SpcStatistic.metric).all()
+
+
+@cep_bp.route('/')
+@login_required
+def index():
+    """Cartas de controle por matéria-prima, fornecedor e medida."""
+    statistics = _filtered_statistics()
+    selected = None
+    selected_id = request.args.get('id', type=int)
+    if selected_id:
+        selected = SpcStatistic.query.get(selected_id)
+    elif statistics:
+        # Por padrão, a série com mais medidas
+        selected = max(statistics, key=lambda stat: stat.count)
+    return render_template(
+        'cep/index.html',
+        title='Controle Estatístico de Processo',
+        statistics=statistics,
+        selected=selected,
+        metrics=spc.METRICS
+    )
+
+
+@cep_bp.route('/api/series')
+@login_required
+def api_series():
+    """Séries acompanhadas (filtros: raw_material_type, supplier, metric)."""
+    return jsonify({
+        'success': True,
+        'series': [dict(stat.to_dict(), label=spc.METRICS.get(stat.metric, stat.metric))
+                   for stat in _filtered_statistics()]
+    })
+
+
+@cep_bp.route('/api/series/<int:stat_id>')
+@login_required
+def api_chart(stat_id):
+    """Dados das cartas X̄/R, individuais, EWMA e CUSUM de uma série."""
+    stat = SpcStatistic.query.get(stat_id)
+    if stat is None:
+        return jsonify({'success': False, 'message': 'Série não encontrada'}), 404
+    return jsonify(dict(spc.chart_data(stat), success=True))
@@ -1,6 +1,6 @@
 from flask import render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import desc, func, or_
+from sqlalchemy import desc, or_
 import datetime
 import json
 import os
@@ -8,6 +8,7 @@ import logging
 
 from app import db
 from models import TechnicalDocument, User, Note
+from utils import document_counters
 from blueprints.dashboard import dashboard_bp
 from blueprints.dashboard.models import Task, CalendarEvent, DashboardConfig, DashboardWidget, get_user_tasks, get_user_events, save_dashboard_config
 
@@ -18,13 +19,11 @@ def index():
     # Obter documentos recentes
     recent_documents = TechnicalDocument.query.order_by(TechnicalDocument.upload_date.desc()).limit(5).all()
     
-    # Coletar estatísticas
+    # Coletar estatísticas (contadores pré-calculados)
     stats = {
-        'total_documents': TechnicalDocument.query.count(),
-        'total_forms': TechnicalDocument.query.filter_by(document_type='formulario').count(),
-        'uploads_today': TechnicalDocument.query.filter(
-            func.date(TechnicalDocument.upload_date) == datetime.date.today()
-        ).count(),
+        'total_documents': document_counters.count(db.session),
+        'total_forms': document_counters.count(db.session, 'type', 'formulario'),
+        'uploads_today': document_counters.count(db.session, 'day', datetime.date.today()),
         'active_users': User.query.count()  # Todos os usuários (ajustar se houver campo de status)
     }
     
@@ -329,10 +328,7 @@ def api_charts_data():
     """API para fornecer dados para os gráficos do painel."""
     try:
         # Dados para o gráfico de documentos por tipo
-        doc_types = db.session.query(
-            TechnicalDocument.document_type, 
-            func.count(TechnicalDocument.id)
-        ).group_by(TechnicalDocument.document_type).all()
+        doc_types = document_counters.counts(db.session, 'type')
         
         # Formatar os dados para o gráfico
         labels = []
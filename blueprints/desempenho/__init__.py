@@ -0,0 +1,9 @@
+from flask import Blueprint
+
+desempenho_bp = Blueprint('desempenho', __name__, url_prefix='/desempenho')
+
+# Exposição para o Prometheus, na raiz (/metrics)
+metrics_bp = Blueprint('metrics', __name__)
+
+# Importação das rotas após a definição do blueprint para evitar importações circulares
+from . import routes
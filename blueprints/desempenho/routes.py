@@ -0,0 +1,81 @@
+"""
+Painel de desempenho das rotas (tempos, SQL por requisição e ocorrências de N+1)
+e exposição das métricas para o Prometheus.
+"""
+
+import hmac
+import logging
+
+from flask import render_template, jsonify, current_app, request, Response, abort
+from flask_login import login_required, current_user
+
+from blueprints.desempenho import desempenho_bp, metrics_bp
+from utils import metrics
+from utils.admin_security import admin_required
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.desempenho')
+
+
+def _profiler():
+    return current_app.extensions['request_profiler']
+
+
+@desempenho_bp.route('/')
+@login_required
+@admin_required
+def index():
+    """Percentis por rota e ocorrências recentes de N+1."""
+    profiler = _profiler()
+    return render_template(
+        'desempenho/index.html',
+        title='Desempenho',
+        routes=profiler.summary(),
+        incidents=profiler.recent_incidents(),
+        threshold=profiler.threshold,
+        window_size=profiler.window_size,
+        enabled=current_app.config.get('PERF_PROFILING_ENABLED', True)
+    )
+
+
+@desempenho_bp.route('/api')
+@login_required
+@admin_required
+def api_summary():
+    """Mesmos dados do painel em JSON."""
+    profiler = _profiler()
+    return jsonify({
+        'success': True,
+        'window_size': profiler.window_size,
+        'n_plus_one_threshold': profiler.threshold,
+        'routes': profiler.summary(),
+        'incidents': profiler.recent_incidents()
+    })
+
+
+@desempenho_bp.route('/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset():
+    """Descarta as amostras acumuladas."""
+    _profiler().reset()
+    logger.info("Amostras de desempenho descartadas")
+    return jsonify({'success': True, 'message': 'Amostras descartadas.'})
+
+
+def _metrics_allowed():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        auth = request.headers.get('Authorization', '')
+        return auth.startswith('Bearer ') and hmac.compare_digest(auth[7:], token)
+    # Sem token configurado: apenas administrador autenticado. O endereço de
+    # origem não serve de critério: atrás de um proxy local todos vêm de 127.0.0.1
+    return current_user.is_authenticated and current_user.role == 'admin'
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Métricas operacionais no formato texto do Prometheus."""
+    if not _metrics_allowed():
+        abort(403)
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
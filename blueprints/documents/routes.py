@@ -1,39 +1,21 @@
 from flask import render_template, redirect, url_for, request, flash, jsonify, current_app, send_file, abort
 from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf
-from sqlalchemy import desc, func, or_
-from werkzeug.utils import secure_filename
+from sqlalchemy import desc, or_
+from werkzeug.security import safe_join
 import os
 import datetime
 import io
 import tempfile
 import logging
 
-# Importações para manipulação de imagens e documentos
-from PIL import Image, ImageDraw, ImageFont
-
-# Importações opcionais (usadas na função de preview)
-try:
-    from PyPDF2 import PdfReader
-except ImportError:
-    PdfReader = None
-
-try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.pdfgen import canvas
-except ImportError:
-    canvas = None
-    letter = None
-
-try:
-    from pdf2image import convert_from_path
-except ImportError:
-    convert_from_path = None
-
 from app import db
 from models import TechnicalDocument, DocumentAttachment, User
 from blueprints.documents import documents_bp
 from blueprints.documents.forms import DocumentForm, DocumentSearchForm
+from utils.upload_store import store_upload, release_file, ensure_private_copy
+from utils.office_preview import get_preview_cache, PreviewUnavailable, KIND_PDF
+from utils import document_counters, version_chain
 
 # Configuração para criar miniaturas de imagens
 THUMBNAIL_SIZE = (200, 200)
@@ -45,14 +27,11 @@ def index():
     search_form = DocumentSearchForm()
     query = TechnicalDocument.query.order_by(TechnicalDocument.upload_date.desc())
     
-    # Filtrar por tipo de documento ativo por padrão
-    query = query.filter(TechnicalDocument.status == 'ativo')
+    # Filtrar por tipo de documento ativo por padrão, apenas na versão atual
+    query = query.filter(TechnicalDocument.status == 'ativo', version_chain.current_filter(TechnicalDocument))
     
-    # Obter contagem por tipo de documento
-    doc_stats = db.session.query(
-        TechnicalDocument.document_type, 
-        func.count(TechnicalDocument.id)
-    ).group_by(TechnicalDocument.document_type).all()
+    # Obter contagem por tipo de documento (contadores pré-calculados)
+    doc_stats = document_counters.counts(db.session, 'type')
     
     # Formatar estatísticas
     stats = {}
@@ -188,20 +167,12 @@ def upload_document():
     if form.validate_on_submit():
         # Salvar arquivo principal
         document_file = form.document_file.data
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        document_folder = os.path.join(upload_folder, 'documents')
-        os.makedirs(document_folder, exist_ok=True)
-        
-        # Gerar nome de arquivo seguro com timestamp
-        secure_name = secure_filename(document_file.filename)
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{secure_name}"
-        file_path = os.path.join(document_folder, filename)
-        
-        # Salvar arquivo no sistema
-        document_file.save(file_path)
-        file_size = os.path.getsize(file_path)
-        file_type = os.path.splitext(filename)[1][1:].lower()
+        # Salvar arquivo no armazenamento por conteúdo (deduplicado por SHA-256)
+        stored = store_upload(document_file)
+        filename = stored.filename
+        file_path = stored.file_path
+        file_size = stored.file_size
+        file_type = os.path.splitext(document_file.filename)[1][1:].lower()
         
         # Criar registro no banco de dados
         document = TechnicalDocument(
@@ -229,19 +200,13 @@ def upload_document():
         
         # Processar anexos se houver
         if form.attachments.data:
-            attachments_folder = os.path.join(document_folder, f"doc_{document.id}_attachments")
-            os.makedirs(attachments_folder, exist_ok=True)
-            
             for attachment in form.attachments.data:
                 if attachment.filename:
-                    secure_name = secure_filename(attachment.filename)
-                    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    attach_filename = f"{timestamp}_{secure_name}"
-                    attach_path = os.path.join(attachments_folder, attach_filename)
-                    
-                    attachment.save(attach_path)
-                    attach_size = os.path.getsize(attach_path)
-                    attach_type = os.path.splitext(attach_filename)[1][1:].lower()
+                    stored = store_upload(attachment)
+                    attach_filename = stored.filename
+                    attach_path = stored.file_path
+                    attach_size = stored.file_size
+                    attach_type = os.path.splitext(attachment.filename)[1][1:].lower()
                     
                     # Criar registro para o anexo
                     doc_attachment = DocumentAttachment(
@@ -285,20 +250,10 @@ def view_document(document_id):
     # Obter anexos
     attachments = DocumentAttachment.query.filter_by(document_id=document.id).all()
     
-    # Verificar se existem outras versões
-    versions = []
-    if document.parent_id:
-        # Se este documento é uma versão, buscar o original e outras versões
-        original = TechnicalDocument.query.get(document.parent_id)
-        if original:
-            versions.append(original)
-        other_versions = TechnicalDocument.query.filter_by(parent_id=document.parent_id).all()
-        for v in other_versions:
-            if v.id != document.id:
-                versions.append(v)
-    else:
-        # Se este é o original, buscar suas versões
-        versions = TechnicalDocument.query.filter_by(parent_id=document.id).all()
+    # Histórico de versões (uma consulta pela linhagem)
+    versions = version_chain.lineage(db.session, TechnicalDocument, document.id)
+    if len(versions) < 2:
+        versions = []
     
     # Se for visualização online e o arquivo existir
     if online_view and document.file_path and os.path.exists(document.file_path):
@@ -371,6 +326,12 @@ def editor():
             
             if format_type == 'pdf':
                 # Criar PDF usando ReportLab se disponível
+                try:
+                    from reportlab.lib.pagesizes import letter
+                    from reportlab.pdfgen import canvas
+                except ImportError:
+                    canvas = None
+                    letter = None
                 if canvas and letter:
                     pdf = canvas.Canvas(temp_path, pagesize=letter)
                     lines = content.split('\n')
@@ -461,43 +422,30 @@ def edit_document(document_id):
         document.restricted_access = form.restricted_access.data
         
         # Processar novo arquivo principal (se fornecido)
+        replaced_file_path = None
         if form.document_file.data and form.document_file.data.filename:
             document_file = form.document_file.data
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            document_folder = os.path.join(upload_folder, 'documents')
+            replaced_file_path = document.file_path
             
-            # Gerar nome de arquivo seguro com timestamp
-            secure_name = secure_filename(document_file.filename)
-            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{secure_name}"
-            file_path = os.path.join(document_folder, filename)
-            
-            # Salvar arquivo no sistema
-            document_file.save(file_path)
+            # Salvar arquivo no armazenamento por conteúdo (deduplicado por SHA-256)
+            stored = store_upload(document_file)
             
             # Atualizar informações do arquivo
-            document.filename = filename
+            document.filename = stored.filename
             document.original_filename = document_file.filename
-            document.file_path = file_path
-            document.file_type = os.path.splitext(filename)[1][1:].lower()
-            document.file_size = os.path.getsize(file_path)
+            document.file_path = stored.file_path
+            document.file_type = os.path.splitext(document_file.filename)[1][1:].lower()
+            document.file_size = stored.file_size
         
         # Processar novos anexos (se fornecidos)
         if form.attachments.data and any(attachment.filename for attachment in form.attachments.data):
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            attachments_folder = os.path.join(upload_folder, 'documents', f"doc_{document.id}_attachments")
-            os.makedirs(attachments_folder, exist_ok=True)
-            
             for attachment in form.attachments.data:
                 if attachment.filename:
-                    secure_name = secure_filename(attachment.filename)
-                    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    attach_filename = f"{timestamp}_{secure_name}"
-                    attach_path = os.path.join(attachments_folder, attach_filename)
-                    
-                    attachment.save(attach_path)
-                    attach_size = os.path.getsize(attach_path)
-                    attach_type = os.path.splitext(attach_filename)[1][1:].lower()
+                    stored = store_upload(attachment)
+                    attach_filename = stored.filename
+                    attach_path = stored.file_path
+                    attach_size = stored.file_size
+                    attach_type = os.path.splitext(attachment.filename)[1][1:].lower()
                     
                     # Criar registro para o anexo
                     doc_attachment = DocumentAttachment(
@@ -513,6 +461,14 @@ def edit_document(document_id):
                     db.session.add(doc_attachment)
         
         db.session.commit()
+        
+        # Liberar a referência ao arquivo substituído
+        if replaced_file_path and replaced_file_path != document.file_path:
+            try:
+                release_file(replaced_file_path)
+            except Exception as e:
+                current_app.logger.warning(f"Erro ao liberar arquivo substituído: {str(e)}")
+        
         flash('Documento atualizado com sucesso!', 'success')
         return redirect(url_for('documents.view_document', document_id=document.id))
     
@@ -536,27 +492,19 @@ def new_version(document_id):
     if form.validate_on_submit():
         # Processar o arquivo principal da nova versão
         document_file = form.document_file.data
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        document_folder = os.path.join(upload_folder, 'documents')
-        
-        # Gerar nome de arquivo seguro com timestamp
-        secure_name = secure_filename(document_file.filename)
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{secure_name}"
-        file_path = os.path.join(document_folder, filename)
-        
-        # Salvar arquivo no sistema
-        document_file.save(file_path)
-        file_size = os.path.getsize(file_path)
-        file_type = os.path.splitext(filename)[1][1:].lower()
+        # Salvar arquivo no armazenamento por conteúdo (deduplicado por SHA-256)
+        stored = store_upload(document_file)
+        filename = stored.filename
+        file_path = stored.file_path
+        file_size = stored.file_size
+        file_type = os.path.splitext(document_file.filename)[1][1:].lower()
         
         # Determinar qual será o documento pai (original)
         parent_id = original_doc.parent_id or original_doc.id
         
         # Determinar a nova versão
-        latest_version = db.session.query(func.max(TechnicalDocument.version)).filter(
-            or_(TechnicalDocument.id == parent_id, TechnicalDocument.parent_id == parent_id)
-        ).scalar() or 1
+        latest_doc = version_chain.latest(db.session, TechnicalDocument, original_doc.id)
+        latest_version = (latest_doc.version if latest_doc else None) or 1
         
         # Criar nova versão no banco de dados
         new_doc = TechnicalDocument(
@@ -585,19 +533,13 @@ def new_version(document_id):
         
         # Processar anexos se houver
         if form.attachments.data:
-            attachments_folder = os.path.join(document_folder, f"doc_{new_doc.id}_attachments")
-            os.makedirs(attachments_folder, exist_ok=True)
-            
             for attachment in form.attachments.data:
                 if attachment.filename:
-                    secure_name = secure_filename(attachment.filename)
-                    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    attach_filename = f"{timestamp}_{secure_name}"
-                    attach_path = os.path.join(attachments_folder, attach_filename)
-                    
-                    attachment.save(attach_path)
-                    attach_size = os.path.getsize(attach_path)
-                    attach_type = os.path.splitext(attach_filename)[1][1:].lower()
+                    stored = store_upload(attachment)
+                    attach_filename = stored.filename
+                    attach_path = stored.file_path
+                    attach_size = stored.file_size
+                    attach_type = os.path.splitext(attachment.filename)[1][1:].lower()
                     
                     # Criar registro para o anexo
                     doc_attachment = DocumentAttachment(
@@ -750,18 +692,13 @@ def view_virtual_document(file_path):
                 download_link=download_link,
                 virtual_document=True
             )
-        # Para planilhas Excel
-        elif file_ext in ['.xlsx', '.xls']:
-            # Para arquivos Excel, usamos o serviço de visualização do Microsoft Office Online
-            file_url = url_for('documents.download_virtual_document', file_path=file_path, as_attachment='false', _external=True)
-            # Codificar a URL para o serviço de visualização do Office Online
-            # Obs: isso não funciona em localhost, mas funciona quando hospedado
-            office_viewer_url = f"https://view.officeapps.live.com/op/embed.aspx?src={file_url}"
+        # Para planilhas Excel e documentos Word, usar a pré-visualização gerada localmente
+        elif get_preview_cache(current_app).supports(file_ext):
             return render_template(
                 'documents/view_online.html',
                 title=f'Visualização Online: {file_name}',
                 document=doc_info,
-                office_url=office_viewer_url,
+                office_url=url_for('documents.preview_virtual_document', file_path=file_path),
                 download_link=download_link,
                 virtual_document=True
             )
@@ -804,6 +741,62 @@ def download_virtual_document(file_path):
         return redirect(url_for('documents.index'))
 
 
+def _send_preview(full_path):
+    """Envia a pré-visualização (PDF ou HTML) gerada localmente para o arquivo."""
+    try:
+        preview_path, kind, sha256 = get_preview_cache(current_app).get_preview(full_path)
+    except PreviewUnavailable as e:
+        return render_template(
+            'documents/preview_unavailable.html',
+            message=str(e)
+        ), 422
+    
+    response = send_file(
+        preview_path,
+        mimetype='application/pdf' if kind == KIND_PDF else 'text/html',
+        conditional=True,
+        etag=sha256,
+        max_age=0
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+@documents_bp.route('/preview-file/<path:file_path>')
+@login_required
+def preview_virtual_document(file_path):
+    """Pré-visualização local de um documento virtual (planilha ou documento Word)."""
+    # Montar o caminho completo
+    FORMS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'extracted_forms')
+    
+    # Garantir que o caminho é seguro (dentro do diretório permitido)
+    full_path = safe_join(FORMS_DIR, file_path)
+    
+    # Verificar se o arquivo existe
+    if not full_path or not os.path.isfile(full_path):
+        abort(404)
+    
+    return _send_preview(full_path)
+
+
+@documents_bp.route('/preview/<int:document_id>')
+@login_required
+def preview_document(document_id):
+    """Pré-visualização local do arquivo de um documento técnico."""
+    document = TechnicalDocument.query.get_or_404(document_id)
+
+    # Verificar permissão para documentos restritos
+    if document.restricted_access and current_user.role != 'admin':
+        flash('Você não tem permissão para acessar este documento.', 'warning')
+        return redirect(url_for('documents.index'))
+
+    if not document.file_path or not os.path.isfile(document.file_path):
+        abort(404)
+
+    return _send_preview(document.file_path)
+
+
 @documents_bp.route('/print-file/<path:file_path>')
 @login_required
 def print_virtual_document(file_path):
@@ -1039,17 +1032,18 @@ def delete_attachment(attachment_id):
         flash('Você não tem permissão para excluir este anexo.', 'warning')
         return redirect(url_for('documents.view_document', document_id=document.id))
     
-    # Tentar excluir o arquivo físico
-    if os.path.exists(attachment.file_path):
-        try:
-            os.remove(attachment.file_path)
-        except Exception as e:
-            flash(f'Erro ao excluir arquivo físico: {str(e)}', 'warning')
+    file_path = attachment.file_path
     
     # Excluir o registro do banco de dados
     db.session.delete(attachment)
     db.session.commit()
     
+    # Liberar a referência ao arquivo (apagado quando não houver outras)
+    try:
+        release_file(file_path)
+    except Exception as e:
+        flash(f'Erro ao excluir arquivo físico: {str(e)}', 'warning')
+    
     flash('Anexo excluído com sucesso!', 'success')
     return redirect(url_for('documents.view_document', document_id=document.id))
 
@@ -1195,6 +1189,13 @@ def edit_online(document_id):
         
         # Salvar o novo conteúdo
         try:
+            # Arquivos deduplicados são compartilhados: editar uma cópia exclusiva
+            document.file_path = ensure_private_copy(
+                document.file_path,
+                os.path.join(current_app.config['UPLOAD_FOLDER'], 'documents')
+            )
+            document.filename = os.path.basename(document.file_path)
+            
             with open(document.file_path, 'w', encoding='utf-8') as f:
                 f.write(new_content)
             
@@ -1278,6 +1279,13 @@ def advanced_editor(document_id):
 </body>
 </html>"""
             
+            # Arquivos deduplicados são compartilhados: editar uma cópia exclusiva
+            document.file_path = ensure_private_copy(
+                document.file_path,
+                os.path.join(current_app.config['UPLOAD_FOLDER'], 'documents')
+            )
+            document.filename = os.path.basename(document.file_path)
+            
             # Salvar o conteúdo HTML completo
             with open(document.file_path, 'w', encoding='utf-8') as f:
                 f.write(html_template)
@@ -1374,16 +1382,13 @@ def advanced_print_document(document_id):
             print_footer=print_footer
         )
     
-    # Para arquivos Excel, tentar embutir visualizador do Microsoft Office Online
-    elif file_ext in ['.xlsx', '.xls']:
-        file_url = url_for('documents.serve_document', document_id=document_id, direct_view=True, _external=True)
-        office_online_viewer = f"https://view.officeapps.live.com/op/embed.aspx?src={file_url}"
-        
+    # Para planilhas Excel e documentos Word, embutir a pré-visualização gerada localmente
+    elif get_preview_cache(current_app).supports(file_ext):
         return render_template(
             'documents/print_view.html',
             title=document.title,
             document=document,
-            office_url=office_online_viewer,
+            office_url=url_for('documents.preview_document', document_id=document_id),
             print_mode=print_mode,
             auto_print=auto_print,
             paper_size=paper_size,
@@ -1478,14 +1483,12 @@ def advanced_print_virtual_document(file_path):
             print_header=print_header,
             print_footer=print_footer
         )
-    elif file_ext in ['.xlsx', '.xls']:
-        file_url = url_for('documents.download_virtual_document', file_path=file_path, as_attachment='false', _external=True)
-        office_viewer_url = f"https://view.officeapps.live.com/op/embed.aspx?src={file_url}"
+    elif get_preview_cache(current_app).supports(file_ext):
         return render_template(
             'documents/print_view.html',
             title=f'Impressão: {file_name}',
             document=doc_info,
-            office_url=office_viewer_url,
+            office_url=url_for('documents.preview_virtual_document', file_path=file_path),
             download_link=download_link,
             virtual_document=True,
             print_mode=print_mode,
@@ -1514,6 +1517,8 @@ def advanced_print_virtual_document(file_path):
 @login_required
 def image_preview(document_id):
     """Gerar uma prévia da imagem para documentos do tipo imagem ou PDF."""
+    from PIL import Image, ImageDraw, ImageFont
+    
     document = TechnicalDocument.query.get_or_404(document_id)
     
     # Verificar permissão para documentos restritos
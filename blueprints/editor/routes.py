@@ -1,25 +1,27 @@
+from functools import lru_cache
 from flask import render_template, request, send_file
 from flask_socketio import emit
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from docx import Document
 from io import BytesIO
 
 from . import editor_bp
 
-# Carregar dados do Excel
-try:
-    fornecedores_df = pd.read_excel("Uploads/fornecedores.xlsx")
-    empresas = fornecedores_df['EMPRESA'].unique().tolist()
-    produtos = fornecedores_df['PRODUTO'].unique().tolist()
-    marcas = fornecedores_df['MARCA'].unique().tolist()
-except Exception as e:
-    print(f"Erro ao carregar dados do Excel: {e}")
-    fornecedores_df = pd.DataFrame(columns=["EMPRESA", "PRODUTO", "MARCA"])
-    empresas = []
-    produtos = []
-    marcas = []
+
+@lru_cache(maxsize=1)
+def _load_fornecedores():
+    """Carrega os dados de fornecedores do Excel na primeira utilização."""
+    import pandas as pd
+    try:
+        fornecedores_df = pd.read_excel("Uploads/fornecedores.xlsx")
+        empresas = fornecedores_df['EMPRESA'].unique().tolist()
+        produtos = fornecedores_df['PRODUTO'].unique().tolist()
+        marcas = fornecedores_df['MARCA'].unique().tolist()
+    except Exception as e:
+        print(f"Erro ao carregar dados do Excel: {e}")
+        fornecedores_df = pd.DataFrame(columns=["EMPRESA", "PRODUTO", "MARCA"])
+        empresas = []
+        produtos = []
+        marcas = []
+    return fornecedores_df, empresas, produtos, marcas
 
 @editor_bp.route('/editor', methods=['GET', 'POST'])
 def editor():
@@ -32,6 +34,8 @@ def editor():
         
         # Gerar arquivo baseado no formato solicitado
         if format == 'pdf':
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen import canvas
             buffer = BytesIO()
             c = canvas.Canvas(buffer, pagesize=letter)
             c.drawString(100, 750, f"Empresa: {empresa}")
@@ -47,6 +51,7 @@ def editor():
             return send_file(buffer, as_attachment=True, download_name="laudo.pdf", mimetype="application/pdf")
         
         elif format == 'word':
+            from docx import Document
             doc = Document()
             doc.add_paragraph(f"Empresa: {empresa}")
             doc.add_paragraph(f"Produto: {produto}")
@@ -59,6 +64,7 @@ def editor():
             return send_file(buffer, as_attachment=True, download_name="laudo.docx", mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
         
         elif format == 'excel':
+            import pandas as pd
             df = pd.DataFrame({
                 "Empresa": [empresa],
                 "Produto": [produto],
@@ -70,6 +76,7 @@ def editor():
             buffer.seek(0)
             return send_file(buffer, as_attachment=True, download_name="laudo.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
+    fornecedores_df, empresas, produtos, marcas = _load_fornecedores()
     return render_template('editor.html', 
                          empresas=empresas, 
                          produtos=produtos, 
@@ -7,20 +7,25 @@ import io
 import base64
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
-from models import TechnicalDocument, Supplier, User, UserActivity, db
-import matplotlib
-matplotlib.use('Agg')  # Define o backend não interativo
-import matplotlib.pyplot as plt
-import pandas as pd
+from models import Supplier, User, UserActivity, db
 from datetime import datetime, timedelta
-import seaborn as sns
 from sqlalchemy import func, extract
-import numpy as np
 from utils.activity_logger import log_view, log_action
+from utils import document_counters
 
 # Configuração do logger
 logger = logging.getLogger(__name__)
 
+
+def _plotting():
+    """Importa matplotlib e seaborn sob demanda, com o backend não interativo."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
 # Criação do blueprint
 estatisticas_bp = Blueprint('estatisticas', __name__, url_prefix='/estatisticas')
 
@@ -37,7 +42,7 @@ def index():
     )
     
     # Obter estatísticas gerais
-    total_reports = TechnicalDocument.query.count()
+    total_reports = document_counters.count(db.session)
     total_suppliers = Supplier.query.count()
     total_users = User.query.count()
     
@@ -45,20 +50,10 @@ def index():
     today = datetime.now()
     six_months_ago = today - timedelta(days=180)
     
-    # Consulta SQL para obter contagem de documentos por mês
-    reports_by_month = db.session.query(
-        extract('year', TechnicalDocument.upload_date).label('year'),
-        extract('month', TechnicalDocument.upload_date).label('month'),
-        func.count(TechnicalDocument.id).label('count')
-    ).filter(
-        TechnicalDocument.upload_date >= six_months_ago
-    ).group_by(
-        extract('year', TechnicalDocument.upload_date),
-        extract('month', TechnicalDocument.upload_date)
-    ).order_by(
-        extract('year', TechnicalDocument.upload_date),
-        extract('month', TechnicalDocument.upload_date)
-    ).all()
+    # Contagem de documentos por mês, somando os contadores diários
+    reports_by_month = {}
+    for day, count in document_counters.daily_counts(db.session, start=six_months_ago.date()).items():
+        reports_by_month[(day.year, day.month)] = reports_by_month.get((day.year, day.month), 0) + count
     
     # Preparar dados para o gráfico de linha
     months = []
@@ -71,30 +66,17 @@ def index():
         months.append(month_name)
         
         # Verificar se há registros para este mês
-        count = 0
-        for record in reports_by_month:
-            if record.year == month_date.year and record.month == month_date.month:
-                count = record.count
-                break
-        
-        counts.append(count)
+        counts.append(reports_by_month.get((month_date.year, month_date.month), 0))
     
     # Gerar gráfico de linha para documentos por mês
     line_chart = create_line_chart(months, counts, 'Documentos por Mês', 'Mês', 'Quantidade')
     
     # Obter documentos por categoria (top 5)
-    reports_by_category = db.session.query(
-        TechnicalDocument.document_type,
-        func.count(TechnicalDocument.id).label('count')
-    ).group_by(
-        TechnicalDocument.document_type
-    ).order_by(
-        func.count(TechnicalDocument.id).desc()
-    ).limit(5).all()
+    reports_by_category = document_counters.counts(db.session, 'type')[:5]
     
     # Preparar dados para o gráfico de barras
-    category_names = [doc.document_type for doc in reports_by_category]
-    category_counts = [doc.count for doc in reports_by_category]
+    category_names = [document_type for document_type, _ in reports_by_category]
+    category_counts = [count for _, count in reports_by_category]
     
     # Gerar gráfico de barras para documentos por categoria
     bar_chart = create_bar_chart(category_names, category_counts, 'Documentos por Categoria', 'Categoria', 'Quantidade')
@@ -142,48 +124,29 @@ def documents_statistics():
     )
     
     # Obter documentos por tipo
-    reports_by_category = db.session.query(
-        TechnicalDocument.document_type,
-        func.count(TechnicalDocument.id).label('count')
-    ).group_by(
-        TechnicalDocument.document_type
-    ).order_by(
-        func.count(TechnicalDocument.id).desc()
-    ).all()
+    reports_by_category = document_counters.counts(db.session, 'type')
     
     # Preparar dados para o gráfico de barras
-    category_names = [doc.document_type for doc in reports_by_category]
-    category_counts = [doc.count for doc in reports_by_category]
+    category_names = [document_type for document_type, _ in reports_by_category]
+    category_counts = [count for _, count in reports_by_category]
     
     # Gerar gráfico de barras para documentos por tipo
     category_chart = create_bar_chart(category_names, category_counts, 'Documentos por Tipo', 'Tipo', 'Quantidade')
     
     # Obter documentos por status
-    reports_by_status = db.session.query(
-        TechnicalDocument.status,
-        func.count(TechnicalDocument.id).label('count')
-    ).group_by(
-        TechnicalDocument.status
-    ).order_by(
-        func.count(TechnicalDocument.id).desc()
-    ).all()
+    reports_by_status = document_counters.counts(db.session, 'status')
     
     # Preparar dados para o gráfico de pizza
-    status_names = [doc.status for doc in reports_by_status]
-    status_counts = [doc.count for doc in reports_by_status]
+    status_names = [status for status, _ in reports_by_status]
+    status_counts = [count for _, count in reports_by_status]
     
     # Gerar gráfico de pizza para documentos por status
     status_chart = create_pie_chart(status_names, status_counts, 'Documentos por Status')
     
-    # Obter documentos por dia da semana
-    reports_by_day = db.session.query(
-        extract('dow', TechnicalDocument.upload_date).label('day'),
-        func.count(TechnicalDocument.id).label('count')
-    ).group_by(
-        extract('dow', TechnicalDocument.upload_date)
-    ).order_by(
-        extract('dow', TechnicalDocument.upload_date)
-    ).all()
+    # Obter documentos por dia da semana, somando os contadores diários
+    reports_by_day = {}
+    for day, count in document_counters.daily_counts(db.session).items():
+        reports_by_day[day.weekday()] = reports_by_day.get(day.weekday(), 0) + count
     
     # Mapear dias da semana
     day_mapping = {
@@ -197,8 +160,8 @@ def documents_statistics():
     }
     
     # Preparar dados para o gráfico de barras
-    day_names = [day_mapping.get(int(report.day), 'Desconhecido') for report in reports_by_day]
-    day_counts = [report.count for report in reports_by_day]
+    day_names = [day_mapping.get(weekday, 'Desconhecido') for weekday in sorted(reports_by_day)]
+    day_counts = [reports_by_day[weekday] for weekday in sorted(reports_by_day)]
     
     # Gerar gráfico de barras para documentos por dia da semana
     day_chart = create_bar_chart(day_names, day_counts, 'Documentos por Dia da Semana', 'Dia', 'Quantidade')
@@ -361,6 +324,7 @@ def activities_statistics():
 
 def create_line_chart(x_data, y_data, title, x_label, y_label):
     """Criar gráfico de linha e retornar como base64."""
+    plt, sns = _plotting()
     plt.figure(figsize=(10, 5))
     sns.set_style("whitegrid")
     plt.plot(x_data, y_data, marker='o', linewidth=2, color='#3498db')
@@ -384,6 +348,7 @@ def create_line_chart(x_data, y_data, title, x_label, y_label):
 
 def create_bar_chart(x_data, y_data, title, x_label, y_label):
     """Criar gráfico de barras e retornar como base64."""
+    plt, sns = _plotting()
     plt.figure(figsize=(10, 5))
     sns.set_style("whitegrid")
     
@@ -420,6 +385,7 @@ def create_bar_chart(x_data, y_data, title, x_label, y_label):
 
 def create_pie_chart(labels, sizes, title):
     """Criar gráfico de pizza e retornar como base64."""
+    plt, sns = _plotting()
     plt.figure(figsize=(8, 8))
     sns.set_style("whitegrid")
     
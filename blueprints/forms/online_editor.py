@@ -14,14 +14,13 @@ import tempfile
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 
-# Importações para manipulação de documentos
-import docx
-import PyPDF2
-import pandas as pd
 from flask import current_app
-import openpyxl
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+
+from utils.workbook_scanner import scan_workbook, RULE_PLACEHOLDER
+
+# Área máxima da planilha exibida no editor
+EDITOR_MAX_ROWS = 100
+EDITOR_MAX_COLS = 50
 
 def extract_data_from_excel(file_path: str) -> Dict[str, Any]:
     """
@@ -33,95 +32,66 @@ def extract_data_from_excel(file_path: str) -> Dict[str, Any]:
     Returns:
         Dicionário com os dados extraídos
     """
-    # Abrir o arquivo Excel
-    workbook = openpyxl.load_workbook(file_path)
-    
-    # Obter nome da aba ativa
-    active_sheet_name = workbook.active.title
-    
+    import openpyxl
+
     # Preparar dicionário para os dados de todas as abas
     sheets_data = {}
     fields = []
     
-    # Para cada aba do arquivo
-    for sheet_name in workbook.sheetnames:
-        sheet = workbook[sheet_name]
-        
-        # Preparar dados da aba
-        sheet_data = {
-            'columns': [],
+    # Obter nome da aba ativa (em modo somente leitura as abas não são carregadas aqui)
+    workbook = openpyxl.load_workbook(file_path, read_only=True)
+    active_sheet_name = workbook.active.title
+    workbook.close()
+    
+    def start_sheet(sheet_name, sheet):
+        max_col = min(sheet.max_column or EDITOR_MAX_COLS, EDITOR_MAX_COLS)
+        sheets_data[sheet_name] = {
+            # Preencher colunas (A, B, C, ...)
+            'columns': list(range(1, max_col + 1)),
             'data': []
         }
+    
+    def add_row(sheet_name, row, values):
+        # Adicionar dados das células; os campos são marcados logo abaixo
+        sheets_data[sheet_name]['data'].append([
+            {
+                'value': str(value) if value is not None else "",
+                'is_field': False,
+                'row': row,
+                'col': col
+            }
+            for col, value in enumerate(values, start=1)
+        ])
+    
+    # Uma única passagem por aba, lendo apenas a área exibida no editor
+    # (limitada para melhor desempenho)
+    for match in scan_workbook(file_path, rules=(RULE_PLACEHOLDER,), max_row=EDITOR_MAX_ROWS,
+                               max_col=EDITOR_MAX_COLS, data_only=False,
+                               on_sheet=start_sheet, on_row=add_row):
+        sheet_name, row, col = match.sheet, match.row, match.column
+        sheets_data[sheet_name]['data'][row - 1][col - 1]['is_field'] = True
         
-        # Obter dimensões da aba
-        max_row = sheet.max_row
-        max_col = sheet.max_column
-        
-        # Limitar a quantidade de células para melhor desempenho
-        max_row = min(max_row, 100)
-        max_col = min(max_col, 50)
+        # Extrair nome do campo
+        field_name = match.value
+        if field_name.startswith("{{") and field_name.endswith("}}"):
+            field_name = field_name[2:-2].strip()
+        elif field_name.startswith("[") and field_name.endswith("]"):
+            field_name = field_name[1:-1].strip()
         
-        # Preencher colunas (A, B, C, ...)
-        for col in range(1, max_col + 1):
-            sheet_data['columns'].append(col)
+        # Limpar nome do campo
+        field_name = field_name.replace("_", "").strip()
+        if not field_name:
+            field_name = f"Campo {row}{chr(64+col)}"
         
-        # Para cada linha da aba
-        for row in range(1, max_row + 1):
-            row_data = []
-            
-            # Para cada coluna da aba
-            for col in range(1, max_col + 1):
-                cell = sheet.cell(row=row, column=col)
-                cell_value = cell.value if cell.value is not None else ""
-                
-                # Verificar se a célula é um campo preenchível
-                is_field = False
-                if isinstance(cell_value, str) and (
-                    cell_value.startswith("{{") and cell_value.endswith("}}") or
-                    cell_value.startswith("[") and cell_value.endswith("]") or
-                    "_______" in cell_value or
-                    "______" in cell_value or
-                    "__________" in cell_value
-                ):
-                    is_field = True
-                    # Extrair nome do campo
-                    field_name = cell_value
-                    if field_name.startswith("{{") and field_name.endswith("}}"):
-                        field_name = field_name[2:-2].strip()
-                    elif field_name.startswith("[") and field_name.endswith("]"):
-                        field_name = field_name[1:-1].strip()
-                    
-                    # Limpar nome do campo
-                    field_name = field_name.replace("_", "").strip()
-                    if not field_name:
-                        field_name = f"Campo {row}{chr(64+col)}"
-                    
-                    # Criar ID único para o campo
-                    field_id = f"excel_{sheet_name}_{row}_{col}"
-                    
-                    # Adicionar à lista de campos
-                    fields.append({
-                        'id': field_id,
-                        'name': field_name,
-                        'sheet': sheet_name,
-                        'row': row,
-                        'col': col,
-                        'value': ""
-                    })
-                
-                # Adicionar dados da célula
-                row_data.append({
-                    'value': str(cell_value),
-                    'is_field': is_field,
-                    'row': row,
-                    'col': col
-                })
-            
-            # Adicionar linha aos dados da aba
-            sheet_data['data'].append(row_data)
-        
-        # Adicionar dados da aba ao dicionário de abas
-        sheets_data[sheet_name] = sheet_data
+        # Adicionar à lista de campos
+        fields.append({
+            'id': f"excel_{sheet_name}_{row}_{col}",
+            'name': field_name,
+            'sheet': sheet_name,
+            'row': row,
+            'col': col,
+            'value': ""
+        })
     
     # Retornar dados extraídos
     return {
@@ -139,6 +109,8 @@ def apply_excel_fields(input_path: str, output_path: str, fields: List[Dict[str,
         output_path: Caminho para salvar o arquivo Excel editado
         fields: Lista de campos com valores editados
     """
+    import openpyxl
+
     # Abrir o arquivo Excel
     workbook = openpyxl.load_workbook(input_path)
     
@@ -177,6 +149,8 @@ def extract_data_from_docx(file_path: str) -> Dict[str, Any]:
     Returns:
         Dicionário com os dados extraídos
     """
+    import docx
+
     # Abrir o arquivo Word
     doc = docx.Document(file_path)
     
@@ -315,6 +289,8 @@ def apply_docx_fields(input_path: str, output_path: str, fields: List[Dict[str,
         output_path: Caminho para salvar o arquivo Word editado
         fields: Lista de campos com valores editados
     """
+    import docx
+
     # Abrir o arquivo Word
     doc = docx.Document(input_path)
     
@@ -371,6 +347,8 @@ def extract_data_from_pdf(file_path: str) -> Dict[str, Any]:
     Returns:
         Dicionário com os dados extraídos
     """
+    import PyPDF2
+
     # Abrir o arquivo PDF
     with open(file_path, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
@@ -467,6 +445,8 @@ def apply_pdf_fields(input_path: str, output_path: str, fields: List[Dict[str, A
         output_path: Caminho para salvar o arquivo PDF editado
         fields: Lista de campos com valores editados
     """
+    import PyPDF2
+
     # Para PDFs, criamos uma anotação simples sobre o PDF original
     # Esta é uma solução temporária, pois editar PDFs diretamente é complexo
     
@@ -487,6 +467,8 @@ def apply_pdf_fields(input_path: str, output_path: str, fields: List[Dict[str, A
         temp_path = temp_file.name
     
     # Criar um PDF com anotações
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
     c = canvas.Canvas(temp_path, pagesize=letter)
     c.setFont("Helvetica", 10)
     
@@ -4,23 +4,17 @@ logger = logging.getLogger(__name__)
 import os
 import mimetypes
 import json
-import tempfile
-import shutil
 import datetime
-from flask import render_template, send_file, abort, Response, jsonify, request, redirect, url_for, flash
+from flask import render_template, send_file, abort, Response, jsonify, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf
 from . import forms_bp
 from app import db, csrf
 from models import StandardFields, FormPreset
-from models import FormPreset
-import openpyxl
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
-import PyPDF2
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import docx
+from utils.workbook_scanner import scan_workbook, RULE_BLANK
+from utils import form_filler
+from utils.batch_fill import get_batch_fill_manager, prepare_job, BatchFillError, DEFAULT_MAX_ROWS, STATUS_DONE
+from utils.artifact_store import get_artifact_store
 
 # Diretório base dos formulários
 FORMS_DIR = os.path.join(os.getcwd(), 'extracted_forms')
@@ -575,20 +569,123 @@ def download_filled_form(file_path):
     file_name = os.path.basename(full_path)
     file_ext = os.path.splitext(file_name)[1].lower()
     
-    filled_path = fill_form_with_data(full_path, form_data)
+    filled_file = fill_form_with_data(full_path, form_data)
     
-    if not filled_path:
+    if not filled_file:
         flash('Não foi possível preencher o formulário. Formato não suportado.', 'error')
         return redirect(url_for('forms.fill_form', file_path=file_path))
     
-    # Enviar o arquivo preenchido para download
+    # Enviar o arquivo preenchido para download (direto da memória)
     return send_file(
-        filled_path,
+        filled_file,
         as_attachment=True,
         download_name=f'Preenchido_{file_name}'
     )
 
 
+@forms_bp.route('/batch/<path:file_path>', methods=['GET', 'POST'])
+@login_required
+def batch_fill(file_path):
+    """Preencher várias cópias de um formulário a partir de um CSV."""
+    full_path = os.path.join(FORMS_DIR, file_path)
+    
+    # Verificar se o arquivo existe
+    if not os.path.exists(full_path) or not os.path.isfile(full_path):
+        abort(404)
+    
+    file_name = os.path.basename(full_path)
+    file_ext = os.path.splitext(file_name)[1].lower()
+    fields = get_form_fields(full_path)
+    max_rows = current_app.config.get('BATCH_FILL_MAX_ROWS', DEFAULT_MAX_ROWS)
+    
+    if request.method == 'GET':
+        return render_template(
+            'forms/batch_fill.html',
+            title=f"Preenchimento em Lote - {file_name}",
+            file_path=file_path,
+            file_name=file_name,
+            file_ext=file_ext,
+            fields=fields,
+            max_rows=max_rows
+        )
+    
+    # Dados do lote: arquivo CSV enviado ou texto colado
+    csv_file = request.files.get('csv_file')
+    if csv_file and csv_file.filename:
+        csv_data = csv_file.read()
+    else:
+        csv_data = request.form.get('csv_text', '')
+    
+    try:
+        job = prepare_job(
+            current_user.id,
+            full_path,
+            csv_data,
+            fields,
+            output_format=request.form.get('output', 'zip'),
+            max_rows=max_rows
+        )
+    except BatchFillError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    get_batch_fill_manager(current_app).submit(job)
+    logger.info(f"Lote {job.id[:8]} iniciado para {file_name}: {job.total} linhas")
+    
+    return jsonify({
+        'success': True,
+        'message': f'Lote iniciado com {job.total} cópias.',
+        'job': job.to_dict(),
+        'status_url': url_for('forms.batch_fill_status', job_id=job.id),
+        'cancel_url': url_for('forms.batch_fill_cancel', job_id=job.id),
+        'download_url': url_for('forms.batch_fill_download', job_id=job.id)
+    }), 202
+
+
+@forms_bp.route('/batch/job/<job_id>')
+@login_required
+def batch_fill_status(job_id):
+    """Progresso de um preenchimento em lote."""
+    job = get_batch_fill_manager(current_app).get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Lote não encontrado.'}), 404
+    
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
+@forms_bp.route('/batch/job/<job_id>/cancel', methods=['POST'])
+@login_required
+def batch_fill_cancel(job_id):
+    """Cancelar um preenchimento em lote em andamento."""
+    job = get_batch_fill_manager(current_app).get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Lote não encontrado.'}), 404
+    
+    if job.finished:
+        return jsonify({'success': False, 'message': 'O lote já foi encerrado.', 'job': job.to_dict()}), 409
+    
+    job.cancel()
+    return jsonify({'success': True, 'message': 'Cancelamento solicitado.', 'job': job.to_dict()})
+
+
+@forms_bp.route('/batch/job/<job_id>/download')
+@login_required
+def batch_fill_download(job_id):
+    """Baixar o resultado de um preenchimento em lote."""
+    job = get_batch_fill_manager(current_app).get(job_id, current_user.id)
+    if job is None or job.status != STATUS_DONE:
+        abort(404)
+    
+    artifact_path = get_artifact_store(current_app).get_path(current_user.id, job.artifact_id)
+    if artifact_path is None:
+        abort(410)
+    
+    return send_file(
+        artifact_path,
+        as_attachment=True,
+        download_name=job.download_name
+    )
+
+
 @forms_bp.route('/preset/<int:preset_id>/download')
 @login_required
 def download_preset(preset_id):
@@ -613,17 +710,17 @@ def download_preset(preset_id):
                     # Adicionar apenas ao dicionário de preenchimento, não modifica o objeto preset
                     form_data[field] = getattr(standard_fields, field)
     
-    filled_path = fill_form_with_data(full_path, form_data)
+    filled_file = fill_form_with_data(full_path, form_data)
     
-    if not filled_path:
+    if not filled_file:
         flash('Não foi possível preencher o formulário. Formato não suportado.', 'error')
         return redirect(url_for('forms.list_presets', file_path=preset.file_path))
     
     file_name = os.path.basename(full_path)
     
-    # Enviar o arquivo preenchido para download
+    # Enviar o arquivo preenchido para download (direto da memória)
     return send_file(
-        filled_path,
+        filled_file,
         as_attachment=True,
         download_name=f'{preset.name}_{file_name}'
     )
@@ -827,39 +924,16 @@ def get_form_fields(file_path):
     try:
         if file_ext == '.xlsx' or file_ext == '.xls':
             try:
-                # Extrair campos de planilha Excel
-                workbook = openpyxl.load_workbook(file_path, data_only=True)
-                sheet = workbook.active
-                
-                if sheet is None:
-                    flash('Não foi possível acessar a planilha.', 'warning')
-                    return fields
-                    
-                # Obter o número máximo de linhas e colunas com segurança
-                max_row = sheet.max_row or 1
-                max_col = sheet.max_column or 1
+                from openpyxl.utils import get_column_letter
                 
-                for row in range(1, max_row + 1):
-                    for col in range(1, max_col + 1):
-                        try:
-                            cell = sheet.cell(row=row, column=col)
-                            if cell is None:
-                                continue
-                            
-                            value = cell.value
-                            
-                            if value and isinstance(value, str) and ('___' in value or '____' in value):
-                                # Encontrou um campo para preenchimento (representado por sublinhados)
-                                field_id = f"cell_{row}_{col}"
-                                sheet_title = getattr(sheet, 'title', 'Planilha')
-                                fields.append({
-                                    'id': field_id,
-                                    'name': f"Campo em {sheet_title} ({get_column_letter(col)}{row})",
-                                    'value': ''
-                                })
-                        except Exception as cell_error:
-                            logger.debug(f"Erro ao processar célula ({row},{col}): {cell_error}")
-                            continue
+                # Extrair campos de planilha Excel (leitura em streaming, somente a aba ativa)
+                for match in scan_workbook(file_path, rules=(RULE_BLANK,), active_only=True):
+                    # Encontrou um campo para preenchimento (representado por sublinhados)
+                    fields.append({
+                        'id': f"cell_{match.row}_{match.column}",
+                        'name': f"Campo em {match.sheet} ({get_column_letter(match.column)}{match.row})",
+                        'value': ''
+                    })
             except Exception as excel_error:
                 logger.debug(f"Erro ao processar arquivo Excel: {excel_error}")
                 fields.append({
@@ -871,6 +945,7 @@ def get_form_fields(file_path):
         elif file_ext == '.docx':
             try:
                 # Extrair campos de documento Word
+                import docx
                 doc = docx.Document(file_path)
                 
                 for para_index, para in enumerate(doc.paragraphs):
@@ -899,6 +974,7 @@ def get_form_fields(file_path):
             try:
                 # Extrair campos de PDF (mais complexo)
                 # Implementação básica para detecção de campos
+                import PyPDF2
                 reader = PyPDF2.PdfReader(file_path)
                 form_fields = reader.get_fields()
                 
@@ -962,143 +1038,21 @@ def get_form_fields(file_path):
 
 
 def fill_form_with_data(file_path, form_data):
-    """Preenche um formulário com os dados fornecidos e retorna o caminho do arquivo preenchido."""
-    file_ext = os.path.splitext(file_path)[1].lower()
+    """
+    Preenche um formulário com os dados fornecidos.
     
-    # Criar diretório temporário para o formulário preenchido
-    temp_dir = tempfile.mkdtemp()
-    file_name = os.path.basename(file_path)
-    output_path = os.path.join(temp_dir, f'filled_{file_name}')
+    O arquivo preenchido é gerado em memória e enviado diretamente ao
+    cliente, sem passar pelo disco.
     
-    try:
-        # Identificar e ignorar campos que não são para preenchimento de dados
-        valid_form_data = {}
-        for field_id, value in form_data.items():
-            if field_id in ['error_field', 'general_error', 'no_fields', 'unsupported_format']:
-                continue
-            valid_form_data[field_id] = value
-        
-        if file_ext == '.xlsx' or file_ext == '.xls':
-            try:
-                # Preencher planilha Excel
-                workbook = openpyxl.load_workbook(file_path)
-                sheet = workbook.active
-                
-                if sheet is None:
-                    raise ValueError('Não foi possível acessar a planilha.')
-                
-                # Aplicar os dados aos campos identificados
-                for field_id, value in valid_form_data.items():
-                    if field_id.startswith('cell_'):
-                        parts = field_id.split('_')
-                        if len(parts) >= 3:
-                            try:
-                                _, row, col = parts
-                                row, col = int(row), int(col)
-                                
-                                cell = sheet.cell(row=row, column=col)
-                                if cell is None:
-                                    continue
-                                
-                                # Verificar se é célula vazia ou tem marcadores de campo
-                                original_value = cell.value
-                                if original_value is None or (isinstance(original_value, str) and 
-                                                             ('___' in original_value or '____' in original_value)):
-                                    cell.value = value
-                                    
-                                    # Aplicar estilo para destacar o campo preenchido
-                                    cell.font = Font(bold=True, color="0000FF")
-                            except Exception as cell_error:
-                                logger.debug(f"Erro ao preencher célula ({field_id}): {cell_error}")
-                                continue
-                
-                # Salvar a planilha preenchida
-                workbook.save(output_path)
-            except Exception as excel_error:
-                logger.debug(f"Erro ao processar arquivo Excel para preenchimento: {excel_error}")
-                raise ValueError(f"Não foi possível preencher o formulário Excel: {str(excel_error)}")
-            
-        elif file_ext == '.docx':
-            try:
-                # Preencher documento Word
-                doc = docx.Document(file_path)
-                
-                # Aplicar os dados aos campos identificados
-                for field_id, value in valid_form_data.items():
-                    if field_id.startswith('para_'):
-                        try:
-                            parts = field_id.split('_')
-                            if len(parts) >= 2:
-                                para_index = int(parts[1])
-                                if para_index < len(doc.paragraphs):
-                                    para = doc.paragraphs[para_index]
-                                    text = para.text
-                                    
-                                    # Substituir campos em branco pelo valor
-                                    new_text = text.replace('_____', value).replace('____', value).replace('___', value)
-                                    
-                                    # Limpar o parágrafo e adicionar o texto substituído
-                                    para.clear()
-                                    para.add_run(new_text)
-                        except Exception as para_error:
-                            logger.debug(f"Erro ao preencher parágrafo {field_id}: {para_error}")
-                            continue
-                
-                # Salvar o documento preenchido
-                doc.save(output_path)
-            except Exception as docx_error:
-                logger.debug(f"Erro ao processar arquivo Word para preenchimento: {docx_error}")
-                raise ValueError(f"Não foi possível preencher o documento Word: {str(docx_error)}")
-            
-        elif file_ext == '.pdf':
-            try:
-                # Para PDFs, criamos um novo PDF com o texto sobreposto
-                # (abordagem simples, funcionalidade limitada)
-                reader = PyPDF2.PdfReader(file_path)
-                writer = PyPDF2.PdfWriter()
-                
-                for page_num in range(len(reader.pages)):
-                    page = reader.pages[page_num]
-                    writer.add_page(page)
-                
-                # Se o PDF tem campos de formulário
-                form_fields = reader.get_fields()
-                if form_fields:
-                    # Preencher campos de formulário
-                    update_fields = {}
-                    for field_id, value in valid_form_data.items():
-                        if field_id in form_fields:
-                            update_fields[field_id] = value
-                    
-                    if update_fields:
-                        for page_num in range(len(reader.pages)):
-                            try:
-                                writer.update_page_form_field_values(page_num, update_fields)
-                            except Exception as page_error:
-                                logger.debug(f"Erro ao preencher página {page_num} do PDF: {page_error}")
-                                continue
-                
-                # Salvar o PDF preenchido
-                with open(output_path, 'wb') as output_file:
-                    writer.write(output_file)
-            except Exception as pdf_error:
-                logger.debug(f"Erro ao processar arquivo PDF para preenchimento: {pdf_error}")
-                raise ValueError(f"Não foi possível preencher o documento PDF: {str(pdf_error)}")
-                
-        else:
-            # Formato não suportado
-            raise ValueError(f"Formato de arquivo não suportado: {file_ext}")
+    Returns:
+        BytesIO posicionado no início, ou None se não foi possível preencher
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
     
+    try:
+        return form_filler.fill_form(file_path, file_ext, form_data)
     except Exception as e:
         logger.debug(f"Erro ao preencher formulário: {e}")
-        try:
-            # Limpar recursos temporários
-            shutil.rmtree(temp_dir)
-        except:
-            pass
         return None
-    
-    return output_path
 
 
-# A função get_column_letter já está importada de openpyxl.utils
\ No newline at end of file
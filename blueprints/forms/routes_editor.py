@@ -10,8 +10,8 @@ permitindo a edição online sem necessidade de download dos arquivos.
 
 import os
 import json
-import base64
 from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
 
 # Importações do Flask
@@ -21,6 +21,7 @@ from flask import (
 )
 from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf
+from werkzeug.security import safe_join
 
 # Importar funções de processamento de documentos
 from .online_editor import (
@@ -35,10 +36,38 @@ from .online_editor import (
 # Importações de modelos
 from app import db
 from models import FormPreset, StandardFields
+from utils.artifact_store import get_artifact_store
+from utils.metrics import registry, lru_cache_stats
 
 # Criar blueprint para o editor universal
 editor_bp = Blueprint('editor', __name__, url_prefix='/forms/editor')
 
+# Tempo de cache (segundos) do arquivo original quando a URL é versionada
+EDITOR_FILE_MAX_AGE = 3600
+
+
+@lru_cache(maxsize=64)
+def _extract_content(full_path, file_ext, mtime_ns, file_size):
+    """
+    Extrai os dados do documento para o editor.
+    
+    O resultado fica em cache; data de modificação e tamanho fazem parte da
+    chave, de modo que um arquivo alterado é processado novamente.
+    """
+    if file_ext in ['.xlsx', '.xls']:
+        return extract_data_from_excel(full_path)
+    if file_ext == '.docx':
+        return extract_data_from_docx(full_path)
+    return extract_data_from_pdf(full_path)
+
+
+registry.register_cache('editor_conteudo', lru_cache_stats(_extract_content))
+
+
+def _file_version(stat_result):
+    """Identificador de versão do arquivo (usado como ETag e na URL)."""
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
 @editor_bp.route('/')
 @login_required
 def index():
@@ -139,57 +168,75 @@ def edit_form(file_path):
 @login_required
 def api_load_content(file_path):
     """API para carregar o conteúdo do documento para edição."""
-    # Verificar se o arquivo existe
-    full_path = os.path.join(current_app.config['ATTACHED_ASSETS_FOLDER'], file_path)
-    if not os.path.exists(full_path) or not os.path.isfile(full_path):
+    # Verificar se o arquivo existe (safe_join recusa caminhos fora da pasta)
+    full_path = safe_join(current_app.config['ATTACHED_ASSETS_FOLDER'], file_path)
+    if full_path is None or not os.path.isfile(full_path):
         return jsonify({'success': False, 'message': 'Arquivo não encontrado'})
     
     # Obter extensão do arquivo
     file_ext = os.path.splitext(full_path)[1].lower()
+    if file_ext not in ['.xlsx', '.xls', '.docx', '.pdf']:
+        return jsonify({'success': False, 'message': 'Formato de arquivo não suportado'})
     
     try:
+        stat_result = os.stat(full_path)
+        version = _file_version(stat_result)
+        data = _extract_content(full_path, file_ext, stat_result.st_mtime_ns, stat_result.st_size)
+        
         # Processar o arquivo de acordo com a extensão
         if file_ext in ['.xlsx', '.xls']:
             # Excel
-            data = extract_data_from_excel(full_path)
-            return jsonify({
+            payload = {
                 'success': True,
                 'content_type': 'excel',
                 'active_sheet': data['active_sheet'],
                 'sheets': data['sheets'],
                 'fields': data['fields']
-            })
+            }
         elif file_ext == '.docx':
             # Word
-            data = extract_data_from_docx(full_path)
-            return jsonify({
+            payload = {
                 'success': True,
                 'content_type': 'docx',
                 'paragraphs': data['paragraphs'],
                 'tables': data['tables'],
                 'fields': data['fields']
-            })
-        elif file_ext == '.pdf':
-            # PDF
-            data = extract_data_from_pdf(full_path)
-            
-            # Converter o PDF para base64 para visualização
-            with open(full_path, 'rb') as pdf_file:
-                pdf_base64 = base64.b64encode(pdf_file.read()).decode('utf-8')
-            
-            return jsonify({
+            }
+        else:
+            # PDF: apenas os metadados; o arquivo é servido à parte, com
+            # suporte a Range, para carregamento progressivo no navegador
+            payload = {
                 'success': True,
                 'content_type': 'pdf',
-                'pdf_base64': pdf_base64,
+                'pdf_url': url_for('editor.api_file_content', file_path=file_path, v=version),
                 'fields': data['fields']
-            })
-        else:
-            # Formato não suportado
-            return jsonify({'success': False, 'message': 'Formato de arquivo não suportado'})
+            }
     
     except Exception as e:
         # Em caso de erro, enviar mensagem de falha
         return jsonify({'success': False, 'message': f'Erro ao processar arquivo: {str(e)}'})
+    
+    # Revalidação por ETag: se o arquivo não mudou, o navegador recebe 304
+    response = jsonify(payload)
+    response.set_etag(version)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@editor_bp.route('/api/file/<path:file_path>')
+@login_required
+def api_file_content(file_path):
+    """Serve o arquivo original para visualização, com cache condicional e requisições parciais (Range)."""
+    full_path = safe_join(current_app.config['ATTACHED_ASSETS_FOLDER'], file_path)
+    if full_path is None or not os.path.isfile(full_path):
+        return jsonify({'success': False, 'message': 'Arquivo não encontrado'}), 404
+    
+    # URLs versionadas (?v=) mudam quando o arquivo muda e podem ficar em cache
+    max_age = EDITOR_FILE_MAX_AGE if request.args.get('v') else 0
+    response = send_file(full_path, conditional=True, etag=True, max_age=max_age)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 @editor_bp.route('/api/save-content/<path:file_path>', methods=['POST'])
 @login_required
@@ -208,12 +255,14 @@ def api_save_content(file_path):
     
     # Obter extensão do arquivo
     file_ext = os.path.splitext(full_path)[1].lower()
+    artifact_id = None
     
     try:
-        # Criar uma cópia temporária do arquivo com os campos preenchidos
+        # Gerar o arquivo editado no armazenamento de artefatos (um
+        # diretório por usuário e por edição, com expiração automática)
         file_name = os.path.basename(full_path)
-        output_filename = f"edited_{file_name}"
-        output_path = os.path.join(current_app.config['UPLOAD_FOLDER'], output_filename)
+        artifact_store = get_artifact_store(current_app)
+        artifact_id, output_path = artifact_store.create(current_user.id, f"edited_{file_name}")
         
         # Aplicar os campos preenchidos ao arquivo de acordo com o tipo
         if file_ext in ['.xlsx', '.xls']:
@@ -226,15 +275,21 @@ def api_save_content(file_path):
             # PDF
             apply_pdf_fields(full_path, output_path, data['fields'])
         else:
+            artifact_store.delete(current_user.id, artifact_id)
             return jsonify({'success': False, 'message': 'Formato de arquivo não suportado'})
         
-        # Salvar o caminho do arquivo na sessão para download posterior
-        session['edited_file'] = output_path
+        # Guardar apenas o identificador do artefato na sessão para download posterior
+        previous_id = session.get('edited_artifact')
+        session['edited_artifact'] = artifact_id
+        if previous_id:
+            artifact_store.delete(current_user.id, previous_id)
         
         return jsonify({'success': True, 'message': 'Documento salvo com sucesso'})
     
     except Exception as e:
         # Em caso de erro, enviar mensagem de falha
+        if artifact_id:
+            artifact_store.delete(current_user.id, artifact_id)
         return jsonify({'success': False, 'message': f'Erro ao salvar arquivo: {str(e)}'})
 
 @editor_bp.route('/api/download-edited')
@@ -242,14 +297,15 @@ def api_save_content(file_path):
 def api_download_edited():
     """API para baixar o arquivo editado."""
     # Verificar se existe um arquivo editado na sessão
-    if 'edited_file' not in session:
+    if 'edited_artifact' not in session:
         flash('Nenhum arquivo editado encontrado!', 'danger')
         return redirect(url_for('editor.index'))
     
-    # Obter caminho do arquivo
-    file_path = session['edited_file']
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
-        flash('Arquivo não encontrado!', 'danger')
+    # Obter caminho do arquivo (None se expirado)
+    file_path = get_artifact_store(current_app).get_path(current_user.id, session['edited_artifact'])
+    if not file_path or not os.path.isfile(file_path):
+        session.pop('edited_artifact', None)
+        flash('Arquivo não encontrado ou expirado!', 'danger')
         return redirect(url_for('editor.index'))
     
     # Obter nome do arquivo
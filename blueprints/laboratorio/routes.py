@@ -1,8 +1,9 @@
 import calendar
 import datetime
 import locale
-from flask import render_template, request, jsonify, redirect, url_for, flash
+from flask import render_template, request, jsonify, redirect, url_for, flash, make_response
 from flask_login import login_required
+from utils import lab_schedule
 from . import laboratorio_bp
 
 # Configura o locale para português do Brasil
@@ -30,13 +31,6 @@ MESES = {
     12: 'DEZEMBRO'
 }
 
-# Dados fixos para o calendário de Maio de 2025, conforme imagem de referência
-DADOS_MAIO_2025 = {
-    'primeiro_dia_semana': 3,  # Quinta-feira (0=segunda, 1=terça, ..., 6=domingo)
-    'dias_no_mes': 31,
-    'turno_inicial_shelf_life': 1  # Inicia com o primeiro turno
-}
-
 @laboratorio_bp.route('/')
 @login_required
 def index():
@@ -64,7 +58,7 @@ def calendario():
     mes_nome = MESES[mes]
     
     # Obtém as atividades para o mês
-    atividades = gerar_atividades_mes(ano, mes)
+    atividades = lab_schedule.month_plan(ano, mes)
     
     return render_template('laboratorio/calendario.html', 
                            ano=ano, 
@@ -83,7 +77,8 @@ def calendario_anual():
     # Obtém o ano da query string ou usa o ano atual
     ano = int(request.args.get('ano', datetime.datetime.now().year))
     
-    # Gera o calendário para todos os meses do ano
+    # Gera o calendário para todos os meses do ano (planos vêm do cache)
+    plano = lab_schedule.year_plan(ano)
     calendario_anual = {}
     for mes in range(1, 13):
         primeiro_dia = datetime.date(ano, mes, 1)
@@ -92,7 +87,7 @@ def calendario_anual():
         calendario_anual[mes] = {
             'primeiro_dia': primeiro_dia,
             'dias_no_mes': dias_no_mes,
-            'atividades': gerar_atividades_mes(ano, mes)
+            'atividades': plano[mes]
         }
     
     return render_template('laboratorio/calendario_anual.html', 
@@ -121,7 +116,7 @@ def imprimir_calendario():
     mes_nome = MESES[mes]
     
     # Obtém as atividades para o mês
-    atividades = gerar_atividades_mes(ano, mes)
+    atividades = lab_schedule.month_plan(ano, mes)
     
     return render_template('laboratorio/imprimir_calendario.html', 
                            ano=ano, 
@@ -139,7 +134,8 @@ def imprimir_calendario_anual():
     # Obtém o ano da query string ou usa o ano atual
     ano = int(request.args.get('ano', datetime.datetime.now().year))
     
-    # Gera o calendário para todos os meses do ano
+    # Gera o calendário para todos os meses do ano (planos vêm do cache)
+    plano = lab_schedule.year_plan(ano)
     calendario_anual = {}
     for mes in range(1, 13):
         primeiro_dia = datetime.date(ano, mes, 1)
@@ -148,7 +144,7 @@ def imprimir_calendario_anual():
         calendario_anual[mes] = {
             'primeiro_dia': primeiro_dia,
             'dias_no_mes': dias_no_mes,
-            'atividades': gerar_atividades_mes(ano, mes)
+            'atividades': plano[mes]
         }
     
     return render_template('laboratorio/imprimir_calendario_anual.html', 
@@ -156,98 +152,46 @@ def imprimir_calendario_anual():
                            calendario=calendario_anual,
                            meses=MESES)
 
-def gerar_atividades_mes(ano, mes):
-    """Gera as atividades para o mês conforme as regras definidas"""
-    # Inicializa o dicionário de atividades
-    atividades = {}
-    
-    # Obtém o número de dias no mês e o primeiro dia da semana (0 = segunda, 6 = domingo)
-    _, dias_no_mes = calendar.monthrange(ano, mes)
-    
-    # Define o primeiro dia do mês para calcular dia da semana
-    primeiro_dia = datetime.date(ano, mes, 1)
-    
-    # Ajusta para garantir que os dias da semana estejam corretos
-    # O weekday() retorna 0 para segunda-feira, 6 para domingo
-    # Mas na realidade, para Maio de 2025, o dia 1 deve ser quinta-feira (3)
-    
-    # Para garantir que o calendário esteja correto, usamos uma referência fixa
-    # Sabemos que 1º de maio de 2025 é uma quinta-feira (índice 3)
-    if ano == 2025 and mes == 5:
-        # Forçar o primeiro dia de maio de 2025 a ser quinta-feira (índice 3)
-        dia_semana_ref = 3
-    else:
-        # Para outros meses, calcular normalmente baseado nos dados reais do calendário
-        dia_semana_ref = primeiro_dia.weekday()
-    
-    # Inicializa o turno para Shelf Life 10D
-    # Use uma referência fixa que corresponda ao calendário de exemplo
-    # Para maio de 2025, vamos iniciar com o turno 1
-    if ano == 2025 and mes == 5:
-        turno_shelf_life = 1
+def _resposta_condicional(tag, gerar, mimetype):
+    """Responde 304 se o cliente já tem a versão tag; senão gera o conteúdo com a ETag."""
+    if request.if_none_match.contains(tag):
+        response = make_response('', 304)
     else:
-        # Para outros meses, calcular de forma genérica
-        data_referencia = datetime.date(2025, 5, 1)  # 1º de maio de 2025 começa com o 1º turno
-        dias_desde_referencia = (primeiro_dia - data_referencia).days
-        turno_shelf_life = (dias_desde_referencia % 3) + 1
-    
-    # Gera as atividades para cada dia do mês
-    for dia in range(1, dias_no_mes + 1):
-        data = datetime.date(ano, mes, dia)
-        
-        # Usar o dia da semana de referência para forçar o calendário a corresponder
-        # ao exemplo fornecido para maio de 2025
-        if ano == 2025 and mes == 5:
-            # Para Maio de 2025, calcular o dia da semana a partir da referência
-            # Sabemos que dia 1 é quinta-feira (3), 2 é sexta, etc.
-            dia_semana = (dia_semana_ref + dia - 1) % 7
-        else:
-            # Cálculo normal para outros meses
-            dia_semana = data.weekday()  # 0=segunda, 1=terça, ..., 6=domingo
-        
-        # Inicializa as atividades para cada turno
-        atividades_dia = {
-            1: [],  # 1º turno
-            2: [],  # 2º turno
-            3: []   # 3º turno
-        }
-        
-        # 1. E.T.E (Estação de Tratamento de Efluentes)
-        if dia_semana == 0:  # Segunda-feira
-            atividades_dia[1].append("E.T.E")
-        else:  # Terça a domingo
-            atividades_dia[3].append("E.T.E")
-        
-        # 2. Análise de Água - distribuição por dia da semana
-        if dia_semana == 0:      # Segunda-feira
-            atividades_dia[1].append("ANÁLISE DE ÁGUA")
-        elif dia_semana == 1:    # Terça-feira
-            atividades_dia[2].append("ANÁLISE DE ÁGUA")
-        elif dia_semana == 2:    # Quarta-feira
-            atividades_dia[3].append("ANÁLISE DE ÁGUA")
-        elif dia_semana == 3:    # Quinta-feira
-            atividades_dia[1].append("ANÁLISE DE ÁGUA")
-        elif dia_semana == 4:    # Sexta-feira
-            atividades_dia[2].append("ANÁLISE DE ÁGUA")
-        elif dia_semana == 5:    # Sábado
-            atividades_dia[3].append("ANÁLISE DE ÁGUA")
-        elif dia_semana == 6:    # Domingo
-            # No domingo, todos os turnos realizam análise de água (se houver expediente)
-            atividades_dia[1].append("ANÁLISE DE ÁGUA*")
-            atividades_dia[2].append("ANÁLISE DE ÁGUA*")
-            atividades_dia[3].append("ANÁLISE DE ÁGUA*")
-        
-        # 3. Shelf Life 10D (alterna ciclicamente entre os turnos)
-        atividades_dia[turno_shelf_life].append("SHELF LIFE 10D")
-        
-        # Atualiza o turno para o próximo dia
-        turno_shelf_life = turno_shelf_life % 3 + 1  # Cicla entre 1, 2, 3
-        
-        # 4. Turbidez (Apenas às segundas-feiras, 3º turno)
-        if dia_semana == 0:  # Segunda-feira
-            atividades_dia[3].append("TURBIDEZ")
-        
-        # Armazena as atividades para este dia
-        atividades[dia] = atividades_dia
-    
-    return atividades
\ No newline at end of file
+        response = make_response(gerar())
+        response.mimetype = mimetype
+    response.set_etag(tag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@laboratorio_bp.route('/calendario/<int:ano>.json')
+@login_required
+def calendario_json(ano):
+    """Plano de atividades do ano (ou de um mês, com ?mes=) em JSON"""
+    mes = request.args.get('mes', type=int)
+    if not lab_schedule.MIN_YEAR <= ano <= lab_schedule.MAX_YEAR or (mes is not None and mes not in MESES):
+        return jsonify({'success': False, 'message': 'Ano ou mês inválido'}), 400
+    
+    regras = lab_schedule.current_rules()
+    meses = [mes] if mes else None
+    return _resposta_condicional(
+        lab_schedule.etag(regras, ano, mes or 'ano', 'json'),
+        lambda: jsonify(lab_schedule.to_json(ano, meses, ruleset=regras)).get_data(),
+        'application/json'
+    )
+
+@laboratorio_bp.route('/calendario/<int:ano>.ics')
+@login_required
+def calendario_ical(ano):
+    """Plano de atividades do ano em iCalendar, para importar em agendas"""
+    if not lab_schedule.MIN_YEAR <= ano <= lab_schedule.MAX_YEAR:
+        return jsonify({'success': False, 'message': 'Ano inválido'}), 400
+    
+    regras = lab_schedule.current_rules()
+    response = _resposta_condicional(
+        lab_schedule.etag(regras, ano, 'ics'),
+        lambda: lab_schedule.to_ical(ano, ruleset=regras),
+        'text/calendar'
+    )
+    response.headers['Content-Disposition'] = f'inline; filename=escala_laboratorio_{ano}.ics'
+    return response
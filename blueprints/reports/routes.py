@@ -1,21 +1,18 @@
 import os
 import io
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_from_directory, current_app, abort, make_response
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_from_directory, current_app, abort, make_response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-import uuid
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm, cm
 
 from app import db
 from models import Report, Category, Supplier
-from utils.search import search_reports
-from utils.file_handler import save_file, allowed_file, get_file_size
+from utils.search import search_reports, build_search_query
+from utils import report_export
+from utils import scorecards
+from utils.scorecards import supplier_rankings
+from utils.file_handler import save_file, allowed_file
+from utils.upload_store import store_upload, store_chunked_upload, release_file, UploadError
 from blueprints.reports import reports_bp
 from blueprints.reports.forms import ReportUploadForm, SearchForm, SupplierForm
 
@@ -23,6 +20,12 @@ from blueprints.reports.forms import ReportUploadForm, SearchForm, SupplierForm
 # Definir função para gerar PDF do laudo
 def generate_print_version(report):
     """Gera uma versão em PDF do laudo para impressão e download."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import mm, cm
+    
     # Diretório para salvar os PDFs gerados
     pdf_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'pdf_reports')
     os.makedirs(pdf_dir, exist_ok=True)
@@ -316,9 +319,11 @@ def upload():
             return render_template('reports/upload.html', form=form, title="Upload de Laudo")
             
         file = form.file.data
+        # Arquivo grande já enviado em partes (ver static/js/chunked_upload.js)
+        upload_id = request.form.get('upload_id', '').strip()
         
         # Se não tiver arquivo, criar um laudo sem arquivo
-        if not file:
+        if not file and not upload_id:
             current_app.logger.info("Criando laudo sem arquivo anexado...")
             
             # Valores padrão para campos obrigatórios
@@ -394,20 +399,22 @@ def upload():
                 flash(f"Erro ao criar laudo: {str(e)}", "danger")
                 return render_template('reports/upload.html', form=form, title="Upload de Laudo")
         
-        elif file and allowed_file(file.filename):
-            # Gerar nome seguro para o arquivo
-            original_filename = file.filename
-            file_extension = os.path.splitext(original_filename)[1]
-            unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-            
-            # Criar caminho do arquivo
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            
-            # Salvar arquivo
-            file.save(file_path)
+        elif upload_id or allowed_file(file.filename):
+            # Salvar arquivo no armazenamento por conteúdo (deduplicado por SHA-256)
+            try:
+                if upload_id:
+                    stored = store_chunked_upload(upload_id, current_user.id)
+                else:
+                    stored = store_upload(file)
+            except UploadError as e:
+                flash(f'Erro no envio do arquivo: {str(e)}', 'danger')
+                return render_template('reports/upload.html', form=form, title="Upload de Laudo")
             
-            # Obter o tamanho do arquivo
-            file_size = get_file_size(file_path)
+            original_filename = stored.original_filename
+            file_extension = os.path.splitext(original_filename)[1]
+            unique_filename = stored.filename
+            file_path = stored.file_path
+            file_size = stored.file_size
             
             # Preparar datas do laudo
             report_date = form.report_date.data if form.report_date.data else None
@@ -574,10 +581,8 @@ def search():
     
     return render_template('reports/search.html', form=form, results=results, title="Buscar Laudos")
 
-@reports_bp.route('/api/search')
-@login_required
-def api_search():
-    """API para busca de laudos (AJAX)."""
+def _search_args():
+    """Filtros da busca a partir da query string (api_search e exportações)."""
     query = request.args.get('query', '')
     category = request.args.get('category', '')
     supplier = request.args.get('supplier', '')
@@ -604,25 +609,57 @@ def api_search():
     # Determinar se deve ordenar por título ou data
     order_by_title = sort_by == 'title'
     
-    results = search_reports(query, category, supplier, date_from, date_to, order_by_title)
+    return query, category, supplier, date_from, date_to, order_by_title
+
+@reports_bp.route('/api/search')
+@login_required
+def api_search():
+    """API para busca de laudos (AJAX)."""
+    results = search_reports(*_search_args())
     return jsonify([r.to_dict() for r in results])
 
+@reports_bp.route('/export/<fmt>')
+@login_required
+def export_search(fmt):
+    """Exporta os laudos da busca (mesmos filtros de api_search) em CSV ou XLSX, em fluxo."""
+    if fmt not in ('csv', 'xlsx'):
+        abort(404)
+    
+    chunk_size = current_app.config.get('EXPORT_CHUNK_SIZE', report_export.DEFAULT_CHUNK_SIZE)
+    headers, rows = report_export.iter_rows(build_search_query(*_search_args()), chunk_size)
+    if fmt == 'csv':
+        body, mimetype = report_export.stream_csv(headers, rows, chunk_size), report_export.CSV_MIMETYPE
+    else:
+        body, mimetype = report_export.stream_xlsx(headers, rows), report_export.XLSX_MIMETYPE
+    
+    current_app.logger.info(f"Exportação de laudos ({fmt}) iniciada por {current_user.username}")
+    return current_app.response_class(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={report_export.export_filename(fmt)}',
+            'X-Accel-Buffering': 'no'  # Entrega imediata atrás do nginx
+        }
+    )
+
 @reports_bp.route('/delete/<int:id>', methods=['POST'])
 @login_required
 def delete(id):
     """Excluir um laudo."""
     report = Report.query.get_or_404(id)
     
-    # Excluir arquivo físico
-    try:
-        os.remove(report.file_path)
-    except OSError:
-        flash('Erro ao excluir arquivo físico!', 'warning')
+    file_path = report.file_path
     
     # Excluir registro do banco
     db.session.delete(report)
     db.session.commit()
     
+    # Liberar o arquivo físico (apagado quando nenhum outro registro o usa)
+    try:
+        release_file(file_path)
+    except OSError:
+        flash('Erro ao excluir arquivo físico!', 'warning')
+    
     flash('Laudo excluído com sucesso!', 'success')
     return redirect(url_for('reports.view_all'))
 
@@ -634,6 +671,29 @@ def suppliers():
     suppliers = Supplier.query.order_by(Supplier.name).paginate(page=page, per_page=20)
     return render_template('reports/suppliers.html', suppliers=suppliers, title="Fornecedores")
 
+@reports_bp.route('/suppliers/scorecards', methods=['GET'])
+@login_required
+def supplier_scorecards():
+    """Ranking de qualidade dos fornecedores com tendência mensal."""
+    months = min(max(request.args.get('months', 12, type=int), 1), 36)
+    rankings = supplier_rankings(db.session, months=months)
+    return render_template('reports/supplier_scorecards.html', rankings=rankings, months=months,
+                           tolerances=scorecards.TOLERANCES, title="Qualidade dos Fornecedores")
+
+@reports_bp.route('/api/suppliers/scorecards', methods=['GET'])
+@login_required
+def api_supplier_scorecards():
+    """Ranking dos fornecedores (parâmetros: months, supplier)."""
+    months = min(max(request.args.get('months', 12, type=int), 1), 36)
+    supplier = request.args.get('supplier') or None
+    return jsonify({
+        'success': True,
+        'months': months,
+        'weights': scorecards.SCORE_WEIGHTS,
+        'tolerances': scorecards.TOLERANCES,
+        'rankings': supplier_rankings(db.session, months=months, supplier=supplier)
+    })
+
 @reports_bp.route('/suppliers/add', methods=['GET', 'POST'])
 @login_required
 def add_supplier():
@@ -1,24 +1,17 @@
 import os
 import json
-import uuid
 from datetime import datetime
-from flask import render_template, redirect, url_for, flash, request, jsonify, current_app, send_file
+from flask import render_template, redirect, url_for, flash, request, jsonify, send_file
 from flask_login import login_required, current_user
 from sqlalchemy import desc
 from werkzeug.utils import secure_filename
 import io
-import pandas as pd
-import openpyxl
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
 
 from . import templates_bp
 from app import db
 from blueprints.templates.forms import ImportTemplateForm, CreateTemplateForm, FillReportForm
 from models import ReportTemplate, Report, User, Client, Sample, ReportAttachment
+from utils.upload_store import store_upload
 
 
 @templates_bp.route('/')
@@ -45,18 +38,9 @@ def import_template():
             # Obter o arquivo enviado e gerar nome seguro
             template_file = form.template_file.data
             original_filename = secure_filename(template_file.filename)
-            file_ext = os.path.splitext(original_filename)[1]
             
-            # Gerar nome único para o arquivo
-            unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-            
-            # Caminho para salvar o arquivo
-            templates_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'templates')
-            os.makedirs(templates_folder, exist_ok=True)
-            file_path = os.path.join(templates_folder, unique_filename)
-            
-            # Salvar o arquivo
-            template_file.save(file_path)
+            # Salvar o arquivo no armazenamento por conteúdo (deduplicado por SHA-256)
+            file_path = store_upload(template_file).file_path
             
             # Detectar o tipo de formulário automaticamente se não foi especificado
             form_type = form.template_type.data
@@ -239,25 +223,18 @@ def fill_report(template_id):
                     if attachment and attachment.filename:
                         filename = secure_filename(attachment.filename)
                         
-                        # Criar pasta de anexos se não existir
-                        attachments_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'report_attachments')
-                        os.makedirs(attachments_folder, exist_ok=True)
-                        
-                        # Gerar nome único para o arquivo
                         file_ext = os.path.splitext(filename)[1]
-                        unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-                        file_path = os.path.join(attachments_folder, unique_filename)
                         
-                        # Salvar arquivo
-                        attachment.save(file_path)
+                        # Salvar arquivo no armazenamento por conteúdo
+                        stored = store_upload(attachment)
                         
                         # Criar registro de anexo
                         new_attachment = ReportAttachment(
                             report_id=new_report.id,
-                            file_path=file_path,
+                            file_path=stored.file_path,
                             original_filename=filename,
                             file_type=file_ext.replace('.', ''),
-                            file_size=os.path.getsize(file_path),
+                            file_size=stored.file_size,
                             upload_date=datetime.utcnow(),
                             uploader_id=current_user.id
                         )
@@ -314,6 +291,11 @@ def view_report(report_id):
 @login_required
 def download_pdf(report_id):
     """Gerar e baixar o PDF de um laudo."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+    
     report = Report.query.get_or_404(report_id)
     template = ReportTemplate.query.get(report.template_id) if report.template_id else None
     
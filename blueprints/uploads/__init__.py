@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+# Importação das rotas após a definição do blueprint para evitar importações circulares
+from . import routes
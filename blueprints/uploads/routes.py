@@ -0,0 +1,81 @@
+"""
+Rotas de upload em partes (retomável) para arquivos grandes.
+
+Fluxo do cliente:
+    1. POST /uploads/chunked com {filename, size} abre a sessão;
+    2. PUT /uploads/chunked/<upload_id>?offset=N envia cada bloco;
+    3. GET /uploads/chunked/<upload_id> informa quantos bytes já chegaram
+       (para retomar após queda de conexão);
+    4. o formulário é enviado com o campo upload_id.
+"""
+
+import logging
+
+from flask import request, jsonify
+from flask_login import login_required, current_user
+
+from blueprints.uploads import uploads_bp
+from utils.upload_store import (
+    UploadError, start_chunked_upload, chunked_upload_status,
+    append_chunk, cancel_chunked_upload
+)
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.uploads')
+
+
+@uploads_bp.route('/chunked', methods=['POST'])
+@login_required
+def iniciar_upload():
+    """Abre uma sessão de upload em partes."""
+    data = request.get_json(silent=True) or {}
+    try:
+        total_size = int(data.get('size', 0))
+        status = start_chunked_upload(current_user.id, data.get('filename', ''), total_size)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Tamanho de arquivo inválido'}), 400
+    except UploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({'success': True, **status}), 201
+
+
+@uploads_bp.route('/chunked/<upload_id>', methods=['GET'])
+@login_required
+def status_upload(upload_id):
+    """Estado da sessão (bytes recebidos) para retomada do envio."""
+    try:
+        status = chunked_upload_status(upload_id, current_user.id)
+    except UploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+
+    return jsonify({'success': True, **status})
+
+
+@uploads_bp.route('/chunked/<upload_id>', methods=['PUT'])
+@login_required
+def enviar_bloco(upload_id):
+    """Recebe um bloco do arquivo na posição indicada por ?offset=."""
+    offset = request.args.get('offset', type=int)
+    if offset is None or offset < 0:
+        return jsonify({'success': False, 'message': 'Parâmetro offset obrigatório'}), 400
+
+    try:
+        status = append_chunk(upload_id, current_user.id, offset, request.stream)
+    except UploadError as e:
+        # 409 permite ao cliente consultar o estado e continuar do ponto certo
+        return jsonify({'success': False, 'message': str(e)}), 409
+
+    return jsonify({'success': True, **status})
+
+
+@uploads_bp.route('/chunked/<upload_id>', methods=['DELETE'])
+@login_required
+def cancelar_upload(upload_id):
+    """Descarta uma sessão de upload em partes."""
+    try:
+        cancel_chunked_upload(upload_id, current_user.id)
+    except UploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+
+    return jsonify({'success': True, 'message': 'Upload cancelado'})
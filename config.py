@@ -5,9 +5,47 @@ class Config:
     SECRET_KEY = os.environ.get('SESSION_SECRET', 'zelopack-dev-key')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///zelopack.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # Conexões mantidas abertas por processo
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))  # Conexões extras em picos
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # Espera máxima por uma conexão livre, em segundos
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))  # Conexões mais antigas que isso são renovadas
+    DB_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')  # Réplica de leitura (opcional)
+    DB_REPLICA_ENDPOINTS = ['estatisticas.*', 'dashboard.*', 'reports.search', 'reports.api_search', 'reports.export_search']  # Rotas que leem da réplica
+    DB_REPLICA_STICKY_SECONDS = 10  # Após gravar, o usuário lê as tabelas alteradas do primário por este tempo
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB limite máximo
+    UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # Bloco dos uploads em partes
+    MAX_CHUNKED_UPLOAD_SIZE = 512 * 1024 * 1024  # 512MB para arquivos enviados em partes
+    ARTIFACT_FOLDER = os.path.join(UPLOAD_FOLDER, 'artifacts')  # Documentos gerados (temporários)
+    ARTIFACT_TTL = 3600  # Expiração dos documentos gerados, em segundos
+    ARTIFACT_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+    BATCH_FILL_MAX_ROWS = 500  # Linhas por preenchimento em lote
+    BATCH_FILL_WORKERS = min(4, os.cpu_count() or 1)  # Processos por lote
+    BATCH_FILL_MAX_JOBS = 2  # Lotes executando ao mesmo tempo
+    PREVIEW_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'previews')  # Pré-visualizações geradas
+    PREVIEW_CONVERTER = os.environ.get('PREVIEW_CONVERTER')  # Executável do LibreOffice (padrão: soffice no PATH)
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx'}
+    LAZY_STARTUP = os.environ.get('LAZY_STARTUP', '').lower() in ('1', 'true', 'yes')  # Banco preparado via CLI
+    PERF_PROFILING_ENABLED = os.environ.get('PERF_PROFILING', '1').lower() not in ('0', 'false', 'no')  # Medidas por requisição
+    PERF_WINDOW_SIZE = 500  # Amostras mantidas por rota
+    PERF_N_PLUS_ONE_THRESHOLD = 10  # Repetições do mesmo SQL que sinalizam N+1
+    PERF_SLOW_REQUEST_MS = 1000  # Requisições acima deste tempo vão para o log
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Token Bearer para /metrics (sem token: apenas administrador autenticado)
+    QUERY_CACHE_MAX_ENTRIES = 1024  # Consultas mantidas no cache
+    QUERY_CACHE_TTL = 300  # Validade padrão das consultas em cache, em segundos
+    QUERY_CACHE_BACKEND = os.environ.get('QUERY_CACHE_BACKEND', 'memory')  # 'memory' ou 'sqlite:///arquivo.db' (compartilhado entre workers)
+    SPC_SUBGROUP_SIZE = 5  # Laudos consecutivos por subgrupo da carta X̄/R (2 a 10)
+    SPC_MIN_SAMPLES = 20  # Medidas antes de avaliar as regras de controle
+    SPC_HISTORY_SIZE = 60  # Subgrupos mantidos para as cartas
+    EXPORT_CHUNK_SIZE = 1000  # Linhas lidas do banco e enviadas por vez nas exportações
+    IMPORT_CHUNK_SIZE = 5000  # Laudos gravados por transação na importação de planilhas
+    ANALYTICS_SNAPSHOT_FOLDER = os.environ.get('ANALYTICS_SNAPSHOT_FOLDER', os.path.join(os.getcwd(), 'analytics'))  # Snapshots Parquet para análises
+    ANALYTICS_SNAPSHOT_COMPRESSION = 'zstd'  # Compressão dos arquivos Parquet
+    ANALYTICS_SNAPSHOT_CHUNK_SIZE = 50000  # Linhas lidas do banco por vez (um row group por mês)
+    LAB_SCHEDULE_RULES_FILE = os.environ.get('LAB_SCHEDULE_RULES_FILE')  # JSON com as regras da escala do laboratório (padrão: regras embutidas)
+    BACKUP_VERIFY_INTERVAL_DAYS = 7  # Dias entre verificações de integridade de cada backup
+    BACKUP_WORKERS = None  # Threads de compressão do backup (None = número de CPUs)
+    BACKUP_COMPRESSION_LEVEL = 6  # Nível deflate dos arquivos comprimíveis do backup (1 a 9)
 
 class DevelopmentConfig(Config):
     """Configurações para ambiente de desenvolvimento."""
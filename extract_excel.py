@@ -53,8 +53,8 @@ def extract_excel_data(excel_path):
         for sheet_name in sheet_names:
             logger.debug(f"\nProcessando planilha: {sheet_name}")
             
-            # Ler a planilha
-            df = pd.read_excel(excel_path, sheet_name=sheet_name)
+            # Ler a planilha (do arquivo já aberto, sem analisá-lo de novo)
+            df = xl.parse(sheet_name)
             
             # Informações sobre a planilha
             num_rows, num_cols = df.shape
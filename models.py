@@ -384,6 +384,53 @@ class CalculationResult(db.Model):
         }
 
 
+class HistoricoCalculo(db.Model):
+    """Modelo para o histórico de cálculos técnicos (somente inserção)."""
+    __tablename__ = 'historico_calculos'
+    __table_args__ = (
+        db.Index('ix_historico_calculos_usuario_data', 'usuario_id', 'criado_em'),
+        db.Index('ix_historico_calculos_tipo_data', 'tipo_calculo', 'criado_em'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo_calculo = db.Column(db.String(50), nullable=False)  # producao-200g, densidade, ratio, finalizacao-tanque, etc.
+    usuario_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    dados = db.Column(db.Text, nullable=False)  # JSON compacto com entradas e resultado
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # Relações
+    usuario = db.relationship('User')
+
+    def __repr__(self):
+        return f"<HistoricoCalculo {self.id}: {self.tipo_calculo}>"
+
+    def to_dict(self):
+        """Converte o registro de histórico para dicionário."""
+        return {
+            'id': self.id,
+            'tipo_calculo': self.tipo_calculo,
+            'usuario_id': self.usuario_id,
+            'dados': json.loads(self.dados) if self.dados else {},
+            'criado_em': self.criado_em.strftime('%d/%m/%Y %H:%M:%S')
+        }
+
+
+class StoredFile(db.Model):
+    """Modelo para arquivos enviados armazenados por conteúdo (SHA-256)."""
+    __tablename__ = 'stored_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    file_path = db.Column(db.String(500), nullable=False, index=True)
+    file_size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=1, nullable=False)  # Registros que apontam para o arquivo
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_referenced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StoredFile {self.sha256[:12]} refs={self.ref_count}>"
+
+
 class Client(db.Model):
     """Modelo para clientes/fornecedores."""
     id = db.Column(db.Integer, primary_key=True)
@@ -1326,3 +1373,173 @@ class Note(db.Model):
 
 
 
+
+
+class SpcStatistic(db.Model):
+    """
+    Estatísticas acumuladas de controle estatístico de processo (CEP) de uma
+    medida, por tipo de matéria-prima e fornecedor.
+
+    Atualizadas a cada laudo salvo (utils/spc.py), sem reler o histórico.
+    """
+    __tablename__ = 'spc_statistics'
+    __table_args__ = (
+        db.UniqueConstraint('raw_material_type', 'supplier', 'metric', name='uq_spc_statistics_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    raw_material_type = db.Column(db.String(100), nullable=False, default='')
+    supplier = db.Column(db.String(150), nullable=False, default='')
+    metric = db.Column(db.String(30), nullable=False)  # lab_brix, lab_ph, lab_acidity, brix, ph, acidity
+    
+    # Medidas individuais: média e variância pelo algoritmo de Welford
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0.0)
+    m2 = db.Column(db.Float, nullable=False, default=0.0)  # Soma dos quadrados dos desvios
+    
+    # EWMA da medida e CUSUM tabular (em desvios padrão)
+    ewma = db.Column(db.Float, nullable=True)
+    cusum_high = db.Column(db.Float, nullable=False, default=0.0)
+    cusum_low = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Carta X̄/R: média das médias e soma das amplitudes dos subgrupos fechados
+    subgroup_count = db.Column(db.Integer, nullable=False, default=0)
+    grand_mean = db.Column(db.Float, nullable=False, default=0.0)
+    range_sum = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Estado limitado em JSON: subgrupo aberto, últimos pontos e subgrupos recentes
+    open_subgroup = db.Column(db.Text, nullable=True)  # [[report_id, valor], ...]
+    recent_points = db.Column(db.Text, nullable=True)  # [[report_id, valor, z, [regras]], ...]
+    history = db.Column(db.Text, nullable=True)  # [{'reports', 'mean', 'range', 'closed_at', 'violations'}, ...]
+    
+    last_report_id = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SpcStatistic {self.metric} {self.raw_material_type}/{self.supplier}>"
+    
+    @property
+    def std_dev(self):
+        """Desvio padrão amostral das medidas individuais."""
+        if self.count < 2:
+            return 0.0
+        return (max(self.m2, 0.0) / (self.count - 1)) ** 0.5
+    
+    def get_json(self, field, default=None):
+        """Lê um dos campos JSON (open_subgroup, recent_points, history)."""
+        value = getattr(self, field)
+        return json.loads(value) if value else (default if default is not None else [])
+    
+    def to_dict(self):
+        """Converte as estatísticas para dicionário."""
+        return {
+            'id': self.id,
+            'raw_material_type': self.raw_material_type,
+            'supplier': self.supplier,
+            'metric': self.metric,
+            'count': self.count,
+            'mean': self.mean,
+            'std_dev': self.std_dev,
+            'ewma': self.ewma,
+            'cusum_high': self.cusum_high,
+            'cusum_low': self.cusum_low,
+            'subgroup_count': self.subgroup_count,
+            'grand_mean': self.grand_mean,
+            'mean_range': self.range_sum / self.subgroup_count if self.subgroup_count else None,
+            'last_report_id': self.last_report_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class SupplierScorecard(db.Model):
+    """
+    Indicadores de qualidade de um fornecedor em um mês, mantidos de forma
+    incremental a cada laudo salvo (utils/scorecards.py).
+
+    Guarda somas (não médias) para que inclusões, correções e exclusões de
+    laudos possam ser somadas ou subtraídas sem reler o histórico.
+    """
+    __tablename__ = 'supplier_scorecards'
+    __table_args__ = (
+        db.UniqueConstraint('supplier', 'month', name='uq_supplier_scorecards_month'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    supplier = db.Column(db.String(150), nullable=False, index=True)
+    month = db.Column(db.Date, nullable=False, index=True)  # Primeiro dia do mês
+    report_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Diferença entre o valor declarado pelo fornecedor e o medido no laboratório
+    brix_pairs = db.Column(db.Integer, nullable=False, default=0)
+    brix_dev_sum = db.Column(db.Float, nullable=False, default=0.0)
+    brix_dev_sq_sum = db.Column(db.Float, nullable=False, default=0.0)
+    ph_pairs = db.Column(db.Integer, nullable=False, default=0)
+    ph_dev_sum = db.Column(db.Float, nullable=False, default=0.0)
+    ph_dev_sq_sum = db.Column(db.Float, nullable=False, default=0.0)
+    acidity_pairs = db.Column(db.Integer, nullable=False, default=0)
+    acidity_dev_sum = db.Column(db.Float, nullable=False, default=0.0)
+    acidity_dev_sq_sum = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Validação físico-química ('ok' ou 'não padrão')
+    validated_count = db.Column(db.Integer, nullable=False, default=0)
+    nonconforming_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Pontualidade: laudos com prazo e entregues até o prazo
+    due_count = db.Column(db.Integer, nullable=False, default=0)
+    on_time_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SupplierScorecard {self.supplier} {self.month:%Y-%m}>"
+
+
+class VersionChainEntry(db.Model):
+    """
+    Posição de um registro versionado (Report, TechnicalDocument) em sua
+    linhagem de versões.
+
+    A linhagem é identificada pelo id da primeira versão (raiz da cadeia de
+    parent_id) e is_latest marca a versão atual. Mantida a cada gravação
+    (utils/version_chain.py), permite ler o histórico completo ou filtrar as
+    versões atuais com uma consulta indexada.
+    """
+    __tablename__ = 'version_chain_entries'
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', name='uq_version_chain_entity'),
+        db.Index('ix_version_chain_lineage', 'entity_type', 'lineage_id', 'version'),
+        db.Index('ix_version_chain_latest', 'entity_type', 'is_latest'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)  # Report, TechnicalDocument
+    entity_id = db.Column(db.Integer, nullable=False)
+    lineage_id = db.Column(db.Integer, nullable=False)  # id da primeira versão
+    version = db.Column(db.Integer, nullable=False, default=1)
+    is_latest = db.Column(db.Boolean, nullable=False, default=False)
+    
+    def __repr__(self):
+        return f"<VersionChainEntry {self.entity_type} {self.entity_id} (linhagem {self.lineage_id}, v{self.version})>"
+
+
+class DocumentCounter(db.Model):
+    """
+    Contagem de documentos técnicos por dimensão (total, tipo, status,
+    categoria ou dia de envio) e valor.
+
+    Mantida a cada gravação (utils/document_counters.py) e conferida
+    periodicamente com as contagens reais; as páginas de estatísticas leem
+    estas linhas em vez de agrupar a tabela de documentos.
+    """
+    __tablename__ = 'document_counters'
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'bucket', name='uq_document_counters_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(20), nullable=False)  # total, type, status, category, day
+    bucket = db.Column(db.String(50), nullable=False, default='')  # Valor da dimensão (dia em AAAA-MM-DD)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<DocumentCounter {self.dimension}={self.bucket}: {self.count}>"
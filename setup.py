@@ -45,6 +45,7 @@ requirements = [
     'matplotlib',
     'numpy',
     'pandas',
+    'pyarrow',
     'openpyxl',
     'pillow',
     'pypdf2',
@@ -0,0 +1,150 @@
+/**
+ * Upload em partes (retomável) para arquivos grandes.
+ *
+ * Uso: adicionar data-chunked-upload ao <input type="file">. Arquivos acima de
+ * data-chunked-threshold (bytes) são enviados em blocos para /uploads/chunked
+ * antes do envio do formulário, que segue apenas com o campo upload_id.
+ * Se a conexão cair, um novo envio do mesmo arquivo continua de onde parou.
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(setupChunkedUpload);
+});
+
+const CHUNKED_UPLOAD_URL = '/uploads/chunked';
+const CHUNKED_MAX_RETRIES = 5;
+
+function getCsrfToken() {
+    const meta = document.querySelector('meta[name="csrf-token"]');
+    return meta ? meta.getAttribute('content') : '';
+}
+
+/**
+ * Chave local que identifica o arquivo para retomar a sessão
+ */
+function chunkedStorageKey(file) {
+    return `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function chunkedRequest(method, url, body, contentType) {
+    const headers = { 'X-CSRFToken': getCsrfToken() };
+    if (contentType) {
+        headers['Content-Type'] = contentType;
+    }
+    const response = await fetch(url, { method: method, headers: headers, body: body, credentials: 'same-origin' });
+    const data = await response.json().catch(() => ({}));
+    return { ok: response.ok, status: response.status, data: data };
+}
+
+/**
+ * Retoma a sessão salva para o arquivo ou abre uma nova
+ */
+async function openChunkedSession(file) {
+    const key = chunkedStorageKey(file);
+    const savedId = localStorage.getItem(key);
+    if (savedId) {
+        const status = await chunkedRequest('GET', `${CHUNKED_UPLOAD_URL}/${savedId}`);
+        if (status.ok) {
+            return status.data;
+        }
+        localStorage.removeItem(key);
+    }
+
+    const created = await chunkedRequest(
+        'POST', CHUNKED_UPLOAD_URL,
+        JSON.stringify({ filename: file.name, size: file.size }),
+        'application/json'
+    );
+    if (!created.ok) {
+        throw new Error(created.data.message || 'Não foi possível iniciar o envio do arquivo');
+    }
+    localStorage.setItem(key, created.data.upload_id);
+    return created.data;
+}
+
+async function uploadInChunks(file, onProgress) {
+    let session = await openChunkedSession(file);
+    let received = session.received;
+    let retries = 0;
+
+    while (received < file.size) {
+        const blob = file.slice(received, Math.min(received + session.chunk_size, file.size));
+        let result;
+        try {
+            result = await chunkedRequest(
+                'PUT', `${CHUNKED_UPLOAD_URL}/${session.upload_id}?offset=${received}`,
+                blob, 'application/octet-stream'
+            );
+        } catch (error) {
+            result = { ok: false, status: 0, data: {} };
+        }
+
+        if (result.ok) {
+            received = result.data.received;
+            retries = 0;
+            onProgress(received / file.size);
+            continue;
+        }
+
+        // Falha de rede ou deslocamento divergente: consultar o servidor e continuar
+        if (++retries > CHUNKED_MAX_RETRIES) {
+            throw new Error(result.data.message || 'Falha no envio do arquivo');
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+        const status = await chunkedRequest('GET', `${CHUNKED_UPLOAD_URL}/${session.upload_id}`);
+        if (!status.ok) {
+            throw new Error(status.data.message || 'Sessão de envio expirada');
+        }
+        received = status.data.received;
+    }
+
+    localStorage.removeItem(chunkedStorageKey(file));
+    return session.upload_id;
+}
+
+function setupChunkedUpload(input) {
+    const form = input.form;
+    const threshold = parseInt(input.dataset.chunkedThreshold || '0', 10);
+    if (!form) {
+        return;
+    }
+
+    const hidden = document.createElement('input');
+    hidden.type = 'hidden';
+    hidden.name = 'upload_id';
+    form.appendChild(hidden);
+
+    const progress = document.createElement('div');
+    progress.className = 'progress mt-2 d-none';
+    progress.innerHTML = '<div class="progress-bar progress-bar-striped progress-bar-animated" role="progressbar" style="width: 0%"></div>';
+    (input.closest('.input-group') || input).insertAdjacentElement('afterend', progress);
+    const bar = progress.querySelector('.progress-bar');
+
+    input.addEventListener('change', function() {
+        hidden.value = '';
+    });
+
+    // Fase de captura: precisa rodar antes dos demais tratadores de envio
+    form.addEventListener('submit', async function(event) {
+        const file = input.files[0];
+        if (!file || file.size <= threshold || hidden.value || !form.checkValidity()) {
+            return;
+        }
+
+        event.preventDefault();
+        event.stopImmediatePropagation();
+        progress.classList.remove('d-none');
+        try {
+            hidden.value = await uploadInChunks(file, function(fraction) {
+                bar.style.width = `${Math.round(fraction * 100)}%`;
+                bar.textContent = `${Math.round(fraction * 100)}%`;
+            });
+            // O arquivo já está no servidor: enviar o formulário sem ele
+            input.value = '';
+            form.submit();
+        } catch (error) {
+            progress.classList.add('d-none');
+            alert(error.message);
+        }
+    }, true);
+}
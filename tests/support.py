@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Apoio comum aos testes do Zelopack
+
+Prepara um banco SQLite temporário antes de importar a aplicação (o banco
+de desenvolvimento nunca é tocado) e oferece atalhos para criar usuários e
+autenticar o cliente de testes.
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_db_fd, DB_PATH = tempfile.mkstemp(prefix='zelopack_tests_', suffix='.db')
+os.close(_db_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+atexit.register(lambda: os.path.exists(DB_PATH) and os.remove(DB_PATH))
+
+# A aplicação precisa ser importada antes dos modelos (import circular);
+# main registra também a rota 'index' usada por base.html
+from main import app, db  # noqa: E402
+from models import Report, User  # noqa: E402
+
+app.config['TESTING'] = True
+app.config['WTF_CSRF_ENABLED'] = False
+
+# Arquivos enviados durante os testes ficam fora do diretório do projeto
+UPLOAD_DIR = tempfile.mkdtemp(prefix='zelopack_uploads_')
+app.config['UPLOAD_FOLDER'] = UPLOAD_DIR
+atexit.register(shutil.rmtree, UPLOAD_DIR, True)
+
+
+def create_user(username, role='analista'):
+    """
+    Cria (ou reaproveita) um usuário de teste.
+
+    Args:
+        username: Nome de usuário (também usado no e-mail)
+        role: Perfil do usuário (admin, analista, gestor)
+
+    Returns:
+        int: ID do usuário
+    """
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            user = User(
+                username=username,
+                email=f'{username}@teste.local',
+                name=username.title(),
+                role=role
+            )
+            user.set_password('senha-de-teste')
+            db.session.add(user)
+            db.session.commit()
+        return user.id
+
+
+def login(client, user_id):
+    """Autentica o cliente de testes como o usuário informado."""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def make_report(session, **fields):
+    """
+    Adiciona à sessão um laudo com os campos obrigatórios preenchidos.
+
+    Args:
+        session: Sessão SQLAlchemy (o laudo não é confirmado)
+        fields: Valores das colunas do laudo
+
+    Returns:
+        Report
+    """
+    values = {
+        'title': 'Laudo de teste',
+        'filename': 'laudo.pdf',
+        'original_filename': 'laudo.pdf',
+        'file_path': '/tmp/laudo.pdf',
+        'file_type': 'pdf',
+        'file_size': 1,
+    }
+    values.update(fields)
+    report = Report(**values)
+    session.add(report)
+    return report
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes dos snapshots analíticos (Parquet)
+
+Exporta os laudos para uma pasta temporária e confere a exportação
+incremental pela marca d'água (inclusive de transações confirmadas depois
+da exportação com data anterior à marca), a leitura da versão mais recente,
+a compactação, a troca da pasta na exportação completa e a trava da pasta.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from support import app, db, make_report
+from models import Report
+from utils import analytics_snapshot
+
+SUPPLIER = 'Snapshot Fornecedor'
+
+
+class ReportSnapshotTest(unittest.TestCase):
+    """Exportação incremental da tabela de laudos."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+        self.old = datetime.utcnow() - timedelta(hours=2)
+        self.reports = [
+            make_report(db.session, supplier=SUPPLIER, updated_date=self.old, upload_date=self.old)
+            for _ in range(3)
+        ]
+        # Linha mais recente que define a marca d'água: a janela de releitura
+        # da exportação seguinte não alcança os laudos acima
+        self.marker = make_report(db.session, supplier=SUPPLIER, updated_date=self.old + timedelta(hours=1),
+                                  upload_date=self.old)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        self.ctx.pop()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _cleanup(self):
+        # Exclusão pelo ORM para manter os índices derivados dos laudos
+        for report in Report.query.filter_by(supplier=SUPPLIER):
+            db.session.delete(report)
+        db.session.commit()
+
+    def _export(self, **options):
+        return analytics_snapshot.export_snapshots(db.session, self.folder, tables=['reports'], **options)
+
+    def _exported_ids(self, latest=False):
+        frame = analytics_snapshot.load_snapshot(self.folder, 'reports', columns=['id', 'supplier'], latest=latest)
+        ids = frame[(frame['supplier'] == SUPPLIER) & (frame['id'] != self.marker.id)]['id']
+        return sorted(ids.tolist())
+
+    def _month_parts(self):
+        month = analytics_snapshot._partition(self.old)
+        partition_folder = os.path.join(self.folder, 'reports', f'{analytics_snapshot.PARTITION_FIELD}={month}')
+        return [f for f in os.listdir(partition_folder) if f.endswith('.parquet')]
+
+    def test_incremental_export_only_adds_changed_rows(self):
+        self._export()
+        ids = sorted(report.id for report in self.reports)
+        self.assertEqual(self._exported_ids(), ids)
+
+        changed = self.reports[1]
+        changed.title = 'Laudo revisado'
+        db.session.commit()
+        self._export()
+
+        self.assertEqual(self._exported_ids(), sorted(ids + [changed.id]))
+
+    def test_latest_keeps_one_version_per_id(self):
+        self._export()
+        self.reports[0].title = 'Laudo revisado'
+        db.session.commit()
+        self._export()
+
+        frame = analytics_snapshot.load_snapshot(self.folder, 'reports', columns=['id', 'title', 'supplier'])
+        frame = frame[(frame['supplier'] == SUPPLIER) & (frame['id'] != self.marker.id)]
+        self.assertEqual(list(frame.columns), ['id', 'title', 'supplier'])
+        self.assertEqual(sorted(frame['id']), sorted(report.id for report in self.reports))
+        titles = dict(zip(frame['id'], frame['title']))
+        self.assertEqual(titles[self.reports[0].id], 'Laudo revisado')
+        self.assertEqual(titles[self.reports[1].id], 'Laudo de teste')
+
+        with self.assertRaises(ValueError):
+            analytics_snapshot.load_snapshot(self.folder, 'reports', columns=['id', 'inexistente'])
+
+    def test_compact_keeps_data(self):
+        self._export()
+        self.reports[2].title = 'Laudo revisado'
+        db.session.commit()
+        self._export()
+        self.assertGreater(len(self._month_parts()), 1)
+
+        def latest():
+            frame = analytics_snapshot.load_snapshot(self.folder, 'reports')
+            return frame.sort_values('id').reset_index(drop=True)
+
+        before = latest()
+        self.assertGreaterEqual(analytics_snapshot.compact(self.folder, 'reports'), 1)
+        self.assertEqual(len(self._month_parts()), 1)
+        self.assertTrue(before.equals(latest()))
+        self.assertEqual(self._exported_ids(), sorted(report.id for report in self.reports))
+
+    def test_full_export_replaces_folder(self):
+        self._export()
+        self.reports[0].title = 'Laudo revisado'
+        db.session.commit()
+        self._export()
+        ids = sorted(report.id for report in self.reports)
+
+        # Falha no meio da exportação completa: a pasta anterior fica intacta
+        with mock.patch.object(analytics_snapshot, '_partition', side_effect=RuntimeError('falha')):
+            with self.assertRaises(RuntimeError):
+                self._export(full=True)
+        self.assertEqual(self._exported_ids(), sorted(ids + [self.reports[0].id]))
+        self.assertFalse(os.path.exists(os.path.join(self.folder, '.reports-full')))
+
+        self._export(full=True)
+        self.assertEqual(self._exported_ids(), ids)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, '.reports-full')))
+        self.assertEqual(len(self._month_parts()), 1)
+
+    def test_busy_folder_raises(self):
+        self._export()
+        watermark = analytics_snapshot.read_watermark(self.folder, 'reports')
+        lock_path = os.path.join(self.folder, analytics_snapshot.LOCK_FILE)
+        with open(lock_path, 'w') as f:
+            f.write('123')
+
+        self.reports[0].title = 'Laudo revisado'
+        db.session.commit()
+        with self.assertRaises(analytics_snapshot.SnapshotBusy):
+            self._export()
+        with self.assertRaises(analytics_snapshot.SnapshotBusy):
+            analytics_snapshot.compact(self.folder, 'reports')
+        self.assertTrue(os.path.exists(lock_path))
+        self.assertEqual(analytics_snapshot.read_watermark(self.folder, 'reports'), watermark)
+
+        # Trava abandonada é removida e a exportação segue
+        stale = os.path.getmtime(lock_path) - analytics_snapshot.LOCK_STALE_SECONDS - 1
+        os.utime(lock_path, (stale, stale))
+        self._export()
+        self.assertFalse(os.path.exists(lock_path))
+        self.assertIn(self.reports[0].id, self._exported_ids())
+        self.assertEqual(len(self._exported_ids()), 4)
+
+    def test_late_commit_before_watermark_is_exported(self):
+        self._export()
+        watermark = analytics_snapshot.read_watermark(self.folder, 'reports')['cursor']
+
+        # Gravado (flush) antes da exportação, confirmado depois dela
+        late = make_report(db.session, supplier=SUPPLIER,
+                           updated_date=datetime.fromisoformat(watermark[0]) - timedelta(minutes=5))
+        db.session.commit()
+        self._export()
+
+        self.assertIn(late.id, self._exported_ids(latest=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
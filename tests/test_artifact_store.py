@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do armazenamento de documentos gerados
+
+Verifica a expiração (TTL), o limite de espaço com remoção dos mais
+antigos, o isolamento entre usuários e o download do documento editado
+pela sessão.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from support import app, create_user, login
+from utils import artifact_store
+from utils.artifact_store import ArtifactStore
+
+
+class ArtifactStoreTest(unittest.TestCase):
+    """Coleta por idade e por espaço."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _artifact(self, store, owner_id, content=b'x', age=0):
+        artifact_id, path = store.create(owner_id, 'formulario.xlsx')
+        with open(path, 'wb') as f:
+            f.write(content)
+        if age:
+            mtime = time.time() - age
+            os.utime(os.path.dirname(path), (mtime, mtime))
+        return artifact_id, path
+
+    def test_expired_artifact_is_collected(self):
+        store = ArtifactStore(self.root, ttl=60)
+        old_id, old_path = self._artifact(store, 1, age=120)
+        new_id, new_path = self._artifact(store, 1)
+
+        self.assertIsNone(store.get_path(1, old_id))
+        self._artifact(store, 2, age=120)
+        self.assertEqual(store.collect_garbage(), 1)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(store.get_path(1, new_id), new_path)
+
+    def test_oldest_artifacts_evicted_over_max_bytes(self):
+        store = ArtifactStore(self.root, max_bytes=100, gc_interval=3600)
+        paths = [self._artifact(store, owner, b'x' * 60, age=age)[1]
+                 for owner, age in ((1, 30), (2, 20), (1, 10))]
+
+        self.assertEqual(store.collect_garbage(), 2)
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, True])
+
+    def test_artifacts_are_isolated_per_owner(self):
+        store = ArtifactStore(self.root)
+        artifact_id, path = self._artifact(store, 1)
+        self.assertEqual(store.get_path(1, artifact_id), path)
+        self.assertIsNone(store.get_path(2, artifact_id))
+        self.assertIsNone(store.get_path(1, '../2/' + artifact_id))
+
+        store.delete(2, artifact_id)
+        self.assertTrue(os.path.exists(path))
+
+
+class EditedDownloadTest(unittest.TestCase):
+    """Download do documento editado guardado na sessão."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.owner_id = create_user('artefato_dono')
+        cls.other_id = create_user('artefato_outro')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = ArtifactStore(self.root)
+        patcher = mock.patch.object(artifact_store, '_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.artifact_id, path = self.store.create(self.owner_id, 'edited_ficha.xlsx')
+        with open(path, 'wb') as f:
+            f.write(b'conteudo editado')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _download(self, user_id):
+        client = app.test_client()
+        login(client, user_id)
+        with client.session_transaction() as session:
+            session['edited_artifact'] = self.artifact_id
+        return client.get('/forms/editor/api/download-edited')
+
+    def test_owner_downloads_artifact(self):
+        response = self._download(self.owner_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), b'conteudo editado')
+        self.assertIn('edited_ficha.xlsx', response.headers['Content-Disposition'])
+
+    def test_other_user_cannot_fetch_artifact(self):
+        response = self._download(self.other_id)
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(b'conteudo editado', response.get_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da gravação paralela dos ZIPs de backup
+
+Os arquivos gravados em blocos comprimidos em paralelo devem formar um ZIP
+válido (testzip) com o mesmo conteúdo dos originais, e crc32_combine deve
+coincidir com o CRC calculado de uma vez. Os uploads do backup deixam de
+fora as pastas geradas ou temporárias.
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+import zipfile
+import zlib
+from types import SimpleNamespace
+from unittest import mock
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils import backup_archiver  # noqa: E402
+from utils.backup_archiver import collect_tree, crc32_combine, write_archive  # noqa: E402
+from utils.backup_manager import BackupManager  # noqa: E402
+
+
+class Crc32CombineTest(unittest.TestCase):
+    """CRC da concatenação a partir dos CRCs das partes."""
+
+    def test_matches_zlib(self):
+        rng = random.Random(50)
+        for length in (0, 1, 7, 64, 1000, 4096):
+            data = bytes(rng.randrange(256) for _ in range(length))
+            for split in sorted({0, length // 3, length}):
+                first, second = data[:split], data[split:]
+                with self.subTest(length=length, split=split):
+                    self.assertEqual(
+                        crc32_combine(zlib.crc32(first), zlib.crc32(second), len(second)),
+                        zlib.crc32(data)
+                    )
+
+
+class WriteArchiveTest(unittest.TestCase):
+    """ZIP gravado em blocos paralelos."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, 'origem')
+        os.makedirs(os.path.join(self.source, 'sub'))
+        rng = random.Random(50)
+        self.files = {
+            'texto.csv': ('lote;brix\n' * 5000).encode('utf-8'),
+            'vazio.txt': b'',
+            'sub/laudo.pdf': bytes(rng.randrange(256) for _ in range(30000)),
+            'sub/dump.sql': b'PGDMP' + bytes(rng.randrange(256) for _ in range(20000)),
+        }
+        for name, content in self.files.items():
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(content)
+        self.output = os.path.join(self.tmp_dir, 'backup.zip')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, members=None, **options):
+        members = members if members is not None else collect_tree(self.source, 'uploads')
+        # Blocos pequenos: cada arquivo passa por vários trechos deflate e CRCs combinados
+        with mock.patch.object(backup_archiver, 'CHUNK_SIZE', 4096):
+            return write_archive(self.output, members, workers=3, **options)
+
+    def test_archive_is_valid_and_identical(self):
+        progress = []
+        result = self._write(progress=progress.append, report_every=0)
+
+        with zipfile.ZipFile(self.output) as zipf:
+            self.assertIsNone(zipf.testzip())
+            for name, content in self.files.items():
+                self.assertEqual(zipf.read(f'uploads/{name}'), content)
+            types = {info.filename: info.compress_type for info in zipf.infolist()}
+
+        self.assertEqual(types['uploads/texto.csv'], zipfile.ZIP_DEFLATED)
+        self.assertEqual(types['uploads/sub/laudo.pdf'], zipfile.ZIP_STORED)
+        self.assertEqual(types['uploads/sub/dump.sql'], zipfile.ZIP_STORED)
+        self.assertEqual(result['files_done'], 4)
+        self.assertEqual(result['stored_files'], 2)
+        self.assertEqual(result['bytes_done'], sum(len(c) for c in self.files.values()))
+        self.assertEqual(progress[-1]['percent'], 100.0)
+
+    def test_unreadable_file_is_skipped(self):
+        read_chunk = backup_archiver._read_chunk
+
+        def failing(path, offset, *args):
+            if path.endswith('texto.csv') and offset > 0:
+                raise OSError('arquivo removido durante o backup')
+            return read_chunk(path, offset, *args)
+
+        members = collect_tree(self.source, 'uploads') + [(os.path.join(self.source, 'inexistente'), 'x')]
+        with mock.patch.object(backup_archiver, '_read_chunk', failing):
+            result = self._write(members)
+
+        self.assertEqual(result['skipped'], ['uploads/texto.csv'])
+        with zipfile.ZipFile(self.output) as zipf:
+            self.assertIsNone(zipf.testzip())
+            self.assertEqual(sorted(zipf.namelist()),
+                             ['uploads/sub/dump.sql', 'uploads/sub/laudo.pdf', 'uploads/vazio.txt'])
+
+    def test_collect_tree_excludes_folders(self):
+        members = collect_tree(self.source, 'uploads', exclude=[os.path.join(self.source, 'sub')])
+        self.assertEqual([arcname for _, arcname in members], ['uploads/texto.csv', 'uploads/vazio.txt'])
+
+
+class UploadSourcesTest(unittest.TestCase):
+    """Arquivos de upload incluídos no backup."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        upload_dir = os.path.join(self.tmp_dir, 'uploads')
+        for name in ('laudo.pdf', 'artifacts/1/job/relatorio.xlsx', 'previews/ab/laudo.png',
+                     'chunked/abc.part', 'chunked/abc.json', 'forms/ficha.xlsx'):
+            path = os.path.join(upload_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x')
+        self.app = SimpleNamespace(instance_path=os.path.join(self.tmp_dir, 'instance'), config={
+            'UPLOAD_FOLDER': upload_dir,
+            'ARTIFACT_FOLDER': os.path.join(upload_dir, 'artifacts'),
+            'PREVIEW_CACHE_FOLDER': os.path.join(upload_dir, 'previews'),
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_generated_and_partial_uploads_are_excluded(self):
+        members = BackupManager(self.app)._upload_sources()
+        self.assertEqual([arcname for _, arcname in members], ['uploads/laudo.pdf', 'uploads/forms/ficha.xlsx'])
+
+
+if __name__ == '__main__':
+    unittest.main()
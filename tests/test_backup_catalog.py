@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do catálogo de backups
+
+Verifica a catalogação (por record() e por varredura da pasta), a
+verificação contra o SHA-256 e o manifesto, a detecção de ZIPs alterados e
+a remoção de entradas.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils.backup_catalog import CATALOG_FILE, MANIFEST_SUFFIX, BackupCatalog  # noqa: E402
+
+
+class BackupCatalogTest(unittest.TestCase):
+    """Catálogo em uma pasta temporária de backups."""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.catalog = BackupCatalog(self.backup_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.backup_dir, ignore_errors=True)
+
+    def _make_zip(self, name, files, created_at='2024-01-01T00:00:00'):
+        path = os.path.join(self.backup_dir, name)
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for member, content in files.items():
+                zipf.writestr(member, content)
+            zipf.writestr('backup_info.json', json.dumps({'name': name[:-4], 'created_at': created_at}))
+        return path
+
+    def test_record_and_entries(self):
+        older = self._make_zip('antigo.zip', {'a.txt': 'a'}, created_at='2024-01-01T00:00:00')
+        newer = self._make_zip('novo.zip', {'a.txt': 'a', 'b.txt': 'bb'}, created_at='2024-02-01T00:00:00')
+        self.catalog.record(newer, {'name': 'novo', 'created_at': '2024-02-01T00:00:00'}, timings={'zip': 0.1})
+
+        entries = self.catalog.entries()
+        # O ZIP sem registro é catalogado na listagem
+        self.assertEqual([e['file_name'] for e in entries], ['novo.zip', 'antigo.zip'])
+        self.assertEqual(entries[0]['file_count'], 3)
+        self.assertEqual(entries[0]['timings'], {'zip': 0.1})
+        self.assertIsNone(entries[1]['sha256'])
+        self.assertEqual(entries[1]['info']['name'], 'antigo')
+        self.assertTrue(os.path.exists(older + MANIFEST_SUFFIX))
+        self.assertEqual(self.catalog.get('novo.zip')['size'], os.path.getsize(newer))
+
+    def test_listing_does_not_reopen_cataloged_zips(self):
+        self._make_zip('backup.zip', {'a.txt': 'a'})
+        self.catalog.entries()
+
+        with mock.patch('zipfile.ZipFile', side_effect=AssertionError('ZIP aberto na listagem')):
+            self.assertEqual(len(self.catalog.entries()), 1)
+
+    def test_verify_ok(self):
+        path = self._make_zip('backup.zip', {'a.txt': 'a' * 1000})
+        self.catalog.record(path, {'name': 'backup'})
+
+        result = self.catalog.verify('backup.zip', deep=True)
+        self.assertEqual(result['status'], 'ok', result['problems'])
+        self.assertEqual(self.catalog.get('backup.zip')['verification']['status'], 'ok')
+        self.assertEqual(self.catalog.due_for_verification(7), [])
+
+    def test_modified_zip_fails_verification(self):
+        path = self._make_zip('backup.zip', {'a.txt': 'a', 'b.txt': 'b'})
+        self.catalog.record(path, {'name': 'backup'})
+        os.utime(path, (0, 0))
+
+        # Mesmo nome, conteúdo diferente (arquivo trocado depois de catalogado)
+        self._make_zip('backup.zip', {'a.txt': 'alterado', 'c.txt': 'c'})
+        entries = self.catalog.entries()
+        self.assertEqual(len(entries), 1)
+        self.assertIsNone(entries[0]['verification'])
+
+        result = self.catalog.verify('backup.zip')
+        self.assertEqual(result['status'], 'falha')
+        problems = '\n'.join(result['problems'])
+        self.assertIn('SHA-256', problems)
+        self.assertIn('Arquivo ausente: b.txt', problems)
+        self.assertIn('Arquivo alterado: a.txt', problems)
+        self.assertIn('Arquivo não registrado: c.txt', problems)
+        self.assertEqual(self.catalog.due_for_verification(7), [])
+
+    def test_corrupted_member_fails_deep_verification(self):
+        path = self._make_zip('backup.zip', {'a.txt': 'conteúdo ' * 200})
+        self.catalog.record(path, {'name': 'backup'})
+        with zipfile.ZipFile(path) as zipf:
+            offset = zipf.getinfo('a.txt').header_offset + 40
+        with open(path, 'r+b') as f:
+            f.seek(offset)
+            byte = f.read(1)
+            f.seek(offset)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        self.assertEqual(self.catalog.verify('backup.zip', deep=True)['status'], 'falha')
+
+    def test_remove_and_deleted_files(self):
+        first = self._make_zip('um.zip', {'a.txt': 'a'})
+        second = self._make_zip('dois.zip', {'a.txt': 'a'})
+        self.catalog.record(first, {'name': 'um'})
+        self.catalog.record(second, {'name': 'dois'})
+
+        os.remove(first)
+        self.catalog.remove('um.zip')
+        self.assertIsNone(self.catalog.get('um.zip'))
+        self.assertFalse(os.path.exists(first + MANIFEST_SUFFIX))
+
+        # ZIP apagado por fora: a entrada some na próxima listagem
+        os.remove(second)
+        self.assertEqual(self.catalog.entries(), [])
+        self.assertFalse(os.path.exists(second + MANIFEST_SUFFIX))
+
+    def test_unreadable_catalog_is_rebuilt(self):
+        self._make_zip('backup.zip', {'a.txt': 'a'})
+        with open(os.path.join(self.backup_dir, CATALOG_FILE), 'w') as f:
+            f.write('{corrompido')
+        self.assertEqual([e['file_name'] for e in self.catalog.entries()], ['backup.zip'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do preenchimento em lote de formulários
+
+Cobre a leitura do CSV, o mapeamento de colunas, a geração do ZIP e a
+distinção entre falhas de uma linha (contadas no trabalho) e erros na
+gravação do resultado (que abortam o lote).
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import openpyxl
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils.artifact_store import ArtifactStore  # noqa: E402
+from utils.batch_fill import (  # noqa: E402
+    BatchFillError, BatchFillManager, STATUS_DONE, STATUS_FAILED,
+    build_column_map, parse_csv_rows, prepare_job
+)
+
+FIELDS = [{'id': 'cell_2_2', 'name': 'Lote'}, {'id': 'cell_3_2', 'name': 'Produto'}]
+
+
+class CsvParsingTest(unittest.TestCase):
+    """Leitura do CSV e associação de colunas aos campos."""
+
+    def test_semicolon_and_bom(self):
+        rows = parse_csv_rows('﻿Lote;Produto\nL1;Suco\n;\nL2;Néctar\n'.encode('utf-8'))
+        self.assertEqual(rows, [{'Lote': 'L1', 'Produto': 'Suco'}, {'Lote': 'L2', 'Produto': 'Néctar'}])
+
+    def test_column_map(self):
+        column_map, ignored = build_column_map(['lote', 'C4', 'cell_3_2', 'Outro'], FIELDS, '.xlsx')
+        self.assertEqual(column_map, {'lote': 'cell_2_2', 'C4': 'cell_4_3', 'cell_3_2': 'cell_3_2'})
+        self.assertEqual(ignored, ['Outro'])
+
+    def test_validation(self):
+        with self.assertRaises(BatchFillError):
+            prepare_job(1, 'modelo.xlsx', b'Outro\nx\n', FIELDS)
+        with self.assertRaises(BatchFillError):
+            prepare_job(1, 'modelo.xlsx', b'Lote\n', FIELDS)
+        with self.assertRaises(BatchFillError):
+            prepare_job(1, 'modelo.xlsx', b'Lote\nL1\nL2\n', FIELDS, max_rows=1)
+        with self.assertRaises(BatchFillError):
+            prepare_job(1, 'modelo.xlsx', b'Lote\nL1\n', FIELDS, output_format='pdf')
+
+
+class BatchFillManagerTest(unittest.TestCase):
+    """Execução de trabalhos (síncrona, sem a thread do gerenciador)."""
+
+    CSV = b'Lote,Produto\nL1,Suco\nL2,Nectar\nL3,Refresco\n'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp_dir, 'modelo.xlsx')
+        workbook = openpyxl.Workbook()
+        workbook.active['A2'] = 'Lote:'
+        workbook.active['A3'] = 'Produto:'
+        workbook.save(self.template)
+        self.store = ArtifactStore(os.path.join(self.tmp_dir, 'artefatos'))
+        self.manager = BatchFillManager(self.store, max_workers=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_zip_with_one_copy_per_row(self):
+        job = prepare_job(7, self.template, self.CSV, FIELDS)
+        self.manager._run(job)
+
+        self.assertEqual(job.status, STATUS_DONE)
+        self.assertEqual((job.done, job.failed), (3, 0))
+        with zipfile.ZipFile(self.store.get_path(7, job.artifact_id)) as archive:
+            names = sorted(archive.namelist())
+            self.assertEqual(names, ['1_modelo.xlsx', '2_modelo.xlsx', '3_modelo.xlsx'])
+            sheet = openpyxl.load_workbook(io.BytesIO(archive.read('2_modelo.xlsx'))).active
+            self.assertEqual((sheet['B2'].value, sheet['B3'].value), ('L2', 'Nectar'))
+
+    def test_row_failures_are_counted(self):
+        with open(self.template, 'wb') as f:
+            f.write(b'modelo corrompido')
+        job = prepare_job(7, self.template, self.CSV, FIELDS)
+        self.manager._run(job)
+
+        self.assertEqual(job.status, STATUS_FAILED)
+        self.assertEqual((job.done, job.failed), (0, 3))
+        self.assertEqual(len(job.errors), 3)
+
+    def test_writer_error_aborts_batch(self):
+        job = prepare_job(7, self.template, self.CSV, FIELDS)
+        parent = os.getpid()
+        writestr = zipfile.ZipFile.writestr
+
+        def failing_writestr(archive, *args, **kwargs):
+            # Os processos do pool também gravam xlsx (ZIP); só o lote falha
+            if os.getpid() == parent:
+                raise OSError('disco cheio')
+            return writestr(archive, *args, **kwargs)
+
+        with mock.patch.object(zipfile.ZipFile, 'writestr', failing_writestr):
+            self.manager._run(job)
+
+        self.assertEqual(job.status, STATUS_FAILED)
+        self.assertEqual(job.failed, 0)
+        self.assertEqual(job.errors, [])
+        self.assertIn('disco cheio', job.message)
+        self.assertIsNone(job.artifact_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do histórico de cálculos
+
+Verifica a gravação em lote, o registro feito pelas APIs de cálculo e o
+isolamento do histórico entre usuários na exportação CSV.
+"""
+
+import json
+import unittest
+from datetime import datetime
+
+from support import app, db, create_user, login
+from models import HistoricoCalculo
+from utils.calculation_history import get_history_writer, record_calculation
+
+
+class CalculationHistoryTest(unittest.TestCase):
+    """Testes do gravador e das rotas do histórico."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.analyst_id = create_user('historico_analista')
+        cls.other_id = create_user('historico_outro')
+        cls.admin_id = create_user('historico_admin', role='admin')
+
+    def setUp(self):
+        with app.app_context():
+            HistoricoCalculo.query.delete()
+            db.session.commit()
+
+    def _rows(self, **filters):
+        with app.app_context():
+            return HistoricoCalculo.query.filter_by(**filters).all()
+
+    def test_batch_flush_writes_all_rows(self):
+        """Registros enfileirados são gravados em lote pelo flush."""
+        writer = get_history_writer(app)
+        for index in range(5):
+            writer.enqueue({
+                'tipo_calculo': 'densidade',
+                'usuario_id': self.analyst_id,
+                'dados': json.dumps({'i': index}),
+                'criado_em': datetime.utcnow()
+            })
+        # A thread em segundo plano pode ter gravado parte do lote antes
+        writer.flush()
+        self.assertEqual(writer.pending(), 0)
+        rows = self._rows(tipo_calculo='densidade')
+        self.assertEqual(sorted(json.loads(row.dados)['i'] for row in rows), list(range(5)))
+
+    def test_testing_mode_writes_synchronously(self):
+        record_calculation(app, 'acidez', {'resultado': 1.5}, usuario_id=self.analyst_id)
+        rows = self._rows(tipo_calculo='acidez')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(json.loads(rows[0].dados), {'resultado': 1.5})
+
+    def test_calculation_api_records_history(self):
+        client = app.test_client()
+        login(client, self.analyst_id)
+        response = client.post('/calculos/api/calcular/ratio', json={'brix': 12, 'acidez': 1})
+        self.assertEqual(response.status_code, 200)
+
+        rows = self._rows(tipo_calculo='ratio')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0].usuario_id, self.analyst_id)
+        self.assertEqual(json.loads(rows[0].dados)['brix'], 12.0)
+
+    def test_export_only_lists_own_history(self):
+        record_calculation(app, 'ratio', {'marca': 'proprio'}, usuario_id=self.analyst_id)
+        record_calculation(app, 'ratio', {'marca': 'alheio'}, usuario_id=self.other_id)
+
+        client = app.test_client()
+        login(client, self.analyst_id)
+        content = client.get('/calculos/historico/exportar').get_data(as_text=True)
+        self.assertIn('proprio', content)
+        self.assertNotIn('alheio', content)
+
+        login(client, self.admin_id)
+        content = client.get(f'/calculos/historico/exportar?user={self.other_id}').get_data(as_text=True)
+        self.assertIn('alheio', content)
+        self.assertNotIn('proprio', content)
+
+    def test_history_page_renders(self):
+        record_calculation(app, 'ratio', {'resultado': {'ratio': 12}}, usuario_id=self.analyst_id)
+        client = app.test_client()
+        login(client, self.analyst_id)
+        response = client.get('/calculos/historico?type=ratio')
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
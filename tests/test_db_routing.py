@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do roteamento de leituras para a réplica
+
+Usa uma aplicação mínima com dois arquivos SQLite (primário e réplica) com
+conteúdos diferentes, de modo que o resultado de cada consulta revela de
+onde ela foi lida.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.orm import DeclarativeBase
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils import db_routing  # noqa: E402
+from utils.db_routing import REPLICA_BIND, RoutingSession, engine_options  # noqa: E402
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+
+
+class Item(db.Model):
+    __tablename__ = 'itens'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+
+
+def _names():
+    return sorted(item.name for item in Item.query.all())
+
+
+def create_app(tmp_dir):
+    app = Flask(__name__)
+    primary = os.path.join(tmp_dir, 'primario.db')
+    replica = os.path.join(tmp_dir, 'replica.db')
+    app.config.update(
+        SECRET_KEY='teste',
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}',
+        SQLALCHEMY_ENGINE_OPTIONS=engine_options(f'sqlite:///{primary}'),
+        SQLALCHEMY_BINDS={REPLICA_BIND: dict(engine_options(f'sqlite:///{replica}'), url=f'sqlite:///{replica}')},
+        DB_REPLICA_ENDPOINTS=['leitura*'],
+        DB_REPLICA_STICKY_SECONDS=10,
+    )
+    db.init_app(app)
+    db_routing.init_app(app, db)
+
+    @app.route('/leitura')
+    def leitura():
+        return jsonify(_names())
+
+    @app.route('/outra')
+    def outra():
+        return jsonify(_names())
+
+    @app.route('/leitura-apos-gravar', methods=['POST'])
+    def leitura_apos_gravar():
+        db.session.add(Item(name='novo'))
+        db.session.flush()
+        names = _names()
+        db.session.rollback()
+        return jsonify(names)
+
+    @app.route('/gravar', methods=['POST'])
+    def gravar():
+        db.session.add(Item(name='gravado'))
+        db.session.commit()
+        return jsonify(True)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Item(name='primario'))
+        db.session.commit()
+        with db.engines[REPLICA_BIND].begin() as conn:
+            conn.execute(text('CREATE TABLE itens (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL)'))
+            conn.execute(text("INSERT INTO itens (name) VALUES ('replica')"))
+    return app
+
+
+class ReplicaRoutingTest(unittest.TestCase):
+    """Leituras das rotas configuradas vão para a réplica."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app(self.tmp_dir)
+
+    def tearDown(self):
+        with self.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_configured_endpoint_reads_replica(self):
+        client = self.app.test_client()
+        self.assertEqual(client.get('/leitura').get_json(), ['replica'])
+        self.assertEqual(client.get('/outra').get_json(), ['primario'])
+
+    def test_tables_written_in_request_read_primary(self):
+        response = self.app.test_client().post('/leitura-apos-gravar')
+        self.assertEqual(response.get_json(), ['novo', 'primario'])
+
+    def test_user_reads_own_writes_from_primary(self):
+        writer = self.app.test_client()
+        writer.post('/gravar')
+        self.assertEqual(writer.get('/leitura').get_json(), ['gravado', 'primario'])
+
+        # Outros usuários continuam lendo da réplica
+        self.assertEqual(self.app.test_client().get('/leitura').get_json(), ['replica'])
+
+    def test_sticky_window_expires(self):
+        self.app.config['DB_REPLICA_STICKY_SECONDS'] = -1
+        writer = self.app.test_client()
+        writer.post('/gravar')
+        self.assertEqual(writer.get('/leitura').get_json(), ['replica'])
+
+    def test_outside_request_uses_primary(self):
+        with self.app.app_context():
+            self.assertEqual(_names(), ['primario'])
+
+
+class EngineOptionsTest(unittest.TestCase):
+    """Opções do pool conforme o tipo de banco."""
+
+    def test_memory_sqlite_keeps_single_connection_pool(self):
+        self.assertEqual(engine_options('sqlite://'), {'pool_pre_ping': True})
+        self.assertEqual(engine_options('sqlite:///:memory:'), {'pool_pre_ping': True})
+
+    def test_pool_settings(self):
+        options = engine_options('postgresql://db/zelopack', pool_size=5, max_overflow=2,
+                                 pool_timeout=7, pool_recycle=60)
+        self.assertEqual(options, {
+            'pool_pre_ping': True, 'pool_size': 5, 'max_overflow': 2,
+            'pool_timeout': 7, 'pool_recycle': 60
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
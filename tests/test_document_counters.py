@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes dos contadores de documentos técnicos
+
+Os contadores mantidos a cada inclusão, alteração e exclusão devem
+coincidir com as contagens reais (actual_counts), sem nada a corrigir na
+reconciliação; gravações fora do ORM são corrigidas por reconcile().
+"""
+
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from support import app, db, create_user
+from models import DocumentCounter, TechnicalDocument
+from utils import document_counters
+
+TITLE = 'Contadores documento'
+TYPES = ('pop', 'ficha_tecnica', 'certificado')
+STATUSES = ('ativo', 'em_revisao', 'obsoleto')
+CATEGORIES = ('laboratorio', 'qualidade', None)
+
+
+def _stored():
+    return {
+        (row.dimension, row.bucket): row.count
+        for row in DocumentCounter.query.all()
+        if row.count
+    }
+
+
+def _actual():
+    return {key: value for key, value in document_counters.actual_counts(db.session).items() if value}
+
+
+class DocumentCountersTest(unittest.TestCase):
+    """Atualização incremental versus contagens reais."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.user_id = create_user('contadores_analista')
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+        document_counters.reconcile(db.session)
+        self.rng = random.Random(47)
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        document_counters.reconcile(db.session)
+        self.ctx.pop()
+
+    def _cleanup(self):
+        for document in TechnicalDocument.query.filter(TechnicalDocument.title.like(f'{TITLE}%')):
+            db.session.delete(document)
+        db.session.commit()
+
+    def _document(self):
+        document = TechnicalDocument(
+            title=f'{TITLE} {self.rng.randrange(10 ** 6)}',
+            document_type=self.rng.choice(TYPES),
+            category=self.rng.choice(CATEGORIES),
+            status=self.rng.choice(STATUSES),
+            upload_date=datetime(2024, 3, 1) + timedelta(days=self.rng.randrange(5)),
+            filename='doc.pdf', original_filename='doc.pdf', file_path='/tmp/doc.pdf',
+            file_type='pdf', file_size=1, uploaded_by=self.user_id
+        )
+        db.session.add(document)
+        return document
+
+    def assertMatchesActual(self):
+        self.assertEqual(_stored(), _actual())
+        self.assertEqual(document_counters.reconcile(db.session), 0)
+
+    def test_inserts_updates_and_deletes(self):
+        documents = [self._document() for _ in range(30)]
+        db.session.commit()
+        self.assertMatchesActual()
+
+        for document in documents[:10]:
+            document.status = self.rng.choice(STATUSES)
+            document.category = self.rng.choice(CATEGORIES)
+        db.session.commit()
+        # Alteração de atributo já expirado pelo commit anterior
+        documents[10].document_type = 'manual'
+        db.session.flush()
+        documents[10].upload_date = datetime(2024, 4, 1)
+        db.session.commit()
+        for document in documents[20:]:
+            db.session.delete(document)
+        db.session.commit()
+
+        self.assertMatchesActual()
+        self.assertEqual(document_counters.count(db.session, 'type', 'manual'), _actual()[('type', 'manual')])
+
+    def test_rollback_discards_pending_changes(self):
+        self._document()
+        db.session.flush()
+        db.session.rollback()
+        self.assertMatchesActual()
+
+    def test_reconcile_fixes_bulk_changes(self):
+        for _ in range(5):
+            self._document()
+        db.session.commit()
+        TechnicalDocument.query.filter(TechnicalDocument.title.like(f'{TITLE}%')) \
+            .update({'status': 'arquivado'}, synchronize_session=False)
+        db.session.commit()
+
+        self.assertNotEqual(_stored(), _actual())
+        self.assertGreater(document_counters.reconcile(db.session), 0)
+        self.assertEqual(_stored(), _actual())
+        self.assertEqual(document_counters.count(db.session, 'status', 'arquivado'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da pré-visualização de documentos técnicos
+
+Garante que a pré-visualização respeita o acesso restrito da mesma forma
+que a visualização e o download, e que o cache de prévias converte cada
+conteúdo uma única vez.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import openpyxl
+from flask import url_for
+
+from support import app, db, create_user, login
+from models import TechnicalDocument
+from utils.office_preview import KIND_HTML, PreviewCache, PreviewUnavailable
+
+
+class DocumentPreviewTest(unittest.TestCase):
+    """Testes de permissão da rota de pré-visualização."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.file_path = os.path.join(cls.tmp_dir, 'restrito.xyz')
+        with open(cls.file_path, 'w') as f:
+            f.write('conteúdo restrito')
+
+        cls.admin_id = create_user('preview_admin', role='admin')
+        cls.analyst_id = create_user('preview_analista')
+
+        with app.app_context():
+            document = TechnicalDocument(
+                title='Documento restrito',
+                document_type='pop',
+                filename='restrito.xyz',
+                original_filename='restrito.xyz',
+                file_path=cls.file_path,
+                file_type='xyz',
+                file_size=os.path.getsize(cls.file_path),
+                restricted_access=True,
+                uploaded_by=cls.admin_id
+            )
+            db.session.add(document)
+            db.session.commit()
+            cls.document_id = document.id
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.delete(db.session.get(TechnicalDocument, cls.document_id))
+            db.session.commit()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def _preview_url(self):
+        with app.test_request_context():
+            return url_for('documents.preview_document', document_id=self.document_id)
+
+    def test_non_admin_is_refused(self):
+        """Usuário sem perfil admin é redirecionado sem receber o arquivo."""
+        client = app.test_client()
+        login(client, self.analyst_id)
+        response = client.get(self._preview_url())
+        self.assertEqual(response.status_code, 302)
+        with app.test_request_context():
+            self.assertEqual(response.location, url_for('documents.index'))
+
+    def test_admin_reaches_preview(self):
+        """Administrador passa pela verificação e chega à geração da prévia."""
+        client = app.test_client()
+        login(client, self.admin_id)
+        response = client.get(self._preview_url())
+        # Extensão sem conversor: a página de prévia indisponível comprova o acesso
+        self.assertEqual(response.status_code, 422)
+
+
+class PreviewCacheTest(unittest.TestCase):
+    """Cache em disco indexado pelo hash do conteúdo (sem conversor externo)."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = PreviewCache(os.path.join(self.tmp_dir, 'previas'), converter=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _workbook(self, name, value):
+        path = os.path.join(self.tmp_dir, name)
+        workbook = openpyxl.Workbook()
+        workbook.active['A1'] = value
+        workbook.save(path)
+        return path
+
+    def test_same_content_is_rendered_once(self):
+        first = self._workbook('a.xlsx', 'Brix <12>')
+        second = os.path.join(self.tmp_dir, 'copia.xlsx')
+        shutil.copyfile(first, second)
+
+        preview_path, kind, sha256 = self.cache.get_preview(first)
+        self.assertEqual(kind, KIND_HTML)
+        with open(preview_path, encoding='utf-8') as f:
+            self.assertIn('Brix &lt;12&gt;', f.read())
+
+        # Mesmo conteúdo em outro caminho reaproveita a prévia gerada
+        self.assertEqual(self.cache.get_preview(second), (preview_path, kind, sha256))
+        self.assertEqual(self.cache.preview_stats, {'hits': 1, 'misses': 1})
+
+    def test_changed_file_gets_new_preview(self):
+        path = self._workbook('a.xlsx', 'versão 1')
+        first = self.cache.get_preview(path)
+        self._workbook('a.xlsx', 'versão 2')
+        os.utime(path, ns=(0, 0))
+        second = self.cache.get_preview(path)
+        self.assertNotEqual(first[2], second[2])
+
+    def test_converter_only_formats(self):
+        path = os.path.join(self.tmp_dir, 'antigo.xls')
+        with open(path, 'wb') as f:
+            f.write(b'xls')
+        self.assertFalse(self.cache.supports('.xls'))
+        self.assertTrue(self.cache.supports('.XLSX'))
+        with self.assertRaises(PreviewUnavailable):
+            self.cache.get_preview(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
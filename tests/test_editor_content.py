@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do carregamento de formulários no editor universal
+
+Verifica o cache da extração (invalidado por data de modificação e
+tamanho), a revalidação por ETag, o envio parcial do PDF e a recusa de
+caminhos fora da pasta de formulários.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from support import app, create_user, login
+from blueprints.forms import routes_editor
+
+
+class EditorContentTest(unittest.TestCase):
+    """Rotas de conteúdo do editor com uma pasta de formulários temporária."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.user_id = create_user('editor_analista')
+
+    def setUp(self):
+        self.assets_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.assets_dir, 'laboratorio'))
+        self.original_assets = app.config['ATTACHED_ASSETS_FOLDER']
+        app.config['ATTACHED_ASSETS_FOLDER'] = self.assets_dir
+        routes_editor._extract_content.cache_clear()
+
+        self.calls = []
+        patcher = mock.patch.object(routes_editor, 'extract_data_from_excel', self._fake_extract)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = app.test_client()
+        login(self.client, self.user_id)
+
+    def tearDown(self):
+        app.config['ATTACHED_ASSETS_FOLDER'] = self.original_assets
+        routes_editor._extract_content.cache_clear()
+        shutil.rmtree(self.assets_dir, ignore_errors=True)
+
+    def _fake_extract(self, path):
+        self.calls.append(path)
+        return {'active_sheet': 'Plan1', 'sheets': {}, 'fields': [len(self.calls)]}
+
+    def _write(self, name, content):
+        path = os.path.join(self.assets_dir, 'laboratorio', name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def _load(self, name, **headers):
+        return self.client.get(f'/forms/editor/api/load-content/laboratorio/{name}', headers=headers)
+
+    def test_extraction_is_cached_until_file_changes(self):
+        path = self._write('ficha.xlsx', b'versao 1')
+        self.assertEqual(self._load('ficha.xlsx').get_json()['fields'], [1])
+        self.assertEqual(self._load('ficha.xlsx').get_json()['fields'], [1])
+        self.assertEqual(len(self.calls), 1)
+
+        # Mesmo tamanho, nova data de modificação
+        stat_result = os.stat(path)
+        os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self._load('ficha.xlsx').get_json()['fields'], [2])
+
+        # Novo tamanho, mesma data de modificação
+        mtime_ns = os.stat(path).st_mtime_ns
+        self._write('ficha.xlsx', b'versao 2 maior')
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(self._load('ficha.xlsx').get_json()['fields'], [3])
+
+    def test_etag_revalidation(self):
+        path = self._write('ficha.xlsx', b'versao 1')
+        first = self._load('ficha.xlsx')
+        etag = first.headers['ETag']
+        self.assertEqual(first.status_code, 200)
+
+        revalidated = self._load('ficha.xlsx', **{'If-None-Match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.get_data(), b'')
+
+        stat_result = os.stat(path)
+        os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10 ** 9))
+        changed = self._load('ficha.xlsx', **{'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_pdf_is_served_with_ranges_and_etag(self):
+        content = b'%PDF-1.4 ' + bytes(range(256)) * 8
+        self._write('laudo.pdf', content)
+        with mock.patch.object(routes_editor, 'extract_data_from_pdf', return_value={'fields': []}):
+            pdf_url = self._load('laudo.pdf').get_json()['pdf_url']
+        self.assertIn('v=', pdf_url)
+
+        full = self.client.get(pdf_url)
+        self.assertEqual(full.get_data(), content)
+        self.assertIn('private', full.headers['Cache-Control'])
+
+        partial = self.client.get(pdf_url, headers={'Range': 'bytes=0-99'})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.get_data(), content[:100])
+
+        revalidated = self.client.get(pdf_url, headers={'If-None-Match': full.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_paths_outside_assets_folder_are_rejected(self):
+        secret = os.path.join(os.path.dirname(self.assets_dir), 'segredo_editor.xlsx')
+        with open(secret, 'wb') as f:
+            f.write(b'segredo')
+        self.addCleanup(os.remove, secret)
+        relative = f'../{os.path.basename(secret)}'
+
+        response = self.client.get(f'/forms/editor/api/file/{relative}')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn(b'segredo', response.get_data())
+
+        response = self.client.get(f'/forms/editor/api/load-content/{relative}')
+        self.assertFalse(response.get_json()['success'])
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
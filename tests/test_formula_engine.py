@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do motor de fórmulas personalizadas
+
+Cobre a lista branca da AST (construções rejeitadas), a proteção contra
+aritmética de inteiros sem limite e a equivalência entre avaliação escalar
+e em lote.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils.formula_engine import CompiledFormula, FormulaError, validate_formula  # noqa: E402
+
+
+class FormulaSandboxTest(unittest.TestCase):
+    """Construções fora da lista branca devem ser rejeitadas na compilação."""
+
+    REJECTED = {
+        'atributo': 'x.__class__',
+        'atributo em função': 'np.sqrt(x)',
+        'função fora da lista': '__import__("os")',
+        'builtin': 'eval("1")',
+        'chamada de atributo': '(1).__add__(2)',
+        'lambda': '(lambda: 1)()',
+        'list comprehension': '[i for i in range(3)]',
+        'generator': 'sum(i for i in range(3))',
+        'dict comprehension': '{i: i for i in range(3)}',
+        'subscrição': 'x[0]',
+        'string': '"abc"',
+        'booleano literal': 'True',
+        'nome desconhecido': 'y + 1',
+        'argumento nomeado': 'round(x, decimals=2)',
+        'walrus': '(y := 2)',
+        'bitwise': 'x << 2',
+    }
+
+    def test_rejected_constructs(self):
+        for label, expression in self.REJECTED.items():
+            with self.subTest(label):
+                with self.assertRaises(FormulaError):
+                    CompiledFormula(expression, ['x'])
+
+    def test_validate_formula_reports_error(self):
+        valid, message = validate_formula('x.real', ['x'])
+        self.assertFalse(valid)
+        self.assertTrue(message)
+
+    def test_reserved_parameter_names(self):
+        for name in ('sqrt', 'pi', '_where', 'não válido'):
+            with self.subTest(name):
+                with self.assertRaises(FormulaError):
+                    CompiledFormula('1', [name])
+
+
+class FormulaArithmeticLimitsTest(unittest.TestCase):
+    """Potências enormes não podem prender o processo."""
+
+    def assertFast(self, started, limit=1.0):
+        self.assertLess(time.monotonic() - started, limit)
+
+    def test_nested_integer_power(self):
+        started = time.monotonic()
+        with self.assertRaises(FormulaError):
+            CompiledFormula('9**9**9', []).evaluate({})
+        self.assertFast(started)
+
+    def test_nested_power_batch(self):
+        started = time.monotonic()
+        with self.assertRaises(FormulaError):
+            CompiledFormula('9**9**9 + x', ['x']).evaluate_batch({'x': [1, 2]})
+        self.assertFast(started)
+
+    def test_power_function_overflow(self):
+        started = time.monotonic()
+        with self.assertRaises(FormulaError):
+            CompiledFormula('pow(9, pow(9, 9))', []).evaluate({})
+        self.assertFast(started)
+
+    def test_huge_literal(self):
+        with self.assertRaises(FormulaError):
+            CompiledFormula('9' * 400, [])
+
+    def test_parameter_overflow_is_not_calculable(self):
+        compiled = CompiledFormula('x ** 1000', ['x'])
+        with self.assertRaises(FormulaError):
+            compiled.evaluate({'x': 10})
+        result = compiled.evaluate_batch({'x': [10, 1]})
+        self.assertTrue(np.isinf(result[0]))
+        self.assertEqual(result[1], 1.0)
+
+    def test_division_by_zero(self):
+        with self.assertRaises(FormulaError):
+            CompiledFormula('x / 0', ['x']).evaluate({'x': 1})
+        with self.assertRaises(FormulaError):
+            CompiledFormula('1 / 0', []).evaluate({})
+
+
+class FormulaEvaluationTest(unittest.TestCase):
+    """Avaliação escalar e vetorizada devem concordar."""
+
+    def test_scalar_matches_batch(self):
+        compiled = CompiledFormula(
+            'sqrt(a) * 2 + (b if a > 1 and b < 10 else -b) + 7 // 2 + 7 % 3',
+            {'a': {}, 'b': {'default': 3}}
+        )
+        rows = [(4, 1), (0.5, 2), (9, None), (2, 12)]
+        batch = compiled.evaluate_batch({
+            'a': [a for a, _ in rows],
+            'b': [b for _, b in rows],
+        })
+        for index, (a, b) in enumerate(rows):
+            with self.subTest(row=index):
+                self.assertAlmostEqual(compiled.evaluate({'a': a, 'b': b}), batch[index])
+
+    def test_chained_comparison(self):
+        compiled = CompiledFormula('1 if 0 < x < 10 else 0', ['x'])
+        self.assertEqual(list(compiled.evaluate_batch({'x': [-1, 5, 10]})), [0.0, 1.0, 0.0])
+
+    def test_missing_input(self):
+        with self.assertRaises(FormulaError):
+            CompiledFormula('x + 1', ['x']).evaluate({})
+
+    def test_results_are_memoized(self):
+        compiled = CompiledFormula('x * 2', ['x'])
+        compiled.evaluate({'x': 3})
+        compiled.evaluate({'x': 3})
+        self.assertEqual(compiled.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da escala de atividades do laboratório
+
+Compara os planos das regras declarativas com o gerador antigo (cópia de
+gerar_atividades_mes, inclusive o caso especial de maio de 2025), valida
+as mensagens de normalize_rule, a releitura do arquivo de regras e a
+revalidação por ETag dos feeds JSON e iCal.
+"""
+
+import calendar
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from support import app, create_user, login
+from utils import lab_schedule
+
+
+def gerar_atividades_mes(ano, mes):
+    """Gerador anterior às regras declarativas (blueprints/laboratorio/routes.py)."""
+    atividades = {}
+    _, dias_no_mes = calendar.monthrange(ano, mes)
+    primeiro_dia = datetime.date(ano, mes, 1)
+    if ano == 2025 and mes == 5:
+        dia_semana_ref = 3
+        turno_shelf_life = 1
+    else:
+        dia_semana_ref = primeiro_dia.weekday()
+        dias_desde_referencia = (primeiro_dia - datetime.date(2025, 5, 1)).days
+        turno_shelf_life = (dias_desde_referencia % 3) + 1
+
+    for dia in range(1, dias_no_mes + 1):
+        if ano == 2025 and mes == 5:
+            dia_semana = (dia_semana_ref + dia - 1) % 7
+        else:
+            dia_semana = datetime.date(ano, mes, dia).weekday()
+        atividades_dia = {1: [], 2: [], 3: []}
+
+        if dia_semana == 0:
+            atividades_dia[1].append("E.T.E")
+        else:
+            atividades_dia[3].append("E.T.E")
+
+        if dia_semana == 6:
+            for turno in (1, 2, 3):
+                atividades_dia[turno].append("ANÁLISE DE ÁGUA*")
+        else:
+            atividades_dia[(1, 2, 3, 1, 2, 3)[dia_semana]].append("ANÁLISE DE ÁGUA")
+
+        atividades_dia[turno_shelf_life].append("SHELF LIFE 10D")
+        turno_shelf_life = turno_shelf_life % 3 + 1
+
+        if dia_semana == 0:
+            atividades_dia[3].append("TURBIDEZ")
+        atividades[dia] = atividades_dia
+    return atividades
+
+
+class PlanTest(unittest.TestCase):
+    """Planos calculados a partir das regras."""
+
+    def test_default_rules_match_previous_generator(self):
+        ruleset = lab_schedule.RuleSet(lab_schedule.DEFAULT_RULES)
+        for ano in range(2020, 2031):
+            for mes in range(1, 13):
+                with self.subTest(ano=ano, mes=mes):
+                    plano = lab_schedule.month_plan(ano, mes, ruleset=ruleset)
+                    esperado = gerar_atividades_mes(ano, mes)
+                    self.assertEqual(
+                        {dia: {turno: list(atividades) for turno, atividades in turnos.items()}
+                         for dia, turnos in plano.items()},
+                        esperado
+                    )
+
+    def test_may_2025(self):
+        plano = lab_schedule.month_plan(2025, 5, ruleset=lab_schedule.RuleSet(lab_schedule.DEFAULT_RULES))
+        # 1º de maio de 2025 é quinta-feira e o SHELF LIFE começa no 1º turno
+        self.assertEqual(plano[1], {1: ('ANÁLISE DE ÁGUA', 'SHELF LIFE 10D'), 2: (), 3: ('E.T.E',)})
+        self.assertEqual(plano[5][3], ('TURBIDEZ',))
+
+    def test_monthly_rule_skips_missing_days(self):
+        ruleset = lab_schedule.RuleSet([
+            {'atividade': 'INVENTÁRIO', 'tipo': 'mensal', 'dias': {'31': [2]}, 'inicio': '2024-02-01'},
+        ])
+        self.assertEqual(lab_schedule.month_plan(2024, 1, ruleset=ruleset)[31][2], ())
+        self.assertFalse(any(turnos[2] for turnos in lab_schedule.month_plan(2024, 2, ruleset=ruleset).values()))
+        self.assertEqual(lab_schedule.month_plan(2024, 3, ruleset=ruleset)[31][2], ('INVENTÁRIO',))
+
+    def test_ical_accepts_year_range(self):
+        text = lab_schedule.to_ical(lab_schedule.MAX_YEAR, ruleset=lab_schedule.RuleSet(lab_schedule.DEFAULT_RULES))
+        self.assertIn(f'DTEND;VALUE=DATE:{lab_schedule.MAX_YEAR + 1}0101', text)
+
+
+class NormalizeRuleTest(unittest.TestCase):
+    """Mensagens de erro das regras inválidas."""
+
+    def assertInvalid(self, rule, message):
+        with self.assertRaises(lab_schedule.InvalidRules) as context:
+            lab_schedule.normalize_rule(rule, position=2)
+        self.assertIn(message, str(context.exception))
+
+    def test_invalid_rules(self):
+        self.assertInvalid(['E.T.E'], 'Regra 2: esperado um objeto')
+        self.assertInvalid({'tipo': 'semanal', 'dias': {'seg': [1]}}, '"atividade" é obrigatório')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'diario'}, '"tipo" deve ser um de')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'semanal'}, '"dias" deve associar')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'semanal', 'dias': {'seg': [4]}}, 'turno 4 inválido')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'semanal', 'dias': {'seg': []}}, 'informe uma lista de turnos')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'semanal', 'dias': {'feriado': [1]}}, "dia da semana 'feriado'")
+        self.assertInvalid({'atividade': 'X', 'tipo': 'mensal', 'dias': {'32': [1]}}, "dia do mês '32'")
+        self.assertInvalid({'atividade': 'X', 'tipo': 'rodizio'}, '"referencia" é obrigatório')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'rodizio', 'referencia': '01/05/2025'}, '"referencia" deve ser uma data')
+        self.assertInvalid({'atividade': 'X', 'tipo': 'semanal', 'dias': {'seg': 1}, 'fim': 'amanhã'}, '"fim" deve ser uma data')
+
+        with self.assertRaises(lab_schedule.InvalidRules):
+            lab_schedule.RuleSet({'atividade': 'X'})
+
+    def test_weekly_defaults_and_aliases(self):
+        rule = lab_schedule.normalize_rule({'atividade': ' X ', 'tipo': 'semanal', 'dias': {'todos': 3, 'Segunda': [1], 'dom': 2}})
+        self.assertEqual(rule['atividade'], 'X')
+        self.assertEqual(rule['dias'], {0: (1,), 1: (3,), 2: (3,), 3: (3,), 4: (3,), 5: (3,), 6: (2,)})
+
+
+class RulesFileTest(unittest.TestCase):
+    """Releitura do arquivo LAB_SCHEDULE_RULES_FILE."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'regras.json')
+        self.mtime = 1_700_000_000_000_000_000
+
+    def tearDown(self):
+        lab_schedule._loaded.update(key=None, ruleset=lab_schedule._DEFAULT_RULESET)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, content):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+        self.mtime += 1_000_000_000
+        os.utime(self.path, ns=(self.mtime, self.mtime))
+
+    def test_reload_on_mtime_change(self):
+        self.assertIs(lab_schedule.current_rules(''), lab_schedule._DEFAULT_RULESET)
+
+        self._write([{'atividade': 'A', 'tipo': 'semanal', 'dias': {'seg': [1]}}])
+        first = lab_schedule.current_rules(self.path)
+        self.assertEqual([rule['atividade'] for rule in first.rules], ['A'])
+        self.assertNotEqual(first.version, lab_schedule._DEFAULT_RULESET.version)
+
+        # Mesma data de modificação: o arquivo não é relido
+        with mock.patch.object(lab_schedule, 'load_rules_file') as load:
+            self.assertIs(lab_schedule.current_rules(self.path), first)
+        load.assert_not_called()
+
+        self._write([{'atividade': 'B', 'tipo': 'mensal', 'dias': {'1': [2]}}])
+        second = lab_schedule.current_rules(self.path)
+        self.assertEqual([rule['atividade'] for rule in second.rules], ['B'])
+        self.assertNotEqual(second.version, first.version)
+
+        # Arquivo inválido ou removido: continuam valendo as últimas regras
+        self._write('[{"atividade": ')
+        self.assertIs(lab_schedule.current_rules(self.path), second)
+        self._write([{'atividade': 'C', 'tipo': 'rodizio'}])
+        self.assertIs(lab_schedule.current_rules(self.path), second)
+        os.remove(self.path)
+        self.assertIs(lab_schedule.current_rules(self.path), second)
+
+
+class FeedTest(unittest.TestCase):
+    """Feeds JSON e iCal com revalidação por ETag."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.user_id = create_user('escala_analista')
+
+    def setUp(self):
+        self.client = app.test_client()
+        login(self.client, self.user_id)
+
+    def test_json_etag(self):
+        response = self.client.get('/laboratorio/calendario/2025.json?mes=5')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(len(data['dias']), 31)
+        self.assertEqual(data['dias'][0]['turnos']['1'], ['ANÁLISE DE ÁGUA', 'SHELF LIFE 10D'])
+        tag = response.headers['ETag']
+
+        with mock.patch.object(lab_schedule, 'to_json') as to_json:
+            cached = self.client.get('/laboratorio/calendario/2025.json?mes=5', headers={'If-None-Match': tag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.get_data(), b'')
+        to_json.assert_not_called()
+
+        other = self.client.get('/laboratorio/calendario/2025.json', headers={'If-None-Match': tag})
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other.headers['ETag'], tag)
+
+    def test_ical_etag(self):
+        response = self.client.get('/laboratorio/calendario/2025.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/calendar')
+        self.assertTrue(response.get_data(as_text=True).startswith('BEGIN:VCALENDAR\r\n'))
+        tag = response.headers['ETag']
+
+        with mock.patch.object(lab_schedule, 'to_ical') as to_ical:
+            cached = self.client.get('/laboratorio/calendario/2025.ics', headers={'If-None-Match': tag})
+        self.assertEqual(cached.status_code, 304)
+        to_ical.assert_not_called()
+
+    def test_year_out_of_range(self):
+        for url in ('/laboratorio/calendario/9999.ics', '/laboratorio/calendario/9999.json',
+                    f'/laboratorio/calendario/{lab_schedule.MIN_YEAR - 1}.json',
+                    '/laboratorio/calendario/2025.json?mes=13'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
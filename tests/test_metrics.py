@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da exposição de métricas para o Prometheus
+
+Verifica o formato texto (HELP/TYPE, escape de rótulos, histogramas
+cumulativos com _sum e _count, coletores) e quem pode ler /metrics, com e
+sem METRICS_TOKEN.
+"""
+
+import unittest
+
+from support import app, create_user, login
+from utils.metrics import MetricsRegistry
+
+
+class ExpositionFormatTest(unittest.TestCase):
+    """Texto gerado pelo registro."""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def _lines(self):
+        text = self.registry.render()
+        self.assertTrue(text.endswith('\n'))
+        return text.splitlines()
+
+    def test_counter_with_escaped_labels(self):
+        counter = self.registry.counter('teste_total', 'Contador de teste', ('rota', 'status'))
+        counter.labels('a"b\\c\nd', 200).inc()
+        counter.labels('a"b\\c\nd', 200).inc(2.5)
+
+        self.assertEqual(self._lines()[:3], [
+            '# HELP teste_total Contador de teste',
+            '# TYPE teste_total counter',
+            'teste_total{rota="a\\"b\\\\c\\nd",status="200"} 3.5',
+        ])
+        with self.assertRaises(ValueError):
+            counter.labels('só um')
+
+    def test_histogram_buckets_sum_and_count(self):
+        histogram = self.registry.histogram('teste_segundos', 'Duração', ('job',), buckets=(1, 0.5))
+        for value in (0.2, 0.5, 0.7, 3.0):
+            histogram.labels('x').observe(value)
+
+        self.assertEqual(self._lines()[:7], [
+            '# HELP teste_segundos Duração',
+            '# TYPE teste_segundos histogram',
+            'teste_segundos_bucket{job="x",le="0.5"} 2',
+            'teste_segundos_bucket{job="x",le="1.0"} 3',
+            'teste_segundos_bucket{job="x",le="+Inf"} 4',
+            'teste_segundos_sum{job="x"} 4.4',
+            'teste_segundos_count{job="x"} 4',
+        ])
+
+    def test_collectors_and_caches(self):
+        def failing():
+            raise RuntimeError('coletor quebrado')
+
+        self.registry.register_collector(failing)
+        self.registry.register_collector(
+            lambda: [('teste_fila', 'gauge', 'Fila', [({'job': 'j'}, 2), ({}, float('nan'))])]
+        )
+        self.registry.register_cache('consultas', lambda: {'hits': 3, 'misses': 1, 'size': 4})
+
+        lines = self._lines()
+        self.assertIn('zelopack_cache_hit_ratio{cache="consultas"} 0.75', lines)
+        self.assertIn('zelopack_cache_entries{cache="consultas"} 4', lines)
+        self.assertIn('# TYPE teste_fila gauge', lines)
+        self.assertIn('teste_fila{job="j"} 2', lines)
+        self.assertIn('teste_fila NaN', lines)
+
+
+class MetricsAccessTest(unittest.TestCase):
+    """Regras de acesso de /metrics."""
+
+    def setUp(self):
+        self.original_token = app.config.get('METRICS_TOKEN')
+
+    def tearDown(self):
+        app.config['METRICS_TOKEN'] = self.original_token
+
+    def _client(self, username=None, role='analista'):
+        client = app.test_client()
+        if username:
+            login(client, create_user(username, role=role))
+        return client
+
+    def test_without_token_only_admin(self):
+        app.config['METRICS_TOKEN'] = None
+        # O cliente de testes chega de 127.0.0.1, como atrás de um proxy local
+        self.assertEqual(self._client().get('/metrics').status_code, 403)
+        self.assertEqual(self._client().get('/metrics', environ_base={'REMOTE_ADDR': '::1'}).status_code, 403)
+        self.assertEqual(self._client('metricas_analista').get('/metrics').status_code, 403)
+
+        response = self._client('metricas_admin', role='admin').get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('# TYPE zelopack_request_duration_seconds histogram', response.get_data(as_text=True))
+
+    def test_with_token_requires_bearer(self):
+        app.config['METRICS_TOKEN'] = 'segredo-prometheus'
+        client = self._client()
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer errado'}).status_code, 403)
+        self.assertEqual(client.get('/metrics', headers={'Authorization': 'segredo-prometheus'}).status_code, 403)
+        self.assertEqual(
+            client.get('/metrics', headers={'Authorization': 'Bearer segredo-prometheus'}).status_code, 200
+        )
+        # Com token configurado, nem o administrador dispensa o token
+        self.assertEqual(self._client('metricas_admin', role='admin').get('/metrics').status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
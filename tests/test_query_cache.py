@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do cache de consultas
+
+Verifica a invalidação por etiquetas após commit (e não após rollback), o
+limite de entradas, as cópias independentes e o backend SQLite
+compartilhado entre processos.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import app, db
+from models import Supplier
+from utils.database import cached_query, invalidate_cache
+from utils.query_cache import (
+    MemoryBackend, QueryCache, SQLiteBackend, UncacheableArgument, make_key, query_cache
+)
+
+calls = []
+
+
+@cached_query(tags=('supplier',))
+def supplier_names(session, prefix):
+    calls.append(prefix)
+    return [s.name for s in session.query(Supplier).filter(Supplier.name.like(f'{prefix}%')).order_by(Supplier.name)]
+
+
+@cached_query(tags=('supplier',))
+def first_supplier(session, prefix):
+    return session.query(Supplier).filter(Supplier.name.like(f'{prefix}%')).order_by(Supplier.id).first()
+
+
+class CommitInvalidationTest(unittest.TestCase):
+    """Alterações confirmadas invalidam as consultas das tabelas afetadas."""
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        query_cache.clear()
+        calls.clear()
+        Supplier.query.filter(Supplier.name.like('Cache %')).delete(synchronize_session=False)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+        Supplier.query.filter(Supplier.name.like('Cache %')).delete(synchronize_session=False)
+        db.session.commit()
+        self.ctx.pop()
+
+    def test_hit_until_commit(self):
+        self.assertEqual(supplier_names(db.session, 'Cache '), [])
+        self.assertEqual(supplier_names(db.session, 'Cache '), [])
+        self.assertEqual(len(calls), 1)
+
+        db.session.add(Supplier(name='Cache A'))
+        db.session.flush()
+        # Ainda não confirmado: o cache continua valendo
+        supplier_names(db.session, 'Cache ')
+        self.assertEqual(len(calls), 1)
+
+        db.session.commit()
+        self.assertEqual(supplier_names(db.session, 'Cache '), ['Cache A'])
+        self.assertEqual(len(calls), 2)
+
+    def test_rollback_keeps_cache(self):
+        supplier_names(db.session, 'Cache ')
+        db.session.add(Supplier(name='Cache B'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        supplier_names(db.session, 'Cache ')
+        self.assertEqual(len(calls), 1)
+
+    def test_bulk_update_invalidates(self):
+        db.session.add(Supplier(name='Cache C'))
+        db.session.commit()
+        self.assertEqual(supplier_names(db.session, 'Cache '), ['Cache C'])
+
+        Supplier.query.filter_by(name='Cache C').update({'name': 'Cache D'}, synchronize_session=False)
+        db.session.commit()
+        self.assertEqual(supplier_names(db.session, 'Cache '), ['Cache D'])
+
+    def test_manual_invalidation(self):
+        supplier_names(db.session, 'Cache ')
+        invalidate_cache('supplier')
+        supplier_names(db.session, 'Cache ')
+        self.assertEqual(len(calls), 2)
+
+    def test_orm_results_become_independent_dicts(self):
+        db.session.add(Supplier(name='Cache E', type='polpa'))
+        db.session.commit()
+        first = first_supplier(db.session, 'Cache ')
+        self.assertIsInstance(first, dict)
+        self.assertEqual(first['name'], 'Cache E')
+        first['name'] = 'alterado'
+        self.assertEqual(first_supplier(db.session, 'Cache ')['name'], 'Cache E')
+
+
+class CacheBackendTest(unittest.TestCase):
+    """Chaves, limite de entradas e backend compartilhado."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_key_ignores_session_and_rejects_unknown_objects(self):
+        with app.app_context():
+            self.assertEqual(
+                make_key(supplier_names, (db.session, 'x'), {}),
+                make_key(supplier_names, ('x',), {})
+            )
+        with self.assertRaises(UncacheableArgument):
+            make_key(supplier_names, (object(),), {})
+
+    def test_memory_backend_is_bounded(self):
+        cache = QueryCache()
+        cache.backend = MemoryBackend(max_entries=2)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_compute(key, lambda: key)
+        self.assertEqual(len(cache.backend), 2)
+        # 'b' foi o menos usado recentemente
+        self.assertIsNone(cache.backend.get('b'))
+        self.assertIsNotNone(cache.backend.get('a'))
+
+    def test_sqlite_backend_shared_between_workers(self):
+        path = os.path.join(self.tmp_dir, 'cache.db')
+        first, second = QueryCache(), QueryCache()
+        first.backend = SQLiteBackend(path)
+        second.backend = SQLiteBackend(path)
+
+        self.assertEqual(first.get_or_compute('k', lambda: [1], tags=('reports',)), [1])
+        self.assertEqual(second.get_or_compute('k', lambda: [2], tags=('reports',)), [1])
+
+        # Uma gravação confirmada em um worker invalida a entrada para todos
+        second.invalidate('reports')
+        self.assertEqual(first.get_or_compute('k', lambda: [3], tags=('reports',)), [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da exportação em fluxo dos laudos
+
+Verifica que o cabeçalho sai antes da consulta ser executada, o BOM e o
+escape de fórmulas no CSV e a leitura do XLSX gerado.
+"""
+
+import csv
+import io
+import unittest
+
+from openpyxl import load_workbook
+from sqlalchemy import event
+
+from support import app, db, create_user, login, make_report
+from models import Report
+from utils import report_export
+from utils.search import build_search_query
+
+SUPPLIER = 'Exportação Fornecedor'
+
+
+class ReportExportTest(unittest.TestCase):
+    """Geração dos arquivos a partir da busca."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.user_id = create_user('exportacao_analista')
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+        make_report(db.session, title='=HYPERLINK("x")', supplier=SUPPLIER, created_by=self.user_id)
+        make_report(db.session, title='Laudo comum', supplier=SUPPLIER, created_by=self.user_id)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        self.ctx.pop()
+
+    def _cleanup(self):
+        # Exclusão pelo ORM para manter os índices derivados dos laudos
+        for report in Report.query.filter_by(supplier=SUPPLIER):
+            db.session.delete(report)
+        db.session.commit()
+
+    def test_header_is_sent_before_query_runs(self):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        headers, rows = report_export.iter_rows(build_search_query(supplier=SUPPLIER), chunk_size=1)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            body = report_export.stream_csv(headers, rows, chunk_size=1)
+            first = next(body)
+            self.assertEqual(statements, [])
+            rest = b''.join(body)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertTrue(first.startswith('﻿'.encode('utf-8')))
+        self.assertTrue(statements)
+        self.assertEqual(len(list(csv.reader(io.StringIO(rest.decode('utf-8'))))), 2)
+
+    def test_csv_route_escapes_formulas(self):
+        client = app.test_client()
+        login(client, self.user_id)
+        response = client.get(f'/reports/export/csv?supplier={SUPPLIER}')
+        self.assertEqual(response.status_code, 200)
+
+        text = response.get_data().decode('utf-8')
+        self.assertTrue(text.startswith('﻿'))
+        rows = list(csv.reader(io.StringIO(text[1:])))
+        self.assertEqual(rows[0][:2], ['ID', 'Título'])
+        self.assertEqual(sorted(row[1] for row in rows[1:]), ["'=HYPERLINK(\"x\")", 'Laudo comum'])
+        self.assertEqual({row[-1] for row in rows[1:]}, {'exportacao_analista'})
+
+    def test_xlsx_is_readable(self):
+        headers, rows = report_export.iter_rows(build_search_query(supplier=SUPPLIER))
+        data = b''.join(report_export.stream_xlsx(headers, rows))
+
+        sheet = load_workbook(io.BytesIO(data), read_only=True)['Laudos']
+        values = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(list(values[0]), headers)
+        self.assertEqual(len(values), 3)
+        self.assertIn("'=HYPERLINK(\"x\")", [row[1] for row in values[1:]])
+
+
+if __name__ == '__main__':
+    unittest.main()
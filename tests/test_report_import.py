@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da importação em massa de laudos
+
+Verifica a localização do cabeçalho, a conversão dos valores, o descarte de
+repetidos (no arquivo e já cadastrados) e o modo de simulação.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from openpyxl import Workbook
+
+from support import app, db
+from models import Report
+from utils import report_import
+
+SUPPLIER = 'Importação Fornecedor'
+
+CSV_CONTENT = (
+    'Planilha de laudos 2023\n'
+    'Fornecedor;Lote;Data do laudo;Brix;pH;Validação\n'
+    f'{SUPPLIER};L-1;05/01/2023;11,5;3,80;Conforme\n'
+    f'{SUPPLIER};L-2;06/01/2023;12,1;3,75;Reprovado\n'
+    f'{SUPPLIER.upper()};l-1;05/01/2023;11,5;3,80;ok\n'
+    f'{SUPPLIER};;07/01/2023;11,0;3,7;ok\n'
+    f'{SUPPLIER};L-3;08/01/2023;150;3,7;ok\n'
+    ';;;;;\n'
+)
+
+
+class ReportImportTest(unittest.TestCase):
+    """Importação de planilhas CSV e XLSX."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        self.ctx.pop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _cleanup(self):
+        # Exclusão pelo ORM para manter os índices derivados dos laudos
+        for report in Report.query.filter(Report.supplier.ilike(SUPPLIER)):
+            db.session.delete(report)
+        db.session.commit()
+
+    def _write(self, name, content, encoding='utf-8'):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write(content)
+        return path
+
+    def _imported(self):
+        return Report.query.filter(Report.supplier.ilike(SUPPLIER)).order_by(Report.batch_number).all()
+
+    def test_csv_import(self):
+        path = self._write('laudos.csv', CSV_CONTENT, encoding='latin-1')
+        result = report_import.import_reports(db.session, [path], chunk_size=1)
+
+        self.assertEqual(result.rows_read, 5)
+        self.assertEqual(result.imported, 2)
+        self.assertEqual(result.duplicates_in_files, 1)
+        self.assertEqual(result.invalid, 2)
+        self.assertTrue(any('linha 6' in error and 'batch_number: obrigatório' in error for error in result.errors))
+        self.assertTrue(any('linha 7' in error and 'brix' in error for error in result.errors))
+
+        reports = self._imported()
+        self.assertEqual([r.batch_number for r in reports], ['L-1', 'L-2'])
+        self.assertEqual(reports[0].brix, 11.5)
+        self.assertEqual(reports[0].report_date, date(2023, 1, 5))
+        self.assertEqual(reports[0].physicochemical_validation, 'ok')
+        self.assertEqual(reports[1].physicochemical_validation, 'não padrão')
+        self.assertEqual(reports[0].file_type, 'importado')
+
+    def test_rerun_skips_existing(self):
+        path = self._write('laudos.csv', CSV_CONTENT)
+        report_import.import_reports(db.session, [path])
+        result = report_import.import_reports(db.session, [path])
+
+        self.assertEqual(result.imported, 0)
+        self.assertEqual(result.duplicates_existing, 2)
+        self.assertEqual(len(self._imported()), 2)
+
+    def test_existing_batch_differs_only_in_case(self):
+        first = self._write('lt.csv', f'Fornecedor;Lote;Data do laudo\n{SUPPLIER};LT-01;05/01/2023\n')
+        second = self._write('lt2.csv', f'Fornecedor;Lote;Data do laudo\n{SUPPLIER.lower()};lt-01;05/01/2023\n')
+        report_import.import_reports(db.session, [first])
+        result = report_import.import_reports(db.session, [second])
+
+        self.assertEqual(result.imported, 0)
+        self.assertEqual(result.duplicates_existing, 1)
+        self.assertEqual([r.batch_number for r in self._imported()], ['LT-01'])
+
+    def test_dry_run_writes_nothing(self):
+        path = self._write('laudos.csv', CSV_CONTENT)
+        result = report_import.import_reports(db.session, [path], dry_run=True)
+
+        self.assertEqual(result.imported, 2)
+        self.assertTrue(result.to_dict()['dry_run'])
+        self.assertEqual(self._imported(), [])
+
+    def test_xlsx_with_mapping_and_serial_dates(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Fornecedor', 'Nº do lote', 'Data do laudo', 'Brix medido'])
+        sheet.append([SUPPLIER, 1234.0, 44931, '11,2'])
+        sheet.append([SUPPLIER, 'L-9', date(2023, 2, 1), None])
+        path = os.path.join(self.tmp_dir, 'laudos.xlsx')
+        workbook.save(path)
+
+        result = report_import.import_reports(db.session, [path], mapping={'Nº do lote': 'batch_number'})
+
+        self.assertEqual(result.imported, 2, result.errors)
+        reports = self._imported()
+        self.assertEqual(reports[0].batch_number, '1234')
+        self.assertEqual(reports[0].report_date, date(2023, 1, 5))
+        self.assertEqual(reports[0].lab_brix, 11.2)
+        self.assertIsNone(reports[1].lab_brix)
+
+    def test_unsupported_and_headerless_files(self):
+        pdf = self._write('laudo.pdf', 'x')
+        headerless = self._write('sem_cabecalho.csv', 'a;b\n1;2\n')
+        result = report_import.import_reports(db.session, [pdf, headerless])
+
+        self.assertEqual(result.files, 2)
+        self.assertEqual(result.sheets, 0)
+        self.assertEqual(len(result.errors), 2)
+
+    def test_map_headers_rejects_unknown_field(self):
+        with self.assertRaises(ValueError):
+            report_import.map_headers(['Coluna'], {'Coluna': 'inexistente'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da instrumentação de desempenho por requisição
+
+Usa uma aplicação mínima com banco SQLite em memória para contar comandos,
+detectar N+1 e calcular percentis por rota; o acesso ao painel é conferido
+na aplicação principal.
+"""
+
+import re
+import unittest
+
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+from support import app, create_user, login
+from utils.request_profiler import RequestProfiler, percentile, statement_shape
+
+SERVER_TIMING_RE = re.compile(r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) SQL", tpl;dur=[\d.]+$')
+
+
+def create_profiled_app():
+    profiled = Flask(__name__)
+    profiled.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        PERF_N_PLUS_ONE_THRESHOLD=5,
+        PERF_WINDOW_SIZE=50,
+    )
+    db = SQLAlchemy()
+    db.init_app(profiled)
+    profiler = RequestProfiler(profiled)
+
+    def names(count):
+        return [
+            db.session.execute(text('SELECT :id AS item_id'), {'id': item_id}).scalar()
+            for item_id in range(count)
+        ]
+
+    @profiled.route('/laco/<int:count>')
+    def laco(count):
+        return jsonify(names(count))
+
+    @profiled.route('/lista')
+    def lista():
+        # Mesmo formato com literais diferentes: também conta como repetição
+        return jsonify([db.session.execute(text(f'SELECT {n}')).scalar() for n in range(7)])
+
+    return profiled, profiler
+
+
+class RequestProfilerTest(unittest.TestCase):
+    """Medidas de uma aplicação instrumentada."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app, cls.profiler = create_profiled_app()
+
+    @classmethod
+    def tearDownClass(cls):
+        # Os eventos do SQLAlchemy são globais: não deixar o perfilador ativo para os demais testes
+        event.remove(Engine, 'before_cursor_execute', cls.profiler._before_cursor_execute)
+        event.remove(Engine, 'after_cursor_execute', cls.profiler._after_cursor_execute)
+        event.remove(Mapper, 'load', cls.profiler._on_load)
+
+    def setUp(self):
+        self.profiler.reset()
+        self.client = self.app.test_client()
+
+    def test_repeated_statement_is_reported_as_n_plus_one(self):
+        self.client.get('/laco/3')
+        self.assertEqual(self.profiler.recent_incidents(), [])
+
+        self.client.get('/laco/8')
+        incidents = self.profiler.recent_incidents()
+        self.assertEqual(len(incidents), 1)
+        self.assertEqual(incidents[0]['endpoint'], 'laco')
+        self.assertEqual(incidents[0]['count'], 8)
+
+        self.client.get('/lista')
+        self.assertEqual(self.profiler.recent_incidents()[0]['statement'], 'SELECT N')
+
+    def test_server_timing_header(self):
+        response = self.client.get('/laco/4')
+        match = SERVER_TIMING_RE.match(response.headers['Server-Timing'])
+        self.assertIsNotNone(match, response.headers['Server-Timing'])
+        self.assertEqual(match.group(1), '4')
+
+    def test_percentiles_per_endpoint(self):
+        for count in range(1, 5):
+            self.client.get(f'/laco/{count}')
+        self.client.get('/lista')
+
+        routes = {route['endpoint']: route for route in self.profiler.summary()}
+        self.assertEqual(set(routes), {'laco', 'lista'})
+        self.assertEqual(routes['laco']['count'], 4)
+        self.assertEqual(routes['laco']['queries'], {'p50': 2.5, 'p95': 3.85, 'p99': 3.97, 'max': 4})
+        self.assertEqual(routes['lista']['queries']['max'], 7)
+        self.assertEqual(routes['lista']['n_plus_one'], 1)
+
+    def test_helpers(self):
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(
+            statement_shape('SELECT * FROM t WHERE id IN (?, ?, ?) AND x = 10'),
+            'SELECT * FROM t WHERE id IN (?) AND x = N'
+        )
+
+
+class DashboardAccessTest(unittest.TestCase):
+    """Painel de desempenho restrito a administradores."""
+
+    def _client(self, username, role):
+        client = app.test_client()
+        login(client, create_user(username, role=role))
+        return client
+
+    def test_admin_only(self):
+        for path in ('/desempenho/', '/desempenho/api'):
+            with self.subTest(path=path):
+                self.assertEqual(app.test_client().get(path).status_code, 302)
+                self.assertEqual(self._client('desempenho_analista', 'analista').get(path).status_code, 302)
+                self.assertEqual(self._client('desempenho_admin', 'admin').get(path).status_code, 200)
+
+        response = self._client('desempenho_admin', 'admin').get('/desempenho/api')
+        self.assertTrue(response.get_json()['success'])
+        self.assertEqual(self._client('desempenho_analista', 'analista').post('/desempenho/reset').status_code, 302)
+
+
+if __name__ == '__main__':
+    unittest.main()
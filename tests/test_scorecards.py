@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes dos scorecards de fornecedores
+
+Os contadores mantidos a cada inclusão, correção e exclusão de laudo devem
+coincidir com os recalculados do zero por scorecards.rebuild().
+"""
+
+import random
+import unittest
+from datetime import date, timedelta
+
+from support import app, db, make_report
+from models import Report, SupplierScorecard
+from utils import scorecards
+
+SUPPLIERS = ('Scorecard Fornecedor A', 'Scorecard Fornecedor B', 'Scorecard Fornecedor C')
+
+
+def _snapshot():
+    rows = SupplierScorecard.query.filter(SupplierScorecard.supplier.in_(SUPPLIERS)).all()
+    return {
+        (row.supplier, row.month): {name: getattr(row, name) or 0 for name in scorecards.COUNTERS}
+        for row in rows
+        if row.report_count
+    }
+
+
+class ScorecardIncrementalTest(unittest.TestCase):
+    """Atualização incremental versus recálculo completo."""
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+        self.rng = random.Random(42)
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        self.ctx.pop()
+
+    def _cleanup(self):
+        # Exclusão pelo ORM para manter os índices derivados dos laudos
+        for report in Report.query.filter(Report.supplier.in_(SUPPLIERS)):
+            db.session.delete(report)
+        db.session.flush()
+        SupplierScorecard.query.filter(SupplierScorecard.supplier.in_(SUPPLIERS)).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _random_fields(self):
+        report_date = date(2024, 1, 1) + timedelta(days=self.rng.randrange(120))
+        return {
+            'supplier': self.rng.choice(SUPPLIERS),
+            'report_date': report_date,
+            'due_date': report_date + timedelta(days=self.rng.randrange(-3, 5)) if self.rng.random() < 0.7 else None,
+            'physicochemical_validation': self.rng.choice(('ok', 'não padrão', 'não verificado')),
+            'brix': round(self.rng.gauss(11.5, 0.4), 2),
+            'lab_brix': round(self.rng.gauss(11.5, 0.4), 2),
+            'ph': round(self.rng.gauss(3.8, 0.05), 3) if self.rng.random() < 0.8 else None,
+            'lab_ph': round(self.rng.gauss(3.8, 0.05), 3),
+            'acidity': round(self.rng.gauss(0.9, 0.05), 3),
+            'lab_acidity': None if self.rng.random() < 0.3 else round(self.rng.gauss(0.9, 0.05), 3),
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = _snapshot()
+        scorecards.rebuild(db.session)
+        rebuilt = _snapshot()
+        self.assertEqual(set(incremental), set(rebuilt))
+        for key, counters in rebuilt.items():
+            for name, expected in counters.items():
+                with self.subTest(key=key, counter=name):
+                    self.assertAlmostEqual(incremental[key][name], expected, places=9)
+
+    def test_inserts_match_rebuild(self):
+        for _ in range(50):
+            make_report(db.session, **self._random_fields())
+        db.session.commit()
+        self.assertMatchesRebuild()
+
+    def test_updates_and_deletes_match_rebuild(self):
+        reports = [make_report(db.session, **self._random_fields()) for _ in range(40)]
+        db.session.commit()
+
+        for report in reports[:15]:
+            # Correções de medidas, troca de fornecedor e mudança de mês
+            for name, value in self._random_fields().items():
+                if self.rng.random() < 0.5:
+                    setattr(report, name, value)
+        db.session.commit()
+        for report in reports[15:22]:
+            db.session.delete(report)
+        db.session.commit()
+
+        self.assertMatchesRebuild()
+
+
+class IndicatorsTest(unittest.TestCase):
+    """Nota e taxas a partir dos contadores."""
+
+    def test_indicators(self):
+        totals = dict.fromkeys(scorecards.COUNTERS, 0)
+        totals.update(report_count=4, validated_count=4, nonconforming_count=1, due_count=2, on_time_count=2,
+                      brix_pairs=2, brix_dev_sum=0.0, brix_dev_sq_sum=0.5)
+        result = scorecards.indicators(totals)
+
+        self.assertEqual(result['measures']['brix']['rms'], 0.5)
+        self.assertIsNone(result['measures']['ph'])
+        self.assertEqual(result['nonconformance_rate'], 0.25)
+        self.assertEqual(result['on_time_rate'], 1.0)
+        # accuracy 0.5 (peso 0.4), conformidade 0.75 (0.4), pontualidade 1.0 (0.2)
+        self.assertEqual(result['score'], 70.0)
+
+    def test_components_without_data_are_ignored(self):
+        totals = dict.fromkeys(scorecards.COUNTERS, 0)
+        totals.update(report_count=1, due_count=1, on_time_count=0)
+        self.assertEqual(scorecards.indicators(totals)['score'], 0.0)
+        self.assertIsNone(scorecards.indicators({'report_count': 1})['score'])
+
+
+if __name__ == '__main__':
+    unittest.main()
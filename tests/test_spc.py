@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do CEP incremental
+
+As estatísticas mantidas a cada laudo salvo devem coincidir com as
+recalculadas do zero por spc.rebuild(), e pontos fora de controle devem
+gerar alertas na mesma transação do laudo.
+"""
+
+import random
+import unittest
+from datetime import date, timedelta
+
+from support import app, db, make_report
+from models import Alert, Report, SpcStatistic
+from utils import spc
+
+SUPPLIERS = ('SPC Fornecedor A', 'SPC Fornecedor B')
+COMPARED_FIELDS = ('count', 'mean', 'm2', 'ewma', 'cusum_high', 'cusum_low',
+                   'subgroup_count', 'grand_mean', 'range_sum')
+
+
+def _snapshot():
+    rows = SpcStatistic.query.filter(SpcStatistic.supplier.in_(SUPPLIERS)).all()
+    return {
+        (row.raw_material_type, row.supplier, row.metric): {
+            **{field: getattr(row, field) for field in COMPARED_FIELDS},
+            'open_subgroup': row.get_json('open_subgroup'),
+            'history': [dict(h, closed_at=None) for h in row.get_json('history')],
+        }
+        for row in rows
+    }
+
+
+class SpcIncrementalTest(unittest.TestCase):
+    """Atualização incremental versus recálculo completo."""
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+        self.rng = random.Random(41)
+        self.day = date(2024, 1, 1)
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        self.ctx.pop()
+
+    def _cleanup(self):
+        # Exclusão pelo ORM para manter os índices derivados dos laudos
+        reports = Report.query.filter(Report.supplier.in_(SUPPLIERS)).all()
+        ids = [r.id for r in reports]
+        Alert.query.filter(Alert.module == 'cep', Alert.entity_id.in_(ids)).delete(synchronize_session=False)
+        for report in reports:
+            db.session.delete(report)
+        db.session.flush()
+        SpcStatistic.query.filter(SpcStatistic.supplier.in_(SUPPLIERS)).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _add(self, supplier, **values):
+        self.day += timedelta(days=1)
+        report = make_report(db.session, supplier=supplier, raw_material_type='laranja',
+                             report_date=self.day, **values)
+        db.session.commit()
+        return report
+
+    def _add_many(self, count):
+        reports = []
+        for _ in range(count):
+            supplier = self.rng.choice(SUPPLIERS)
+            reports.append(self._add(
+                supplier,
+                lab_brix=round(self.rng.gauss(11.5, 0.3), 2),
+                lab_ph=round(self.rng.gauss(3.8, 0.05), 3),
+                acidity=None if self.rng.random() < 0.2 else round(self.rng.gauss(0.9, 0.04), 3)
+            ))
+        return reports
+
+    def assertSnapshotsEqual(self, incremental, rebuilt, fields=None):
+        self.assertEqual(set(incremental), set(rebuilt))
+        for key, values in rebuilt.items():
+            for field in fields or values:
+                with self.subTest(key=key, field=field):
+                    expected, actual = values[field], incremental[key][field]
+                    if isinstance(expected, float):
+                        self.assertAlmostEqual(actual, expected, places=9)
+                    else:
+                        self.assertEqual(actual, expected)
+
+    def test_inserts_match_rebuild(self):
+        self._add_many(60)
+        incremental = _snapshot()
+        self.assertTrue(incremental)
+
+        spc.rebuild(db.session)
+        self.assertSnapshotsEqual(incremental, _snapshot())
+
+    def test_corrections_and_deletions_match_rebuild_moments(self):
+        reports = self._add_many(40)
+
+        reports[3].lab_brix = reports[3].lab_brix + 0.4
+        reports[7].supplier = SUPPLIERS[1] if reports[7].supplier == SUPPLIERS[0] else SUPPLIERS[0]
+        reports[9].acidity = None
+        db.session.commit()
+        db.session.delete(reports[12])
+        db.session.commit()
+
+        incremental = _snapshot()
+        spc.rebuild(db.session)
+        # Correções ajustam só média e variância; subgrupos fechados não são refeitos
+        rebuilt = {key: value for key, value in _snapshot().items() if value['count']}
+        incremental = {key: value for key, value in incremental.items() if value['count']}
+        self.assertSnapshotsEqual(incremental, rebuilt, fields=('count', 'mean', 'm2'))
+
+    def test_out_of_control_point_raises_alert(self):
+        for _ in range(25):
+            self._add(SUPPLIERS[0], lab_brix=round(self.rng.gauss(11.5, 0.1), 2))
+        outlier = self._add(SUPPLIERS[0], lab_brix=15.0)
+
+        alerts = Alert.query.filter_by(module='cep', entity_id=outlier.id).all()
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0].type, 'danger')
+        self.assertIn('Brix (laboratório)', alerts[0].title)
+
+    def test_chart_data(self):
+        self._add_many(12)
+        stat = SpcStatistic.query.filter_by(supplier=SUPPLIERS[0], metric='lab_brix').first()
+        data = spc.chart_data(stat)
+        self.assertEqual(data['subgroup_size'], app.config['SPC_SUBGROUP_SIZE'])
+        self.assertLessEqual(len(data['individuals']['points']), spc.RECENT_POINTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da inicialização rápida (LAZY_STARTUP)
+
+Importa a aplicação num processo novo e verifica que as bibliotecas pesadas
+só são carregadas pelas funções que as usam.
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib', 'openpyxl', 'docx', 'PyPDF2', 'reportlab', 'PIL.Image')
+
+
+class LazyStartupTest(unittest.TestCase):
+    """Importação da aplicação sem bibliotecas pesadas."""
+
+    def _loaded_modules(self, statement):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(
+                os.environ,
+                LAZY_STARTUP='1',
+                DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}",
+                PYTHONPATH=ROOT_DIR
+            )
+            code = (
+                f"import sys; {statement}; "
+                f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+            )
+            result = subprocess.run(
+                [sys.executable, '-c', code], cwd=tmp_dir, env=env,
+                capture_output=True, text=True, timeout=120
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        output = result.stdout.strip().splitlines()
+        return [name for name in (output[-1] if output else '').split(',') if name]
+
+    def test_main_import_skips_heavy_modules(self):
+        self.assertEqual(self._loaded_modules('import main'), [])
+
+    def test_forms_processor_import_skips_heavy_modules(self):
+        self.assertEqual(self._loaded_modules('import main, utils.forms_processor'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes do armazenamento de uploads por conteúdo
+
+Cobre o upload em partes com retomada após queda de conexão, a
+deduplicação por SHA-256 com contagem de referências e o carregamento do
+script de envio em partes na página de laudos.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import unittest
+from unittest import mock
+
+from werkzeug.datastructures import FileStorage
+
+from support import app, create_user, login
+from models import StoredFile
+from utils import upload_store
+from utils.upload_store import (
+    UploadError, append_chunk, chunked_upload_status, release_file, store_chunked_upload, store_upload
+)
+
+
+class ChunkedUploadTest(unittest.TestCase):
+    """Fluxo HTTP do upload em partes."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.owner_id = create_user('upload_dono')
+        cls.other_id = create_user('upload_outro')
+
+    def setUp(self):
+        self.client = app.test_client()
+        login(self.client, self.owner_id)
+        self.content = os.urandom(3000)
+
+    def _start(self):
+        response = self.client.post('/uploads/chunked', json={
+            'filename': 'laudo.pdf',
+            'size': len(self.content)
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['upload_id']
+
+    def _put(self, upload_id, offset, data):
+        return self.client.put(f'/uploads/chunked/{upload_id}?offset={offset}', data=data)
+
+    def test_resume_after_dropped_connection(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0, self.content[:1000]).status_code, 200)
+
+        # O cliente perdeu a resposta e reenviou o mesmo bloco: nada é duplicado
+        retry = self._put(upload_id, 0, self.content[:1000])
+        self.assertEqual(retry.status_code, 409)
+
+        status = self.client.get(f'/uploads/chunked/{upload_id}').get_json()
+        self.assertEqual(status['received'], 1000)
+        self.assertFalse(status['complete'])
+
+        offset = status['received']
+        for start in range(offset, len(self.content), 1000):
+            response = self._put(upload_id, start, self.content[start:start + 1000])
+            self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['complete'])
+
+        with app.test_request_context():
+            stored = store_chunked_upload(upload_id, self.owner_id)
+            with open(stored.file_path, 'rb') as f:
+                self.assertEqual(f.read(), self.content)
+            self.assertEqual(stored.sha256, hashlib.sha256(self.content).hexdigest())
+            self.assertTrue(release_file(stored.file_path))
+
+    def test_incomplete_upload_is_not_stored(self):
+        upload_id = self._start()
+        self._put(upload_id, 0, self.content[:10])
+        with app.test_request_context():
+            with self.assertRaises(UploadError):
+                store_chunked_upload(upload_id, self.owner_id)
+
+    def test_chunk_beyond_declared_size(self):
+        upload_id = self._start()
+        response = self._put(upload_id, 0, self.content + b'extra')
+        self.assertEqual(response.status_code, 409)
+
+    def test_rejected_chunk_leaves_no_bytes(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0, self.content[:1000]).status_code, 200)
+        # Lido em vários pedaços: o excesso só aparece depois de parte do bloco
+        with mock.patch.object(upload_store, 'COPY_BUFFER_SIZE', 256):
+            self.assertEqual(self._put(upload_id, 1000, self.content[1000:] + b'extra').status_code, 409)
+
+        # O reenvio correto no mesmo deslocamento é aceito
+        response = self._put(upload_id, 1000, self.content[1000:])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['complete'])
+
+    def test_overlapping_retry_is_written_once(self):
+        upload_id = self._start()
+        barrier = threading.Barrier(2, timeout=5)
+        results = []
+
+        class SlowStream:
+            """Corpo entregue em uma leitura; o fim só chega quando os dois envios leram tudo."""
+
+            def __init__(self, data):
+                self.data = data
+
+            def read(self, size):
+                data, self.data = self.data, b''
+                if not data:
+                    barrier.wait()
+                return data
+
+        def send():
+            with app.test_request_context():
+                try:
+                    results.append(append_chunk(upload_id, self.owner_id, 0, SlowStream(self.content[:1000])))
+                except UploadError as e:
+                    results.append(e)
+
+        threads = [threading.Thread(target=send) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(isinstance(result, UploadError) for result in results), 1)
+        with app.test_request_context():
+            self.assertEqual(chunked_upload_status(upload_id, self.owner_id)['received'], 1000)
+
+    def test_session_belongs_to_owner(self):
+        upload_id = self._start()
+        other = app.test_client()
+        login(other, self.other_id)
+        self.assertEqual(other.get(f'/uploads/chunked/{upload_id}').status_code, 404)
+        self.assertEqual(other.put(f'/uploads/chunked/{upload_id}?offset=0', data=b'x').status_code, 409)
+
+    def test_disallowed_extension(self):
+        response = self.client.post('/uploads/chunked', json={'filename': 'script.exe', 'size': 10})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContentAddressedStoreTest(unittest.TestCase):
+    """Deduplicação e contagem de referências."""
+
+    def _store(self, content, filename):
+        return store_upload(FileStorage(stream=io.BytesIO(content), filename=filename))
+
+    def test_same_content_is_stored_once(self):
+        content = os.urandom(2048)
+        with app.test_request_context():
+            first = self._store(content, 'a.pdf')
+            second = self._store(content, 'b.pdf')
+            self.assertFalse(first.deduplicated)
+            self.assertTrue(second.deduplicated)
+            self.assertEqual(first.file_path, second.file_path)
+            self.assertEqual(StoredFile.query.filter_by(sha256=first.sha256).one().ref_count, 2)
+
+            # O arquivo só sai do disco quando a última referência é liberada
+            self.assertFalse(release_file(first.file_path))
+            self.assertTrue(os.path.exists(first.file_path))
+            self.assertTrue(release_file(second.file_path))
+            self.assertFalse(os.path.exists(first.file_path))
+            self.assertIsNone(StoredFile.query.filter_by(sha256=first.sha256).first())
+
+
+class UploadPageTest(unittest.TestCase):
+    """A página de envio de laudos carrega o script de upload em partes."""
+
+    def test_chunked_upload_script_is_rendered(self):
+        client = app.test_client()
+        login(client, create_user('upload_pagina'))
+        response = client.get('/reports/upload')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('js/chunked_upload.js', response.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
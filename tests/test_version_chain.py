@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes das linhagens de versões
+
+As linhas mantidas a cada flush devem coincidir com as recalculadas do zero
+por version_chain.rebuild(), e as consultas devem funcionar também para
+registros sem linha (pela CTE recursiva).
+"""
+
+import unittest
+
+from support import app, db, make_report
+from models import Report, VersionChainEntry
+from utils import version_chain
+
+SUPPLIER = 'Versões Fornecedor'
+
+
+def _snapshot():
+    ids = [r.id for r in Report.query.filter_by(supplier=SUPPLIER)]
+    entries = VersionChainEntry.query.filter(
+        VersionChainEntry.entity_type == 'Report', VersionChainEntry.entity_id.in_(ids)
+    )
+    return {e.entity_id: (e.lineage_id, e.version, bool(e.is_latest)) for e in entries}
+
+
+class VersionChainTest(unittest.TestCase):
+    """Manutenção incremental e consultas das linhagens."""
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self._cleanup()
+
+    def tearDown(self):
+        db.session.rollback()
+        self._cleanup()
+        self.ctx.pop()
+
+    def _cleanup(self):
+        # Exclusão pelo ORM (versões mais novas primeiro) para manter as linhagens
+        for report in Report.query.filter_by(supplier=SUPPLIER).order_by(Report.id.desc()):
+            db.session.delete(report)
+        db.session.commit()
+
+    def _report(self, parent=None, **fields):
+        return make_report(
+            db.session, supplier=SUPPLIER,
+            parent_id=parent.id if parent else None,
+            version=(parent.version or 1) + 1 if parent else 1,
+            **fields
+        )
+
+    def _chain(self, length):
+        versions = [self._report()]
+        db.session.commit()
+        for _ in range(length - 1):
+            versions.append(self._report(versions[-1]))
+            db.session.commit()
+        return versions
+
+    def assertMatchesRebuild(self):
+        incremental = _snapshot()
+        version_chain.rebuild(db.session)
+        self.assertEqual(incremental, _snapshot())
+
+    def test_inserts_match_rebuild(self):
+        first = self._chain(4)
+        second = self._chain(1)
+        # Versão anterior e nova gravadas no mesmo flush
+        root = self._report()
+        db.session.flush()
+        self._report(root)
+        db.session.commit()
+
+        snapshot = _snapshot()
+        self.assertEqual(snapshot[first[-1].id], (first[0].id, 4, True))
+        self.assertEqual(snapshot[first[1].id], (first[0].id, 2, False))
+        self.assertEqual(snapshot[second[0].id], (second[0].id, 1, True))
+        self.assertMatchesRebuild()
+
+    def test_deletes_and_moves_match_rebuild(self):
+        first = self._chain(3)
+        second = self._chain(2)
+
+        db.session.delete(first[-1])
+        db.session.commit()
+        self.assertEqual(version_chain.latest(db.session, Report, first[0].id).id, first[1].id)
+
+        # Última versão da segunda cadeia passa a continuar a primeira
+        second[-1].parent_id = first[1].id
+        second[-1].version = 3
+        db.session.commit()
+
+        self.assertEqual(
+            [r.id for r in version_chain.lineage(db.session, Report, first[0].id)],
+            [first[0].id, first[1].id, second[-1].id]
+        )
+        self.assertMatchesRebuild()
+
+    def test_current_filter_hides_superseded_versions(self):
+        versions = self._chain(3)
+        current = Report.query.filter_by(supplier=SUPPLIER).filter(version_chain.current_filter(Report)).all()
+        self.assertEqual([r.id for r in current], [versions[-1].id])
+
+    def test_records_without_entries_use_recursive_query(self):
+        versions = self._chain(3)
+        VersionChainEntry.query.filter(
+            VersionChainEntry.entity_type == 'Report',
+            VersionChainEntry.entity_id.in_([r.id for r in versions])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        self.assertEqual(
+            [r.id for r in version_chain.lineage(db.session, Report, versions[1].id)],
+            [r.id for r in versions]
+        )
+        self.assertEqual(version_chain.latest(db.session, Report, versions[0].id).id, versions[-1].id)
+
+
+if __name__ == '__main__':
+    unittest.main()
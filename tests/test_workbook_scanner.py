@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes da varredura de planilhas (detecção de campos de formulário)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import openpyxl
+from openpyxl.styles import Font
+
+# Adicionar diretório raiz ao path para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from utils.workbook_scanner import (  # noqa: E402
+    RULE_BLANK, RULE_HEADER, RULE_LABEL, RULE_LABEL_STRICT, RULE_PLACEHOLDER,
+    classify_text, scan_workbook
+)
+
+
+class ClassifyTextTest(unittest.TestCase):
+    """Regras aplicadas a textos isolados."""
+
+    def test_rules(self):
+        cases = {
+            'Lote: ___': {RULE_BLANK, RULE_LABEL},
+            '{{produto}}': {RULE_PLACEHOLDER},
+            '[campo]': {RULE_PLACEHOLDER},
+            'Assinatura ________': {RULE_BLANK, RULE_PLACEHOLDER},
+            'Temperatura (°C)': {RULE_LABEL},
+            'Aprovado?': {RULE_LABEL},
+            'Responsável:': {RULE_LABEL, RULE_LABEL_STRICT},
+            'Nome do analista': {RULE_LABEL},
+            'Texto livre': set(),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text):
+                self.assertEqual(classify_text(text), frozenset(expected))
+
+    def test_rule_subset(self):
+        self.assertEqual(classify_text('Lote: ___', rules=(RULE_BLANK,)), frozenset({RULE_BLANK}))
+
+
+class ScanWorkbookTest(unittest.TestCase):
+    """Varredura completa de um arquivo .xlsx."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmp_dir, 'formulario.xlsx')
+
+        workbook = openpyxl.Workbook()
+        principal = workbook.active
+        principal.title = 'Principal'
+        principal['A1'] = 'FICHA DE CONTROLE'
+        principal['A1'].font = Font(bold=True)
+        principal['A2'] = 'Produto:'
+        principal['B2'] = 'Suco de laranja'
+        principal['C3'] = 'Lote:'
+        principal['C4'] = 'L-123'
+        principal['A5'] = 'Assinatura ___'
+        principal['A30'] = 'Observação:'
+
+        extra = workbook.create_sheet('Extra')
+        extra['A1'] = '{{campo}}'
+        workbook.save(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def _fields(self, **options):
+        return list(scan_workbook(self.path, **options))
+
+    def test_all_sheets(self):
+        sheets = {field.sheet for field in self._fields()}
+        self.assertEqual(sheets, {'Principal', 'Extra'})
+
+    def test_active_only_and_sheet_filter(self):
+        self.assertEqual({f.sheet for f in self._fields(active_only=True)}, {'Principal'})
+        self.assertEqual({f.sheet for f in self._fields(sheets=['Extra'])}, {'Extra'})
+
+    def test_neighbors(self):
+        fields = {f.value: f for f in self._fields(rules=(RULE_LABEL_STRICT,), neighbors=True, active_only=True)}
+        # Vizinho à direita, ou abaixo quando o rótulo está na última coluna
+        self.assertEqual(fields['Produto:'].neighbor, 'Suco de laranja')
+        self.assertEqual(fields['Lote:'].neighbor, 'L-123')
+        self.assertEqual((fields['Lote:'].row, fields['Lote:'].column), (3, 3))
+
+    def test_row_cap(self):
+        values = {f.value for f in self._fields(active_only=True, max_row=10)}
+        self.assertIn('Assinatura ___', values)
+        self.assertNotIn('Observação:', values)
+
+    def test_header_zone(self):
+        headers = [f for f in self._fields(active_only=True, header_zone=(2, 2)) if RULE_HEADER in f.kinds]
+        self.assertEqual([h.value for h in headers], ['FICHA DE CONTROLE'])
+
+    def test_single_pass_per_sheet(self):
+        rows = []
+        sheets = []
+        list(scan_workbook(
+            self.path,
+            on_sheet=lambda name, worksheet: sheets.append(name),
+            on_row=lambda name, row, values: rows.append((name, row))
+        ))
+        self.assertEqual(sheets, ['Principal', 'Extra'])
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(len([r for r in rows if r[0] == 'Principal']), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
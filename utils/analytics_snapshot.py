@@ -0,0 +1,407 @@
+"""
+Snapshots colunares (Parquet) de tabelas para análises fora do banco de produção.
+
+Cada tabela é gravada em ANALYTICS_SNAPSHOT_FOLDER particionada por mês, no
+formato de pastas do Hive:
+
+    <pasta>/<tabela>/month=2024-05/part-20240601T030000-1a2b3c4d.parquet
+
+As execuções são incrementais: a marca d'água (_watermark.json na pasta da
+tabela) guarda a última posição exportada e cada execução acrescenta só as
+linhas incluídas ou alteradas depois dela, em arquivos novos. Uma linha
+alterada aparece de novo num arquivo posterior; load_snapshot devolve apenas
+a versão mais recente de cada id. Quando a marca é uma data gravada pela
+aplicação (updated_date, preenchida no flush e não no commit), uma transação
+confirmada depois da exportação pode ter data anterior à marca; por isso os
+últimos minutos antes dela (overlap) são relidos a cada execução, e as
+linhas repetidas são descartadas na leitura. Exclusões não são propagadas: a exportação
+completa (full=True) refaz a tabela do zero e compact() reescreve cada mês
+num único arquivo sem versões repetidas.
+
+O agendamento fica a cargo do sistema (cron, Agendador de Tarefas), por
+exemplo a cada hora:
+
+    0 * * * *  cd /opt/zelopack && flask --app main analytics-snapshot
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select, types
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.analytics_snapshot')
+
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_COMPRESSION = 'zstd'
+PARTITION_FIELD = 'month'
+NO_DATE_PARTITION = 'sem-data'
+WATERMARK_FILE = '_watermark.json'
+LOCK_FILE = '.lock'
+LOCK_STALE_SECONDS = 6 * 3600
+EPOCH = datetime(1970, 1, 1)
+
+# Tabela -> colunas da marca d'água (em ordem, a última é única), coluna do mês
+# e janela relida antes da marca (datas atribuídas antes do commit)
+TABLES = {
+    'reports': {'cursor': ('updated_date', 'id'), 'partition': 'upload_date', 'overlap': timedelta(minutes=15)},
+    'user_activities': {'cursor': ('id',), 'partition': 'created_at'},
+    'movimentacoes_estoque': {'cursor': ('id',), 'partition': 'data_movimentacao'},
+}
+
+
+class SnapshotBusy(Exception):
+    """Outra exportação está em andamento na mesma pasta."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('pyarrow não está instalado; instale-o para gerar ou ler os snapshots analíticos')
+    return pyarrow
+
+
+def _table(name):
+    # Importar db via models registra as tabelas no metadata
+    from models import db
+
+    if name not in TABLES:
+        raise ValueError(f'Tabela sem snapshot analítico: {name}')
+    return db.metadata.tables[name]
+
+
+def arrow_schema(name):
+    """Esquema Arrow da tabela, derivado das colunas do modelo (mais a partição)."""
+    pa = _pyarrow()
+    fields = []
+    for column in _table(name).columns:
+        column_type = column.type
+        if isinstance(column_type, types.Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column_type, types.Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, (types.Float, types.Numeric)):
+            arrow_type = pa.float64()
+        elif isinstance(column_type, types.DateTime):
+            arrow_type = pa.timestamp('us')
+        elif isinstance(column_type, types.Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    fields.append(pa.field(PARTITION_FIELD, pa.string()))
+    return pa.schema(fields)
+
+
+def _partition(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m')
+    return NO_DATE_PARTITION
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _from_json(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+# Marca d'água e trava --------------------------------------------------------
+
+def read_watermark(folder, name):
+    """Estado da última exportação da tabela ou None se nunca exportada."""
+    path = os.path.join(folder, name, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_watermark(folder, name, state):
+    path = os.path.join(folder, name, WATERMARK_FILE)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+class _FolderLock:
+    """Trava por arquivo (O_EXCL), válida entre processos e no Windows."""
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, LOCK_FILE)
+
+    def __enter__(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.path)
+                except FileNotFoundError:
+                    continue
+                if age < LOCK_STALE_SECONDS:
+                    raise SnapshotBusy(f'Exportação em andamento ({self.path})')
+                logger.warning(f"Removendo trava abandonada de snapshot analítico: {self.path}")
+                os.remove(self.path)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return self
+        raise SnapshotBusy(f'Exportação em andamento ({self.path})')
+
+    def __exit__(self, *exc_info):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# Exportação ------------------------------------------------------------------
+
+def _cursor_expression(column):
+    # Datas nulas contam como as mais antigas (a ordem de NULL varia entre bancos)
+    if isinstance(column.type, types.DateTime):
+        return func.coalesce(column, EPOCH)
+    return column
+
+
+def _cursor_value(column, value):
+    if value is None and isinstance(column.type, types.DateTime):
+        return EPOCH
+    return value
+
+
+def _changed_rows(session, table, cursor_columns, watermark, chunk_size, overlap=None):
+    columns = [_cursor_expression(table.c[name]) for name in cursor_columns]
+    query = select(table).order_by(*columns)
+    if watermark is not None and overlap:
+        # Relê a janela antes da marca: a data é atribuída no flush, antes do commit
+        query = query.where(columns[0] >= _from_json(watermark[0]) - overlap)
+    elif watermark is not None:
+        # Posição estritamente posterior à marca, comparando a tupla coluna a coluna
+        position = [_from_json(value) for value in watermark]
+        conditions = []
+        for index, column in enumerate(columns):
+            equal = [columns[i] == position[i] for i in range(index)]
+            conditions.append(and_(*equal, column > position[index]))
+        query = query.where(or_(*conditions))
+    return session.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+
+
+def _export_table(session, folder, name, full, chunk_size, compression):
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    spec = TABLES[name]
+    table = _table(name)
+    schema = arrow_schema(name)
+    column_names = [column.name for column in table.columns]
+    text_columns = {field.name for field in schema if field.type == pa.string()}
+    table_folder = os.path.join(folder, name)
+    previous = None if full else read_watermark(folder, name)
+    watermark = previous['cursor'] if previous else None
+
+    # A exportação completa é montada ao lado e substitui a pasta no final
+    target = os.path.join(folder, f'.{name}-full') if full else table_folder
+    if full:
+        shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target, exist_ok=True)
+
+    run_id = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    writers = {}
+    exported = 0
+    last_row = None
+    try:
+        result = _changed_rows(session, table, spec['cursor'], watermark, chunk_size, spec.get('overlap'))
+        for chunk in result.partitions():
+            batches = {}
+            for row in chunk:
+                batches.setdefault(_partition(row._mapping[spec['partition']]), []).append(row)
+            for month, rows in batches.items():
+                data = {column: [row._mapping[column] for row in rows] for column in column_names}
+                for column in text_columns.intersection(data):
+                    data[column] = [value if value is None or isinstance(value, str) else str(value)
+                                    for value in data[column]]
+                data[PARTITION_FIELD] = [month] * len(rows)
+                if month not in writers:
+                    partition_folder = os.path.join(target, f'{PARTITION_FIELD}={month}')
+                    os.makedirs(partition_folder, exist_ok=True)
+                    final_path = os.path.join(partition_folder, f'part-{run_id}-{uuid.uuid4().hex[:8]}.parquet')
+                    # Arquivos iniciados por "." são ignorados na leitura até o rename
+                    temp_path = os.path.join(partition_folder, '.' + os.path.basename(final_path) + '.tmp')
+                    writers[month] = (pq.ParquetWriter(temp_path, schema, compression=compression), temp_path, final_path)
+                writers[month][0].write_table(pa.Table.from_pydict(data, schema=schema))
+            exported += len(chunk)
+            last_row = chunk[-1]
+    except Exception:
+        for writer, temp_path, _final_path in writers.values():
+            writer.close()
+            os.remove(temp_path)
+        if full:
+            shutil.rmtree(target, ignore_errors=True)
+        raise
+
+    for writer, temp_path, final_path in writers.values():
+        writer.close()
+        os.replace(temp_path, final_path)
+
+    if full:
+        shutil.rmtree(table_folder, ignore_errors=True)
+        os.replace(target, table_folder)
+
+    # Gravada por último: se algo falhar antes, a próxima execução repete as
+    # linhas e a leitura descarta as versões duplicadas
+    if last_row is not None:
+        cursor = [_json_value(_cursor_value(table.c[column], last_row._mapping[column])) for column in spec['cursor']]
+    else:
+        cursor = watermark
+    _write_watermark(folder, name, {
+        'cursor': cursor,
+        'cursor_columns': list(spec['cursor']),
+        'rows_exported': exported,
+        'total_rows_exported': exported + (previous or {}).get('total_rows_exported', 0),
+        'updated_at': datetime.utcnow().isoformat(),
+    })
+    return exported
+
+
+def export_snapshots(session, folder, tables=None, full=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                     compression=DEFAULT_COMPRESSION):
+    """
+    Acrescenta aos snapshots as linhas alteradas desde a última exportação.
+
+    Args:
+        session: Sessão do SQLAlchemy
+        folder: Pasta dos snapshots
+        tables: Tabelas exportadas (padrão: todas de TABLES)
+        full: Refazer as tabelas do zero em vez de exportar só as alterações
+        chunk_size: Linhas lidas do banco por vez (um row group por mês)
+        compression: Compressão do Parquet (zstd, snappy, gzip...)
+
+    Returns:
+        Dicionário tabela -> linhas exportadas
+
+    Raises:
+        SnapshotBusy: Se outra exportação estiver usando a pasta
+    """
+    from utils import metrics
+
+    os.makedirs(folder, exist_ok=True)
+    started = time.monotonic()
+    status = 'failed'
+    exported = {}
+    try:
+        with _FolderLock(folder):
+            for name in tables or TABLES:
+                exported[name] = _export_table(session, folder, name, full, chunk_size, compression)
+                logger.info(f"Snapshot analítico de {name}: {exported[name]} linha(s) exportada(s)")
+        status = 'done'
+    finally:
+        metrics.observe_job('snapshot_analitico', status, time.monotonic() - started)
+    return exported
+
+
+def compact(folder, name, months=None, compression=DEFAULT_COMPRESSION):
+    """
+    Reescreve cada mês da tabela num único arquivo, só com a versão mais recente de cada id.
+
+    Args:
+        months: Meses ('AAAA-MM') compactados (padrão: todos)
+
+    Returns:
+        Número de meses reescritos
+    """
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    table_folder = os.path.join(folder, name)
+    if not os.path.isdir(table_folder):
+        return 0
+    rewritten = 0
+    schema = arrow_schema(name)
+    with _FolderLock(folder):
+        for entry in sorted(os.listdir(table_folder)):
+            if not entry.startswith(f'{PARTITION_FIELD}='):
+                continue
+            month = entry.split('=', 1)[1]
+            if months and month not in months:
+                continue
+            partition_folder = os.path.join(table_folder, entry)
+            parts = sorted(f for f in os.listdir(partition_folder) if f.endswith('.parquet') and not f.startswith('.'))
+            if len(parts) < 2:
+                continue
+            frame = _latest_versions(name, load_snapshot(folder, name, months=[month], latest=False))
+            final_path = os.path.join(partition_folder, f'part-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet')
+            temp_path = os.path.join(partition_folder, '.compact.parquet.tmp')
+            frame[PARTITION_FIELD] = month
+            pq.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False), temp_path,
+                           compression=compression)
+            os.replace(temp_path, final_path)
+            for part in parts:
+                os.remove(os.path.join(partition_folder, part))
+            rewritten += 1
+    return rewritten
+
+
+# Leitura ---------------------------------------------------------------------
+
+def _latest_versions(name, frame):
+    cursor = list(TABLES[name]['cursor'])
+    return frame.sort_values(cursor, kind='stable', na_position='first').drop_duplicates('id', keep='last').reset_index(drop=True)
+
+
+def load_snapshot(folder, name, columns=None, months=None, latest=True):
+    """
+    Carrega o snapshot de uma tabela como DataFrame do pandas.
+
+    Só as colunas pedidas são lidas dos arquivos e os meses fora do filtro
+    nem são abertos.
+
+    Args:
+        folder: Pasta dos snapshots
+        name: Tabela (chave de TABLES)
+        columns: Colunas desejadas (padrão: todas, mais "month")
+        months: Meses ('AAAA-MM') carregados (padrão: todos)
+        latest: Manter só a versão mais recente de cada id
+
+    Returns:
+        pandas.DataFrame (vazio se a tabela nunca foi exportada)
+    """
+    _pyarrow()
+    import pyarrow.dataset as ds
+
+    schema = arrow_schema(name)
+    columns = list(columns) if columns else schema.names
+    unknown = [column for column in columns if column not in schema.names]
+    if unknown:
+        raise ValueError(f"Colunas inexistentes em {name}: {', '.join(unknown)}")
+
+    table_folder = os.path.join(folder, name)
+    if not os.path.isdir(table_folder):
+        return schema.empty_table().select(columns).to_pandas()
+
+    # As colunas da marca d'água são lidas também para escolher a versão mais recente
+    read_columns = list(columns)
+    if latest:
+        read_columns += [column for column in TABLES[name]['cursor'] if column not in read_columns]
+    dataset = ds.dataset(table_folder, schema=schema, format='parquet', partitioning='hive')
+    filter_expression = ds.field(PARTITION_FIELD).isin(list(months)) if months else None
+    frame = dataset.to_table(columns=read_columns, filter=filter_expression).to_pandas()
+    if latest:
+        frame = _latest_versions(name, frame)[columns]
+    return frame
@@ -0,0 +1,156 @@
+"""
+Armazenamento temporário de documentos gerados (formulários preenchidos,
+documentos editados no editor online).
+
+Cada artefato fica em ARTIFACT_FOLDER/<usuario>/<id_do_trabalho>/<arquivo>,
+de modo que usuários e preenchimentos simultâneos nunca disputam o mesmo
+caminho. Artefatos expiram após ARTIFACT_TTL segundos e o espaço total é
+limitado por ARTIFACT_MAX_BYTES (os mais antigos são removidos primeiro).
+"""
+
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.artifacts')
+
+# Padrões do armazenamento
+DEFAULT_TTL = 3600  # segundos
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+DEFAULT_GC_INTERVAL = 60  # segundos entre coletas automáticas
+
+_ARTIFACT_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ArtifactStore:
+    """Diretório de artefatos gerados com expiração e limite de espaço."""
+
+    def __init__(self, root, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, gc_interval=DEFAULT_GC_INTERVAL):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.gc_interval = gc_interval
+        self._gc_lock = threading.Lock()
+        self._last_gc = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _owner_dir(self, owner_id):
+        return os.path.join(self.root, str(int(owner_id or 0)))
+
+    def _artifact_dir(self, owner_id, artifact_id):
+        if not artifact_id or not _ARTIFACT_ID_RE.match(artifact_id):
+            return None
+        return os.path.join(self._owner_dir(owner_id), artifact_id)
+
+    def create(self, owner_id, filename):
+        """
+        Reserva o caminho de um novo artefato.
+
+        Args:
+            owner_id: ID do usuário dono do artefato
+            filename: Nome do arquivo gerado
+
+        Returns:
+            Tupla (artifact_id, caminho_completo)
+        """
+        self.maybe_collect()
+        artifact_id = uuid.uuid4().hex
+        artifact_dir = self._artifact_dir(owner_id, artifact_id)
+        os.makedirs(artifact_dir)
+        return artifact_id, os.path.join(artifact_dir, os.path.basename(filename))
+
+    def get_path(self, owner_id, artifact_id):
+        """
+        Caminho do artefato, se existir e não estiver expirado.
+
+        Returns:
+            Caminho completo ou None
+        """
+        artifact_dir = self._artifact_dir(owner_id, artifact_id)
+        if artifact_dir is None or not os.path.isdir(artifact_dir):
+            return None
+        if time.time() - os.path.getmtime(artifact_dir) > self.ttl:
+            self.delete(owner_id, artifact_id)
+            return None
+        names = os.listdir(artifact_dir)
+        if not names:
+            return None
+        return os.path.join(artifact_dir, names[0])
+
+    def delete(self, owner_id, artifact_id):
+        """Remove um artefato."""
+        artifact_dir = self._artifact_dir(owner_id, artifact_id)
+        if artifact_dir is not None:
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+
+    def _list_artifacts(self):
+        artifacts = []
+        for owner in os.listdir(self.root):
+            owner_dir = os.path.join(self.root, owner)
+            if not os.path.isdir(owner_dir):
+                continue
+            for artifact_id in os.listdir(owner_dir):
+                artifact_dir = os.path.join(owner_dir, artifact_id)
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(artifact_dir) if entry.is_file())
+                    artifacts.append((os.path.getmtime(artifact_dir), size, artifact_dir))
+                except OSError:
+                    continue
+        return artifacts
+
+    def collect_garbage(self):
+        """
+        Remove artefatos expirados e, se necessário, os mais antigos até
+        que o espaço ocupado fique dentro do limite.
+
+        Returns:
+            Número de artefatos removidos
+        """
+        with self._gc_lock:
+            self._last_gc = time.time()
+            cutoff = self._last_gc - self.ttl
+            artifacts = sorted(self._list_artifacts())
+            total = sum(size for _, size, _ in artifacts)
+            removed = 0
+
+            for mtime, size, artifact_dir in artifacts:
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                shutil.rmtree(artifact_dir, ignore_errors=True)
+                total -= size
+                removed += 1
+
+            if removed:
+                logger.info(f"{removed} artefatos removidos ({total} bytes em uso)")
+            return removed
+
+    def maybe_collect(self):
+        """Executa a coleta se o intervalo mínimo já passou."""
+        if time.time() - self._last_gc >= self.gc_interval:
+            try:
+                self.collect_garbage()
+            except OSError as e:
+                logger.warning(f"Erro na coleta de artefatos: {str(e)}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store(app):
+    """Retorna o armazenamento de artefatos do processo, criando-o na primeira chamada."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore(
+                    app.config.get('ARTIFACT_FOLDER') or os.path.join(app.config['UPLOAD_FOLDER'], 'artifacts'),
+                    ttl=app.config.get('ARTIFACT_TTL', DEFAULT_TTL),
+                    max_bytes=app.config.get('ARTIFACT_MAX_BYTES', DEFAULT_MAX_BYTES)
+                )
+    return _store
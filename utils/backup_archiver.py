@@ -0,0 +1,336 @@
+"""
+Gravação de arquivos ZIP de backup em fluxo, com compressão em paralelo.
+
+Os arquivos de origem (uploads, logs, dump do banco) vão direto para o ZIP,
+sem cópia prévia para uma pasta temporária: cada byte é lido uma vez e
+gravado uma vez, e não é preciso espaço livre do tamanho dos uploads.
+
+Cada arquivo é dividido em blocos (CHUNK_SIZE) comprimidos em paralelo por
+threads (zlib libera o GIL); a thread principal grava os blocos no ZIP na
+ordem original. Como em pigz, cada bloco é um trecho deflate independente
+terminado em Z_SYNC_FLUSH (o último em Z_FINISH), e a concatenação é um
+fluxo deflate válido; os CRCs dos blocos são combinados (crc32_combine).
+Formatos já comprimidos (PDF, XLSX, DOCX, JPG...) são guardados sem
+compressão (ZIP_STORED), só com o CRC calculado nas threads.
+
+O número de blocos em andamento é limitado, então a memória usada não
+depende do tamanho dos arquivos. O progresso (arquivos, bytes e MB/s) é
+registrado no log e pode ser repassado a uma função de retorno.
+"""
+
+import functools
+import logging
+import os
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.backup_archiver')
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_COMPRESSION_LEVEL = 6
+PENDING_CHUNKS_PER_WORKER = 4
+REPORT_EVERY = 5.0  # segundos entre registros de progresso
+
+# Formatos que já são comprimidos: recomprimir gasta CPU e quase não reduz o tamanho
+STORED_EXTENSIONS = frozenset({
+    '.pdf', '.xlsx', '.xlsm', '.docx', '.pptx', '.odt', '.ods', '.odp',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar',
+    '.mp3', '.mp4', '.mov', '.avi', '.parquet',
+})
+
+# Assinaturas de conteúdo já comprimido (ex.: pg_dump -F c grava em .sql)
+_COMPRESSED_MAGIC = (b'PGDMP', b'PK\x03\x04', b'\x1f\x8b', b'\x28\xb5\x2f\xfd')
+
+
+def should_store(path):
+    """True se o arquivo deve ir para o ZIP sem compressão."""
+    if os.path.splitext(path)[1].lower() in STORED_EXTENSIONS:
+        return True
+    try:
+        with open(path, 'rb') as f:
+            return f.read(8).startswith(_COMPRESSED_MAGIC)
+    except OSError:
+        return False
+
+
+def collect_tree(folder, prefix, exclude=(), extensions=None):
+    """
+    Arquivos de uma pasta (recursivo) como pares (caminho, nome no ZIP).
+
+    Args:
+        folder: Pasta de origem
+        prefix: Pasta dentro do ZIP (ex.: 'uploads')
+        exclude: Pastas ignoradas (ex.: a própria pasta de backups)
+        extensions: Se informado, só arquivos com estas extensões
+    """
+    excluded = {os.path.realpath(path) for path in exclude if path}
+    members = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) not in excluded)
+        for name in sorted(files):
+            if extensions and os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            path = os.path.join(root, name)
+            arcname = os.path.join(prefix, os.path.relpath(path, folder)).replace(os.sep, '/')
+            members.append((path, arcname))
+    return members
+
+
+# CRC de blocos -------------------------------------------------------------
+
+def _gf2_times(matrix, vector):
+    total = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return total
+
+
+def _gf2_compose(outer, inner):
+    return [_gf2_times(outer, column) for column in inner]
+
+
+@functools.lru_cache(maxsize=64)
+def _zeros_operator(length):
+    """Operador (GF(2)) que avança um CRC-32 por length bytes zero."""
+    bit = [0xEDB88320] + [1 << n for n in range(31)]
+    power = _gf2_compose(bit, bit)      # 2 bits
+    power = _gf2_compose(power, power)  # 4 bits
+    power = _gf2_compose(power, power)  # 1 byte
+    operator = [1 << n for n in range(32)]
+    while length:
+        if length & 1:
+            operator = _gf2_compose(power, operator)
+        length >>= 1
+        if length:
+            power = _gf2_compose(power, power)
+    return tuple(operator)
+
+
+def crc32_combine(crc1, crc2, length2):
+    """CRC-32 da concatenação A+B a partir de crc(A), crc(B) e len(B) (como zlib.crc32_combine)."""
+    if length2 <= 0:
+        return crc1
+    return _gf2_times(_zeros_operator(length2), crc1) ^ crc2
+
+
+# Gravação ------------------------------------------------------------------
+
+def _read_chunk(path, offset, length, stored, level, last):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        raw = f.read(length)
+    crc = zlib.crc32(raw)
+    if stored:
+        return raw, crc, len(raw)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(raw) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return data, crc, len(raw)
+
+
+class _MemberWriter:
+    """
+    Grava no ZIP um arquivo cujos dados já vêm comprimidos.
+
+    Espelha ZipFile.open(mode='w') (cabeçalho local, dados e cabeçalho
+    reescrito com CRC e tamanhos), que só aceita dados ainda por comprimir.
+    """
+
+    def __init__(self, zipf, zinfo):
+        self.zipf = zipf
+        self.zinfo = zinfo
+        zinfo.compress_size = 0
+        zinfo.CRC = 0
+        zinfo.flag_bits = 0
+        self.zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        zipf.fp.write(zinfo.FileHeader(self.zip64))
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+
+    def write(self, data, crc, raw_length):
+        self.zipf.fp.write(data)
+        self.crc = crc32_combine(self.crc, crc, raw_length)
+        self.file_size += raw_length
+        self.compress_size += len(data)
+
+    def close(self):
+        zinfo = self.zinfo
+        if not self.zip64 and max(self.file_size, self.compress_size) > zipfile.ZIP64_LIMIT:
+            raise zipfile.LargeZipFile(f'{zinfo.filename}: tamanho exige ZIP64')
+        zinfo.CRC = self.crc
+        zinfo.file_size = self.file_size
+        zinfo.compress_size = self.compress_size
+        fp = self.zipf.fp
+        end = fp.tell()
+        fp.seek(zinfo.header_offset)
+        fp.write(zinfo.FileHeader(self.zip64))
+        fp.seek(end)
+        self.zipf.start_dir = end
+        self.zipf.filelist.append(zinfo)
+        self.zipf.NameToInfo[zinfo.filename] = zinfo
+
+    def discard(self):
+        # Arquivo de origem sumiu ou ficou ilegível no meio da gravação
+        self.zipf.fp.seek(self.zinfo.header_offset)
+        self.zipf.fp.truncate()
+        self.zipf.start_dir = self.zinfo.header_offset
+
+
+class ArchiveProgress:
+    """Andamento da gravação: arquivos, bytes lidos e gravados e vazão."""
+
+    def __init__(self, files_total, bytes_total, callback=None, report_every=REPORT_EVERY):
+        self.files_total = files_total
+        self.bytes_total = bytes_total
+        self.files_done = 0
+        self.bytes_done = 0
+        self.bytes_written = 0
+        self.stored_files = 0
+        self.skipped = []
+        self.started = time.monotonic()
+        self.callback = callback
+        self.report_every = report_every
+        self._last_report = self.started
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        return {
+            'files_done': self.files_done,
+            'files_total': self.files_total,
+            'bytes_done': self.bytes_done,
+            'bytes_total': self.bytes_total,
+            'bytes_written': self.bytes_written,
+            'stored_files': self.stored_files,
+            'skipped': list(self.skipped),
+            'seconds': round(elapsed, 3),
+            'throughput_mb_s': round(self.bytes_done / elapsed / 1024 / 1024, 2) if elapsed else 0.0,
+            'percent': round(100.0 * self.bytes_done / self.bytes_total, 1) if self.bytes_total else 100.0,
+        }
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < self.report_every:
+            return
+        self._last_report = now
+        data = self.to_dict()
+        logger.info(
+            f"Backup: {data['files_done']}/{data['files_total']} arquivo(s), {data['percent']}% "
+            f"({data['bytes_done'] / 1024 / 1024:.1f} de {data['bytes_total'] / 1024 / 1024:.1f} MB), "
+            f"{data['throughput_mb_s']} MB/s"
+        )
+        if self.callback:
+            self.callback(data)
+
+
+def _chunks(size):
+    # (deslocamento, tamanho, último?) de cada bloco; arquivos vazios têm um bloco vazio
+    offsets = list(range(0, size, CHUNK_SIZE)) or [0]
+    return [(offset, min(CHUNK_SIZE, size - offset), offset == offsets[-1]) for offset in offsets]
+
+
+def write_archive(output_path, members, workers=None, level=DEFAULT_COMPRESSION_LEVEL,
+                  progress=None, report_every=REPORT_EVERY):
+    """
+    Grava um ZIP com os arquivos informados, comprimindo em paralelo.
+
+    Args:
+        output_path: Caminho do ZIP a criar
+        members: Pares (caminho de origem, nome no ZIP)
+        workers: Threads de compressão (padrão: número de CPUs)
+        level: Nível de compressão deflate (1 a 9)
+        progress: Função chamada periodicamente com o andamento (dicionário)
+        report_every: Segundos entre registros de progresso
+
+    Returns:
+        Dicionário com o andamento final (ArchiveProgress.to_dict) e workers
+    """
+    workers = workers or os.cpu_count() or 1
+    plan = []
+    for path, arcname in members:
+        try:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        except OSError as e:
+            logger.warning(f"Arquivo ignorado no backup ({arcname}): {e}")
+            continue
+        stored = should_store(path)
+        zinfo.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+        plan.append((path, zinfo, stored))
+
+    state = ArchiveProgress(len(plan), sum(zinfo.file_size for _, zinfo, _ in plan), progress, report_every)
+    max_pending = workers * PENDING_CHUNKS_PER_WORKER
+
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipf, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backup-zip') as pool:
+
+        def submit_all():
+            for path, zinfo, stored in plan:
+                for offset, length, last in _chunks(zinfo.file_size):
+                    future = pool.submit(_read_chunk, path, offset, length, stored, level, last)
+                    yield zinfo, stored, offset == 0, last, future
+
+        tasks = submit_all()
+        pending = deque()
+
+        def fill():
+            while len(pending) < max_pending:
+                task = next(tasks, None)
+                if task is None:
+                    return
+                pending.append(task)
+
+        fill()
+        writer = None
+        failed = None
+        try:
+            while pending:
+                zinfo, stored, first, last, future = pending.popleft()
+                fill()
+                if first:
+                    writer = _MemberWriter(zipf, zinfo)
+                    failed = None
+                if failed is None:
+                    try:
+                        data, crc, raw_length = future.result()
+                    except OSError as e:
+                        failed = e
+                        writer.discard()
+                        state.skipped.append(zinfo.filename)
+                        logger.warning(f"Arquivo ignorado no backup ({zinfo.filename}): {e}")
+                    else:
+                        writer.write(data, crc, raw_length)
+                        state.bytes_done += raw_length
+                        state.bytes_written += len(data)
+                else:
+                    future.cancel()
+                if last and failed is None:
+                    writer.close()
+                    state.files_done += 1
+                    state.stored_files += stored
+                state.report()
+        finally:
+            # Em caso de erro, blocos ainda não iniciados não são lidos à toa
+            for task in pending:
+                task[-1].cancel()
+
+    state.report(force=True)
+    result = state.to_dict()
+    result['workers'] = workers
+    result['bytes_written'] = os.path.getsize(output_path)
+    return result
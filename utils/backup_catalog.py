@@ -0,0 +1,375 @@
+"""
+Catálogo dos backups completos do sistema, em arquivo ao lado dos ZIPs.
+
+Listar os backups abrindo cada ZIP para ler backup_info.json fica mais lento
+a cada arquivo guardado. O catálogo (catalog.json na pasta de backups)
+guarda, por arquivo, as informações do backup, tamanho, data de modificação,
+SHA-256, quantidade de arquivos, tempos de cada etapa e o resultado da
+última verificação. A lista completa dos arquivos incluídos (manifesto:
+nome, tamanho e CRC de cada um) fica em <backup>.manifest.json, lido só
+na verificação.
+
+O catálogo fica na pasta dos backups, e não no banco, para continuar
+correto depois de uma restauração (que substitui o banco). Na listagem, a
+pasta é conferida por nome, tamanho e data: ZIPs novos ou alterados (cópias
+manuais, backups antigos) são catalogados uma vez; entradas de arquivos
+removidos são descartadas.
+
+A verificação confere o SHA-256 do arquivo e o diretório do ZIP contra o
+manifesto; a completa também relê cada arquivo incluído (CRC). Agende
+`flask backups-verify` (ex.: cron semanal) para rodá-la em segundo plano.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import zipfile
+import zlib
+from datetime import datetime, timedelta
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.backup_catalog')
+
+CATALOG_FILE = 'catalog.json'
+LOCK_FILE = '.catalog.lock'
+MANIFEST_SUFFIX = '.manifest.json'
+CATALOG_VERSION = 1
+
+HASH_CHUNK_SIZE = 1024 * 1024
+LOCK_TIMEOUT = 30  # segundos aguardando outro processo atualizar o catálogo
+LOCK_STALE_SECONDS = 300
+
+
+class CatalogBusy(Exception):
+    """Outro processo está atualizando o catálogo há tempo demais."""
+
+
+class _CatalogLock:
+    """Trava por arquivo (O_EXCL), válida entre processos e no Windows; aguarda a liberação."""
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, LOCK_FILE)
+
+    def __enter__(self):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.path)
+                except FileNotFoundError:
+                    continue
+                if age >= LOCK_STALE_SECONDS:
+                    logger.warning(f"Removendo trava abandonada do catálogo de backups: {self.path}")
+                    try:
+                        os.remove(self.path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if time.monotonic() >= deadline:
+                    raise CatalogBusy(f'Catálogo de backups em uso ({self.path})')
+                time.sleep(0.05)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return self
+
+    def __exit__(self, *exc_info):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def file_sha256(path):
+    """SHA-256 de um arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def zip_manifest(path):
+    """Manifesto de um ZIP a partir do diretório central (sem ler o conteúdo)."""
+    with zipfile.ZipFile(path, 'r') as zipf:
+        return [
+            {'name': item.filename, 'size': item.file_size, 'compressed_size': item.compress_size, 'crc': item.CRC}
+            for item in zipf.infolist() if not item.is_dir()
+        ]
+
+
+class BackupCatalog:
+    """Catálogo dos backups de uma pasta."""
+
+    def __init__(self, backup_dir):
+        self.backup_dir = backup_dir
+        self.path = os.path.join(backup_dir, CATALOG_FILE)
+
+    # Leitura e gravação ------------------------------------------------------
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            # Catálogo ilegível: é refeito a partir dos ZIPs
+            logger.error(f"Catálogo de backups ilegível ({e}); será reconstruído")
+            return {}
+        if data.get('version') != CATALOG_VERSION:
+            return {}
+        return data.get('backups', {})
+
+    def _write(self, backups):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CATALOG_VERSION, 'backups': backups}, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def _manifest_path(self, file_name):
+        return os.path.join(self.backup_dir, file_name + MANIFEST_SUFFIX)
+
+    def _write_manifest(self, file_name, manifest):
+        temp_path = f"{self._manifest_path(file_name)}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self._manifest_path(file_name))
+
+    def read_manifest(self, file_name):
+        """Manifesto gravado para o backup (ou None se não houver)."""
+        try:
+            with open(self._manifest_path(file_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Catalogação -------------------------------------------------------------
+
+    def _index_archive(self, file_name, stat, previous=None):
+        """
+        Cataloga um ZIP que não passou por record() (backup antigo ou copiado).
+
+        Se o arquivo já estava catalogado e mudou, o SHA-256 e o manifesto
+        registrados são mantidos: a próxima verificação aponta a alteração.
+        """
+        file_path = os.path.join(self.backup_dir, file_name)
+        if previous and previous.get('sha256') and not previous.get('invalid'):
+            entry = dict(previous, size=stat.st_size, mtime=stat.st_mtime, verification=None)
+            entry['modified_at'] = datetime.fromtimestamp(stat.st_mtime).isoformat()
+            logger.warning(f"Backup {file_name} foi alterado depois de catalogado")
+            return entry
+
+        entry = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': None, 'verification': None}
+        try:
+            with zipfile.ZipFile(file_path, 'r') as zipf:
+                if 'backup_info.json' in zipf.namelist():
+                    with zipf.open('backup_info.json') as f:
+                        entry['info'] = json.load(f)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.error(f"Erro ao ler backup {file_name}: {str(e)}")
+            # Guardado como inválido para não ser reaberto a cada listagem
+            entry['invalid'] = str(e)
+            return entry
+
+        if 'info' not in entry:
+            # Backup sem informações, adicionar informações básicas
+            created_at = datetime.fromtimestamp(stat.st_ctime)
+            entry['info'] = {
+                'name': file_name.replace('.zip', ''),
+                'timestamp': created_at.strftime('%Y%m%d_%H%M%S'),
+                'created_at': created_at.isoformat()
+            }
+        manifest = zip_manifest(file_path)
+        self._write_manifest(file_name, manifest)
+        entry['file_count'] = len(manifest)
+        entry['uncompressed_size'] = sum(item['size'] for item in manifest)
+        return entry
+
+    def _sync(self, backups):
+        """
+        Confere a pasta com o catálogo.
+
+        Returns:
+            Tupla (entradas novas ou refeitas, nomes de arquivos que sumiram)
+        """
+        updated = {}
+        found = set()
+        with os.scandir(self.backup_dir) as it:
+            for item in it:
+                if not item.name.endswith('.zip') or not item.is_file():
+                    continue
+                found.add(item.name)
+                stat = item.stat()
+                entry = backups.get(item.name)
+                if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime:
+                    continue
+                updated[item.name] = self._index_archive(item.name, stat, entry)
+        return updated, set(backups) - found
+
+    def _public(self, file_name, entry):
+        data = dict(entry)
+        data['file_name'] = file_name
+        data['file_path'] = os.path.join(self.backup_dir, file_name)
+        return data
+
+    def entries(self):
+        """
+        Backups da pasta, do mais recente para o mais antigo.
+
+        Returns:
+            Lista de dicionários com file_name, file_path, size, info,
+            sha256, file_count, timings e verification
+        """
+        if not os.path.isdir(self.backup_dir):
+            return []
+        backups = self._read()
+        updated, removed = self._sync(backups)
+        if updated or removed:
+            with _CatalogLock(self.backup_dir):
+                # Relido sob a trava: outro processo pode ter gravado nesse meio-tempo
+                backups = self._read()
+                backups.update(updated)
+                for file_name in removed:
+                    backups.pop(file_name, None)
+                    try:
+                        os.remove(self._manifest_path(file_name))
+                    except FileNotFoundError:
+                        pass
+                self._write(backups)
+
+        listed = [self._public(name, entry) for name, entry in backups.items() if not entry.get('invalid')]
+        listed.sort(key=lambda x: x['info'].get('created_at', ''), reverse=True)
+        return listed
+
+    def get(self, file_name):
+        """Entrada do catálogo para um arquivo (ou None)."""
+        entry = self._read().get(file_name)
+        return self._public(file_name, entry) if entry else None
+
+    def record(self, file_path, info, timings=None, sha256=None, manifest=None):
+        """
+        Cataloga um backup recém-criado.
+
+        Args:
+            file_path: Caminho do ZIP (dentro da pasta de backups)
+            info: Conteúdo de backup_info.json
+            timings: Segundos gastos por etapa
+            sha256: SHA-256 do arquivo (calculado se omitido)
+            manifest: Manifesto dos arquivos (lido do ZIP se omitido)
+
+        Returns:
+            Entrada gravada
+        """
+        file_name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        manifest = manifest if manifest is not None else zip_manifest(file_path)
+        self._write_manifest(file_name, manifest)
+        entry = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': sha256 or file_sha256(file_path),
+            'info': info,
+            'file_count': len(manifest),
+            'uncompressed_size': sum(item['size'] for item in manifest),
+            'timings': timings or {},
+            'verification': None,
+        }
+        with _CatalogLock(self.backup_dir):
+            backups = self._read()
+            backups[file_name] = entry
+            self._write(backups)
+        return self._public(file_name, entry)
+
+    def remove(self, file_name):
+        """Retira um backup do catálogo (o ZIP é excluído por quem chama)."""
+        with _CatalogLock(self.backup_dir):
+            backups = self._read()
+            if backups.pop(file_name, None) is not None:
+                self._write(backups)
+        try:
+            os.remove(self._manifest_path(file_name))
+        except FileNotFoundError:
+            pass
+
+    # Verificação -------------------------------------------------------------
+
+    def verify(self, file_name, deep=False):
+        """
+        Verifica a integridade de um backup e grava o resultado no catálogo.
+
+        Confere o SHA-256 do arquivo (registrado na criação; backups antigos
+        passam a ter o valor calculado na primeira verificação) e o diretório
+        do ZIP contra o manifesto. Com deep=True, cada arquivo incluído é
+        descompactado e seu CRC conferido.
+
+        Returns:
+            Dicionário com status ('ok' ou 'falha'), verified_at, deep e problems
+        """
+        from utils import metrics
+
+        file_path = os.path.join(self.backup_dir, file_name)
+        started = time.monotonic()
+        problems = []
+        entry = self._read().get(file_name) or {}
+        sha256 = None
+        try:
+            sha256 = file_sha256(file_path)
+            if entry.get('sha256') and entry['sha256'] != sha256:
+                problems.append('SHA-256 diferente do registrado na criação')
+
+            expected = self.read_manifest(file_name)
+            actual = {item['name']: item for item in zip_manifest(file_path)}
+            if expected is not None:
+                for item in expected:
+                    found = actual.get(item['name'])
+                    if found is None:
+                        problems.append(f"Arquivo ausente: {item['name']}")
+                    elif found['size'] != item['size'] or found['crc'] != item['crc']:
+                        problems.append(f"Arquivo alterado: {item['name']}")
+                extra = set(actual) - {item['name'] for item in expected}
+                problems.extend(f"Arquivo não registrado: {name}" for name in sorted(extra))
+
+            if deep:
+                with zipfile.ZipFile(file_path, 'r') as zipf:
+                    bad = zipf.testzip()
+                if bad:
+                    problems.append(f"CRC inválido: {bad}")
+        except (OSError, zipfile.BadZipFile, zlib.error) as e:
+            problems.append(str(e))
+
+        result = {
+            'status': 'falha' if problems else 'ok',
+            'verified_at': datetime.now().isoformat(),
+            'deep': deep,
+            'seconds': round(time.monotonic() - started, 3),
+            'problems': problems[:50],
+        }
+        metrics.observe_job('verificacao_backup', 'done' if not problems else 'failed', time.monotonic() - started)
+        if problems:
+            logger.error(f"Verificação do backup {file_name} falhou: {'; '.join(problems[:5])}")
+        else:
+            logger.info(f"Backup {file_name} verificado ({'completa' if deep else 'rápida'})")
+
+        with _CatalogLock(self.backup_dir):
+            backups = self._read()
+            if file_name in backups:
+                if not backups[file_name].get('sha256') and sha256 and not problems:
+                    backups[file_name]['sha256'] = sha256
+                backups[file_name]['verification'] = result
+                self._write(backups)
+        return result
+
+    def due_for_verification(self, max_age_days):
+        """Backups nunca verificados ou verificados há mais de max_age_days dias."""
+        limit = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        due = []
+        for entry in self.entries():
+            verification = entry.get('verification')
+            if not verification or verification.get('verified_at', '') < limit:
+                due.append(entry['file_name'])
+        return due
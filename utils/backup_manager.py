@@ -7,11 +7,12 @@ import json
 import logging
 import tempfile
 from datetime import datetime
-import sqlite3
 import zipfile
 import psycopg2
 import subprocess
-from flask import current_app
+import time
+from utils.backup_catalog import BackupCatalog
+from utils import backup_archiver
 
 # Configuração do logger
 logger = logging.getLogger(__name__)
@@ -27,6 +28,9 @@ class BackupManager:
         # Criar diretório de backup se não existir
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir, exist_ok=True)
+        
+        # Catálogo dos backups (evita abrir cada ZIP na listagem)
+        self.catalog = BackupCatalog(self.backup_dir)
     
     def _get_backup_dir(self):
         """Retorna o diretório para armazenar backups."""
@@ -37,20 +41,30 @@ class BackupManager:
             # Fallback para o diretório atual
             return os.path.join(os.getcwd(), 'instance', 'backups')
     
-    def create_system_backup(self, include_uploads=True, include_logs=False):
+    def create_system_backup(self, include_uploads=True, include_logs=False, progress=None):
         """
         Cria um backup completo do sistema, incluindo o banco de dados e 
         opcionalmente os arquivos de upload e logs.
         
+        Uploads e logs vão direto para o ZIP (utils.backup_archiver), com
+        compressão em paralelo; só o dump do banco e as configurações passam
+        por uma pasta temporária.
+        
         Args:
             include_uploads: Se deve incluir arquivos de upload
             include_logs: Se deve incluir arquivos de log
+            progress: Função chamada periodicamente com o andamento da gravação
             
         Returns:
             dict: Informações sobre o backup criado
         """
+        from utils import metrics
+        
+        started = time.monotonic()
         try:
-            # Criar diretório temporário para o backup
+            timings = {}
+            
+            # Diretório temporário para o dump do banco e as configurações
             temp_dir = tempfile.mkdtemp()
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             backup_name = f"zelopack_backup_{timestamp}"
@@ -72,6 +86,7 @@ class BackupManager:
                 json.dump(backup_info, f, indent=2)
             
             # Backup do banco de dados
+            step = time.monotonic()
             db_backup_path = os.path.join(temp_dir, 'database')
             os.makedirs(db_backup_path, exist_ok=True)
             
@@ -83,51 +98,68 @@ class BackupManager:
                 self._backup_postgres_db(db_uri, db_backup_path)
             else:
                 logger.warning(f"Tipo de banco de dados não suportado para backup: {db_type}")
+            timings['database'] = time.monotonic() - step
             
             # Backup de configurações
             config_backup_path = os.path.join(temp_dir, 'configs')
             os.makedirs(config_backup_path, exist_ok=True)
             self._backup_configurations(config_backup_path)
             
-            # Backup de uploads
+            # Arquivos do ZIP: pasta temporária, uploads e logs (lidos na origem)
+            members = backup_archiver.collect_tree(temp_dir, '')
             if include_uploads:
-                uploads_backup_path = os.path.join(temp_dir, 'uploads')
-                os.makedirs(uploads_backup_path, exist_ok=True)
-                self._backup_uploads(uploads_backup_path)
-            
-            # Backup de logs
+                members += self._upload_sources()
             if include_logs:
-                logs_backup_path = os.path.join(temp_dir, 'logs')
-                os.makedirs(logs_backup_path, exist_ok=True)
-                self._backup_logs(logs_backup_path)
-            
-            # Criar arquivo ZIP com todo o conteúdo
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, _, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(file_path, temp_dir)
-                        zipf.write(file_path, arcname=rel_path)
+                members += self._log_sources()
+            
+            # Criar arquivo ZIP com todo o conteúdo (com outro nome até ficar completo)
+            step = time.monotonic()
+            partial_path = f"{backup_path}.partial"
+            archive = backup_archiver.write_archive(
+                partial_path, members,
+                workers=self._config('BACKUP_WORKERS'),
+                level=self._config('BACKUP_COMPRESSION_LEVEL', backup_archiver.DEFAULT_COMPRESSION_LEVEL),
+                progress=progress
+            )
+            os.replace(partial_path, backup_path)
+            timings['archive'] = time.monotonic() - step
             
             # Limpar diretório temporário
             shutil.rmtree(temp_dir)
             
-            logger.info(f"Backup completo criado em: {backup_path}")
+            # Registrar no catálogo: tamanho, SHA-256, manifesto e tempos
+            timings['total'] = time.monotonic() - started
+            entry = self.catalog.record(backup_path, backup_info, timings={
+                name: round(seconds, 3) for name, seconds in timings.items()
+            })
+            
+            logger.info(
+                f"Backup completo criado em: {backup_path} ({archive['files_done']} arquivo(s), "
+                f"{archive['throughput_mb_s']} MB/s, {archive['workers']} thread(s))"
+            )
+            metrics.observe_job('backup_sistema', 'done', time.monotonic() - started)
             
             return {
                 'success': True,
                 'file_path': backup_path,
                 'file_name': os.path.basename(backup_path),
-                'size': os.path.getsize(backup_path),
+                'size': entry['size'],
+                'sha256': entry['sha256'],
+                'file_count': entry['file_count'],
+                'timings': entry['timings'],
+                'archive': archive,
                 'created_at': datetime.now().isoformat(),
                 'info': backup_info
             }
         
         except Exception as e:
             logger.error(f"Erro ao criar backup: {str(e)}")
+            metrics.observe_job('backup_sistema', 'failed', time.monotonic() - started)
             # Limpar diretório temporário em caso de erro
             if 'temp_dir' in locals() and os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
+            if 'partial_path' in locals() and os.path.exists(partial_path):
+                os.remove(partial_path)
             
             return {
                 'success': False,
@@ -233,58 +265,25 @@ class BackupManager:
     
     def get_available_backups(self):
         """
-        Retorna a lista de backups disponíveis.
+        Retorna a lista de backups disponíveis, a partir do catálogo.
         
         Returns:
-            list: Lista de backups disponíveis
+            list: Lista de backups disponíveis (mais recente primeiro)
         """
-        backups = []
-        
-        if not os.path.exists(self.backup_dir):
-            return backups
+        try:
+            return self.catalog.entries()
+        except Exception as e:
+            logger.error(f"Erro ao listar backups: {str(e)}")
+            return []
+    
+    def verify_backup(self, backup_file_name, deep=False):
+        """
+        Verifica a integridade de um backup (SHA-256 e manifesto; CRC de cada arquivo se deep).
         
-        # Listar todos os arquivos ZIP no diretório de backup
-        for file_name in os.listdir(self.backup_dir):
-            if not file_name.endswith('.zip'):
-                continue
-            
-            file_path = os.path.join(self.backup_dir, file_name)
-            
-            try:
-                # Extrair informações do backup
-                with zipfile.ZipFile(file_path, 'r') as zipf:
-                    if 'backup_info.json' in zipf.namelist():
-                        with zipf.open('backup_info.json') as f:
-                            backup_info = json.load(f)
-                            
-                            backups.append({
-                                'file_name': file_name,
-                                'file_path': file_path,
-                                'size': os.path.getsize(file_path),
-                                'info': backup_info
-                            })
-                    else:
-                        # Backup sem informações, adicionar informações básicas
-                        stat = os.stat(file_path)
-                        created_at = datetime.fromtimestamp(stat.st_ctime)
-                        
-                        backups.append({
-                            'file_name': file_name,
-                            'file_path': file_path,
-                            'size': stat.st_size,
-                            'info': {
-                                'name': file_name.replace('.zip', ''),
-                                'timestamp': created_at.strftime('%Y%m%d_%H%M%S'),
-                                'created_at': created_at.isoformat()
-                            }
-                        })
-            except Exception as e:
-                logger.error(f"Erro ao ler backup {file_name}: {str(e)}")
-        
-        # Ordenar por data de criação (mais recente primeiro)
-        backups.sort(key=lambda x: x['info'].get('created_at', ''), reverse=True)
-        
-        return backups
+        Returns:
+            dict: Resultado da verificação, também gravado no catálogo
+        """
+        return self.catalog.verify(backup_file_name, deep=deep)
     
     def delete_backup(self, backup_file_name):
         """
@@ -304,6 +303,7 @@ class BackupManager:
                 return False
             
             os.remove(backup_path)
+            self.catalog.remove(backup_file_name)
             logger.info(f"Backup excluído: {backup_file_name}")
             
             return True
@@ -450,7 +450,8 @@ class BackupManager:
                                     values.append(str(val))
                                 else:
                                     # Escapar strings
-                                    values.append(f"'{str(val).replace(\"'\", \"''\")}'")
+                                    escaped = str(val).replace("'", "''")
+                                    values.append(f"'{escaped}'")
                             
                             f.write(f"INSERT INTO {table} ({', '.join(colnames)}) VALUES ({', '.join(values)});\n")
             
@@ -567,7 +568,7 @@ class BackupManager:
                 if backup_file.endswith('.sql'):
                     self._restore_postgres_db_direct(db_uri, backup_file)
             else:
-                logger.info(f"Banco de dados PostgreSQL restaurado com sucesso")
+                logger.info("Banco de dados PostgreSQL restaurado com sucesso")
         
         except Exception as e:
             logger.error(f"Erro ao restaurar o PostgreSQL: {str(e)}")
@@ -594,7 +595,7 @@ class BackupManager:
             cursor.close()
             conn.close()
             
-            logger.info(f"Banco de dados PostgreSQL restaurado diretamente com sucesso")
+            logger.info("Banco de dados PostgreSQL restaurado diretamente com sucesso")
         
         except Exception as e:
             logger.error(f"Erro ao restaurar diretamente o PostgreSQL: {str(e)}")
@@ -660,43 +661,39 @@ class BackupManager:
                 
                 db.session.commit()
             
-            logger.info(f"Configurações restauradas com sucesso")
+            logger.info("Configurações restauradas com sucesso")
         
         except Exception as e:
             logger.error(f"Erro ao restaurar configurações: {str(e)}")
     
-    def _backup_uploads(self, backup_path):
-        """Faz backup dos arquivos de upload."""
-        try:
-            # Identificar diretório de uploads
-            if self.app:
-                upload_dir = self.app.config.get('UPLOAD_FOLDER')
-            else:
-                upload_dir = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.getcwd(), 'uploads')
-            
-            if not os.path.exists(upload_dir):
-                logger.warning(f"Diretório de uploads não encontrado: {upload_dir}")
-                return
-            
-            # Copiar arquivos
-            for item in os.listdir(upload_dir):
-                item_path = os.path.join(upload_dir, item)
-                
-                if os.path.isfile(item_path):
-                    # Copiar arquivo
-                    shutil.copy2(item_path, os.path.join(backup_path, item))
-                elif os.path.isdir(item_path):
-                    # Copiar diretório
-                    shutil.copytree(
-                        item_path, 
-                        os.path.join(backup_path, item),
-                        dirs_exist_ok=True
-                    )
-            
-            logger.info(f"Backup de uploads concluído")
-        
-        except Exception as e:
-            logger.error(f"Erro ao fazer backup de uploads: {str(e)}")
+    def _config(self, key, default=None):
+        """Valor de configuração do app (ou default sem app)."""
+        if self.app:
+            return self.app.config.get(key, default)
+        return default
+    
+    def _upload_sources(self):
+        """Arquivos de upload a incluir no backup, como pares (caminho, nome no ZIP)."""
+        # Identificar diretório de uploads
+        if self.app:
+            upload_dir = self.app.config.get('UPLOAD_FOLDER')
+        else:
+            upload_dir = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.getcwd(), 'uploads')
+        
+        if not upload_dir or not os.path.exists(upload_dir):
+            logger.warning(f"Diretório de uploads não encontrado: {upload_dir}")
+            return []
+        
+        # Ficam de fora a pasta de backups e o que é gerado ou temporário:
+        # artefatos, pré-visualizações e uploads em partes ainda não concluídos
+        from utils.upload_store import CHUNKED_DIRNAME
+        exclude = [
+            self.backup_dir,
+            self._config('ARTIFACT_FOLDER') or os.path.join(upload_dir, 'artifacts'),
+            self._config('PREVIEW_CACHE_FOLDER') or os.path.join(upload_dir, 'previews'),
+            os.path.join(upload_dir, CHUNKED_DIRNAME),
+        ]
+        return backup_archiver.collect_tree(upload_dir, 'uploads', exclude=exclude)
     
     def _restore_uploads(self, backup_path):
         """Restaura os arquivos de upload."""
@@ -725,39 +722,28 @@ class BackupManager:
                         dirs_exist_ok=True
                     )
             
-            logger.info(f"Uploads restaurados com sucesso")
+            logger.info("Uploads restaurados com sucesso")
         
         except Exception as e:
             logger.error(f"Erro ao restaurar uploads: {str(e)}")
     
-    def _backup_logs(self, backup_path):
-        """Faz backup dos arquivos de log."""
-        try:
-            # Identificar diretório de logs
-            if self.app:
-                log_dir = self.app.config.get('LOG_FOLDER')
-            else:
-                log_dir = os.environ.get('LOG_FOLDER') or os.path.join(os.getcwd(), 'logs')
-            
-            if not os.path.exists(log_dir):
-                logger.warning(f"Diretório de logs não encontrado: {log_dir}")
-                return
-            
-            # Copiar arquivos
-            for item in os.listdir(log_dir):
-                if not item.endswith('.log'):
-                    continue
-                    
-                item_path = os.path.join(log_dir, item)
-                
-                if os.path.isfile(item_path):
-                    # Copiar arquivo
-                    shutil.copy2(item_path, os.path.join(backup_path, item))
-            
-            logger.info(f"Backup de logs concluído")
+    def _log_sources(self):
+        """Arquivos de log (.log) a incluir no backup, como pares (caminho, nome no ZIP)."""
+        # Identificar diretório de logs
+        if self.app:
+            log_dir = self.app.config.get('LOG_FOLDER')
+        else:
+            log_dir = os.environ.get('LOG_FOLDER') or os.path.join(os.getcwd(), 'logs')
         
-        except Exception as e:
-            logger.error(f"Erro ao fazer backup de logs: {str(e)}")
+        if not log_dir or not os.path.exists(log_dir):
+            logger.warning(f"Diretório de logs não encontrado: {log_dir}")
+            return []
+        
+        return [
+            (os.path.join(log_dir, item), f"logs/{item}")
+            for item in sorted(os.listdir(log_dir))
+            if item.endswith('.log') and os.path.isfile(os.path.join(log_dir, item))
+        ]
     
     def _restore_logs(self, backup_path):
         """Restaura os arquivos de log."""
@@ -782,7 +768,7 @@ class BackupManager:
                     # Copiar arquivo
                     shutil.copy2(item_path, os.path.join(log_dir, item))
             
-            logger.info(f"Logs restaurados com sucesso")
+            logger.info("Logs restaurados com sucesso")
         
         except Exception as e:
             logger.error(f"Erro ao restaurar logs: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,367 @@
+"""
+Preenchimento em lote de formulários.
+
+Um trabalho recebe um modelo de extracted_forms/ e uma lista de linhas de
+valores (por exemplo, um CSV com as ordens de produção do turno). O modelo
+é lido e seus campos são identificados uma única vez; as cópias são
+preenchidas em paralelo num pool de processos e gravadas, à medida que
+ficam prontas, num ZIP (ou num único PDF mesclado) do armazenamento de
+artefatos. O progresso pode ser consultado e o trabalho pode ser cancelado.
+
+Os trabalhos ficam em memória no processo da aplicação.
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import metrics
+from utils.form_filler import init_fill_worker, fill_row
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.forms.lote')
+
+# Padrões do preenchimento em lote
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_MAX_JOBS = 2  # Trabalhos executando ao mesmo tempo
+
+OUTPUT_ZIP = 'zip'
+OUTPUT_PDF = 'pdf'
+
+# Estados do trabalho
+STATUS_PENDING = 'pendente'
+STATUS_RUNNING = 'executando'
+STATUS_DONE = 'concluido'
+STATUS_CANCELLED = 'cancelado'
+STATUS_FAILED = 'erro'
+
+_CELL_REF_RE = re.compile(r'^([A-Za-z]{1,3})(\d+)$')
+
+
+class BatchFillError(ValueError):
+    """Erro de validação de um trabalho de preenchimento em lote."""
+
+
+def parse_csv_rows(data):
+    """
+    Lê as linhas de valores de um CSV (separador vírgula ou ponto e vírgula).
+
+    Args:
+        data: Conteúdo do CSV em bytes ou texto
+
+    Returns:
+        Lista de dicionários {coluna: valor}
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+
+    sample = data[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.DictReader(io.StringIO(data), dialect=dialect)
+    rows = []
+    for row in reader:
+        values = {(key or '').strip(): (value or '').strip() for key, value in row.items() if key}
+        if any(values.values()):
+            rows.append(values)
+    return rows
+
+
+def build_column_map(columns, fields, file_ext):
+    """
+    Associa as colunas do CSV aos campos do modelo.
+
+    Uma coluna pode trazer o identificador do campo (ex.: cell_5_3, para_2),
+    o nome exibido do campo ou, em planilhas, a referência da célula (ex.: C5).
+
+    Returns:
+        Tupla (mapa {coluna: id_do_campo}, colunas ignoradas)
+    """
+    by_id = {field['id']: field['id'] for field in fields}
+    by_name = {field.get('name', '').strip().lower(): field['id'] for field in fields}
+
+    column_map = {}
+    ignored = []
+    for column in columns:
+        key = column.strip()
+        if key in by_id:
+            column_map[column] = key
+        elif key.lower() in by_name:
+            column_map[column] = by_name[key.lower()]
+        elif file_ext in ('.xlsx', '.xls') and _CELL_REF_RE.match(key):
+            from openpyxl.utils import column_index_from_string
+            letters, row = _CELL_REF_RE.match(key).groups()
+            column_map[column] = f"cell_{int(row)}_{column_index_from_string(letters.upper())}"
+        elif file_ext == '.pdf':
+            # Campos de formulário PDF são identificados pelo nome interno
+            column_map[column] = key
+        else:
+            ignored.append(column)
+    return column_map, ignored
+
+
+def prepare_job(owner_id, template_path, csv_data, fields, output_format=OUTPUT_ZIP, max_rows=DEFAULT_MAX_ROWS):
+    """
+    Valida os dados do lote e monta o trabalho.
+
+    Args:
+        owner_id: ID do usuário que solicitou o lote
+        template_path: Caminho completo do modelo
+        csv_data: Conteúdo do CSV (bytes ou texto)
+        fields: Campos detectados no modelo (get_form_fields)
+        output_format: 'zip' ou 'pdf' (PDF mesclado, apenas para modelos PDF)
+        max_rows: Número máximo de linhas aceitas
+
+    Returns:
+        BatchFillJob ainda não iniciado
+
+    Raises:
+        BatchFillError: Se os dados não permitirem montar o lote
+    """
+    file_ext = os.path.splitext(template_path)[1].lower()
+    if output_format not in (OUTPUT_ZIP, OUTPUT_PDF):
+        raise BatchFillError('Formato de saída inválido.')
+    if output_format == OUTPUT_PDF and file_ext != '.pdf':
+        raise BatchFillError('O PDF mesclado só está disponível para modelos em PDF.')
+
+    try:
+        rows = parse_csv_rows(csv_data)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise BatchFillError(f'Não foi possível ler o CSV: {str(e)}')
+
+    if not rows:
+        raise BatchFillError('O CSV não contém linhas de dados.')
+    if len(rows) > max_rows:
+        raise BatchFillError(f'O lote excede o limite de {max_rows} linhas.')
+
+    column_map, ignored = build_column_map(list(rows[0].keys()), fields, file_ext)
+    if not column_map:
+        raise BatchFillError('Nenhuma coluna do CSV corresponde a um campo do formulário.')
+
+    return BatchFillJob(owner_id, template_path, rows, column_map, output_format, ignored)
+
+
+class BatchFillJob:
+    """Trabalho de preenchimento em lote."""
+
+    def __init__(self, owner_id, template_path, rows, column_map, output_format, ignored_columns=None):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.template_path = template_path
+        self.template_name = os.path.basename(template_path)
+        self.file_ext = os.path.splitext(template_path)[1].lower()
+        self.rows = rows
+        self.column_map = column_map
+        self.output_format = output_format
+        self.ignored_columns = ignored_columns or []
+        self.status = STATUS_PENDING
+        self.total = len(rows)
+        self.done = 0
+        self.failed = 0
+        self.errors = []
+        self.message = ''
+        self.artifact_id = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def download_name(self):
+        base = os.path.splitext(self.template_name)[0]
+        return f"Lote_{base}.{'pdf' if self.output_format == OUTPUT_PDF else 'zip'}"
+
+    def cancel(self):
+        """Solicita o cancelamento; as cópias ainda não iniciadas são descartadas."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (STATUS_DONE, STATUS_CANCELLED, STATUS_FAILED)
+
+    def form_data(self, row):
+        return {self.column_map[column]: value for column, value in row.items() if column in self.column_map}
+
+    def to_dict(self):
+        """Estado do trabalho para a API de progresso."""
+        processed = self.done + self.failed
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'template': self.template_name,
+            'output': self.output_format,
+            'total': self.total,
+            'done': self.done,
+            'failed': self.failed,
+            'percent': round(100 * processed / self.total, 1) if self.total else 100.0,
+            'errors': self.errors[:20],
+            'ignored_columns': self.ignored_columns,
+            'message': self.message,
+        }
+
+
+class BatchFillManager:
+    """Registro e execução dos trabalhos de preenchimento em lote."""
+
+    def __init__(self, artifact_store, max_workers=DEFAULT_MAX_WORKERS, max_jobs=DEFAULT_MAX_JOBS):
+        self.artifact_store = artifact_store
+        self.max_workers = max_workers
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_jobs)
+
+    def submit(self, job):
+        """Registra o trabalho e inicia sua execução em segundo plano."""
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        thread = threading.Thread(target=self._run, args=(job,), name=f'lote-{job.id[:8]}', daemon=True)
+        thread.start()
+        return job
+
+    def get(self, job_id, owner_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.owner_id != owner_id:
+            return None
+        return job
+
+    def queue_stats(self):
+        """Quantidade de trabalhos aguardando vaga e em execução."""
+        jobs = list(self._jobs.values())
+        return {
+            'pending': sum(1 for job in jobs if job.status == STATUS_PENDING),
+            'running': sum(1 for job in jobs if job.status == STATUS_RUNNING),
+        }
+
+    def _prune(self):
+        # Esquecer trabalhos terminados cujo arquivo já expirou
+        cutoff = time.time() - self.artifact_store.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        with self._slots:
+            if job.cancelled:
+                job.status = STATUS_CANCELLED
+                job.finished_at = time.time()
+                return
+
+            job.status = STATUS_RUNNING
+            started = time.time()
+            artifact_id, output_path = self.artifact_store.create(job.owner_id, job.download_name)
+            try:
+                with open(job.template_path, 'rb') as f:
+                    template_bytes = f.read()
+
+                if job.output_format == OUTPUT_PDF:
+                    self._fill_merged_pdf(job, template_bytes, output_path)
+                else:
+                    self._fill_zip(job, template_bytes, output_path)
+
+                if job.cancelled:
+                    job.status = STATUS_CANCELLED
+                    self.artifact_store.delete(job.owner_id, artifact_id)
+                elif job.done == 0:
+                    job.status = STATUS_FAILED
+                    job.message = 'Nenhuma cópia pôde ser preenchida'
+                    self.artifact_store.delete(job.owner_id, artifact_id)
+                else:
+                    job.status = STATUS_DONE
+                    job.artifact_id = artifact_id
+            except Exception as e:
+                logger.error(f"Erro no preenchimento em lote {job.id}: {str(e)}")
+                job.status = STATUS_FAILED
+                job.message = str(e)
+                self.artifact_store.delete(job.owner_id, artifact_id)
+            finally:
+                job.finished_at = time.time()
+                metrics.observe_job('preenchimento_lote', job.status, job.finished_at - started)
+                logger.info(
+                    f"Lote {job.id[:8]} ({job.template_name}): {job.status}, "
+                    f"{job.done}/{job.total} preenchidos, {job.failed} com erro"
+                )
+
+    def _filled_copies(self, job, template_bytes):
+        """Preenche as cópias no pool de processos, em ordem de conclusão."""
+        workers = max(1, min(self.max_workers, job.total))
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_fill_worker,
+            initargs=(template_bytes, job.file_ext)
+        )
+        try:
+            futures = {
+                executor.submit(fill_row, index, job.form_data(row)): index
+                for index, row in enumerate(job.rows, start=1)
+            }
+            for future in as_completed(futures):
+                if job.cancelled:
+                    break
+                index = futures[future]
+                # Só falhas do preenchimento contam como erro da linha; erros
+                # de quem consome as cópias (gravação do ZIP) abortam o lote
+                try:
+                    copy = future.result()
+                except Exception as e:
+                    job.failed += 1
+                    job.errors.append(f"Linha {index}: {str(e)}")
+                    continue
+                yield copy
+                job.done += 1
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _fill_zip(self, job, template_bytes, output_path):
+        base, ext = os.path.splitext(job.template_name)
+        width = len(str(job.total))
+        with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for index, content in self._filled_copies(job, template_bytes):
+                archive.writestr(f"{index:0{width}d}_{base}{ext}", content)
+
+    def _fill_merged_pdf(self, job, template_bytes, output_path):
+        # A mesclagem respeita a ordem das linhas, então as cópias são
+        # guardadas até o fim
+        copies = dict(self._filled_copies(job, template_bytes))
+        if job.cancelled or not copies:
+            return
+        import PyPDF2
+        writer = PyPDF2.PdfWriter()
+        for index in sorted(copies):
+            for page in PyPDF2.PdfReader(io.BytesIO(copies[index])).pages:
+                writer.add_page(page)
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_batch_fill_manager(app):
+    """Retorna o gerenciador de trabalhos do processo, criando-o na primeira chamada."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                from utils.artifact_store import get_artifact_store
+                _manager = BatchFillManager(
+                    get_artifact_store(app),
+                    max_workers=app.config.get('BATCH_FILL_WORKERS', DEFAULT_MAX_WORKERS),
+                    max_jobs=app.config.get('BATCH_FILL_MAX_JOBS', DEFAULT_MAX_JOBS)
+                )
+                metrics.registry.register_collector(metrics.job_queue_collector('preenchimento_lote', _manager.queue_stats))
+    return _manager
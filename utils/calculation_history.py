@@ -0,0 +1,158 @@
+"""
+Gravação do histórico de cálculos técnicos.
+
+Os registros são enfileirados em memória e gravados em lote por uma thread
+em segundo plano, de modo que as APIs de cálculo não pagam um commit por
+requisição. A tabela é somente inserção (append-only).
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.calculos.historico')
+
+# Parâmetros padrão do gravador em lote
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0  # segundos
+MAX_QUEUE_SIZE = 10000
+
+
+class CalculationHistoryWriter:
+    """Fila com gravação em lote do histórico de cálculos."""
+
+    def __init__(self, app, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='historico-calculos', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def enqueue(self, row):
+        """
+        Adiciona um registro à fila de gravação.
+
+        Se a fila estiver cheia (banco indisponível por muito tempo), o
+        registro é descartado e o evento é registrado no log.
+        """
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning(f"Fila do histórico cheia; cálculo [{row.get('tipo_calculo')}] descartado")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            # Acorda a thread antes do intervalo quando o lote está completo
+            self._wakeup.set()
+
+    def pending(self):
+        """Quantidade de registros aguardando gravação."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """
+        Grava imediatamente todos os registros pendentes.
+
+        Returns:
+            Número de registros gravados
+        """
+        with self._flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return 0
+            return self._write(rows)
+
+    def _write(self, rows):
+        from app import db
+        from models import HistoricoCalculo
+
+        with self.app.app_context():
+            try:
+                # Um único INSERT com executemany para todo o lote
+                db.session.execute(db.insert(HistoricoCalculo), rows)
+                db.session.commit()
+                logger.debug(f"{len(rows)} registros de histórico de cálculo gravados")
+                return len(rows)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao gravar histórico de cálculos ({len(rows)} registros): {str(e)}")
+                return 0
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._closing.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        """Interrompe a thread e grava o que estiver pendente."""
+        self._closing.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer(app):
+    """Retorna o gravador do processo, criando-o na primeira chamada."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = CalculationHistoryWriter(
+                    app,
+                    batch_size=app.config.get('CALC_HISTORY_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    flush_interval=app.config.get('CALC_HISTORY_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+                )
+    return _writer
+
+
+def record_calculation(app, tipo_calculo, dados, usuario_id=None):
+    """
+    Registra um cálculo no histórico.
+
+    Em modo de teste (TESTING) ou com CALC_HISTORY_ASYNC=False a gravação é
+    síncrona; caso contrário o registro é enfileirado para gravação em lote.
+
+    Args:
+        app: Aplicação Flask
+        tipo_calculo: Identificador do cálculo (ex.: 'ratio', 'finalizacao-tanque')
+        dados: Dicionário com entradas e resultado
+        usuario_id: ID do usuário (None para anônimo)
+    """
+    row = {
+        'tipo_calculo': tipo_calculo,
+        'usuario_id': usuario_id,
+        'dados': json.dumps(dados, separators=(',', ':'), ensure_ascii=False, default=str),
+        'criado_em': datetime.utcnow()
+    }
+
+    writer = get_history_writer(app)
+    writer.enqueue(row)
+    if app.config.get('TESTING') or not app.config.get('CALC_HISTORY_ASYNC', True):
+        writer.flush()
+
+
+def flush_history():
+    """Grava os registros pendentes (garante leitura das próprias gravações)."""
+    if _writer is not None:
+        return _writer.flush()
+    return 0
@@ -4,7 +4,6 @@ Funções de alto desempenho para consultas comuns, caching e bulk operations.
 """
 
 import logging
-from functools import wraps
 from flask import current_app
 from sqlalchemy import func, text
 from sqlalchemy.orm import joinedload, contains_eager, load_only
@@ -12,51 +11,48 @@ from sqlalchemy.exc import SQLAlchemyError
 import time
 import json
 
+from utils.metrics import registry
+from utils.query_cache import query_cache
+
 # Configuração de logging
 logger = logging.getLogger('zelopack.database')
 
-# Cache simples em memória
-_query_cache = {}
-_cache_timeout = 300  # 5 minutos em segundos
+def query_cache_stats():
+    """Acertos, faltas e entradas do cache de consultas."""
+    return query_cache.stats()
+
+registry.register_cache('consultas', query_cache_stats)
 
 def clear_cache():
     """Limpa todo o cache de consultas."""
-    global _query_cache
-    _query_cache = {}
+    query_cache.clear()
     logger.info("Cache de consultas limpo.")
 
-def cached_query(timeout=None):
+def invalidate_cache(*tags):
+    """
+    Invalida as consultas em cache com alguma das etiquetas.
+    
+    Alterações confirmadas pela sessão já invalidam as tabelas afetadas;
+    use esta função para mudanças feitas fora do ORM.
+    
+    Args:
+        tags: Etiquetas (nomes de tabelas, ex.: 'reports', 'supplier')
+    """
+    query_cache.invalidate(*tags)
+
+def cached_query(timeout=None, tags=()):
     """
     Decorator para cache de consultas.
     
+    O resultado é guardado como dados simples (objetos do ORM viram
+    dicionários) e a sessão passada como argumento não entra na chave.
+    
     Args:
         timeout: Tempo de expiração do cache em segundos (None para usar o padrão)
+        tags: Tabelas lidas pela consulta; um commit que altere alguma delas
+            invalida o resultado
     """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Gerar chave de cache baseada na função e argumentos
-            cache_key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
-            
-            # Verificar se resultado está em cache e dentro da validade
-            if cache_key in _query_cache:
-                entry = _query_cache[cache_key]
-                if time.time() - entry['timestamp'] < (timeout or _cache_timeout):
-                    logger.debug(f"Cache hit para {cache_key}")
-                    return entry['data']
-            
-            # Se não estiver em cache ou expirado, executar consulta
-            result = func(*args, **kwargs)
-            
-            # Armazenar resultado no cache
-            _query_cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
-            
-            return result
-        return wrapper
-    return decorator
+    return query_cache.cached(ttl=timeout, tags=tags)
 
 def optimize_query(query, model_class, only_fields=None, join_models=None, prefetch_models=None):
     """
@@ -199,7 +195,7 @@ def get_table_stats(session, table_name):
             'error': str(e)
         }
 
-@cached_query(timeout=3600)  # Cache por 1 hora
+@cached_query(timeout=3600, tags=('user', 'reports', 'supplier', 'category'))  # Cache por 1 hora
 def get_database_stats(session):
     """
     Obtém estatísticas gerais do banco de dados.
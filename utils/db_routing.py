@@ -0,0 +1,157 @@
+"""
+Pool de conexões configurável e roteamento de leituras para uma réplica.
+
+Com DATABASE_REPLICA_URL definida, a aplicação ganha o bind "replica". As
+rotas listadas em DB_REPLICA_ENDPOINTS (estatísticas, dashboard e busca de
+laudos) enviam seus SELECTs para a réplica; escritas, flushes e comandos
+textuais continuam no primário.
+
+Para que o usuário sempre enxergue o que acabou de gravar, as tabelas
+alteradas por ele ficam "presas" ao primário durante DB_REPLICA_STICKY_SECONDS
+(registro na sessão do Flask), e dentro da mesma requisição qualquer tabela
+já alterada também é lida do primário.
+
+Para testar localmente, basta uma cópia do arquivo SQLite como réplica:
+
+    cp zelopack.db replica.db
+    DATABASE_REPLICA_URL=sqlite:///replica.db python main.py
+"""
+
+import fnmatch
+import logging
+import time
+
+from flask import current_app, g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.sql.util import find_tables
+
+from utils import metrics
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.db_routing')
+
+REPLICA_BIND = 'replica'
+_SESSION_KEY = '_db_writes'
+
+
+def engine_options(url, pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=300):
+    """
+    Opções de create_engine para a URL informada.
+
+    SQLite em memória usa um pool de conexão única (StaticPool), que não
+    aceita tamanho, transbordo nem espera; nesse caso só o pre-ping é mantido.
+
+    Returns:
+        Dicionário para SQLALCHEMY_ENGINE_OPTIONS (ou para um bind)
+    """
+    options = {'pool_pre_ping': True}
+    if url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') in ('sqlite:', 'sqlite:/')):
+        return options
+    options.update({
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+    })
+    return options
+
+
+class RoutingSession(FlaskSession):
+    """Sessão que envia os SELECTs das rotas de leitura para a réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _reads_from_replica():
+            target = self._replica_target(clause)
+            if target is not None:
+                metrics.DB_READ_ROUTING.labels(target).inc()
+                if target == 'replica':
+                    return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_target(self, clause):
+        """'replica', 'primario' ou None quando o comando não é uma leitura roteável."""
+        if REPLICA_BIND not in self._db.engines or clause is None or not getattr(clause, 'is_select', False):
+            return None
+        if self._flushing:
+            return 'primario'
+        tables = {table.name for table in find_tables(clause, include_joins=True, include_aliases=True)}
+        if not tables or tables & recently_written_tables():
+            return 'primario'
+        return 'replica'
+
+
+def _reads_from_replica():
+    return has_request_context() and g.get('db_read_replica', False)
+
+
+def recently_written_tables():
+    """Tabelas alteradas nesta requisição ou pelo usuário há menos de DB_REPLICA_STICKY_SECONDS."""
+    tables = set(g.get('db_written_tables', ()))
+    writes = flask_session.get(_SESSION_KEY)
+    if writes:
+        limit = time.time() - current_app.config.get('DB_REPLICA_STICKY_SECONDS', 10)
+        tables.update(table for table, written_at in writes.items() if written_at >= limit)
+    return tables
+
+
+def _collect_written_tables(session, flush_context):
+    if not has_request_context():
+        return
+    written = g.setdefault('db_written_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(type(obj), '__tablename__', None)
+        if table:
+            written.add(table)
+
+
+def _collect_dml_tables(orm_execute_state):
+    if not has_request_context():
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            g.setdefault('db_written_tables', set()).add(table.name)
+
+
+def _remember_written_tables(session):
+    # Após o commit: as próximas requisições do usuário leem essas tabelas do primário
+    if not has_request_context() or not g.get('db_written_tables'):
+        return
+    now = int(time.time())
+    limit = now - current_app.config.get('DB_REPLICA_STICKY_SECONDS', 10)
+    writes = {table: written_at for table, written_at in flask_session.get(_SESSION_KEY, {}).items()
+              if written_at >= limit}
+    writes.update({table: now for table in g.db_written_tables})
+    flask_session[_SESSION_KEY] = writes
+
+
+def _watch_pool(engine, bind):
+    for pool_event in ('connect', 'checkout', 'invalidate'):
+        counter = metrics.DB_POOL_EVENTS.labels(bind, pool_event)
+        event.listen(engine, pool_event, lambda *args, _counter=counter: _counter.inc())
+
+
+def init_app(app, db):
+    """
+    Liga o roteamento de leituras e a telemetria do pool.
+
+    Deve ser chamada depois de db.init_app(app).
+    """
+    patterns = tuple(app.config.get('DB_REPLICA_ENDPOINTS', ()))
+
+    @app.before_request
+    def route_reads_to_replica():
+        endpoint = request.endpoint or ''
+        g.db_read_replica = any(fnmatch.fnmatchcase(endpoint, pattern) for pattern in patterns)
+
+    if not event.contains(RoutingSession, 'after_flush', _collect_written_tables):
+        event.listen(RoutingSession, 'after_flush', _collect_written_tables)
+        event.listen(RoutingSession, 'do_orm_execute', _collect_dml_tables)
+        event.listen(RoutingSession, 'after_commit', _remember_written_tables)
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            _watch_pool(engine, bind or 'default')
+        if REPLICA_BIND in db.engines:
+            logger.info(f"Leituras de {', '.join(patterns)} direcionadas à réplica")
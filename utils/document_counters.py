@@ -0,0 +1,254 @@
+"""
+Contadores de documentos técnicos por dimensão, mantidos a cada gravação.
+
+Painel, documentos e estatísticas mostram contagens por tipo, status,
+categoria e dia de envio. Em vez de agrupar TechnicalDocument a cada
+requisição, elas são lidas de DocumentCounter (uma linha por valor de cada
+dimensão), que é incrementado e decrementado na mesma transação em que os
+documentos são incluídos, alterados ou excluídos.
+
+Gravações que não passam pelo ORM (UPDATE/DELETE em massa, SQL manual) não
+atualizam os contadores; reconcile() recalcula tudo com GROUP BY e corrige
+as diferenças. Agende `flask document-counters-reconcile` (ex.: cron diário);
+se a tabela estiver vazia, a primeira leitura faz a reconciliação.
+"""
+
+import logging
+from collections import Counter
+from datetime import date, datetime
+
+from sqlalchemy import event, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.document_counters')
+
+TOTAL = 'total'
+
+# Dimensão -> coluna de TechnicalDocument
+DIMENSIONS = {
+    'type': 'document_type',
+    'status': 'status',
+    'category': 'category',
+    'day': 'upload_date',
+}
+
+_TRACKED_ATTRIBUTES = tuple(DIMENSIONS.values())
+_BUCKET_LENGTH = 50
+
+_state = {'checked': False}
+
+
+def _counters():
+    from models import DocumentCounter
+    return DocumentCounter.__table__
+
+
+def _bucket(dimension, value):
+    if value is None:
+        return ''
+    if dimension == 'day':
+        if isinstance(value, datetime):
+            value = value.date()
+        return value.isoformat() if isinstance(value, date) else str(value)[:10]
+    return str(value)[:_BUCKET_LENGTH]
+
+
+def buckets(values):
+    """Pares (dimensão, valor) em que um documento é contado."""
+    keys = [(TOTAL, '')]
+    for dimension, column in DIMENSIONS.items():
+        keys.append((dimension, _bucket(dimension, values.get(column))))
+    return keys
+
+
+# Atualização a cada gravação ----------------------------------------------
+
+def _snapshot(document):
+    return {column: getattr(document, column) for column in _TRACKED_ATTRIBUTES}
+
+
+def _committed_snapshot(session, document):
+    # Atributos expirados não guardam o valor anterior no histórico: lê do banco
+    from models import TechnicalDocument
+
+    with session.no_autoflush:
+        row = session.execute(
+            select(*[getattr(TechnicalDocument, column) for column in _TRACKED_ATTRIBUTES])
+            .where(TechnicalDocument.id == document.id)
+        ).one_or_none()
+    return dict(zip(_TRACKED_ATTRIBUTES, row)) if row is not None else None
+
+
+def _collect_changes(session, flush_context, instances):
+    from models import TechnicalDocument
+
+    pending = session.info.setdefault('document_counter_changes', [])
+    for document in session.new:
+        if isinstance(document, TechnicalDocument):
+            pending.append((None, document))
+    for document in session.dirty:
+        if isinstance(document, TechnicalDocument):
+            attrs = inspect(document).attrs
+            if any(attrs[column].history.has_changes() for column in _TRACKED_ATTRIBUTES):
+                pending.append((_committed_snapshot(session, document), document))
+    for document in session.deleted:
+        if isinstance(document, TechnicalDocument):
+            pending.append((_committed_snapshot(session, document), None))
+
+
+def _apply_changes(session, flush_context):
+    changes = session.info.pop('document_counter_changes', None)
+    if not changes:
+        return
+    deltas = Counter()
+    for old, document in changes:
+        if old:
+            deltas.subtract(buckets(old))
+        if document is not None:
+            # Depois do flush: upload_date e demais defaults já preenchidos
+            deltas.update(buckets(_snapshot(document)))
+    connection = session.connection()
+    for (dimension, bucket), delta in deltas.items():
+        if delta:
+            _increment(connection, dimension, bucket, delta)
+
+
+def _discard_changes(session):
+    session.info.pop('document_counter_changes', None)
+
+
+def _increment(connection, dimension, bucket, delta):
+    """Soma delta ao contador de forma atômica (UPSERT quando o banco oferece)."""
+    table = _counters()
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(table).values(dimension=dimension, bucket=bucket, count=delta)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['dimension', 'bucket'], set_={'count': table.c['count'] + delta}
+        ))
+        return
+    result = connection.execute(
+        update(table).where(table.c.dimension == dimension, table.c.bucket == bucket)
+        .values(count=table.c['count'] + delta)
+    )
+    if not result.rowcount:
+        connection.execute(insert(table).values(dimension=dimension, bucket=bucket, count=delta))
+
+
+# Reconciliação ---------------------------------------------------------------
+
+def actual_counts(session):
+    """Contagens reais por (dimensão, valor), calculadas com GROUP BY."""
+    from models import TechnicalDocument
+
+    actual = Counter({(TOTAL, ''): session.query(func.count(TechnicalDocument.id)).scalar() or 0})
+    for dimension, column_name in DIMENSIONS.items():
+        column = getattr(TechnicalDocument, column_name)
+        expression = func.date(column) if dimension == 'day' else column
+        for value, documents in session.query(expression, func.count(TechnicalDocument.id)).group_by(expression):
+            actual[(dimension, _bucket(dimension, value))] += documents
+    return actual
+
+
+def reconcile(session):
+    """
+    Confere os contadores com as contagens reais e corrige as diferenças.
+
+    Returns:
+        Número de contadores corrigidos
+    """
+    table = _counters()
+    actual = actual_counts(session)
+    stored = {
+        (dimension, bucket): value
+        for dimension, bucket, value in session.execute(select(table.c.dimension, table.c.bucket, table.c['count']))
+    }
+
+    corrected = 0
+    for key in set(actual) | set(stored):
+        expected = actual.get(key, 0)
+        if stored.get(key) == expected or (key not in stored and not expected):
+            continue
+        dimension, bucket = key
+        if key not in stored:
+            session.execute(insert(table).values(dimension=dimension, bucket=bucket, count=expected))
+        elif expected:
+            session.execute(update(table).where(table.c.dimension == dimension, table.c.bucket == bucket)
+                            .values(count=expected))
+        else:
+            session.execute(table.delete().where(table.c.dimension == dimension, table.c.bucket == bucket))
+        corrected += 1
+    session.commit()
+    _state['checked'] = True
+    if corrected:
+        logger.warning(f"Contadores de documentos: {corrected} valor(es) corrigido(s) na reconciliação")
+    return corrected
+
+
+# Leitura ---------------------------------------------------------------------
+
+def _ensure_initialized(session):
+    # Primeira leitura após a implantação: preenche a tabela a partir dos documentos
+    if _state['checked']:
+        return
+    if session.execute(select(_counters().c.id).limit(1)).first() is None:
+        reconcile(session)
+    _state['checked'] = True
+
+
+def counts(session, dimension):
+    """
+    Contagens de uma dimensão, da maior para a menor.
+
+    Returns:
+        Lista de (valor, contagem); valor None para documentos sem o campo
+    """
+    table = _counters()
+    _ensure_initialized(session)
+    rows = session.execute(
+        select(table.c.bucket, table.c['count'])
+        .where(table.c.dimension == dimension, table.c['count'] > 0)
+        .order_by(table.c['count'].desc(), table.c.bucket)
+    )
+    return [(bucket or None, value) for bucket, value in rows]
+
+
+def count(session, dimension=TOTAL, bucket=''):
+    """Contagem de um valor de uma dimensão (padrão: total de documentos)."""
+    table = _counters()
+    _ensure_initialized(session)
+    return session.execute(
+        select(table.c['count']).where(table.c.dimension == dimension, table.c.bucket == _bucket(dimension, bucket))
+    ).scalar() or 0
+
+
+def daily_counts(session, start=None):
+    """
+    Documentos enviados por dia.
+
+    Args:
+        start: Primeiro dia considerado (padrão: todos)
+
+    Returns:
+        Dicionário date -> contagem
+    """
+    table = _counters()
+    _ensure_initialized(session)
+    query = select(table.c.bucket, table.c['count']) \
+        .where(table.c.dimension == 'day', table.c.bucket != '', table.c['count'] > 0)
+    if start is not None:
+        query = query.where(table.c.bucket >= _bucket('day', start))
+    return {date.fromisoformat(bucket): value for bucket, value in session.execute(query)}
+
+
+def init_app(app):
+    """Passa a atualizar os contadores a cada gravação de documentos técnicos."""
+    if not event.contains(Session, 'before_flush', _collect_changes):
+        event.listen(Session, 'before_flush', _collect_changes)
+        event.listen(Session, 'after_flush', _apply_changes)
+        event.listen(Session, 'after_rollback', _discard_changes)
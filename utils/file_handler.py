@@ -1,8 +1,9 @@
 import os
 from flask import current_app
-import uuid
 from werkzeug.utils import secure_filename
 
+from utils.upload_store import store_upload
+
 def allowed_file(filename):
     """
     Verifica se o arquivo possui uma extensão permitida.
@@ -21,7 +22,10 @@ def allowed_file(filename):
 
 def save_file(file):
     """
-    Salva o arquivo enviado com nome seguro.
+    Salva o arquivo enviado no armazenamento por conteúdo.
+    
+    O arquivo é gravado em blocos com cálculo do SHA-256; conteúdos
+    idênticos são armazenados uma única vez (ver utils.upload_store).
     
     Args:
         file: Objeto de arquivo do Flask
@@ -29,19 +33,8 @@ def save_file(file):
     Returns:
         Tupla com (nome_arquivo_seguro, caminho_completo, nome_original)
     """
-    original_filename = file.filename
-    # Gerar nome seguro para evitar conflitos e vulnerabilidades
-    unique_id = uuid.uuid4().hex
-    extension = os.path.splitext(original_filename)[1]
-    secure_name = f"{unique_id}{extension}"
-    
-    # Definir caminho completo
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_name)
-    
-    # Salvar arquivo
-    file.save(file_path)
-    
-    return (secure_name, file_path, original_filename)
+    stored = store_upload(file)
+    return (stored.filename, stored.file_path, stored.original_filename)
 
 def get_file_size(file_path):
     """
@@ -0,0 +1,183 @@
+"""
+Preenchimento de formulários (Excel, Word e PDF) com valores de campos.
+
+Módulo sem dependência do Flask, para que possa ser usado tanto nas rotas
+quanto nos processos de trabalho do preenchimento em lote.
+"""
+
+import io
+import logging
+
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.forms.filler')
+
+# Identificadores de pseudo-campos (mensagens de erro) que não são preenchidos
+IGNORED_FIELD_IDS = ('error_field', 'general_error', 'no_fields', 'unsupported_format')
+
+
+def fill_form(source, file_ext, form_data):
+    """
+    Preenche um formulário com os dados fornecidos.
+    
+    Args:
+        source: Caminho do arquivo ou objeto de arquivo (ex.: BytesIO) com o modelo
+        file_ext: Extensão do modelo ('.xlsx', '.docx', '.pdf', ...)
+        form_data: Dicionário {id_do_campo: valor}
+        
+    Returns:
+        BytesIO posicionado no início com o arquivo preenchido
+        
+    Raises:
+        ValueError: Formato não suportado ou erro ao preencher
+    """
+    output = io.BytesIO()
+    
+    # Identificar e ignorar campos que não são para preenchimento de dados
+    form_data = {
+        field_id: value for field_id, value in form_data.items()
+        if field_id not in IGNORED_FIELD_IDS
+    }
+    
+    if file_ext == '.xlsx' or file_ext == '.xls':
+        try:
+            # Preencher planilha Excel
+            import openpyxl
+            from openpyxl.styles import Font
+            workbook = openpyxl.load_workbook(source)
+            sheet = workbook.active
+
+            if sheet is None:
+                raise ValueError('Não foi possível acessar a planilha.')
+
+            # Aplicar os dados aos campos identificados
+            for field_id, value in form_data.items():
+                if field_id.startswith('cell_'):
+                    parts = field_id.split('_')
+                    if len(parts) >= 3:
+                        try:
+                            _, row, col = parts
+                            row, col = int(row), int(col)
+
+                            cell = sheet.cell(row=row, column=col)
+                            if cell is None:
+                                continue
+
+                            # Verificar se é célula vazia ou tem marcadores de campo
+                            original_value = cell.value
+                            if original_value is None or (isinstance(original_value, str) and 
+                                                         ('___' in original_value or '____' in original_value)):
+                                cell.value = value
+
+                                # Aplicar estilo para destacar o campo preenchido
+                                cell.font = Font(bold=True, color="0000FF")
+                        except Exception as cell_error:
+                            logger.debug(f"Erro ao preencher célula ({field_id}): {cell_error}")
+                            continue
+
+            # Salvar a planilha preenchida
+            workbook.save(output)
+        except Exception as excel_error:
+            logger.debug(f"Erro ao processar arquivo Excel para preenchimento: {excel_error}")
+            raise ValueError(f"Não foi possível preencher o formulário Excel: {str(excel_error)}")
+
+    elif file_ext == '.docx':
+        try:
+            # Preencher documento Word
+            import docx
+            doc = docx.Document(source)
+
+            # Aplicar os dados aos campos identificados
+            for field_id, value in form_data.items():
+                if field_id.startswith('para_'):
+                    try:
+                        parts = field_id.split('_')
+                        if len(parts) >= 2:
+                            para_index = int(parts[1])
+                            if para_index < len(doc.paragraphs):
+                                para = doc.paragraphs[para_index]
+                                text = para.text
+
+                                # Substituir campos em branco pelo valor
+                                new_text = text.replace('_____', value).replace('____', value).replace('___', value)
+
+                                # Limpar o parágrafo e adicionar o texto substituído
+                                para.clear()
+                                para.add_run(new_text)
+                    except Exception as para_error:
+                        logger.debug(f"Erro ao preencher parágrafo {field_id}: {para_error}")
+                        continue
+
+            # Salvar o documento preenchido
+            doc.save(output)
+        except Exception as docx_error:
+            logger.debug(f"Erro ao processar arquivo Word para preenchimento: {docx_error}")
+            raise ValueError(f"Não foi possível preencher o documento Word: {str(docx_error)}")
+
+    elif file_ext == '.pdf':
+        try:
+            # Para PDFs, criamos um novo PDF com o texto sobreposto
+            # (abordagem simples, funcionalidade limitada)
+            import PyPDF2
+            reader = PyPDF2.PdfReader(source)
+            writer = PyPDF2.PdfWriter()
+
+            for page_num in range(len(reader.pages)):
+                page = reader.pages[page_num]
+                writer.add_page(page)
+
+            # Se o PDF tem campos de formulário
+            form_fields = reader.get_fields()
+            if form_fields:
+                # Preencher campos de formulário
+                update_fields = {}
+                for field_id, value in form_data.items():
+                    if field_id in form_fields:
+                        update_fields[field_id] = value
+
+                if update_fields:
+                    for page_num in range(len(reader.pages)):
+                        try:
+                            writer.update_page_form_field_values(page_num, update_fields)
+                        except Exception as page_error:
+                            logger.debug(f"Erro ao preencher página {page_num} do PDF: {page_error}")
+                            continue
+
+            # Salvar o PDF preenchido
+            writer.write(output)
+        except Exception as pdf_error:
+            logger.debug(f"Erro ao processar arquivo PDF para preenchimento: {pdf_error}")
+            raise ValueError(f"Não foi possível preencher o documento PDF: {str(pdf_error)}")
+
+    else:
+        # Formato não suportado
+        raise ValueError(f"Formato de arquivo não suportado: {file_ext}")
+    
+    output.seek(0)
+    return output
+
+
+# ---------------------------------------------------------------------------
+# Processos de trabalho do preenchimento em lote
+# ---------------------------------------------------------------------------
+
+_worker_template = None
+_worker_ext = None
+
+
+def init_fill_worker(template_bytes, file_ext):
+    """Inicializador do processo: guarda o modelo em memória uma única vez."""
+    global _worker_template, _worker_ext
+    _worker_template = template_bytes
+    _worker_ext = file_ext
+
+
+def fill_row(index, form_data):
+    """
+    Preenche uma cópia do modelo carregado no processo.
+    
+    Returns:
+        Tupla (índice, bytes do arquivo preenchido)
+    """
+    output = fill_form(io.BytesIO(_worker_template), _worker_ext, form_data)
+    return index, output.getvalue()
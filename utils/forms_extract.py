@@ -7,6 +7,8 @@ import openpyxl
 from docx import Document
 import PyPDF2
 
+from utils.workbook_scanner import scan_workbook, RULE_LABEL
+
 def extract_form_fields(file_path):
     """
     Extrai campos de formulários baseado no tipo de arquivo.
@@ -26,32 +28,15 @@ def extract_form_fields(file_path):
 def extract_xlsx_fields(file_path):
     """Extrai campos de um arquivo Excel."""
     fields = []
-    wb = openpyxl.load_workbook(file_path, data_only=True)
-    for sheet_name in wb.sheetnames:
-        sheet = wb[sheet_name]
-        # Procurar por células que possam ser campos de formulário
-        for row in range(1, sheet.max_row + 1):
-            for col in range(1, sheet.max_column + 1):
-                cell = sheet.cell(row=row, column=col)
-                
-                # Verificar se o valor da célula tem indicativos de ser um campo
-                if cell.value and isinstance(cell.value, str):
-                    text = cell.value.strip()
-                    
-                    # Padrões comuns para campos de formulário
-                    if (
-                        ':' in text or 
-                        re.search(r'\(.*\)', text) or  # Texto entre parênteses
-                        text.endswith('?') or  # Perguntas
-                        text.lower().startswith(('nome', 'data', 'valor', 'quantidade', 'observações'))
-                    ):
-                        fields.append({
-                            'sheet': sheet_name,
-                            'position': f"{col},{row}",
-                            'text': text,
-                            'type': 'input',  # Tipo padrão, poderia ser refinado
-                            'value': '',  # Valor vazio para preenchimento
-                        })
+    # Procurar por células que possam ser campos de formulário (rótulos, perguntas, etc.)
+    for match in scan_workbook(file_path, rules=(RULE_LABEL,)):
+        fields.append({
+            'sheet': match.sheet,
+            'position': f"{match.column},{match.row}",
+            'text': match.value.strip(),
+            'type': 'input',  # Tipo padrão, poderia ser refinado
+            'value': '',  # Valor vazio para preenchimento
+        })
     
     return fields
 
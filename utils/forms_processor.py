@@ -2,12 +2,9 @@
 Módulo para processamento de diferentes tipos de documentos/formulários.
 """
 import os
-import io
 import re
-import openpyxl
-from docx import Document
-import PyPDF2
-import pandas as pd
+
+from utils.workbook_scanner import scan_workbook, RULE_LABEL_STRICT, RULE_HEADER
 
 def process_xlsx(file_path):
     """
@@ -22,13 +19,10 @@ def process_xlsx(file_path):
         'sheets': [],
     }
     
-    # Carregar a planilha
-    wb = openpyxl.load_workbook(file_path, data_only=True)
+    sheets = {}
     
-    # Processar cada planilha
-    for sheet_name in wb.sheetnames:
-        sheet = wb[sheet_name]
-        sheet_data = {
+    def start_sheet(sheet_name, sheet):
+        sheets[sheet_name] = {
             'name': sheet_name,
             'rows': sheet.max_row,
             'columns': sheet.max_column,
@@ -37,64 +31,44 @@ def process_xlsx(file_path):
             'headers': [],  # Para cabeçalhos identificados
             'fields': [],   # Para campos identificados
         }
+        result['sheets'].append(sheets[sheet_name])
+    
+    # Uma única passagem por aba: cabeçalhos em negrito nas 9 primeiras
+    # linhas/colunas e rótulos de campo com o valor da célula vizinha
+    for match in scan_workbook(file_path, rules=(RULE_LABEL_STRICT,), neighbors=True,
+                               header_zone=(9, 9), on_sheet=start_sheet):
+        sheet_data = sheets[match.sheet]
         
-        # Identificar cabeçalhos e rodapés
-        for row in range(1, min(10, sheet.max_row + 1)):  # Procurar nos primeiros 10 rows
-            for col in range(1, min(10, sheet.max_column + 1)):
-                cell = sheet.cell(row=row, column=col)
-                if cell.value and isinstance(cell.value, str) and cell.font.bold:
-                    sheet_data['headers'].append({
-                        'row': row,
-                        'column': col,
-                        'value': str(cell.value),
-                    })
+        if RULE_HEADER in match.kinds:
+            sheet_data['headers'].append({
+                'row': match.row,
+                'column': match.column,
+                'value': str(match.value),
+            })
+            continue
         
-        # Identificar possíveis campos de formulário
-        for row in range(1, sheet.max_row + 1):
-            for col in range(1, sheet.max_column + 1):
-                cell = sheet.cell(row=row, column=col)
-                if cell.value and isinstance(cell.value, str):
-                    text = str(cell.value).strip()
-                    next_cell = None
-                    
-                    # Verificar se a célula parece um rótulo de campo
-                    if (
-                        text.endswith(':') or 
-                        re.search(r'(Data|Nome|Valor|Quantidade|Observação|Responsável)$', text, re.IGNORECASE)
-                    ):
-                        # Verificar a célula à direita ou abaixo para entrada de dados
-                        if col < sheet.max_column:
-                            next_cell = sheet.cell(row=row, column=col+1)
-                        elif row < sheet.max_row:
-                            next_cell = sheet.cell(row=row+1, column=col)
-                        
-                        field_id = f"{sheet_name}_field_{row}_{col}"
-                        field_type = "text"  # Tipo padrão
-                        
-                        # Tentar determinar o tipo de campo
-                        if text.lower().find('data') >= 0:
-                            field_type = "date"
-                        elif text.lower().find('valor') >= 0 or text.lower().find('quantidade') >= 0:
-                            field_type = "number"
-                        elif text.lower().find('observação') >= 0 or text.lower().find('descrição') >= 0:
-                            field_type = "textarea"
-                        elif text.lower().find('sim/não') >= 0 or text.lower().find('aprovado') >= 0:
-                            field_type = "boolean"
-                        
-                        field = {
-                            'id': field_id,
-                            'label': text,
-                            'type': field_type,
-                            'row': row,
-                            'column': col,
-                            'value': next_cell.value if next_cell and next_cell.value else "",
-                            'editable': True,
-                        }
-                        
-                        sheet_data['fields'].append(field)
+        text = str(match.value).strip()
+        field_type = "text"  # Tipo padrão
         
-        # Adicionar dados da planilha ao resultado
-        result['sheets'].append(sheet_data)
+        # Tentar determinar o tipo de campo
+        if text.lower().find('data') >= 0:
+            field_type = "date"
+        elif text.lower().find('valor') >= 0 or text.lower().find('quantidade') >= 0:
+            field_type = "number"
+        elif text.lower().find('observação') >= 0 or text.lower().find('descrição') >= 0:
+            field_type = "textarea"
+        elif text.lower().find('sim/não') >= 0 or text.lower().find('aprovado') >= 0:
+            field_type = "boolean"
+        
+        sheet_data['fields'].append({
+            'id': f"{match.sheet}_field_{match.row}_{match.column}",
+            'label': text,
+            'type': field_type,
+            'row': match.row,
+            'column': match.column,
+            'value': match.neighbor if match.neighbor else "",
+            'editable': True,
+        })
     
     return result
 
@@ -113,6 +87,8 @@ def process_docx(file_path):
         'fields': [],
     }
     
+    from docx import Document
+
     # Carregar o documento
     doc = Document(file_path)
     
@@ -238,6 +214,8 @@ def process_pdf(file_path):
         'interactive': False,
     }
     
+    import PyPDF2
+
     # Abrir o PDF
     with open(file_path, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
@@ -0,0 +1,520 @@
+"""
+Motor de avaliação de fórmulas personalizadas (CustomFormula).
+
+Cada fórmula é analisada uma única vez para uma AST restrita (apenas
+aritmética, comparações, condicionais e funções matemáticas da lista branca),
+compilada para uma função vetorizada com numpy e mantida em cache por
+(id da fórmula, updated_at). Resultados de entradas repetidas são memoizados.
+"""
+
+import ast
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache, reduce
+
+import numpy as np
+
+from utils.metrics import registry
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.formulas')
+
+# Funções disponíveis dentro das fórmulas (todas vetorizadas)
+ALLOWED_FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'exp': np.exp,
+    'log': np.log,
+    'log10': np.log10,
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'round': np.round,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'pow': np.power,
+    'min': np.minimum,
+    'max': np.maximum,
+}
+
+# Constantes disponíveis dentro das fórmulas
+ALLOWED_CONSTANTS = {
+    'pi': np.pi,
+    'e': np.e,
+}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub, ast.Not)
+_COMPARE_OPERATORS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# Limites de segurança
+MAX_FORMULA_LENGTH = 2000
+MAX_AST_NODES = 500
+MAX_COMPILED_FORMULAS = 256
+RESULT_CACHE_SIZE = 4096
+
+
+class FormulaError(ValueError):
+    """Erro de validação ou avaliação de uma fórmula personalizada."""
+
+
+class _FormulaValidator(ast.NodeVisitor):
+    """Percorre a AST e rejeita qualquer construção fora da lista branca."""
+
+    def __init__(self, parameters):
+        self.parameters = set(parameters)
+        self.used_names = set()
+        self.node_count = 0
+
+    def generic_visit(self, node):
+        self.node_count += 1
+        if self.node_count > MAX_AST_NODES:
+            raise FormulaError("Fórmula muito complexa.")
+        super().generic_visit(node)
+
+    def visit_Expression(self, node):
+        self.generic_visit(node)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise FormulaError(f"Constante não permitida: {node.value!r}")
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            raise FormulaError("Atribuições não são permitidas em fórmulas.")
+        if node.id not in self.parameters and node.id not in ALLOWED_CONSTANTS:
+            raise FormulaError(f"Variável desconhecida na fórmula: '{node.id}'")
+        self.used_names.add(node.id)
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise FormulaError(f"Operador não permitido: {node.op.__class__.__name__}")
+        self.generic_visit(node)
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise FormulaError(f"Operador não permitido: {node.op.__class__.__name__}")
+        self.generic_visit(node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+
+    def visit_And(self, node):
+        pass
+
+    def visit_Or(self, node):
+        pass
+
+    def visit_Compare(self, node):
+        for op in node.ops:
+            if not isinstance(op, _COMPARE_OPERATORS):
+                raise FormulaError(f"Comparação não permitida: {op.__class__.__name__}")
+        self.generic_visit(node)
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in ALLOWED_FUNCTIONS:
+            name = getattr(node.func, 'id', node.func.__class__.__name__)
+            raise FormulaError(f"Função não permitida: '{name}'")
+        if node.keywords:
+            raise FormulaError("Argumentos nomeados não são permitidos em fórmulas.")
+        self.node_count += 1
+        for arg in node.args:
+            self.visit(arg)
+
+    def visit_Load(self, node):
+        pass
+
+    def visit(self, node):
+        # Operadores já foram validados pelos nós pais
+        if isinstance(node, _BINARY_OPERATORS + _UNARY_OPERATORS + _COMPARE_OPERATORS):
+            return None
+        method = getattr(self, f'visit_{node.__class__.__name__}', None)
+        if method is None:
+            raise FormulaError(f"Construção não permitida na fórmula: {node.__class__.__name__}")
+        return method(node)
+
+
+class _VectorizeTransformer(ast.NodeTransformer):
+    """
+    Reescreve construções escalares em equivalentes vetorizados do numpy:
+    condicionais viram np.where, and/or viram logical_and/logical_or e
+    comparações encadeadas são decompostas em pares. Literais numéricos
+    viram float, evitando aritmética de inteiros de precisão arbitrária
+    (ex.: 9 ** 9 ** 9).
+    """
+
+    @staticmethod
+    def _call(name, args, node):
+        return ast.copy_location(
+            ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[]),
+            node
+        )
+
+    def visit_Constant(self, node):
+        try:
+            return ast.copy_location(ast.Constant(value=float(node.value)), node)
+        except OverflowError:
+            raise FormulaError("Constante fora do intervalo numérico.")
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        node.func = ast.Name(id=f'_fn_{node.func.id}', ctx=ast.Load())
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return self._call('_where', [node.test, node.body, node.orelse], node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        name = '_and' if isinstance(node.op, ast.And) else '_or'
+        return reduce(lambda left, right: self._call(name, [left, right], node), node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return self._call('_not', [node.operand], node)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        pairs = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            pairs.append(ast.copy_location(ast.Compare(left=left, ops=[op], comparators=[right]), node))
+            left = right
+        return reduce(lambda a, b: self._call('_and', [a, b], node), pairs)
+
+
+_EVAL_GLOBALS = {
+    '__builtins__': {},
+    '_where': np.where,
+    '_and': np.logical_and,
+    '_or': np.logical_or,
+    '_not': np.logical_not,
+    **{f'_fn_{name}': func for name, func in ALLOWED_FUNCTIONS.items()},
+    **ALLOWED_CONSTANTS,
+}
+
+
+def parse_parameters(raw_parameters):
+    """
+    Normaliza o JSON de parâmetros de uma fórmula.
+
+    Aceita uma lista de nomes (["brix", "acidez"]) ou um dicionário cujo valor
+    descreve cada parâmetro ({"brix": {"field": "lab_brix", "default": 0}}).
+
+    Args:
+        raw_parameters: String JSON, lista ou dicionário
+
+    Returns:
+        OrderedDict {nome: {'field': str|None, 'default': float|None}}
+    """
+    if isinstance(raw_parameters, str):
+        try:
+            raw_parameters = json.loads(raw_parameters) if raw_parameters.strip() else {}
+        except json.JSONDecodeError as e:
+            raise FormulaError(f"Parâmetros da fórmula não são um JSON válido: {e}")
+
+    parameters = OrderedDict()
+    if isinstance(raw_parameters, list):
+        for name in raw_parameters:
+            parameters[str(name)] = {'field': None, 'default': None}
+    elif isinstance(raw_parameters, dict):
+        for name, spec in raw_parameters.items():
+            spec = spec if isinstance(spec, dict) else {'default': spec}
+            default = spec.get('default')
+            parameters[str(name)] = {
+                'field': spec.get('field'),
+                'default': float(default) if isinstance(default, (int, float)) else None
+            }
+    elif raw_parameters is not None:
+        raise FormulaError("Parâmetros da fórmula devem ser uma lista ou um objeto JSON.")
+
+    for name in parameters:
+        if not name.isidentifier() or name.startswith('_'):
+            raise FormulaError(f"Nome de parâmetro inválido: '{name}'")
+        if name in ALLOWED_FUNCTIONS or name in ALLOWED_CONSTANTS:
+            raise FormulaError(f"Nome de parâmetro reservado: '{name}'")
+
+    return parameters
+
+
+class CompiledFormula:
+    """Fórmula validada e compilada, pronta para avaliação escalar ou em lote."""
+
+    def __init__(self, expression, parameters, formula_id=None, version=None):
+        if not expression or not expression.strip():
+            raise FormulaError("A fórmula está vazia.")
+        if len(expression) > MAX_FORMULA_LENGTH:
+            raise FormulaError("Fórmula muito longa.")
+
+        self.formula_id = formula_id
+        self.version = version
+        self.expression = expression.strip()
+        self.parameters = parse_parameters(parameters)
+
+        try:
+            tree = ast.parse(self.expression, mode='eval')
+        except SyntaxError as e:
+            raise FormulaError(f"Erro de sintaxe na fórmula: {e.msg}")
+
+        validator = _FormulaValidator(self.parameters.keys())
+        validator.visit(tree)
+        self.used_parameters = [name for name in self.parameters if name in validator.used_names]
+
+        tree = ast.fix_missing_locations(_VectorizeTransformer().visit(tree))
+        self._code = compile(tree, f'<formula {formula_id or "ad-hoc"}>', 'eval')
+        self._cached_scalar = lru_cache(maxsize=RESULT_CACHE_SIZE)(self._evaluate_scalar)
+
+    def _resolve_inputs(self, inputs):
+        """Completa as entradas com os valores padrão e valida ausências."""
+        values = {}
+        for name in self.used_parameters:
+            value = inputs.get(name)
+            if value is None:
+                value = self.parameters[name]['default']
+            if value is None:
+                raise FormulaError(f"Valor obrigatório não informado: '{name}'")
+            values[name] = value
+        return values
+
+    def _run(self, namespace):
+        # Overflow e divisão por zero entre constantes ainda usam floats do Python
+        try:
+            with np.errstate(all='ignore'):
+                return eval(self._code, _EVAL_GLOBALS, namespace)
+        except ArithmeticError as e:
+            raise FormulaError(f"Erro aritmético na fórmula: {e}")
+
+    def _evaluate_scalar(self, key):
+        # np.float64 segue as mesmas regras do lote (inf/NaN em vez de exceções)
+        result = float(self._run({name: np.float64(value) for name, value in key}))
+        if not np.isfinite(result):
+            raise FormulaError("Resultado não calculável (divisão por zero ou estouro numérico).")
+        return result
+
+    def evaluate(self, inputs):
+        """
+        Avalia a fórmula para um único conjunto de entradas (memoizado).
+
+        Args:
+            inputs: Dicionário {parametro: valor}
+
+        Returns:
+            Resultado numérico (float)
+
+        Raises:
+            FormulaError: Entradas ausentes/inválidas ou resultado não finito
+        """
+        try:
+            values = self._resolve_inputs(inputs)
+            key = tuple((name, float(values[name])) for name in self.used_parameters)
+        except (TypeError, ValueError) as e:
+            if isinstance(e, FormulaError):
+                raise
+            raise FormulaError(f"Valor de entrada inválido: {e}")
+        return self._cached_scalar(key)
+
+    def evaluate_batch(self, columns):
+        """
+        Avalia a fórmula de forma vetorizada sobre colunas de entrada.
+
+        Args:
+            columns: Dicionário {parametro: sequência de valores}; valores None
+                usam o padrão do parâmetro ou resultam em NaN
+
+        Returns:
+            numpy.ndarray com um resultado por linha (NaN quando não calculável)
+        """
+        arrays = {}
+        length = None
+        for name in self.used_parameters:
+            default = self.parameters[name]['default']
+            raw = columns.get(name)
+            if raw is None:
+                raise FormulaError(f"Coluna obrigatória não informada: '{name}'")
+            array = np.array(
+                [default if value is None else value for value in raw],
+                dtype=float
+            )
+            if length is not None and len(array) != length:
+                raise FormulaError("Todas as colunas devem ter o mesmo tamanho.")
+            length = len(array)
+            arrays[name] = array
+
+        if length is None:
+            # Fórmula constante: o tamanho vem de qualquer coluna recebida
+            length = max((len(values) for values in columns.values()), default=0)
+
+        result = self._run(arrays)
+        return np.broadcast_to(np.asarray(result, dtype=float), (length,)).copy()
+
+    def cache_info(self):
+        """Estatísticas do cache de resultados desta fórmula."""
+        return self._cached_scalar.cache_info()
+
+
+# Cache de fórmulas compiladas: {formula_id: CompiledFormula}
+_compiled_cache = OrderedDict()
+_compiled_lock = threading.Lock()
+_compiled_stats = {'hits': 0, 'misses': 0}
+
+
+def get_compiled_formula(formula):
+    """
+    Retorna a versão compilada de uma CustomFormula, reutilizando o cache
+    enquanto o registro não for alterado (updated_at).
+
+    Args:
+        formula: Instância de CustomFormula
+
+    Returns:
+        CompiledFormula
+    """
+    version = formula.updated_at
+    with _compiled_lock:
+        compiled = _compiled_cache.get(formula.id)
+        if compiled is not None and compiled.version == version:
+            _compiled_cache.move_to_end(formula.id)
+            _compiled_stats['hits'] += 1
+            return compiled
+        _compiled_stats['misses'] += 1
+
+    compiled = CompiledFormula(formula.formula, formula.parameters, formula_id=formula.id, version=version)
+
+    with _compiled_lock:
+        _compiled_cache[formula.id] = compiled
+        _compiled_cache.move_to_end(formula.id)
+        while len(_compiled_cache) > MAX_COMPILED_FORMULAS:
+            _compiled_cache.popitem(last=False)
+
+    logger.debug(f"Fórmula {formula.id} compilada (versão {version})")
+    return compiled
+
+
+def clear_formula_cache(formula_id=None):
+    """Remove do cache uma fórmula compilada (ou todas, se formula_id for None)."""
+    with _compiled_lock:
+        if formula_id is None:
+            _compiled_cache.clear()
+        else:
+            _compiled_cache.pop(formula_id, None)
+
+
+def _compiled_cache_stats():
+    with _compiled_lock:
+        return dict(_compiled_stats, size=len(_compiled_cache))
+
+
+def _result_cache_stats():
+    # Soma dos caches de resultados das fórmulas compiladas em memória
+    with _compiled_lock:
+        infos = [compiled.cache_info() for compiled in _compiled_cache.values()]
+    return {
+        'hits': sum(info.hits for info in infos),
+        'misses': sum(info.misses for info in infos),
+        'size': sum(info.currsize for info in infos),
+    }
+
+
+registry.register_cache('formulas_compiladas', _compiled_cache_stats)
+registry.register_cache('formulas_resultados', _result_cache_stats)
+
+
+def validate_formula(expression, parameters):
+    """
+    Valida uma fórmula sem armazená-la em cache.
+
+    Returns:
+        Tupla (valida, mensagem_erro)
+    """
+    try:
+        CompiledFormula(expression, parameters)
+        return True, None
+    except FormulaError as e:
+        return False, str(e)
+
+
+def _report_columns(compiled, reports):
+    """Monta as colunas de entrada da fórmula a partir dos campos dos laudos."""
+    from models import Report
+
+    columns = {}
+    for name in compiled.used_parameters:
+        field = compiled.parameters[name]['field'] or name
+        if field not in Report.__table__.columns:
+            raise FormulaError(f"Campo de laudo inexistente para o parâmetro '{name}': '{field}'")
+        columns[name] = [getattr(report, field) for report in reports]
+    return columns
+
+
+def evaluate_formula_for_reports(formula, reports, user_id, session=None, batch_size=1000):
+    """
+    Avalia uma fórmula sobre vários laudos de uma vez e grava os resultados
+    em CalculationResult com inserções em lote.
+
+    Cada parâmetro é lido do campo do laudo indicado em 'field' (ou do campo
+    de mesmo nome). Laudos sem dados suficientes são ignorados.
+
+    Args:
+        formula: Instância de CustomFormula
+        reports: Lista de objetos Report
+        user_id: ID do usuário responsável pelo cálculo
+        session: Sessão SQLAlchemy (None para não gravar resultados)
+        batch_size: Quantidade de linhas por comando de inserção
+
+    Returns:
+        Dict com 'results' ({report_id: valor}), 'saved' e 'skipped'
+    """
+    compiled = get_compiled_formula(formula)
+    reports = list(reports)
+    columns = _report_columns(compiled, reports)
+
+    values = compiled.evaluate_batch(columns) if reports else np.array([])
+
+    now = datetime.utcnow()
+    results = {}
+    mappings = []
+    for index, report in enumerate(reports):
+        value = values[index]
+        if not np.isfinite(value):
+            continue
+        value = float(value)
+        results[report.id] = value
+        mappings.append({
+            'report_id': report.id,
+            'formula_id': formula.id,
+            'name': formula.name,
+            'description': formula.description,
+            'input_data': json.dumps({name: columns[name][index] for name in compiled.used_parameters}),
+            'result': json.dumps({'value': value}),
+            'calculated_by': user_id,
+            'calculated_at': now
+        })
+
+    saved = 0
+    if session is not None and mappings:
+        from models import CalculationResult
+        for start in range(0, len(mappings), batch_size):
+            chunk = mappings[start:start + batch_size]
+            session.bulk_insert_mappings(CalculationResult, chunk)
+            saved += len(chunk)
+        session.commit()
+        logger.info(f"Fórmula {formula.id}: {saved} resultados gravados em lote")
+
+    return {
+        'results': results,
+        'saved': saved,
+        'skipped': len(reports) - len(results)
+    }
@@ -0,0 +1,389 @@
+"""
+Regras da escala de atividades do laboratório e planos mensais calculados.
+
+As análises recorrentes (E.T.E, análise de água, SHELF LIFE 10D, turbidez...)
+são descritas por regras declarativas em vez de condições no código. Cada
+regra diz em que dias e turnos a atividade acontece:
+
+- semanal: turnos por dia da semana ("seg" ... "dom", ou "todos" como
+  padrão para os dias não listados);
+- mensal: turnos por dia do mês (1 a 31; dias inexistentes no mês são
+  ignorados);
+- rodizio: um turno por dia, alternando na ordem de "turnos" a partir da
+  data de "referencia".
+
+Todas aceitam "inicio" e "fim" (datas ISO) para limitar a vigência. Por
+padrão valem DEFAULT_RULES; com LAB_SCHEDULE_RULES_FILE apontando para um
+arquivo JSON (lista de regras no mesmo formato), ele passa a valer e é
+relido quando muda. Incluir uma nova análise recorrente é só acrescentar
+uma regra:
+
+    {"atividade": "MICROBIOLÓGICO", "tipo": "semanal", "dias": {"qua": [2]}}
+
+Os planos são guardados em memória por (regras, ano, mês); a versão das
+regras (hash do conteúdo normalizado) faz parte da chave, então uma mudança
+nas regras gera planos novos. A mesma versão compõe as ETags dos feeds JSON
+e iCal.
+"""
+
+import calendar
+import datetime
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.lab_schedule')
+
+TURNOS = (1, 2, 3)
+
+DIAS_SEMANA = {'seg': 0, 'ter': 1, 'qua': 2, 'qui': 3, 'sex': 4, 'sab': 5, 'dom': 6}
+
+TIPOS = ('semanal', 'mensal', 'rodizio')
+
+# Escala atual do laboratório
+DEFAULT_RULES = [
+    # E.T.E (Estação de Tratamento de Efluentes): 1º turno na segunda, 3º nos demais dias
+    {'atividade': 'E.T.E', 'tipo': 'semanal', 'dias': {'seg': [1], 'todos': [3]}},
+    # Análise de água: um turno por dia, em sequência ao longo da semana
+    {'atividade': 'ANÁLISE DE ÁGUA', 'tipo': 'semanal',
+     'dias': {'seg': [1], 'ter': [2], 'qua': [3], 'qui': [1], 'sex': [2], 'sab': [3]}},
+    # No domingo, todos os turnos realizam análise de água (se houver expediente)
+    {'atividade': 'ANÁLISE DE ÁGUA*', 'tipo': 'semanal', 'dias': {'dom': [1, 2, 3]}},
+    # Shelf life 10D alterna entre os turnos; 1º de maio de 2025 coube ao 1º turno
+    {'atividade': 'SHELF LIFE 10D', 'tipo': 'rodizio', 'referencia': '2025-05-01', 'turnos': [1, 2, 3]},
+    # Turbidez: apenas às segundas-feiras, 3º turno
+    {'atividade': 'TURBIDEZ', 'tipo': 'semanal', 'dias': {'seg': [3]}},
+]
+
+MAX_CACHED_MONTHS = 240
+
+# Anos aceitos pelos feeds; o evento iCal termina no dia seguinte, então
+# 31/12/9999 (datetime.MAXYEAR) não teria data final
+MIN_YEAR = 1900
+MAX_YEAR = 2199
+
+
+class InvalidRules(ValueError):
+    """Regra da escala com formato ou valores inválidos."""
+
+
+# Validação -------------------------------------------------------------------
+
+def _ascii(value):
+    return unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode('ascii').strip().lower()
+
+
+def _date(value, field, name):
+    if value is None or isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        raise InvalidRules(f'{name}: "{field}" deve ser uma data no formato AAAA-MM-DD')
+
+
+def _turnos(value, name):
+    if isinstance(value, int):
+        value = [value]
+    if not isinstance(value, (list, tuple)) or not value:
+        raise InvalidRules(f'{name}: informe uma lista de turnos')
+    for turno in value:
+        if turno not in TURNOS:
+            raise InvalidRules(f'{name}: turno {turno!r} inválido (use {", ".join(map(str, TURNOS))})')
+    return tuple(value)
+
+
+def _weekday(key, name):
+    if isinstance(key, int) or str(key).isdigit():
+        weekday = int(key)
+    else:
+        weekday = DIAS_SEMANA.get(_ascii(key)[:3])
+    if weekday is None or not 0 <= weekday <= 6:
+        raise InvalidRules(f'{name}: dia da semana {key!r} inválido (use seg, ter, qua, qui, sex, sab, dom ou todos)')
+    return weekday
+
+
+def _month_day(key, name):
+    try:
+        day = int(key)
+    except (TypeError, ValueError):
+        day = 0
+    if not 1 <= day <= 31:
+        raise InvalidRules(f'{name}: dia do mês {key!r} inválido (use 1 a 31)')
+    return day
+
+
+def normalize_rule(rule, position=1):
+    """
+    Valida uma regra e a converte para a forma usada no cálculo.
+
+    Raises:
+        InvalidRules: Se faltar campo obrigatório ou algum valor for inválido
+    """
+    if not isinstance(rule, dict):
+        raise InvalidRules(f'Regra {position}: esperado um objeto com "atividade" e "tipo"')
+    atividade = str(rule.get('atividade') or '').strip()
+    name = f'Regra {position} ({atividade or "sem nome"})'
+    if not atividade:
+        raise InvalidRules(f'{name}: "atividade" é obrigatório')
+    tipo = rule.get('tipo')
+    if tipo not in TIPOS:
+        raise InvalidRules(f'{name}: "tipo" deve ser um de {", ".join(TIPOS)}')
+
+    normalized = {
+        'atividade': atividade,
+        'tipo': tipo,
+        'inicio': _date(rule.get('inicio'), 'inicio', name),
+        'fim': _date(rule.get('fim'), 'fim', name),
+    }
+    if tipo == 'rodizio':
+        referencia = _date(rule.get('referencia'), 'referencia', name)
+        if referencia is None:
+            raise InvalidRules(f'{name}: "referencia" é obrigatório no rodízio')
+        normalized['referencia'] = referencia
+        normalized['turnos'] = _turnos(rule.get('turnos', TURNOS), name)
+        return normalized
+
+    dias = rule.get('dias')
+    if not isinstance(dias, dict) or not dias:
+        raise InvalidRules(f'{name}: "dias" deve associar dias a listas de turnos')
+    if tipo == 'semanal':
+        padrao = _turnos(dias['todos'], name) if 'todos' in dias else ()
+        por_dia = {weekday: padrao for weekday in range(7)}
+        for key, turnos in dias.items():
+            if key != 'todos':
+                por_dia[_weekday(key, name)] = _turnos(turnos, name)
+    else:
+        por_dia = {_month_day(key, name): _turnos(turnos, name) for key, turnos in dias.items()}
+    normalized['dias'] = {key: turnos for key, turnos in sorted(por_dia.items()) if turnos}
+    return normalized
+
+
+class RuleSet:
+    """Conjunto de regras normalizadas; a versão identifica o conteúdo."""
+
+    def __init__(self, rules, source='padrão'):
+        if not isinstance(rules, (list, tuple)):
+            raise InvalidRules('As regras devem ser uma lista')
+        self.rules = tuple(normalize_rule(rule, position) for position, rule in enumerate(rules, start=1))
+        self.source = source
+        canonical = json.dumps(self.rules, sort_keys=True, default=str, ensure_ascii=False)
+        self.version = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+    def __eq__(self, other):
+        return isinstance(other, RuleSet) and other.version == self.version
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __repr__(self):
+        return f'<RuleSet {self.version} ({len(self.rules)} regras, {self.source})>'
+
+
+def _turnos_do_dia(rule, data):
+    if rule['inicio'] and data < rule['inicio']:
+        return ()
+    if rule['fim'] and data > rule['fim']:
+        return ()
+    if rule['tipo'] == 'semanal':
+        return rule['dias'].get(data.weekday(), ())
+    if rule['tipo'] == 'mensal':
+        return rule['dias'].get(data.day, ())
+    turnos = rule['turnos']
+    return (turnos[(data - rule['referencia']).days % len(turnos)],)
+
+
+# Carregamento das regras -----------------------------------------------------
+
+_DEFAULT_RULESET = RuleSet(DEFAULT_RULES)
+_loaded = {'key': None, 'ruleset': _DEFAULT_RULESET}
+_lock = threading.Lock()
+
+
+def load_rules_file(path):
+    """
+    Lê e valida um arquivo JSON de regras.
+
+    Raises:
+        InvalidRules: Se o arquivo não for JSON válido ou alguma regra for inválida
+    """
+    try:
+        with open(path, encoding='utf-8') as handle:
+            rules = json.load(handle)
+    except json.JSONDecodeError as e:
+        raise InvalidRules(f'{path}: JSON inválido ({e})')
+    return RuleSet(rules, source=path)
+
+
+def current_rules(path=None):
+    """
+    Regras em vigor: as do arquivo LAB_SCHEDULE_RULES_FILE ou DEFAULT_RULES.
+
+    O arquivo é relido quando sua data de modificação muda. Se estiver
+    inválido ou inacessível, o erro é registrado e continuam valendo as
+    últimas regras carregadas.
+    """
+    if path is None:
+        try:
+            from flask import current_app
+            path = current_app.config.get('LAB_SCHEDULE_RULES_FILE')
+        except RuntimeError:
+            path = None
+    if not path:
+        return _DEFAULT_RULESET
+
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError as e:
+        logger.error(f"Arquivo de regras da escala indisponível ({e}); mantendo {_loaded['ruleset']!r}")
+        return _loaded['ruleset']
+    if key == _loaded['key']:
+        return _loaded['ruleset']
+
+    with _lock:
+        if key != _loaded['key']:
+            try:
+                ruleset = load_rules_file(path)
+            except (OSError, InvalidRules) as e:
+                logger.error(f"Regras da escala inválidas: {e}; mantendo {_loaded['ruleset']!r}")
+                ruleset = _loaded['ruleset']
+            else:
+                logger.info(f"Regras da escala carregadas: {ruleset!r}")
+            _loaded['key'] = key
+            _loaded['ruleset'] = ruleset
+    return _loaded['ruleset']
+
+
+# Planos ----------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=MAX_CACHED_MONTHS)
+def _month_plan(ruleset, ano, mes):
+    _, dias_no_mes = calendar.monthrange(ano, mes)
+    plano = {}
+    for dia in range(1, dias_no_mes + 1):
+        data = datetime.date(ano, mes, dia)
+        turnos = {turno: [] for turno in TURNOS}
+        for rule in ruleset.rules:
+            for turno in _turnos_do_dia(rule, data):
+                turnos[turno].append(rule['atividade'])
+        # Tuplas: o plano fica no cache e é compartilhado entre requisições
+        plano[dia] = {turno: tuple(atividades) for turno, atividades in turnos.items()}
+    return plano
+
+
+def month_plan(ano, mes, ruleset=None):
+    """
+    Atividades do mês, calculadas uma vez por (regras, ano, mês).
+
+    Args:
+        ano: Ano
+        mes: Mês (1 a 12)
+        ruleset: Regras a aplicar (padrão: current_rules())
+
+    Returns:
+        Dicionário dia -> {turno: tupla de atividades}; não deve ser alterado
+    """
+    return _month_plan(ruleset or current_rules(), ano, mes)
+
+
+def year_plan(ano, ruleset=None):
+    """Planos dos 12 meses do ano: dicionário mês -> month_plan."""
+    ruleset = ruleset or current_rules()
+    return {mes: _month_plan(ruleset, ano, mes) for mes in range(1, 13)}
+
+
+def etag(ruleset, *parts):
+    """ETag de uma visão do plano: versão das regras mais ano/mês/formato."""
+    return '-'.join([ruleset.version] + [str(part) for part in parts])
+
+
+def cache_info():
+    """Estatísticas do cache de planos mensais."""
+    return _month_plan.cache_info()._asdict()
+
+
+# Feeds -----------------------------------------------------------------------
+
+def to_json(ano, meses=None, ruleset=None):
+    """
+    Plano em formato serializável para o feed JSON.
+
+    Args:
+        ano: Ano
+        meses: Meses incluídos (padrão: todos)
+        ruleset: Regras a aplicar (padrão: current_rules())
+    """
+    ruleset = ruleset or current_rules()
+    dias = []
+    for mes in meses or range(1, 13):
+        for dia, turnos in _month_plan(ruleset, ano, mes).items():
+            data = datetime.date(ano, mes, dia)
+            dias.append({
+                'data': data.isoformat(),
+                'dia_semana': data.weekday(),
+                'turnos': {str(turno): list(atividades) for turno, atividades in turnos.items()},
+            })
+    return {'ano': ano, 'versao_regras': ruleset.version, 'dias': dias}
+
+
+def _ical_text(value):
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ical_line(line):
+    # Linhas de no máximo 75 octetos; a continuação começa com espaço (RFC 5545)
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], ''
+    for char in line:
+        limit = 75 if not parts else 74
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = char
+        else:
+            current += char
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+@functools.lru_cache(maxsize=8)
+def _ical(ruleset, ano):
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Zelopack//Escala do Laboratorio//PT',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_ical_text(f"Escala do Laboratório {ano}")}',
+    ]
+    for mes in range(1, 13):
+        for dia, turnos in _month_plan(ruleset, ano, mes).items():
+            data = datetime.date(ano, mes, dia)
+            fim = data + datetime.timedelta(days=1)
+            for turno, atividades in turnos.items():
+                for atividade in atividades:
+                    slug = re.sub(r'[^a-z0-9]+', '-', _ascii(atividade)).strip('-') or 'atividade'
+                    lines += [
+                        'BEGIN:VEVENT',
+                        f'UID:{data:%Y%m%d}-{turno}-{slug}@laboratorio.zelopack',
+                        f'DTSTAMP:{stamp}',
+                        f'DTSTART;VALUE=DATE:{data:%Y%m%d}',
+                        f'DTEND;VALUE=DATE:{fim:%Y%m%d}',
+                        f'SUMMARY:{_ical_text(f"{atividade} ({turno}º turno)")}',
+                        'TRANSP:TRANSPARENT',
+                        'END:VEVENT',
+                    ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_ical_line(line) for line in lines) + '\r\n'
+
+
+def to_ical(ano, ruleset=None):
+    """Plano do ano em iCalendar: um evento de dia inteiro por atividade e turno."""
+    return _ical(ruleset or current_rules(), ano)
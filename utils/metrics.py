@@ -0,0 +1,388 @@
+"""
+Métricas operacionais no formato texto do Prometheus.
+
+O registro mantém contadores e histogramas em memória no processo e, na
+leitura (/metrics), consulta os coletores registrados para os valores
+instantâneos: pool de conexões, salas do Socket.IO, filas de trabalhos e
+estatísticas de cada camada de cache.
+
+A gravação é leve: cada série tem sua própria trava, mantida apenas pelo
+incremento; a montagem do texto só acontece quando a rota é consultada.
+"""
+
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.metrics')
+
+PROCESS_START = time.time()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites padrão dos histogramas, em segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if math.isnan(value):
+            return 'NaN'
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base das métricas com rótulos."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Série correspondente aos valores dos rótulos (criada na primeira vez)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name}: esperados rótulos {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child):
+        yield f'{self.name}{_labels(self.labelnames, key)} {_format_value(child.value)}'
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Histograma com limites fixos (contagens cumulativas na exposição)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, key, child):
+        counts, total = child.snapshot()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if math.isinf(bound) else _format_value(float(bound))
+            yield f'{self.name}_bucket{_labels(self.labelnames, key, [("le", le)])} {cumulative}'
+        yield f'{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}'
+        yield f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}'
+
+
+class MetricsRegistry:
+    """Registro das métricas e dos coletores de valores instantâneos."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """
+        Registra uma função chamada a cada leitura.
+
+        A função devolve uma lista de tuplas (nome, tipo, descrição, amostras),
+        sendo amostras uma lista de ({rótulo: valor}, número).
+        """
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def register_cache(self, name, stats):
+        """
+        Registra uma camada de cache.
+
+        Args:
+            name: Nome do cache (rótulo cache="...")
+            stats: Função sem argumentos que devolve {'hits', 'misses', 'size'}
+        """
+        with self._lock:
+            self._caches[name] = stats
+
+    def _cache_families(self):
+        hits, misses, sizes, ratios = [], [], [], []
+        for name, stats in sorted(self._caches.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Falha ao ler estatísticas do cache {name}: {str(e)}")
+                continue
+            labels = {'cache': name}
+            total = values.get('hits', 0) + values.get('misses', 0)
+            hits.append((labels, values.get('hits', 0)))
+            misses.append((labels, values.get('misses', 0)))
+            if values.get('size') is not None:
+                sizes.append((labels, values['size']))
+            ratios.append((labels, values.get('hits', 0) / total if total else 0.0))
+        return [
+            ('zelopack_cache_hits_total', 'counter', 'Acertos por camada de cache', hits),
+            ('zelopack_cache_misses_total', 'counter', 'Faltas por camada de cache', misses),
+            ('zelopack_cache_entries', 'gauge', 'Entradas armazenadas por camada de cache', sizes),
+            ('zelopack_cache_hit_ratio', 'gauge', 'Proporção de acertos desde o início do processo', ratios),
+        ]
+
+    def render(self):
+        """Texto completo da exposição."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+
+        families = self._cache_families()
+        for collector in list(self._collectors):
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning(f"Falha no coletor de métricas {getattr(collector, '__name__', collector)}: {str(e)}")
+
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Requisições HTTP
+REQUEST_LATENCY = registry.histogram(
+    'zelopack_request_duration_seconds', 'Tempo total das requisições por rota', ('endpoint',))
+REQUEST_DB_TIME = registry.histogram(
+    'zelopack_request_db_duration_seconds', 'Tempo gasto no banco por requisição', ('endpoint',))
+REQUESTS = registry.counter(
+    'zelopack_requests_total', 'Requisições atendidas por rota e classe de status', ('endpoint', 'status'))
+SQL_QUERIES = registry.counter(
+    'zelopack_sql_queries_total', 'Comandos SQL executados por rota', ('endpoint',))
+N_PLUS_ONE = registry.counter(
+    'zelopack_n_plus_one_total', 'Requisições com possível N+1 por rota', ('endpoint',))
+
+# Banco de dados
+DB_POOL_EVENTS = registry.counter(
+    'zelopack_db_pool_events_total', 'Eventos do pool de conexões (connect, checkout, invalidate)', ('bind', 'event'))
+DB_READ_ROUTING = registry.counter(
+    'zelopack_db_read_routing_total', 'Consultas de rotas de leitura por destino (replica ou primario)', ('target',))
+
+# Trabalhos em segundo plano
+JOB_DURATION = registry.histogram(
+    'zelopack_job_duration_seconds', 'Duração dos trabalhos em segundo plano', ('job', 'status'), JOB_BUCKETS)
+
+
+def lru_cache_stats(func):
+    """Estatísticas de uma função decorada com functools.lru_cache."""
+    def stats():
+        info = func.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+    return stats
+
+
+def observe_request(endpoint, sample):
+    """Observador do RequestProfiler: converte a amostra da requisição em métricas."""
+    wall_ms, db_ms, queries, _rows, _template_ms, _size, n_plus_one, status = sample
+    REQUEST_LATENCY.labels(endpoint).observe(wall_ms / 1000.0)
+    REQUEST_DB_TIME.labels(endpoint).observe(db_ms / 1000.0)
+    REQUESTS.labels(endpoint, f'{status // 100}xx').inc()
+    if queries:
+        SQL_QUERIES.labels(endpoint).inc(queries)
+    if n_plus_one:
+        N_PLUS_ONE.labels(endpoint).inc()
+
+
+def observe_job(job, status, seconds):
+    """Registra a duração de um trabalho em segundo plano concluído."""
+    JOB_DURATION.labels(job, status).observe(seconds)
+
+
+def job_queue_collector(job, stats):
+    """
+    Coletor da fila de um tipo de trabalho em segundo plano.
+
+    Args:
+        job: Nome do tipo de trabalho (rótulo job="...")
+        stats: Função sem argumentos que devolve {'pending', 'running'}
+    """
+    def collect():
+        values = stats()
+        labels = {'job': job}
+        return [
+            ('zelopack_job_queue_depth', 'gauge', 'Trabalhos aguardando execução',
+             [(labels, values.get('pending', 0))]),
+            ('zelopack_job_running', 'gauge', 'Trabalhos em execução', [(labels, values.get('running', 0))]),
+        ]
+    return collect
+
+
+# Métricas do pool: (nome, método do pool, descrição)
+_POOL_GAUGES = (
+    ('zelopack_db_pool_size', 'size', 'Tamanho configurado do pool de conexões'),
+    ('zelopack_db_pool_checked_out', 'checkedout', 'Conexões em uso'),
+    ('zelopack_db_pool_checked_in', 'checkedin', 'Conexões ociosas no pool'),
+    ('zelopack_db_pool_overflow', 'overflow', 'Conexões além do tamanho do pool'),
+)
+
+
+def db_pool_collector(db, app):
+    """Coletor do uso do pool de conexões de cada engine do Flask-SQLAlchemy."""
+    def collect():
+        samples = {name: [] for name, _, _ in _POOL_GAUGES}
+        with app.app_context():
+            for bind, engine in db.engines.items():
+                pool = engine.pool
+                labels = {'bind': bind or 'default', 'pool': type(pool).__name__}
+                for name, method, _ in _POOL_GAUGES:
+                    # Pools sem fila (ex.: SQLite em memória) não informam todos os valores
+                    if callable(getattr(pool, method, None)):
+                        samples[name].append((labels, getattr(pool, method)()))
+        return [(name, 'gauge', documentation, samples[name]) for name, _, documentation in _POOL_GAUGES]
+    return collect
+
+
+def socketio_collector(socketio):
+    """Coletor de conexões e salas do Socket.IO (por namespace)."""
+    def collect():
+        connections, rooms, members = [], [], []
+        server = getattr(socketio, 'server', None)
+        manager = getattr(server, 'manager', None)
+        for namespace, namespace_rooms in list(getattr(manager, 'rooms', {}).items()):
+            labels = {'namespace': namespace}
+            connected = namespace_rooms.get(None, {})
+            connections.append((labels, len(connected)))
+            # Cada cliente tem uma sala própria com o seu sid; só as demais contam
+            named = [(room, sids) for room, sids in list(namespace_rooms.items())
+                     if room is not None and room not in connected]
+            rooms.append((labels, len(named)))
+            members.append((labels, sum(len(sids) for _, sids in named)))
+        return [
+            ('zelopack_socketio_connections', 'gauge', 'Clientes conectados ao Socket.IO', connections),
+            ('zelopack_socketio_rooms', 'gauge', 'Salas ativas (documentos em edição)', rooms),
+            ('zelopack_socketio_room_members', 'gauge', 'Participações somadas em todas as salas', members),
+        ]
+    return collect
+
+
+def auto_check_collector(last_check_file):
+    """Coletor do último resultado da verificação automática (auto_check.py)."""
+    def collect():
+        if not os.path.exists(last_check_file):
+            return []
+        import json
+        with open(last_check_file, 'r') as f:
+            last_check = json.load(f)
+        return [
+            ('zelopack_auto_check_last_run_timestamp_seconds', 'gauge',
+             'Momento da última verificação automática', [({}, os.path.getmtime(last_check_file))]),
+            ('zelopack_auto_check_issues', 'gauge',
+             'Problemas encontrados na última verificação automática', [({}, len(last_check.get('issues', [])))]),
+        ]
+    return collect
+
+
+def process_collector():
+    """Coletor do início do processo (permite calcular o tempo no ar)."""
+    def collect():
+        return [('zelopack_process_start_time_seconds', 'gauge', 'Início do processo da aplicação',
+                 [({}, PROCESS_START)])]
+    return collect
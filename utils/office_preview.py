@@ -0,0 +1,426 @@
+"""
+Pré-visualização local de documentos do Office (planilhas e documentos Word).
+
+O arquivo é convertido para PDF quando há um conversor local instalado
+(LibreOffice em modo headless) e, caso contrário, para HTML paginado gerado
+com openpyxl/python-docx. O resultado fica em cache no disco, indexado pelo
+hash do conteúdo, e é servido pelo próprio servidor: a mesma versão de um
+arquivo só é convertida uma vez, mesmo que esteja em vários caminhos.
+"""
+
+import datetime
+import hashlib
+import html
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from utils import metrics
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.preview')
+
+# Incrementar quando a saída dos renderizadores mudar (invalida o cache)
+RENDERER_VERSION = '1'
+
+# Limites do renderizador HTML
+MAX_SHEET_ROWS = 2000
+MAX_SHEET_COLS = 60
+ROWS_PER_PAGE = 60
+
+CONVERTER_TIMEOUT = 120  # segundos
+HASH_BLOCK_SIZE = 1024 * 1024
+
+KIND_PDF = 'pdf'
+KIND_HTML = 'html'
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.docx', '.doc')
+# Formatos que dependem do conversor externo
+CONVERTER_ONLY_EXTENSIONS = ('.xls', '.doc')
+
+_PAGE_CSS = """
+body { font-family: Arial, Helvetica, sans-serif; font-size: 12px; background: #f0f0f0; margin: 0; padding: 16px; }
+.page { background: #fff; max-width: 1100px; margin: 0 auto 16px; padding: 24px; box-shadow: 0 1px 4px rgba(0,0,0,.2); overflow-x: auto; }
+.page-title { font-size: 11px; color: #777; margin-bottom: 8px; }
+table.sheet { border-collapse: collapse; }
+table.sheet td, table.sheet th { border: 1px solid #d0d0d0; padding: 2px 4px; vertical-align: top; white-space: pre-wrap; }
+table.sheet th { background: #f3f3f3; color: #555; font-weight: normal; text-align: center; }
+table.doc { border-collapse: collapse; margin: 8px 0; }
+table.doc td { border: 1px solid #999; padding: 4px; vertical-align: top; }
+p { margin: 0 0 6px; }
+@media print { body { background: #fff; padding: 0; } .page { box-shadow: none; margin: 0; page-break-after: always; } }
+"""
+
+
+class PreviewUnavailable(Exception):
+    """O arquivo não pode ser pré-visualizado neste servidor."""
+
+
+def find_converter(configured=None):
+    """Localiza o executável do LibreOffice (ou o configurado em PREVIEW_CONVERTER)."""
+    if configured:
+        return shutil.which(configured)
+    return shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def _sheet_pages(workbook):
+    """Gera o HTML de cada página (bloco de linhas) das abas da planilha."""
+    from openpyxl.utils import get_column_letter
+
+    for worksheet in workbook.worksheets:
+        max_row = min(worksheet.max_row or 0, MAX_SHEET_ROWS)
+        max_col = min(worksheet.max_column or 0, MAX_SHEET_COLS)
+        if not max_row or not max_col:
+            continue
+
+        # Células mescladas: a primeira recebe rowspan/colspan, as demais são omitidas
+        spans = {}
+        hidden = set()
+        for merged in worksheet.merged_cells.ranges:
+            spans[(merged.min_row, merged.min_col)] = (
+                merged.max_row - merged.min_row + 1, merged.max_col - merged.min_col + 1
+            )
+            for row in range(merged.min_row, merged.max_row + 1):
+                for col in range(merged.min_col, merged.max_col + 1):
+                    if (row, col) != (merged.min_row, merged.min_col):
+                        hidden.add((row, col))
+
+        header = '<tr><th></th>' + ''.join(
+            f'<th>{get_column_letter(col)}</th>' for col in range(1, max_col + 1)
+        ) + '</tr>'
+
+        rows = []
+        page_number = 1
+        for cells in worksheet.iter_rows(min_row=1, max_row=max_row, max_col=max_col):
+            row_index = cells[0].row
+            parts = [f'<tr><th>{row_index}</th>']
+            for cell in cells:
+                key = (row_index, cell.column)
+                if key in hidden:
+                    continue
+                attrs = ''
+                if key in spans:
+                    rowspan, colspan = spans[key]
+                    attrs = f' rowspan="{rowspan}" colspan="{colspan}"'
+                parts.append(f'<td{attrs}{_cell_style(cell)}>{_cell_text(cell.value)}</td>')
+            parts.append('</tr>')
+            rows.append(''.join(parts))
+
+            if len(rows) == ROWS_PER_PAGE:
+                yield _sheet_page(worksheet.title, page_number, header, rows)
+                rows = []
+                page_number += 1
+
+        if rows:
+            yield _sheet_page(worksheet.title, page_number, header, rows)
+
+
+def _sheet_page(title, number, header, rows):
+    return (
+        f'<div class="page"><div class="page-title">{html.escape(title)} - página {number}</div>'
+        f'<table class="sheet">{header}{"".join(rows)}</table></div>'
+    )
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%d/%m/%Y %H:%M') if (value.hour or value.minute) else value.strftime('%d/%m/%Y')
+    if isinstance(value, datetime.date):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M')
+    return html.escape(str(value))
+
+
+def _cell_style(cell):
+    styles = []
+    font = cell.font
+    if font is not None:
+        if font.bold:
+            styles.append('font-weight:bold')
+        if font.italic:
+            styles.append('font-style:italic')
+        color = font.color.rgb if font.color is not None and font.color.type == 'rgb' else None
+        if isinstance(color, str) and len(color) == 8 and color[2:] != '000000':
+            styles.append(f'color:#{color[2:]}')
+    fill = cell.fill
+    if fill is not None and fill.fill_type == 'solid' and fill.fgColor.type == 'rgb':
+        color = fill.fgColor.rgb
+        if isinstance(color, str) and len(color) == 8 and color[2:] not in ('000000', 'FFFFFF'):
+            styles.append(f'background:#{color[2:]}')
+    alignment = cell.alignment
+    if alignment is not None and alignment.horizontal in ('center', 'right', 'left'):
+        styles.append(f'text-align:{alignment.horizontal}')
+    return f' style="{";".join(styles)}"' if styles else ''
+
+
+def _paragraph_html(paragraph):
+    runs = []
+    for run in paragraph.runs:
+        text = html.escape(run.text)
+        if not text:
+            continue
+        if run.bold:
+            text = f'<strong>{text}</strong>'
+        if run.italic:
+            text = f'<em>{text}</em>'
+        if run.underline:
+            text = f'<u>{text}</u>'
+        runs.append(text)
+    content = ''.join(runs) or '&nbsp;'
+
+    style_name = (paragraph.style.name if paragraph.style is not None else '') or ''
+    if style_name.startswith('Heading') or style_name.startswith('Título'):
+        level = ''.join(ch for ch in style_name if ch.isdigit()) or '1'
+        level = min(int(level), 6)
+        return f'<h{level}>{content}</h{level}>'
+
+    align = {1: 'center', 2: 'right', 3: 'justify'}.get(paragraph.alignment, '')
+    return f'<p style="text-align:{align}">{content}</p>' if align else f'<p>{content}</p>'
+
+
+def _table_html(table):
+    rows = []
+    for row in table.rows:
+        cells = ''.join(
+            f'<td>{"".join(_paragraph_html(p) for p in cell.paragraphs)}</td>' for cell in row.cells
+        )
+        rows.append(f'<tr>{cells}</tr>')
+    return f'<table class="doc">{"".join(rows)}</table>'
+
+
+def _has_page_break(paragraph):
+    return any(
+        br.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}type') == 'page'
+        for br in paragraph._element.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}br')
+    )
+
+
+def _document_pages(document):
+    """Gera o HTML de cada página do documento, quebrando nas quebras de página explícitas."""
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    body = document.element.body
+    blocks = []
+    for child in body.iterchildren():
+        tag = child.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            paragraph = Paragraph(child, document)
+            blocks.append(_paragraph_html(paragraph))
+            if _has_page_break(paragraph):
+                yield f'<div class="page">{"".join(blocks)}</div>'
+                blocks = []
+        elif tag == 'tbl':
+            blocks.append(_table_html(Table(child, document)))
+
+    if blocks:
+        yield f'<div class="page">{"".join(blocks)}</div>'
+
+
+def render_html(file_path, title):
+    """
+    Converte uma planilha .xlsx ou um documento .docx em HTML paginado.
+
+    Returns:
+        String com o documento HTML completo
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext in ('.xlsx', '.xlsm'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(file_path, data_only=True)
+        try:
+            pages = list(_sheet_pages(workbook))
+        finally:
+            workbook.close()
+    elif file_ext == '.docx':
+        import docx
+        pages = list(_document_pages(docx.Document(file_path)))
+    else:
+        raise PreviewUnavailable(f'Formato {file_ext} requer o conversor do LibreOffice.')
+
+    if not pages:
+        pages = ['<div class="page"><p>Documento vazio.</p></div>']
+
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f'<title>{html.escape(title)}</title><style>{_PAGE_CSS}</style></head>'
+        f'<body>{"".join(pages)}</body></html>'
+    )
+
+
+def convert_to_pdf(converter, file_path, output_path, timeout=CONVERTER_TIMEOUT):
+    """Converte o arquivo para PDF com o LibreOffice em modo headless."""
+    with tempfile.TemporaryDirectory(prefix='preview-') as work_dir:
+        # Perfil próprio: permite conversões simultâneas sem disputar o perfil do usuário
+        profile = f'-env:UserInstallation=file://{os.path.join(work_dir, "profile")}'
+        result = subprocess.run(
+            [converter, profile, '--headless', '--convert-to', 'pdf', '--outdir', work_dir, file_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout
+        )
+        converted = os.path.join(work_dir, os.path.splitext(os.path.basename(file_path))[0] + '.pdf')
+        if result.returncode != 0 or not os.path.exists(converted):
+            raise PreviewUnavailable(
+                f'Falha na conversão para PDF: {result.stderr.decode("utf-8", "replace").strip()}'
+            )
+        shutil.move(converted, output_path)
+
+
+class PreviewCache:
+    """Cache em disco das pré-visualizações, indexado pelo hash do conteúdo."""
+
+    def __init__(self, root, converter=None, timeout=CONVERTER_TIMEOUT, hash_cache_size=512):
+        self.root = root
+        self.converter = converter
+        self.timeout = timeout
+        self._hashes = OrderedDict()
+        self._hash_cache_size = hash_cache_size
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self.hash_stats = {'hits': 0, 'misses': 0}
+        self.preview_stats = {'hits': 0, 'misses': 0}
+        os.makedirs(self.root, exist_ok=True)
+
+    def supports(self, file_ext):
+        """Indica se a extensão pode ser pré-visualizada com os recursos deste servidor."""
+        file_ext = file_ext.lower()
+        if file_ext not in SUPPORTED_EXTENSIONS:
+            return False
+        return bool(self.converter) or file_ext not in CONVERTER_ONLY_EXTENSIONS
+
+    def file_hash(self, file_path):
+        """Hash SHA-256 do arquivo, memorizado por (caminho, mtime, tamanho)."""
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._hashes:
+                self._hashes.move_to_end(key)
+                self.hash_stats['hits'] += 1
+                return self._hashes[key]
+            self.hash_stats['misses'] += 1
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        with self._lock:
+            self._hashes[key] = sha256
+            if len(self._hashes) > self._hash_cache_size:
+                self._hashes.popitem(last=False)
+        return sha256
+
+    def _cache_path(self, sha256, kind):
+        return os.path.join(self.root, sha256[:2], f'{sha256}-{RENDERER_VERSION}.{kind}')
+
+    def get_preview(self, file_path):
+        """
+        Retorna a pré-visualização do arquivo, gerando-a na primeira chamada.
+
+        Args:
+            file_path: Caminho completo do arquivo
+
+        Returns:
+            Tupla (caminho_da_previa, tipo, hash) com tipo 'pdf' ou 'html'
+
+        Raises:
+            PreviewUnavailable: Se o formato não puder ser convertido
+        """
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if not self.supports(file_ext):
+            raise PreviewUnavailable(f'Pré-visualização não disponível para arquivos {file_ext}.')
+
+        sha256 = self.file_hash(file_path)
+        kinds = (KIND_PDF, KIND_HTML) if self.converter else (KIND_HTML,)
+        for kind in kinds:
+            cached = self._cache_path(sha256, kind)
+            if os.path.exists(cached):
+                self.preview_stats['hits'] += 1
+                return cached, kind, sha256
+
+        # Uma única conversão por conteúdo, mesmo com requisições simultâneas
+        with self._lock:
+            render_lock = self._render_locks.setdefault(sha256, threading.Lock())
+        with render_lock:
+            try:
+                for kind in kinds:
+                    cached = self._cache_path(sha256, kind)
+                    if os.path.exists(cached):
+                        self.preview_stats['hits'] += 1
+                        return cached, kind, sha256
+                self.preview_stats['misses'] += 1
+                started = time.monotonic()
+                status = 'erro'
+                try:
+                    result = self._render(file_path, sha256)
+                    status = 'concluido'
+                    return result
+                finally:
+                    metrics.observe_job('previa', status, time.monotonic() - started)
+            finally:
+                with self._lock:
+                    self._render_locks.pop(sha256, None)
+
+    def _render(self, file_path, sha256):
+        os.makedirs(os.path.join(self.root, sha256[:2]), exist_ok=True)
+
+        if self.converter:
+            target = self._cache_path(sha256, KIND_PDF)
+            try:
+                partial = target + '.part'
+                convert_to_pdf(self.converter, file_path, partial, self.timeout)
+                os.replace(partial, target)
+                logger.info(f"Prévia PDF gerada para {os.path.basename(file_path)} ({sha256[:12]})")
+                return target, KIND_PDF, sha256
+            except (PreviewUnavailable, subprocess.TimeoutExpired, OSError) as e:
+                logger.warning(f"Conversor indisponível para {os.path.basename(file_path)}, usando HTML: {str(e)}")
+                if os.path.splitext(file_path)[1].lower() in CONVERTER_ONLY_EXTENSIONS:
+                    raise PreviewUnavailable(str(e))
+
+        target = self._cache_path(sha256, KIND_HTML)
+        try:
+            content = render_html(file_path, os.path.basename(file_path))
+        except PreviewUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao gerar prévia de {os.path.basename(file_path)}: {str(e)}")
+            raise PreviewUnavailable(f'Não foi possível gerar a pré-visualização: {str(e)}')
+
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(partial, target)
+        logger.info(f"Prévia HTML gerada para {os.path.basename(file_path)} ({sha256[:12]})")
+        return target, KIND_HTML, sha256
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_preview_cache(app):
+    """Retorna o cache de pré-visualizações do processo, criando-o na primeira chamada."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PreviewCache(
+                    app.config.get('PREVIEW_CACHE_FOLDER') or os.path.join(app.config['UPLOAD_FOLDER'], 'previews'),
+                    converter=find_converter(app.config.get('PREVIEW_CONVERTER')),
+                    timeout=app.config.get('PREVIEW_CONVERTER_TIMEOUT', CONVERTER_TIMEOUT)
+                )
+                cache = _cache
+                metrics.registry.register_cache(
+                    'previa_hash', lambda: dict(cache.hash_stats, size=len(cache._hashes)))
+                metrics.registry.register_cache('previa_arquivos', lambda: dict(cache.preview_stats))
+    return _cache
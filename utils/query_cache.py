@@ -0,0 +1,359 @@
+"""
+Cache de resultados de consultas com limite de tamanho, expiração e etiquetas.
+
+Cada resultado é guardado já convertido em dados simples (dicionários,
+listas, números, datas): objetos do ORM nunca atravessam requisições. A
+chave é calculada a partir dos argumentos de forma estável; sessões do
+SQLAlchemy são ignoradas e instâncias de modelos entram pelo id.
+
+Os resultados recebem etiquetas (por padrão, nomes de tabelas, como
+"reports" ou "supplier"). Quando uma transação que alterou uma tabela é
+confirmada (after_commit), as entradas com a etiqueta correspondente deixam
+de valer. A invalidação usa versões por etiqueta: cada entrada guarda as
+versões do momento em que foi gravada e é descartada quando alguma delas
+mudou.
+
+Com QUERY_CACHE_BACKEND apontando para um arquivo SQLite, as entradas e as
+versões das etiquetas ficam compartilhadas entre os workers do gunicorn, e
+uma alteração feita em um worker invalida o cache de todos.
+"""
+
+import datetime
+import decimal
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.cache')
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300  # segundos
+
+_PRIMITIVES = (type(None), bool, int, float, str, bytes, decimal.Decimal,
+               datetime.date, datetime.time, datetime.timedelta)
+
+
+class UncacheableArgument(TypeError):
+    """Argumento sem representação estável para compor a chave do cache."""
+
+
+def to_plain(value):
+    """
+    Converte um resultado em dados simples.
+
+    Instâncias do ORM viram dicionários com as colunas, linhas de consultas
+    (Row) viram dicionários e coleções são convertidas recursivamente.
+
+    Raises:
+        TypeError: Para valores que não podem ser convertidos
+    """
+    if isinstance(value, _PRIMITIVES):
+        return value
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [to_plain(item) for item in value]
+    mapping = getattr(value, '_mapping', None)
+    if mapping is not None:
+        return {key: to_plain(item) for key, item in mapping.items()}
+    state = inspect(value, raiseerr=False)
+    if state is not None and hasattr(state, 'mapper'):
+        return {attr.key: to_plain(getattr(value, attr.key)) for attr in state.mapper.column_attrs}
+    raise TypeError(f'Resultado do tipo {type(value).__name__} não pode ser guardado no cache')
+
+
+def _key_part(value):
+    if isinstance(value, _PRIMITIVES):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_key_part(item) for item in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ','.join(sorted(_key_part(item) for item in value)) + '}'
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{_key_part(k)}:{_key_part(v)}' for k, v in sorted(value.items(), key=lambda i: repr(i[0]))) + '}'
+    state = inspect(value, raiseerr=False)
+    if state is not None and hasattr(state, 'mapper') and state.identity:
+        return f'<{state.mapper.class_.__name__}:{state.identity}>'
+    raise UncacheableArgument(f'Argumento do tipo {type(value).__name__} não pode compor a chave do cache')
+
+
+def make_key(func, args, kwargs):
+    """
+    Chave estável para a chamada func(*args, **kwargs).
+
+    Sessões do SQLAlchemy são ignoradas; instâncias de modelos são
+    representadas pela classe e pela chave primária.
+
+    Raises:
+        UncacheableArgument: Se algum argumento não tiver representação estável
+    """
+    parts = [f'{func.__module__}.{func.__qualname__}']
+    for value in args:
+        if not _is_session(value):
+            parts.append(_key_part(value))
+    for name in sorted(kwargs):
+        if not _is_session(kwargs[name]):
+            parts.append(f'{name}={_key_part(kwargs[name])}')
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _is_session(value):
+    if isinstance(value, Session):
+        return True
+    # scoped_session (db.session) e objetos equivalentes
+    return hasattr(value, 'registry') and hasattr(value, 'query') and hasattr(value, 'execute')
+
+
+class MemoryBackend:
+    """Entradas e versões de etiquetas no próprio processo."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def bump_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # As versões continuam crescendo: entradas de outros processos não voltam a valer
+            for tag in self._versions:
+                self._versions[tag] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Entradas e versões de etiquetas num arquivo SQLite compartilhado pelos workers."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_entries ('
+                         'key TEXT PRIMARY KEY, entry BLOB NOT NULL, used_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_used ON cache_entries (used_at)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT entry FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE cache_entries SET used_at = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    def set(self, key, entry):
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, entry, used_at) VALUES (?, ?, ?)',
+                     (key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), time.time()))
+        # Descartar as entradas usadas há mais tempo além do limite
+        conn.execute('DELETE FROM cache_entries WHERE key IN ('
+                     'SELECT key FROM cache_entries ORDER BY used_at DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def tag_versions(self, tags):
+        if not tags:
+            return {}
+        placeholders = ','.join('?' for _ in tags)
+        rows = self._connect().execute(
+            f'SELECT tag, version FROM cache_tags WHERE tag IN ({placeholders})', list(tags)
+        ).fetchall()
+        versions = dict(rows)
+        return {tag: versions.get(tag, 0) for tag in tags}
+
+    def bump_tags(self, tags):
+        conn = self._connect()
+        for tag in tags:
+            conn.execute('INSERT INTO cache_tags (tag, version) VALUES (?, 1) '
+                         'ON CONFLICT(tag) DO UPDATE SET version = version + 1', (tag,))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM cache_entries')
+        conn.execute('UPDATE cache_tags SET version = version + 1')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+
+class QueryCache:
+    """Cache de consultas (extensão Flask)."""
+
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        self.default_ttl = DEFAULT_TTL
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configura o cache a partir de QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL e
+        QUERY_CACHE_BACKEND ('memory' ou 'sqlite:///caminho/arquivo.db') e
+        registra a invalidação por etiquetas nas sessões do banco.
+        """
+        max_entries = app.config.get('QUERY_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        self.default_ttl = app.config.get('QUERY_CACHE_TTL', DEFAULT_TTL)
+        backend = app.config.get('QUERY_CACHE_BACKEND') or 'memory'
+        if backend.startswith('sqlite:///'):
+            self.backend = SQLiteBackend(backend[len('sqlite:///'):], max_entries)
+        else:
+            self.backend = MemoryBackend(max_entries)
+        app.extensions['query_cache'] = self
+
+        # Escuta a classe base: vale para as sessões do Flask-SQLAlchemy e para sessões avulsas
+        if not event.contains(Session, 'after_flush', _collect_flushed_tables):
+            event.listen(Session, 'after_flush', _collect_flushed_tables)
+            event.listen(Session, 'do_orm_execute', _collect_dml_tables)
+            event.listen(Session, 'after_rollback', _discard_tables)
+        if not event.contains(Session, 'after_commit', self._after_commit):
+            event.listen(Session, 'after_commit', self._after_commit)
+
+    # Leitura e gravação ---------------------------------------------------
+
+    def get_or_compute(self, key, compute, ttl=None, tags=()):
+        """
+        Retorna o valor em cache ou calcula, converte e grava um novo.
+
+        Args:
+            key: Chave (ver make_key)
+            compute: Função sem argumentos que produz o valor
+            ttl: Validade em segundos (None usa QUERY_CACHE_TTL)
+            tags: Etiquetas do valor (ex.: ('reports', 'supplier'))
+        """
+        tags = tuple(sorted(set(tags)))
+        entry = self.backend.get(key)
+        if entry is not None:
+            expires_at, versions, payload = entry
+            if expires_at > time.time() and versions == self.backend.tag_versions(tags):
+                self.hits += 1
+                # Cópia independente: quem chama pode alterar o resultado à vontade
+                return pickle.loads(payload)
+            self.backend.delete(key)
+
+        self.misses += 1
+        versions = self.backend.tag_versions(tags)
+        value = to_plain(compute())
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.backend.set(key, (time.time() + (ttl or self.default_ttl), versions, payload))
+        return pickle.loads(payload)
+
+    def invalidate(self, *tags):
+        """Invalida todas as entradas com alguma das etiquetas."""
+        if tags:
+            self.backend.bump_tags(sorted(set(tags)))
+            logger.debug(f"Cache invalidado para {', '.join(sorted(set(tags)))}")
+
+    def clear(self):
+        """Descarta todas as entradas."""
+        self.backend.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.backend)}
+
+    def cached(self, ttl=None, tags=()):
+        """
+        Decorator que guarda o resultado da função no cache.
+
+        Args:
+            ttl: Validade em segundos (None usa QUERY_CACHE_TTL)
+            tags: Etiquetas invalidadas por alterações nas tabelas correspondentes
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    key = make_key(func, args, kwargs)
+                except UncacheableArgument as e:
+                    logger.debug(f"Consulta {func.__name__} sem cache: {str(e)}")
+                    return to_plain(func(*args, **kwargs))
+                return self.get_or_compute(key, lambda: func(*args, **kwargs), ttl, tags)
+            wrapper.cache_tags = tuple(tags)
+            return wrapper
+        return decorator
+
+    def _after_commit(self, session):
+        tables = session.info.pop('cache_tables', None)
+        if tables:
+            self.invalidate(*tables)
+
+
+def _pending_tables(session):
+    return session.info.setdefault('cache_tables', set())
+
+
+def _collect_flushed_tables(session, flush_context):
+    tables = _pending_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(type(obj), '__tablename__', None)
+        if table:
+            tables.add(table)
+
+
+def _collect_dml_tables(orm_execute_state):
+    # INSERT/UPDATE/DELETE em massa (session.execute(insert(...)), query.update(), ...)
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _pending_tables(orm_execute_state.session).add(table.name)
+
+
+def _discard_tables(session):
+    session.info.pop('cache_tables', None)
+
+
+query_cache = QueryCache()
@@ -0,0 +1,96 @@
+"""
+Alterações de laudos (Report) para tabelas derivadas mantidas de forma incremental.
+
+Antes de cada flush, cada laudo inserido, alterado ou excluído é registrado
+com os valores anteriores (lidos do banco) e os atuais das colunas que os
+assinantes acompanham. Depois do flush os assinantes recebem essas mudanças
+e podem acrescentar ou alterar objetos na sessão; eles são gravados na mesma
+transação do laudo.
+"""
+
+import logging
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.report_events')
+
+_columns = []
+_subscribers = {}
+
+
+def subscribe(name, handler, columns):
+    """
+    Registra um assinante das alterações de laudos.
+
+    Args:
+        name: Nome do assinante (para os logs; registrar de novo substitui)
+        handler: Função handler(session, changes), em que changes é uma lista
+            de (report, old, new); old é None na inclusão e new é None na
+            exclusão; os demais são dicionários coluna -> valor
+        columns: Colunas de Report que o assinante acompanha
+    """
+    _subscribers[name] = handler
+    for column in columns:
+        if column not in _columns:
+            _columns.append(column)
+    if not event.contains(Session, 'before_flush', _collect_changes):
+        event.listen(Session, 'before_flush', _collect_changes)
+        event.listen(Session, 'after_flush_postexec', _dispatch_changes)
+        event.listen(Session, 'after_rollback', _discard_changes)
+
+
+def snapshot(report):
+    """Valores atuais das colunas acompanhadas."""
+    return {column: getattr(report, column) for column in _columns}
+
+
+def _committed_snapshot(session, report):
+    # O valor anterior de um atributo expirado não fica no histórico: lê do banco (antes do flush)
+    from models import Report
+
+    with session.no_autoflush:
+        row = session.execute(
+            select(*[getattr(Report, column) for column in _columns]).where(Report.id == report.id)
+        ).one_or_none()
+    return dict(zip(_columns, row)) if row is not None else None
+
+
+def _has_tracked_changes(report):
+    state = inspect(report)
+    return any(state.attrs[column].history.has_changes() for column in _columns)
+
+
+def _collect_changes(session, flush_context, instances):
+    from models import Report
+
+    pending = session.info.setdefault('report_changes', [])
+    for report in session.new:
+        if isinstance(report, Report):
+            pending.append((report, None, snapshot(report)))
+    for report in session.dirty:
+        if isinstance(report, Report) and _has_tracked_changes(report):
+            old, new = _committed_snapshot(session, report), snapshot(report)
+            if old != new:
+                pending.append((report, old, new))
+    for report in session.deleted:
+        if isinstance(report, Report):
+            pending.append((report, _committed_snapshot(session, report), None))
+
+
+def _dispatch_changes(session, flush_context):
+    changes = session.info.pop('report_changes', None)
+    if not changes:
+        return
+    with session.no_autoflush:
+        for name, handler in _subscribers.items():
+            try:
+                handler(session, changes)
+            except Exception as e:
+                # Tabelas derivadas nunca impedem que o laudo seja salvo
+                logger.error(f"Erro ao atualizar {name} após alteração de laudos: {str(e)}")
+
+
+def _discard_changes(session):
+    session.info.pop('report_changes', None)
@@ -0,0 +1,162 @@
+"""
+Exportação em fluxo (CSV e XLSX) dos laudos de uma busca.
+
+As linhas são lidas em blocos (yield_per, que usa cursor no servidor quando
+o driver oferece) como tuplas de colunas, sem montar objetos do ORM, e são
+escritas à medida que chegam. O consumo de memória é o mesmo para 100 ou
+1 milhão de laudos.
+
+- CSV: cada bloco vira um pedaço da resposta; os primeiros bytes (BOM e
+  cabeçalho) saem antes da primeira consulta terminar.
+- XLSX: o openpyxl em modo write-only grava as linhas em arquivo temporário e
+  monta o arquivo final só ao salvar; o envio começa nesse momento, também
+  em pedaços lidos do disco.
+"""
+
+import csv
+import io
+import logging
+import tempfile
+from datetime import date, datetime, time
+
+from sqlalchemy.orm import aliased
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.report_export')
+
+DEFAULT_CHUNK_SIZE = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+CSV_MIMETYPE = 'text/csv; charset=utf-8'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Caracteres que fazem o Excel interpretar o texto como fórmula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_columns():
+    """Pares (cabeçalho, expressão) exportados, na ordem das colunas."""
+    from models import Report, User
+
+    creator = aliased(User)
+    return [
+        ('ID', Report.id),
+        ('Título', Report.title),
+        ('Lote', Report.batch_number),
+        ('Matéria-prima', Report.raw_material_type),
+        ('Fornecedor', Report.supplier),
+        ('Categoria', Report.category),
+        ('Código da amostra', Report.sample_code),
+        ('Data do laudo', Report.report_date),
+        ('Enviado em', Report.upload_date),
+        ('Prazo', Report.due_date),
+        ('Brix (fornecedor)', Report.brix),
+        ('pH (fornecedor)', Report.ph),
+        ('Acidez (fornecedor)', Report.acidity),
+        ('Brix (laboratório)', Report.lab_brix),
+        ('pH (laboratório)', Report.lab_ph),
+        ('Acidez (laboratório)', Report.lab_acidity),
+        ('Validação físico-química', Report.physicochemical_validation),
+        ('Status', Report.status),
+        ('Etapa', Report.stage),
+        ('Versão', Report.version),
+        ('Arquivo', Report.original_filename),
+        ('Criado por', creator.username),
+    ], creator
+
+
+def iter_rows(search_query, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Linhas da busca como tuplas, lidas em blocos.
+
+    Args:
+        search_query: Consulta de Report (utils.search.build_search_query)
+        chunk_size: Linhas buscadas por vez
+
+    Returns:
+        Tupla (cabeçalhos, consulta iterável de tuplas). A consulta só é
+        executada quando começa a ser percorrida, depois do cabeçalho.
+    """
+    from models import Report
+
+    columns, creator = export_columns()
+    query = search_query.outerjoin(creator, creator.id == Report.created_by) \
+        .with_entities(*[expression for _, expression in columns]) \
+        .execution_options(stream_results=True) \
+        .yield_per(chunk_size)
+    return [header for header, _ in columns], query
+
+
+def _safe_text(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return _safe_text(value)
+
+
+def stream_csv(headers, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Gera o CSV em pedaços de chunk_size linhas.
+
+    O arquivo começa com BOM UTF-8 para que o Excel reconheça os acentos.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield ('﻿' + buffer.getvalue()).encode('utf-8')
+
+    buffer.seek(0)
+    buffer.truncate()
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_xlsx(headers, rows, sheet_title='Laudos'):
+    """Gera o XLSX (openpyxl em modo write-only) em pedaços lidos do arquivo temporário."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    for row in rows:
+        sheet.append([_safe_text(value) for value in row])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            data = output.read(FILE_CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+
+
+def export_filename(extension):
+    """Nome do arquivo de exportação com data e hora."""
+    return f"laudos_{datetime.now():%Y%m%d_%H%M%S}.{extension}"
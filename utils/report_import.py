@@ -0,0 +1,476 @@
+"""
+Importação em massa de laudos históricos a partir de planilhas (XLSX, XLS e CSV).
+
+Cada arquivo é lido uma única vez, em streaming (openpyxl somente leitura,
+iter_rows(values_only=True)). Em cada aba, a linha de cabeçalho é localizada
+pelos nomes de coluna conhecidos (FIELD_ALIASES, que inclui os cabeçalhos
+da exportação da busca) e cada linha é convertida e validada. Linhas
+repetidas pela chave (fornecedor, lote, data do laudo), no próprio arquivo
+ou já cadastradas, são descartadas.
+
+As linhas válidas são gravadas em blocos de chunk_size, cada um numa
+transação: COPY no PostgreSQL (psycopg2) e INSERT com executemany nos demais
+bancos, sem montar objetos do ORM. Como os repetidos são ignorados, uma
+importação interrompida pode ser executada de novo. No modo de simulação
+(dry_run) nada é gravado e o resultado mostra o que seria importado.
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.report_import')
+
+DEFAULT_CHUNK_SIZE = 5000
+HEADER_SCAN_ROWS = 10
+MAX_REPORTED_ERRORS = 200
+
+# Campo de Report -> cabeçalhos aceitos (normalizados: sem acentos, minúsculos)
+FIELD_ALIASES = {
+    'title': ('titulo',),
+    'description': ('descricao', 'observacao', 'observacoes', 'obs'),
+    'supplier': ('fornecedor',),
+    'batch_number': ('lote', 'n lote', 'no lote', 'numero do lote', 'num lote', 'lote do fornecedor'),
+    'raw_material_type': ('materia prima', 'tipo de materia prima', 'produto', 'fruta'),
+    'category': ('categoria',),
+    'sample_code': ('codigo da amostra', 'cod amostra', 'amostra'),
+    'report_date': ('data do laudo', 'data laudo', 'data de emissao', 'data'),
+    'manufacturing_date': ('data de fabricacao', 'fabricacao'),
+    'expiration_date': ('data de validade', 'validade'),
+    'due_date': ('prazo',),
+    'brix': ('brix fornecedor', 'brix'),
+    'ph': ('ph fornecedor', 'ph'),
+    'acidity': ('acidez fornecedor', 'acidez total', 'acidez'),
+    'lab_brix': ('brix laboratorio', 'brix lab', 'brix medido'),
+    'lab_ph': ('ph laboratorio', 'ph lab', 'ph medido'),
+    'lab_acidity': ('acidez laboratorio', 'acidez lab', 'acidez medida'),
+    'physicochemical_validation': ('validacao fisico quimica', 'validacao', 'conformidade'),
+}
+
+TEXT_FIELDS = ('title', 'description', 'supplier', 'batch_number', 'raw_material_type', 'category', 'sample_code')
+DATE_FIELDS = ('report_date', 'manufacturing_date', 'expiration_date', 'due_date')
+
+# Faixas aceitas das medidas
+RANGES = {
+    'brix': (0, 100), 'lab_brix': (0, 100),
+    'ph': (0, 14), 'lab_ph': (0, 14),
+    'acidity': (0, 100), 'lab_acidity': (0, 100),
+}
+
+REQUIRED_FIELDS = ('supplier', 'batch_number')
+
+_VALIDATION_VALUES = {
+    'ok': 'ok', 'conforme': 'ok', 'aprovado': 'ok', 'sim': 'ok',
+    'nao padrao': 'não padrão', 'nao conforme': 'não padrão', 'reprovado': 'não padrão', 'nao': 'não padrão',
+}
+_DATE_FORMATS = ('%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M')
+_EXCEL_EPOCH = date(1899, 12, 30)
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+class UnsupportedFile(Exception):
+    """Arquivo em formato que não pode ser importado."""
+
+
+class ImportResult:
+    """Contagens e erros de uma importação (ou simulação)."""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.files = 0
+        self.sheets = 0
+        self.rows_read = 0
+        self.invalid = 0
+        self.duplicates_in_files = 0
+        self.duplicates_existing = 0
+        self.imported = 0
+        self.columns = {}
+        self.errors = []
+
+    def add_error(self, location, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'{location}: {message}')
+
+    def to_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'files': self.files,
+            'sheets': self.sheets,
+            'rows_read': self.rows_read,
+            'invalid': self.invalid,
+            'duplicates_in_files': self.duplicates_in_files,
+            'duplicates_existing': self.duplicates_existing,
+            'imported': self.imported,
+            'columns': self.columns,
+            'errors': self.errors,
+            'errors_truncated': self.invalid > len(self.errors),
+        }
+
+
+# Leitura dos arquivos -------------------------------------------------------
+
+def normalize_header(value):
+    """Cabeçalho sem acentos, em minúsculas e só com letras, números e espaços."""
+    text = unicodedata.normalize('NFKD', str(value or '')).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM_RE.sub(' ', text.lower()).strip()
+
+
+def _alias_index(mapping=None):
+    index = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            index.setdefault(alias, field)
+    for header, field in (mapping or {}).items():
+        if field not in FIELD_ALIASES:
+            raise ValueError(f'Campo de destino desconhecido: {field}')
+        index[normalize_header(header)] = field
+    return index
+
+
+def map_headers(headers, mapping=None):
+    """
+    Associa as colunas da planilha aos campos de Report.
+
+    Args:
+        headers: Valores da linha de cabeçalho
+        mapping: Cabeçalho da planilha -> campo, além de FIELD_ALIASES
+
+    Returns:
+        Dicionário índice da coluna -> campo (cada campo usado uma vez)
+    """
+    aliases = _alias_index(mapping)
+    columns, used = {}, set()
+    for position, header in enumerate(headers):
+        field = aliases.get(normalize_header(header))
+        if field and field not in used:
+            columns[position] = field
+            used.add(field)
+    return columns
+
+
+def _iter_sheets(path):
+    """Gera (aba, iterador de linhas) lendo o arquivo uma única vez."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    elif extension == '.xls':
+        import pandas as pd
+
+        # Formato antigo: todas as abas lidas de uma vez (sem streaming no xlrd)
+        for name, frame in pd.read_excel(path, sheet_name=None, header=None).items():
+            frame = frame.astype(object).where(frame.notna(), None)
+            yield name, iter(frame.itertuples(index=False, name=None))
+    elif extension in ('.csv', '.txt'):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        try:
+            text = raw.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            text = raw.decode('latin-1')
+        sample = text[:4096]
+        try:
+            dialect, options = csv.Sniffer().sniff(sample, delimiters=';,\t'), {}
+        except csv.Error:
+            # Linhas de título antes do cabeçalho confundem o Sniffer: usa o separador mais frequente
+            dialect, options = csv.excel, {'delimiter': max(';,\t', key=sample.count)}
+        yield os.path.basename(path), csv.reader(io.StringIO(text), dialect, **options)
+    else:
+        raise UnsupportedFile(f'Formato não suportado: {extension or "sem extensão"}')
+
+
+def _find_header(rows, mapping):
+    """
+    Localiza o cabeçalho nas primeiras linhas da aba.
+
+    Returns:
+        Tupla (colunas ou None, linha do cabeçalho, número dela, linhas de
+        dados já lidas durante a procura)
+    """
+    best, best_position, scanned = {}, 0, []
+    for position, row in enumerate(rows, start=1):
+        scanned.append(row)
+        columns = map_headers(row, mapping)
+        if len(columns) > len(best):
+            best, best_position = columns, position
+        if position >= HEADER_SCAN_ROWS:
+            break
+    if len(best) < 2 or not all(field in best.values() for field in REQUIRED_FIELDS):
+        return None, None, 0, scanned
+    return best, scanned[best_position - 1], best_position, scanned[best_position:]
+
+
+# Conversão e validação ------------------------------------------------------
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or value != value  # NaN
+
+
+def _to_text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # lotes numéricos lidos como 1234.0
+    if isinstance(value, (datetime, date)):
+        value = value.strftime('%d/%m/%Y')
+    return str(value).strip()
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise ValueError('valor lógico')
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace(' ', '')
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')  # 1.234,5 -> 1234.5
+    return float(text)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Número de série do Excel
+        if 1 <= value < 2958466:
+            return _EXCEL_EPOCH + timedelta(days=int(value))
+        raise ValueError('número fora das datas do Excel')
+    text = str(value).strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'data inválida "{text}"')
+
+
+def convert_row(values, columns):
+    """
+    Converte uma linha da planilha em valores de Report.
+
+    Args:
+        values: Valores da linha
+        columns: Índice da coluna -> campo (map_headers)
+
+    Returns:
+        Tupla (dicionário campo -> valor, lista de erros)
+    """
+    record, errors = {}, []
+    for position, field in columns.items():
+        value = values[position] if position < len(values) else None
+        if _is_blank(value):
+            continue
+        try:
+            if field in TEXT_FIELDS:
+                record[field] = _to_text(value)
+            elif field in DATE_FIELDS:
+                record[field] = _to_date(value)
+            elif field in RANGES:
+                number = _to_float(value)
+                low, high = RANGES[field]
+                if not low <= number <= high:
+                    raise ValueError(f'{number:g} fora da faixa {low}-{high}')
+                record[field] = number
+            elif field == 'physicochemical_validation':
+                normalized = _VALIDATION_VALUES.get(normalize_header(value))
+                if normalized is None:
+                    raise ValueError(f'valor desconhecido "{value}"')
+                record[field] = normalized
+        except (TypeError, ValueError) as e:
+            errors.append(f'{field}: {str(e)}')
+
+    for field in REQUIRED_FIELDS:
+        if not record.get(field):
+            errors.append(f'{field}: obrigatório')
+    return record, errors
+
+
+def dedupe_key(record):
+    """Chave de repetição: (fornecedor, lote, data do laudo), sem diferenciar maiúsculas."""
+    return (
+        (record.get('supplier') or '').strip().casefold(),
+        (record.get('batch_number') or '').strip().casefold(),
+        record.get('report_date'),
+    )
+
+
+# Gravação -------------------------------------------------------------------
+
+def _column_defaults(table):
+    # O COPY não aplica os defaults do modelo; o executemany exige as mesmas chaves em todas as linhas
+    defaults = {}
+    for column in table.columns:
+        if not column.primary_key and column.default is not None and \
+                (column.default.is_scalar or column.default.is_callable):
+            defaults[column.name] = column.default.arg
+    for field in FIELD_ALIASES:
+        defaults.setdefault(field, None)
+    return defaults
+
+
+def _complete_row(record, defaults, source, user_id, now):
+    row = {name: (value(None) if callable(value) else value) for name, value in defaults.items()}
+    row.update({
+        'title': f"Laudo {record['batch_number']} - {record['supplier']}",
+        'filename': source,
+        'original_filename': source,
+        'file_path': '',
+        'file_type': 'importado',
+        'file_size': 0,
+        'created_by': user_id,
+        'upload_date': now,
+        'updated_date': now,
+    })
+    row.update(record)
+    return row
+
+
+def _existing_keys(session, rows):
+    from models import Report
+
+    # Pré-filtro sem diferenciar maiúsculas; a comparação final é pela dedupe_key
+    batches = {(row['batch_number'] or '').strip().lower() for row in rows}
+    query = select(Report.supplier, Report.batch_number, Report.report_date) \
+        .where(func.lower(func.trim(Report.batch_number)).in_(batches))
+    return {
+        dedupe_key({'supplier': supplier, 'batch_number': batch, 'report_date': report_date})
+        for supplier, batch, report_date in session.execute(query)
+    }
+
+
+def _copy_rows(session, table, rows):
+    """COPY ... FROM STDIN (psycopg2); devolve False se o driver não oferecer."""
+    connection = session.connection()
+    if connection.dialect.name != 'postgresql':
+        return False
+    cursor = connection.connection.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        return False
+
+    names = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[name] is None else row[name] for name in names])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+    )
+    return True
+
+
+def _write_chunk(session, rows):
+    from models import Report
+
+    table = Report.__table__
+    if not _copy_rows(session, table, rows):
+        session.execute(insert(table), rows)
+    session.commit()
+
+
+def import_reports(session, paths, user_id=None, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, mapping=None):
+    """
+    Importa laudos de uma ou mais planilhas.
+
+    Args:
+        session: Sessão do SQLAlchemy
+        paths: Arquivos .xlsx, .xls ou .csv
+        user_id: Usuário registrado como criador dos laudos
+        dry_run: Apenas validar e contar, sem gravar
+        chunk_size: Linhas gravadas por transação
+        mapping: Cabeçalho da planilha -> campo de Report, além de FIELD_ALIASES
+
+    Returns:
+        ImportResult
+    """
+    from models import Report
+
+    result = ImportResult(dry_run)
+    defaults = _column_defaults(Report.__table__)
+    now = datetime.utcnow()
+    seen = set()
+    pending = []
+
+    def flush():
+        existing = _existing_keys(session, pending)
+        rows = [row for row in pending if dedupe_key(row) not in existing]
+        result.duplicates_existing += len(pending) - len(rows)
+        if rows and not dry_run:
+            _write_chunk(session, rows)
+            logger.info(f"Importação de laudos: {len(rows)} gravados ({result.imported + len(rows)} no total)")
+        result.imported += len(rows)
+        pending.clear()
+
+    try:
+        for path in paths:
+            source = os.path.basename(path)
+            result.files += 1
+            try:
+                sheets = _iter_sheets(path)
+                for sheet_name, rows in sheets:
+                    location = f'{source} [{sheet_name}]'
+                    columns, headers, header_row, first_rows = _find_header(rows, mapping)
+                    if columns is None:
+                        if any(any(not _is_blank(value) for value in row) for row in first_rows):
+                            result.add_error(location, 'cabeçalho com fornecedor e lote não encontrado')
+                        continue
+                    result.sheets += 1
+                    result.columns[location] = {str(headers[position]).strip(): field for position, field in columns.items()}
+
+                    row_number = header_row
+                    for values in _chain(first_rows, rows):
+                        row_number += 1
+                        if all(_is_blank(value) for value in values):
+                            continue
+                        result.rows_read += 1
+                        record, errors = convert_row(values, columns)
+                        if errors:
+                            result.add_error(f'{location} linha {row_number}', '; '.join(errors))
+                            continue
+                        key = dedupe_key(record)
+                        if key in seen:
+                            result.duplicates_in_files += 1
+                            continue
+                        seen.add(key)
+                        pending.append(_complete_row(record, defaults, source, user_id, now))
+                        if len(pending) >= chunk_size:
+                            flush()
+            except UnsupportedFile as e:
+                result.add_error(source, str(e))
+        if pending:
+            flush()
+    except Exception:
+        session.rollback()
+        raise
+
+    if result.imported and not dry_run:
+        from utils.query_cache import query_cache
+        query_cache.invalidate(Report.__tablename__)
+    return result
+
+
+def _chain(first_rows, rows):
+    yield from first_rows
+    yield from rows
+
+
+def rebuild_derived_tables(session):
+    """Recalcula CEP e scorecards, que a gravação em massa não atualiza laudo a laudo."""
+    from utils import scorecards, spc
+
+    spc.rebuild(session)
+    scorecards.rebuild(session)
@@ -0,0 +1,263 @@
+"""
+Instrumentação de desempenho por requisição.
+
+Para cada requisição são registrados: tempo total, tempo gasto no banco,
+número de comandos SQL, linhas obtidas, tempo de renderização de templates
+e tamanho da resposta. Comandos com o mesmo formato executados mais de
+PERF_N_PLUS_ONE_THRESHOLD vezes na mesma requisição são sinalizados como
+possível N+1 (ex.: relacionamentos carregados um a um dentro de um laço).
+
+As amostras ficam numa janela deslizante por rota (PERF_WINDOW_SIZE) e os
+percentis são calculados na leitura. A gravação só acrescenta em deques,
+sem travas no caminho da requisição.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.desempenho')
+
+# Padrões da instrumentação
+DEFAULT_WINDOW_SIZE = 500
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+DEFAULT_SLOW_REQUEST_MS = 1000
+MAX_INCIDENTS = 200
+PERCENTILES = (50, 95, 99)
+
+# Normalização do formato dos comandos SQL
+_IN_LIST_RE = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)|\((?:\s*%\([^)]+\)s\s*,)+\s*%\([^)]+\)s\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Formato do comando SQL: literais numéricos e listas IN normalizados."""
+    shape = _IN_LIST_RE.sub('(?)', statement)
+    shape = _NUMBER_RE.sub('N', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+def percentile(sorted_values, pct):
+    """Percentil (interpolação linear) de uma lista já ordenada."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+class RequestStats:
+    """Medidas de uma requisição em andamento."""
+
+    __slots__ = ('started', 'db_time', 'queries', 'rows', 'template_time', 'shapes',
+                 '_query_start', '_template_start')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.template_time = 0.0
+        self.shapes = Counter()
+        self._query_start = []
+        self._template_start = []
+
+
+class RequestProfiler:
+    """Extensão Flask que coleta as medidas de desempenho por rota."""
+
+    def __init__(self, app=None):
+        self.window_size = DEFAULT_WINDOW_SIZE
+        self.threshold = DEFAULT_N_PLUS_ONE_THRESHOLD
+        self.slow_request_ms = DEFAULT_SLOW_REQUEST_MS
+        self._samples = {}
+        self._samples_lock = threading.Lock()
+        self.incidents = deque(maxlen=MAX_INCIDENTS)
+        self._observers = []
+        # Chave própria em g: os eventos do SQLAlchemy são globais e outro
+        # perfilador no mesmo processo (outra aplicação) não deve somar aqui
+        self._stats_key = f'_request_stats_{id(self)}'
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.window_size = app.config.get('PERF_WINDOW_SIZE', DEFAULT_WINDOW_SIZE)
+        self.threshold = app.config.get('PERF_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        self.slow_request_ms = app.config.get('PERF_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        app.extensions['request_profiler'] = self
+
+        if not app.config.get('PERF_PROFILING_ENABLED', True):
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        # Eventos globais: valem para todos os engines (inclusive réplicas)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(Mapper, 'load', self._on_load)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    # Coleta ---------------------------------------------------------------
+
+    def _current(self):
+        if not has_request_context():
+            return None
+        return g.get(self._stats_key)
+
+    def _before_request(self):
+        setattr(g, self._stats_key, RequestStats())
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self._current()
+        if stats is not None:
+            stats._query_start.append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self._current()
+        if stats is None or not stats._query_start:
+            return
+        stats.db_time += time.perf_counter() - stats._query_start.pop()
+        stats.queries += 1
+        stats.shapes[statement] += 1
+        # Comandos de escrita informam as linhas afetadas; leituras são contadas no carregamento
+        if cursor.rowcount and cursor.rowcount > 0 and not statement.lstrip().upper().startswith('SELECT'):
+            stats.rows += cursor.rowcount
+
+    def _on_load(self, target, context):
+        stats = self._current()
+        if stats is not None:
+            stats.rows += 1
+
+    def _before_render(self, sender, template, context, **extra):
+        stats = self._current()
+        if stats is not None:
+            stats._template_start.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stats = self._current()
+        if stats is not None and stats._template_start:
+            stats.template_time += time.perf_counter() - stats._template_start.pop()
+
+    def _after_request(self, response):
+        stats = g.pop(self._stats_key, None)
+        endpoint = request.endpoint
+        if stats is None or endpoint is None or endpoint == 'static':
+            return response
+
+        duration = time.perf_counter() - stats.started
+        # Respostas em streaming não são consumidas para medir o tamanho
+        size = response.content_length
+        if size is None and response.is_sequence:
+            size = response.calculate_content_length()
+
+        # N+1: mesmo formato de comando repetido na requisição
+        shapes = Counter()
+        for statement, count in stats.shapes.items():
+            shapes[statement_shape(statement)] += count
+        repeated = {shape: count for shape, count in shapes.items() if count > self.threshold}
+        for shape, count in repeated.items():
+            self.incidents.append({
+                'endpoint': endpoint,
+                'path': request.path,
+                'statement': shape[:500],
+                'count': count,
+                'at': time.time(),
+            })
+            logger.warning(f"Possível N+1 em {endpoint}: {count}x {shape[:200]}")
+
+        sample = (
+            duration * 1000,
+            stats.db_time * 1000,
+            stats.queries,
+            stats.rows,
+            stats.template_time * 1000,
+            size or 0,
+            len(repeated),
+            response.status_code,
+        )
+        self._window(endpoint).append(sample)
+        for observer in self._observers:
+            observer(endpoint, sample)
+
+        if sample[0] > self.slow_request_ms:
+            logger.info(
+                f"Requisição lenta {endpoint}: {sample[0]:.0f}ms, {stats.queries} SQL "
+                f"({sample[1]:.0f}ms), templates {sample[4]:.0f}ms"
+            )
+
+        response.headers['Server-Timing'] = (
+            f'app;dur={sample[0]:.1f}, db;dur={sample[1]:.1f};desc="{stats.queries} SQL", '
+            f'tpl;dur={sample[4]:.1f}'
+        )
+        return response
+
+    def _window(self, endpoint):
+        window = self._samples.get(endpoint)
+        if window is None:
+            with self._samples_lock:
+                window = self._samples.setdefault(endpoint, deque(maxlen=self.window_size))
+        return window
+
+    def add_observer(self, observer):
+        """
+        Registra uma função chamada ao fim de cada requisição medida.
+
+        Args:
+            observer: Função (endpoint, amostra); a amostra é a tupla
+                (tempo_ms, banco_ms, comandos, linhas, templates_ms, bytes, n_mais_um, status)
+        """
+        self._observers.append(observer)
+
+    # Consulta -------------------------------------------------------------
+
+    def summary(self):
+        """
+        Percentis por rota sobre a janela deslizante.
+
+        Returns:
+            Lista de dicionários ordenada pelo p95 do tempo total (decrescente)
+        """
+        fields = ('wall_ms', 'db_ms', 'queries', 'rows', 'template_ms', 'response_bytes')
+        routes = []
+        for endpoint, window in list(self._samples.items()):
+            samples = list(window)
+            if not samples:
+                continue
+            route = {
+                'endpoint': endpoint,
+                'count': len(samples),
+                'errors': sum(1 for sample in samples if sample[7] >= 500),
+                'n_plus_one': sum(1 for sample in samples if sample[6]),
+            }
+            for index, name in enumerate(fields):
+                values = sorted(sample[index] for sample in samples)
+                route[name] = {f'p{pct}': round(percentile(values, pct), 2) for pct in PERCENTILES}
+                route[name]['max'] = round(values[-1], 2)
+            routes.append(route)
+        routes.sort(key=lambda route: route['wall_ms']['p95'], reverse=True)
+        return routes
+
+    def recent_incidents(self, limit=50):
+        """Ocorrências de N+1 mais recentes primeiro."""
+        return list(self.incidents)[-limit:][::-1]
+
+    def reset(self):
+        """Descarta as amostras e ocorrências acumuladas."""
+        with self._samples_lock:
+            self._samples.clear()
+        self.incidents.clear()
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,234 @@
+"""
+Scorecards de qualidade de fornecedores, mantidos a cada laudo salvo.
+
+Cada laudo contribui para a linha (fornecedor, mês) de SupplierScorecard com
+contagens e somas: diferenças entre o declarado (brix, ph, acidity) e o
+medido no laboratório (lab_*), validações físico-químicas não conformes e
+entregas dentro do prazo. Uma alteração subtrai a contribuição anterior e
+soma a nova, de modo que o ranking e as tendências de 12 meses saem de
+algumas centenas de linhas pré-calculadas, sem percorrer os laudos.
+"""
+
+import logging
+import math
+from collections import OrderedDict
+from datetime import date, datetime
+
+from utils import report_events
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.scorecards')
+
+MEASURES = ('brix', 'ph', 'acidity')
+
+# Diferença declarada x laboratório considerada aceitável por medida
+TOLERANCES = {'brix': 0.5, 'ph': 0.1, 'acidity': 0.1}
+
+# Peso de cada componente na nota (componentes sem dados são ignorados)
+SCORE_WEIGHTS = {'accuracy': 0.4, 'conformity': 0.4, 'punctuality': 0.2}
+
+COUNTERS = ('report_count', 'validated_count', 'nonconforming_count', 'due_count', 'on_time_count') + tuple(
+    f'{measure}_{suffix}' for measure in MEASURES for suffix in ('pairs', 'dev_sum', 'dev_sq_sum')
+)
+
+_TRACKED_ATTRIBUTES = ('supplier', 'physicochemical_validation', 'report_date', 'upload_date', 'due_date') + \
+    MEASURES + tuple(f'lab_{measure}' for measure in MEASURES)
+
+
+def _measure(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def contribution(snapshot):
+    """
+    Contribuição de um laudo para o scorecard.
+
+    Args:
+        snapshot: Dicionário com as colunas acompanhadas do laudo
+
+    Returns:
+        Tupla ((fornecedor, mês), {contador: valor}) ou None para laudos sem fornecedor
+    """
+    supplier = (snapshot.get('supplier') or '').strip()
+    if not supplier:
+        return None
+    reference = _as_date(snapshot.get('report_date') or snapshot.get('upload_date')) or date.today()
+    values = {'report_count': 1}
+
+    for measure in MEASURES:
+        declared, measured = _measure(snapshot.get(measure)), _measure(snapshot.get(f'lab_{measure}'))
+        if declared is not None and measured is not None:
+            deviation = declared - measured
+            values[f'{measure}_pairs'] = 1
+            values[f'{measure}_dev_sum'] = deviation
+            values[f'{measure}_dev_sq_sum'] = deviation * deviation
+
+    validation = snapshot.get('physicochemical_validation')
+    if validation in ('ok', 'não padrão'):
+        values['validated_count'] = 1
+        values['nonconforming_count'] = 1 if validation == 'não padrão' else 0
+
+    due_date = _as_date(snapshot.get('due_date'))
+    if due_date:
+        values['due_count'] = 1
+        values['on_time_count'] = 1 if reference <= due_date else 0
+
+    return (supplier, reference.replace(day=1)), values
+
+
+def indicators(totals):
+    """
+    Indicadores e nota (0 a 100) a partir das somas de um ou mais meses.
+
+    Args:
+        totals: Objeto ou dicionário com os contadores de SupplierScorecard
+
+    Returns:
+        Dicionário com desvio médio e quadrático por medida, taxas e nota
+    """
+    get = totals.get if isinstance(totals, dict) else lambda name: getattr(totals, name)
+    result = {'report_count': get('report_count') or 0, 'measures': {}}
+
+    accuracies = []
+    for measure in MEASURES:
+        pairs = get(f'{measure}_pairs') or 0
+        if not pairs:
+            result['measures'][measure] = None
+            continue
+        bias = get(f'{measure}_dev_sum') / pairs
+        rms = math.sqrt(max(get(f'{measure}_dev_sq_sum') / pairs, 0.0))
+        result['measures'][measure] = {'pairs': pairs, 'bias': bias, 'rms': rms}
+        # Diferença quadrática nula vale 1; duas vezes a tolerância ou mais vale 0
+        accuracies.append(max(0.0, 1.0 - rms / (2 * TOLERANCES[measure])))
+
+    validated = get('validated_count') or 0
+    due = get('due_count') or 0
+    components = {
+        'accuracy': sum(accuracies) / len(accuracies) if accuracies else None,
+        'conformity': 1.0 - (get('nonconforming_count') or 0) / validated if validated else None,
+        'punctuality': (get('on_time_count') or 0) / due if due else None,
+    }
+    result.update(components)
+    result['nonconformance_rate'] = 1.0 - components['conformity'] if components['conformity'] is not None else None
+    result['on_time_rate'] = components['punctuality']
+
+    weights = {name: weight for name, weight in SCORE_WEIGHTS.items() if components[name] is not None}
+    total_weight = sum(weights.values())
+    result['score'] = round(100 * sum(components[name] * weight for name, weight in weights.items()) / total_weight, 1) \
+        if total_weight else None
+    return result
+
+
+# Atualização a cada laudo salvo --------------------------------------------
+
+def _apply_report_changes(session, changes):
+    cards = {}
+    for _report, old, new in changes:
+        old_part = contribution(old) if old else None
+        new_part = contribution(new) if new else None
+        if old_part == new_part:
+            continue
+        if old_part:
+            _add(session, cards, old_part, sign=-1)
+        if new_part:
+            _add(session, cards, new_part, sign=1)
+
+
+def _add(session, cards, part, sign):
+    from models import SupplierScorecard
+
+    key, values = part
+    card = cards.get(key)
+    if card is None:
+        card = session.query(SupplierScorecard).filter_by(supplier=key[0], month=key[1]).with_for_update().first()
+        if card is None:
+            card = SupplierScorecard(supplier=key[0], month=key[1], **{name: 0 for name in COUNTERS})
+            session.add(card)
+        cards[key] = card
+    for name, value in values.items():
+        setattr(card, name, (getattr(card, name) or 0) + sign * value)
+
+
+def rebuild(session, batch_size=1000):
+    """
+    Recalcula todos os scorecards a partir dos laudos existentes (uso único).
+
+    Returns:
+        Número de laudos processados
+    """
+    from models import Report, SupplierScorecard
+
+    session.query(SupplierScorecard).delete()
+    cards = {}
+    processed = 0
+    with session.no_autoflush:
+        for report in session.query(Report).yield_per(batch_size):
+            part = contribution({column: getattr(report, column) for column in _TRACKED_ATTRIBUTES})
+            if part:
+                _add(session, cards, part, sign=1)
+            processed += 1
+    session.commit()
+    return processed
+
+
+# Consultas -----------------------------------------------------------------
+
+def _month_start(months_back):
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def supplier_rankings(session, months=12, supplier=None):
+    """
+    Ranking dos fornecedores e tendência mensal no período.
+
+    Lê apenas as linhas de SupplierScorecard dos últimos meses (uma consulta).
+
+    Args:
+        months: Meses considerados, incluindo o atual
+        supplier: Limitar a um fornecedor
+
+    Returns:
+        Lista ordenada pela nota (maior primeiro) com supplier, indicadores do
+        período e trend (indicadores de cada mês)
+    """
+    from models import SupplierScorecard
+
+    start = _month_start(months - 1)
+    query = session.query(SupplierScorecard).filter(SupplierScorecard.month >= start)
+    if supplier:
+        query = query.filter(SupplierScorecard.supplier == supplier)
+
+    grouped = OrderedDict()
+    for card in query.order_by(SupplierScorecard.supplier, SupplierScorecard.month):
+        if not card.report_count:
+            continue
+        entry = grouped.setdefault(card.supplier, {'totals': dict.fromkeys(COUNTERS, 0), 'trend': []})
+        for name in COUNTERS:
+            entry['totals'][name] += getattr(card, name) or 0
+        entry['trend'].append(dict(indicators(card), month=card.month.strftime('%Y-%m')))
+
+    rankings = [
+        dict(indicators(entry['totals']), supplier=name, trend=entry['trend'])
+        for name, entry in grouped.items()
+    ]
+    rankings.sort(key=lambda item: (item['score'] is None, -(item['score'] or 0), -item['report_count']))
+    for position, item in enumerate(rankings, start=1):
+        item['position'] = position
+    return rankings
+
+
+def init_app(app):
+    """Passa a atualizar os scorecards a cada laudo salvo."""
+    report_events.subscribe('scorecards de fornecedores', _apply_report_changes, _TRACKED_ATTRIBUTES)
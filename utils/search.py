@@ -18,6 +18,23 @@ def search_reports(query=None, category=None, supplier=None, date_from=None, dat
     Returns:
         Lista de objetos Report que correspondem aos critérios
     """
+    return build_search_query(query, category, supplier, date_from, date_to, order_by_title).all()
+
+def build_search_query(query=None, category=None, supplier=None, date_from=None, date_to=None, order_by_title=False):
+    """
+    Monta a consulta da busca de laudos sem executá-la (usada também nas exportações).
+    
+    Args:
+        query: Termo de busca geral (busca em título, descrição, etc.)
+        category: Filtro por categoria
+        supplier: Filtro por fornecedor
+        date_from: Data inicial para filtro
+        date_to: Data final para filtro
+        order_by_title: Se True, ordena os resultados alfabeticamente pelo título em vez da data
+        
+    Returns:
+        Consulta SQLAlchemy de Report com os filtros e a ordenação aplicados
+    """
     # Iniciar a consulta base
     search_query = Report.query
     
@@ -60,4 +77,4 @@ def search_reports(query=None, category=None, supplier=None, date_from=None, dat
         # Ordenar do mais recente para o mais antigo (padrão)
         search_query = search_query.order_by(Report.upload_date.desc())
     
-    return search_query.all()
+    return search_query
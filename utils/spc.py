@@ -0,0 +1,378 @@
+"""
+Controle estatístico de processo (CEP) incremental das medidas dos laudos.
+
+Para cada combinação (tipo de matéria-prima, fornecedor, medida) é mantida
+uma linha de SpcStatistic com estatísticas acumuladas por algoritmos online:
+
+- média e variância das medidas individuais (Welford);
+- EWMA da medida e CUSUM tabular, em desvios padrão;
+- carta X̄/R com subgrupos de SPC_SUBGROUP_SIZE laudos consecutivos;
+- os últimos pontos e subgrupos, em listas de tamanho fixo.
+
+Cada laudo salvo custa O(1): os dados das cartas e as violações das regras
+da Western Electric saem dessas estatísticas, sem reler o histórico. Um
+ponto fora de controle gera um Alert na mesma transação do laudo.
+"""
+
+import json
+import logging
+import math
+from datetime import datetime
+
+from utils import report_events
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.spc')
+
+METRICS = {
+    'lab_brix': 'Brix (laboratório)',
+    'lab_ph': 'pH (laboratório)',
+    'lab_acidity': 'Acidez (laboratório)',
+    'brix': 'Brix (fornecedor)',
+    'ph': 'pH (fornecedor)',
+    'acidity': 'Acidez (fornecedor)',
+}
+
+RULES = {
+    'WE1': 'ponto além de 3 desvios padrão',
+    'WE2': '2 de 3 pontos além de 2 desvios padrão do mesmo lado',
+    'WE3': '4 de 5 pontos além de 1 desvio padrão do mesmo lado',
+    'WE4': '8 pontos seguidos do mesmo lado da média',
+    'EWMA': 'média móvel exponencial fora dos limites',
+    'CUSUM+': 'deslocamento acumulado para cima (CUSUM)',
+    'CUSUM-': 'deslocamento acumulado para baixo (CUSUM)',
+    'XBAR': 'média do subgrupo fora dos limites da carta X̄',
+    'R': 'amplitude do subgrupo fora dos limites da carta R',
+}
+
+# Regras que indicam ponto claramente fora de controle (alerta "danger")
+CRITICAL_RULES = {'WE1', 'XBAR', 'R'}
+
+# Constantes A2, D3 e D4 da carta X̄/R por tamanho de subgrupo
+XBAR_R_CONSTANTS = {
+    2: (1.880, 0.0, 3.267),
+    3: (1.023, 0.0, 2.574),
+    4: (0.729, 0.0, 2.282),
+    5: (0.577, 0.0, 2.114),
+    6: (0.483, 0.0, 2.004),
+    7: (0.419, 0.076, 1.924),
+    8: (0.373, 0.136, 1.864),
+    9: (0.337, 0.184, 1.816),
+    10: (0.308, 0.223, 1.777),
+}
+
+EWMA_LAMBDA = 0.2
+CUSUM_K = 0.5  # Folga, em desvios padrão
+CUSUM_H = 5.0  # Limite de decisão, em desvios padrão
+RECENT_POINTS = 8  # Pontos necessários para a regra mais longa (WE4)
+
+_TRACKED_ATTRIBUTES = tuple(METRICS) + ('raw_material_type', 'supplier')
+
+_settings = {
+    'SPC_SUBGROUP_SIZE': 5,
+    'SPC_MIN_SAMPLES': 20,
+    'SPC_HISTORY_SIZE': 60,
+}
+
+
+# Estatísticas online -------------------------------------------------------
+
+def welford_add(stat, value):
+    """Inclui uma medida na média e na variância acumuladas."""
+    stat.count += 1
+    delta = value - stat.mean
+    stat.mean += delta / stat.count
+    stat.m2 += delta * (value - stat.mean)
+
+
+def welford_remove(stat, value):
+    """Retira uma medida incluída antes (correção ou exclusão do laudo)."""
+    if stat.count <= 1:
+        stat.count, stat.mean, stat.m2 = 0, 0.0, 0.0
+        return
+    stat.count -= 1
+    delta = value - stat.mean
+    stat.mean -= delta / stat.count
+    stat.m2 = max(stat.m2 - delta * (value - stat.mean), 0.0)
+
+
+def western_electric(z_scores):
+    """
+    Regras da Western Electric que o último ponto viola.
+
+    Args:
+        z_scores: Pontos recentes em desvios padrão, do mais antigo ao atual
+
+    Returns:
+        Lista de códigos de regra (WE1 a WE4)
+    """
+    if not z_scores:
+        return []
+    current = z_scores[-1]
+    violations = []
+    if abs(current) > 3:
+        violations.append('WE1')
+    side = 1 if current > 0 else -1
+    if side * current > 2 and sum(1 for z in z_scores[-3:] if side * z > 2) >= 2:
+        violations.append('WE2')
+    if side * current > 1 and sum(1 for z in z_scores[-5:] if side * z > 1) >= 4:
+        violations.append('WE3')
+    if len(z_scores) >= 8 and all(side * z > 0 for z in z_scores[-8:]):
+        violations.append('WE4')
+    return violations
+
+
+def xbar_r_limits(stat, subgroup_size=None):
+    """
+    Linha central e limites das cartas X̄ e R a partir das estatísticas acumuladas.
+
+    Returns:
+        Dicionário com 'xbar' e 'range' ({'center', 'lcl', 'ucl'}) ou None
+        se ainda não houver subgrupos fechados
+    """
+    subgroup_size = subgroup_size or _settings['SPC_SUBGROUP_SIZE']
+    constants = XBAR_R_CONSTANTS.get(subgroup_size)
+    if not stat.subgroup_count or constants is None:
+        return None
+    a2, d3, d4 = constants
+    mean_range = stat.range_sum / stat.subgroup_count
+    return {
+        'xbar': {'center': stat.grand_mean, 'lcl': stat.grand_mean - a2 * mean_range,
+                 'ucl': stat.grand_mean + a2 * mean_range},
+        'range': {'center': mean_range, 'lcl': d3 * mean_range, 'ucl': d4 * mean_range},
+    }
+
+
+def observe(stat, report_id, value, closed_at=None):
+    """
+    Acrescenta uma medida às estatísticas e avalia as regras de controle.
+
+    As regras usam os limites anteriores à medida (o ponto é comparado com o
+    processo como estava) e só são avaliadas depois de SPC_MIN_SAMPLES medidas.
+
+    Returns:
+        Regras violadas que não estavam violadas no ponto anterior
+    """
+    std_dev = stat.std_dev
+    recent = stat.get_json('recent_points')
+    previous_rules = set(recent[-1][3]) if recent else set()
+    violations = []
+    z = None
+
+    baseline_mean = stat.mean if stat.count else value
+    stat.ewma = EWMA_LAMBDA * value + (1 - EWMA_LAMBDA) * (stat.ewma if stat.ewma is not None else baseline_mean)
+
+    if stat.count >= _settings['SPC_MIN_SAMPLES'] and std_dev > 0:
+        z = (value - stat.mean) / std_dev
+        violations.extend(western_electric([point[2] for point in recent if point[2] is not None] + [z]))
+
+        stat.cusum_high = max(0.0, stat.cusum_high + z - CUSUM_K)
+        stat.cusum_low = max(0.0, stat.cusum_low - z - CUSUM_K)
+        if stat.cusum_high > CUSUM_H:
+            violations.append('CUSUM+')
+            stat.cusum_high = 0.0
+        if stat.cusum_low > CUSUM_H:
+            violations.append('CUSUM-')
+            stat.cusum_low = 0.0
+
+        ewma_limit = 3 * std_dev * math.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA))
+        if abs(stat.ewma - stat.mean) > ewma_limit:
+            violations.append('EWMA')
+
+    welford_add(stat, value)
+    violations.extend(_add_to_subgroup(stat, report_id, value, closed_at))
+
+    recent.append([report_id, value, z, violations])
+    stat.recent_points = json.dumps(recent[-RECENT_POINTS:])
+    stat.last_report_id = report_id
+    return [rule for rule in violations if rule not in previous_rules]
+
+
+def _add_to_subgroup(stat, report_id, value, closed_at):
+    subgroup_size = _settings['SPC_SUBGROUP_SIZE']
+    members = stat.get_json('open_subgroup')
+    members.append([report_id, value])
+    if len(members) < subgroup_size:
+        stat.open_subgroup = json.dumps(members)
+        return []
+
+    values = [member[1] for member in members]
+    subgroup_mean = sum(values) / len(values)
+    subgroup_range = max(values) - min(values)
+
+    violations = []
+    limits = xbar_r_limits(stat, subgroup_size)
+    if limits and stat.subgroup_count * subgroup_size >= _settings['SPC_MIN_SAMPLES']:
+        if not limits['xbar']['lcl'] <= subgroup_mean <= limits['xbar']['ucl']:
+            violations.append('XBAR')
+        if not limits['range']['lcl'] <= subgroup_range <= limits['range']['ucl']:
+            violations.append('R')
+
+    stat.subgroup_count += 1
+    stat.grand_mean += (subgroup_mean - stat.grand_mean) / stat.subgroup_count
+    stat.range_sum += subgroup_range
+
+    history = stat.get_json('history')
+    history.append({
+        'reports': [member[0] for member in members],
+        'mean': subgroup_mean,
+        'range': subgroup_range,
+        'closed_at': (closed_at or datetime.utcnow()).isoformat(),
+        'violations': violations,
+    })
+    stat.history = json.dumps(history[-_settings['SPC_HISTORY_SIZE']:])
+    stat.open_subgroup = None
+    return violations
+
+
+def chart_data(stat):
+    """Dados das cartas X̄/R, individuais, EWMA e CUSUM de uma estatística."""
+    std_dev = stat.std_dev
+    ewma_limit = 3 * std_dev * math.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA))
+    return {
+        'statistic': stat.to_dict(),
+        'label': METRICS.get(stat.metric, stat.metric),
+        'subgroup_size': _settings['SPC_SUBGROUP_SIZE'],
+        'limits': xbar_r_limits(stat),
+        'subgroups': stat.get_json('history'),
+        'open_subgroup': stat.get_json('open_subgroup'),
+        'individuals': {
+            'center': stat.mean,
+            'lcl': stat.mean - 3 * std_dev,
+            'ucl': stat.mean + 3 * std_dev,
+            'points': [
+                {'report_id': point[0], 'value': point[1], 'z': point[2],
+                 'violations': [{'rule': rule, 'description': RULES[rule]} for rule in point[3]]}
+                for point in stat.get_json('recent_points')
+            ],
+        },
+        'ewma': {'value': stat.ewma, 'lcl': stat.mean - ewma_limit, 'ucl': stat.mean + ewma_limit},
+        'cusum': {'high': stat.cusum_high, 'low': stat.cusum_low, 'decision': CUSUM_H},
+        'rules': RULES,
+    }
+
+
+# Atualização a cada laudo salvo --------------------------------------------
+
+def _key(raw_material_type, supplier):
+    return ((raw_material_type or '').strip(), (supplier or '').strip())
+
+
+def _measure(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _values(snapshot):
+    values = {metric: _measure(snapshot[metric]) for metric in METRICS}
+    values['key'] = _key(snapshot['raw_material_type'], snapshot['supplier'])
+    return values
+
+
+def _apply_report_changes(session, changes):
+    stats = {}
+    for report, old, new in changes:
+        _apply_change(session, stats, report, old and _values(old), new and _values(new))
+
+
+def _apply_change(session, stats, report, old, new):
+    for metric in METRICS:
+        old_value = old[metric] if old else None
+        new_value = new[metric] if new else None
+        same_key = old is not None and new is not None and old['key'] == new['key']
+        if old_value == new_value and (same_key or old is None or new is None):
+            continue
+
+        if old_value is not None:
+            stat = _get_statistic(session, stats, old['key'], metric, create=False)
+            if stat is not None:
+                welford_remove(stat, old_value)
+        if new_value is None:
+            continue
+
+        stat = _get_statistic(session, stats, new['key'], metric)
+        if old_value is not None and same_key:
+            # Correção de um valor já considerado: só ajusta média e variância
+            welford_add(stat, new_value)
+            continue
+        fired = observe(stat, report.id, new_value)
+        if fired:
+            _raise_alert(session, stat, report, new_value, fired)
+
+
+def _get_statistic(session, stats, key, metric, create=True):
+    from models import SpcStatistic
+
+    cache_key = key + (metric,)
+    stat = stats.get(cache_key)
+    if stat is None:
+        stat = session.query(SpcStatistic).filter_by(
+            raw_material_type=key[0], supplier=key[1], metric=metric
+        ).with_for_update().first()
+        if stat is None and create:
+            stat = SpcStatistic(raw_material_type=key[0], supplier=key[1], metric=metric,
+                                count=0, mean=0.0, m2=0.0, cusum_high=0.0, cusum_low=0.0,
+                                subgroup_count=0, grand_mean=0.0, range_sum=0.0)
+            session.add(stat)
+        stats[cache_key] = stat
+    return stat
+
+
+def _raise_alert(session, stat, report, value, rules):
+    from models import Alert
+
+    label = METRICS.get(stat.metric, stat.metric)
+    origin = ' / '.join(part for part in (stat.raw_material_type, stat.supplier) if part) or 'sem identificação'
+    message = (
+        f"Laudo #{report.id} (lote {report.batch_number or 'não informado'}, {origin}): "
+        f"{label} = {value:g}. Regras violadas: {'; '.join(RULES[rule] for rule in rules)}. "
+        f"Média do processo {stat.mean:.3g}, desvio padrão {stat.std_dev:.3g}."
+    )
+    session.add(Alert(
+        title=f"CEP: {label} fora de controle",
+        message=message,
+        type='danger' if CRITICAL_RULES & set(rules) else 'warning',
+        module='cep',
+        entity_type='Report',
+        entity_id=report.id,
+    ))
+    logger.warning(message)
+
+
+def rebuild(session, batch_size=1000):
+    """
+    Recalcula todas as estatísticas a partir dos laudos existentes.
+
+    Uso único (implantação ou mudança de SPC_SUBGROUP_SIZE); não gera alertas.
+
+    Returns:
+        Número de laudos processados
+    """
+    from models import Report, SpcStatistic
+
+    session.query(SpcStatistic).delete()
+    stats = {}
+    processed = 0
+    query = session.query(Report).order_by(Report.report_date, Report.upload_date, Report.id)
+    with session.no_autoflush:
+        for report in query.yield_per(batch_size):
+            values = _values({column: getattr(report, column) for column in _TRACKED_ATTRIBUTES})
+            for metric in METRICS:
+                if values[metric] is not None:
+                    stat = _get_statistic(session, stats, values['key'], metric)
+                    observe(stat, report.id, values[metric], closed_at=report.upload_date)
+            processed += 1
+    session.commit()
+    return processed
+
+
+def init_app(app):
+    """Lê a configuração e passa a atualizar o CEP a cada laudo salvo."""
+    for name in _settings:
+        _settings[name] = app.config.get(name, _settings[name])
+    report_events.subscribe('CEP', _apply_report_changes, _TRACKED_ATTRIBUTES)
@@ -0,0 +1,160 @@
+"""
+Perfil de importação e medição do tempo de inicialização da aplicação.
+
+O perfil usa `python -X importtime` num processo separado e agrega o custo
+por módulo e por pacote de primeiro nível. A medição importa o módulo alvo
+várias vezes, cada vez num processo novo, e compara a mediana com um
+orçamento. Serve como benchmark de regressão:
+
+    python -m utils.startup_profile --budget 1.5
+
+O processo termina com código 1 quando a mediana ultrapassa o orçamento.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict, namedtuple
+
+# Módulo importado pelos workers (gunicorn main:app)
+DEFAULT_TARGET = 'main'
+DEFAULT_RUNS = 5
+DEFAULT_TOP = 25
+
+ImportTiming = namedtuple('ImportTiming', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+_MEASURE_SNIPPET = (
+    'import time, sys\n'
+    't = time.perf_counter()\n'
+    '__import__({target!r})\n'
+    'sys.stdout.write("%.6f" % (time.perf_counter() - t))\n'
+)
+
+
+def _child_env(lazy=True):
+    env = dict(os.environ)
+    if lazy:
+        # Medir o boot dos workers: sem preparação do banco durante a importação
+        env['LAZY_STARTUP'] = '1'
+    env.setdefault('PYTHONPATH', os.getcwd())
+    return env
+
+
+def profile_imports(target=DEFAULT_TARGET, lazy=True):
+    """
+    Importa o módulo alvo num processo novo com -X importtime.
+
+    Returns:
+        Lista de ImportTiming na ordem reportada pelo interpretador
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=_child_env(lazy),
+        check=False
+    )
+    timings = []
+    for line in result.stderr.decode('utf-8', 'replace').splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            timings.append(ImportTiming(
+                module=match.group(4),
+                self_us=int(match.group(1)),
+                cumulative_us=int(match.group(2)),
+                depth=len(match.group(3)) // 2
+            ))
+    if result.returncode != 0 and not timings:
+        raise RuntimeError(f'Falha ao importar {target}: {result.stderr.decode("utf-8", "replace")[-2000:]}')
+    return timings
+
+
+def summarize_packages(timings):
+    """Soma o tempo próprio dos módulos por pacote de primeiro nível (microssegundos)."""
+    totals = defaultdict(int)
+    for timing in timings:
+        totals[timing.module.split('.')[0]] += timing.self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure_startup(target=DEFAULT_TARGET, runs=DEFAULT_RUNS, lazy=True):
+    """
+    Mede o tempo de importação do módulo alvo, cada vez num processo novo.
+
+    Returns:
+        Lista com a duração de cada execução, em segundos
+    """
+    durations = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', _MEASURE_SNIPPET.format(target=target)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=_child_env(lazy),
+            check=True
+        )
+        durations.append(float(result.stdout.decode().strip().splitlines()[-1]))
+    return durations
+
+
+def run_report(target=DEFAULT_TARGET, top=DEFAULT_TOP, runs=DEFAULT_RUNS, budget=None, lazy=True, out=None):
+    """
+    Imprime o perfil de importação e o tempo de inicialização.
+
+    Returns:
+        0 se dentro do orçamento (ou sem orçamento), 1 caso contrário
+    """
+    out = out or sys.stdout
+    timings = profile_imports(target, lazy)
+
+    out.write(f'Módulos mais caros ao importar {target} (tempo próprio):\n')
+    for timing in sorted(timings, key=lambda t: t.self_us, reverse=True)[:top]:
+        out.write(f'  {timing.self_us / 1000:8.1f} ms  {timing.cumulative_us / 1000:8.1f} ms acum.  {timing.module}\n')
+
+    out.write('\nPor pacote:\n')
+    for package, total in summarize_packages(timings)[:top]:
+        out.write(f'  {total / 1000:8.1f} ms  {package}\n')
+
+    if runs <= 0:
+        return 0
+
+    durations = measure_startup(target, runs, lazy)
+    median = statistics.median(durations)
+    out.write(
+        f'\nInicialização ({runs} execuções): mediana {median:.3f}s, '
+        f'mínimo {min(durations):.3f}s, máximo {max(durations):.3f}s\n'
+    )
+
+    if budget is not None and median > budget:
+        out.write(f'ERRO: inicialização acima do orçamento de {budget:.3f}s\n')
+        return 1
+    if budget is not None:
+        out.write(f'Dentro do orçamento de {budget:.3f}s\n')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Perfil de importação e benchmark de inicialização.')
+    parser.add_argument('--target', default=DEFAULT_TARGET, help='Módulo a importar (padrão: main)')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Quantidade de módulos listados')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='Execuções para medir a inicialização')
+    parser.add_argument(
+        '--budget', type=float,
+        default=float(os.environ['STARTUP_BUDGET']) if os.environ.get('STARTUP_BUDGET') else None,
+        help='Tempo máximo de importação em segundos (ou variável STARTUP_BUDGET)'
+    )
+    parser.add_argument(
+        '--with-bootstrap', action='store_true',
+        help='Incluir a preparação do banco na importação (LAZY_STARTUP desligado)'
+    )
+    args = parser.parse_args(argv)
+    return run_report(args.target, args.top, args.runs, args.budget, lazy=not args.with_bootstrap)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,7 +10,6 @@ import time
 import random
 import string
 import pyotp
-import qrcode
 from io import BytesIO
 import logging
 from datetime import datetime, timedelta
@@ -115,7 +114,8 @@ class TwoFactorAuth:
         totp = pyotp.TOTP(secret_key)
         uri = totp.provisioning_uri(name=username, issuer_name="Zelopack")
         
-        # Gerar QR code
+        # Gerar QR code (qrcode carrega o Pillow; importado só quando necessário)
+        import qrcode
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
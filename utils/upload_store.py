@@ -0,0 +1,513 @@
+"""
+Armazenamento de uploads endereçado por conteúdo.
+
+Os arquivos enviados são gravados em blocos enquanto o SHA-256 é calculado,
+e ficam em UPLOAD_FOLDER/blobs/<aa>/<sha256><ext>. Um mesmo arquivo enviado
+duas vezes é armazenado uma única vez; a tabela stored_files mantém a
+contagem de referências e o arquivo só é apagado quando a última referência
+é liberada.
+
+Também oferece uploads em partes (retomáveis) para arquivos grandes, como
+laudos digitalizados: o cliente abre uma sessão, envia os blocos com o
+deslocamento (offset) correspondente e, ao enviar o formulário, a sessão é
+incorporada ao armazenamento.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.uploads')
+
+# Tamanho do bloco de leitura/gravação
+COPY_BUFFER_SIZE = 1024 * 1024  # 1MB
+
+# Padrões dos uploads em partes
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB (abaixo de MAX_CONTENT_LENGTH)
+DEFAULT_MAX_CHUNKED_SIZE = 512 * 1024 * 1024  # 512MB
+DEFAULT_CHUNKED_MAX_AGE = 24 * 3600  # segundos
+SESSION_LOCK_TIMEOUT = 10  # segundos aguardando outro envio da mesma sessão
+SESSION_LOCK_STALE_SECONDS = 120
+
+BLOBS_DIRNAME = 'blobs'
+CHUNKED_DIRNAME = 'chunked'
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Resultado de um armazenamento: nome do arquivo em disco, caminho completo,
+# nome original, tamanho em bytes, hash e se o conteúdo já existia
+StoredUpload = namedtuple(
+    'StoredUpload',
+    ['filename', 'file_path', 'original_filename', 'file_size', 'sha256', 'deduplicated']
+)
+
+
+class UploadError(Exception):
+    """Erro de validação ou de estado de um upload."""
+
+
+def _upload_root():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def _blobs_root():
+    path = os.path.join(_upload_root(), BLOBS_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _chunked_root():
+    path = os.path.join(_upload_root(), CHUNKED_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _blob_path(sha256, extension):
+    return os.path.join(_blobs_root(), sha256[:2], f"{sha256}{extension.lower()}")
+
+
+def _file_extension(filename):
+    return os.path.splitext(filename or '')[1]
+
+
+def _copy_hashing(stream, destination):
+    """
+    Copia o stream para o arquivo de destino calculando o SHA-256.
+
+    Returns:
+        Tupla (sha256_hex, bytes_copiados)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(COPY_BUFFER_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        destination.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _add_reference(stored, now):
+    from app import db
+    from models import StoredFile
+
+    # Incremento atômico para não perder referências concorrentes
+    StoredFile.query.filter_by(id=stored.id).update({
+        StoredFile.ref_count: StoredFile.ref_count + 1,
+        StoredFile.last_referenced_at: now
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+def _acquire_blob(tmp_path, sha256, size, original_filename):
+    """
+    Registra uma referência ao conteúdo com o hash informado.
+
+    Se o conteúdo já estiver armazenado, o arquivo temporário é descartado;
+    caso contrário ele é movido para o caminho definitivo.
+
+    Returns:
+        Tupla (caminho_definitivo, deduplicado)
+    """
+    from app import db
+    from models import StoredFile
+
+    now = datetime.utcnow()
+
+    stored = StoredFile.query.filter_by(sha256=sha256).first()
+    if stored is not None:
+        deduplicated = os.path.exists(stored.file_path)
+        if deduplicated:
+            os.remove(tmp_path)
+            logger.info(f"Upload deduplicado: {original_filename} -> {sha256[:12]}")
+        else:
+            # Registro sem arquivo (removido manualmente): restaurar o conteúdo
+            os.makedirs(os.path.dirname(stored.file_path), exist_ok=True)
+            os.replace(tmp_path, stored.file_path)
+        _add_reference(stored, now)
+        return stored.file_path, deduplicated
+
+    final_path = _blob_path(sha256, _file_extension(original_filename))
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    try:
+        db.session.add(StoredFile(
+            sha256=sha256,
+            file_path=final_path,
+            file_size=size,
+            ref_count=1,
+            created_at=now,
+            last_referenced_at=now
+        ))
+        db.session.commit()
+        return final_path, False
+    except IntegrityError:
+        # O mesmo conteúdo foi registrado em paralelo por outro envio
+        db.session.rollback()
+        stored = StoredFile.query.filter_by(sha256=sha256).first()
+        if stored is None:
+            raise UploadError('Não foi possível registrar o arquivo enviado')
+        if stored.file_path != final_path and os.path.exists(final_path):
+            os.remove(final_path)
+        _add_reference(stored, now)
+        return stored.file_path, True
+
+
+def store_upload(file):
+    """
+    Armazena um arquivo enviado (FileStorage) por conteúdo.
+
+    O corpo é lido em blocos de 1MB, gravado em arquivo temporário e o
+    SHA-256 é calculado na mesma passagem; o tamanho vem da própria cópia.
+
+    Args:
+        file: Objeto de arquivo do Flask
+
+    Returns:
+        StoredUpload com os dados do arquivo armazenado
+    """
+    original_filename = file.filename
+    fd, tmp_path = tempfile.mkstemp(prefix='upload_', suffix='.part', dir=_blobs_root())
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            sha256, size = _copy_hashing(file.stream, tmp)
+        file_path, deduplicated = _acquire_blob(tmp_path, sha256, size, original_filename)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return StoredUpload(os.path.basename(file_path), file_path, original_filename, size, sha256, deduplicated)
+
+
+def release_file(file_path):
+    """
+    Libera uma referência ao arquivo armazenado.
+
+    O arquivo só é apagado do disco quando não restam referências. Arquivos
+    gravados antes do armazenamento por conteúdo (sem registro em
+    stored_files) são apagados diretamente.
+
+    Args:
+        file_path: Caminho completo do arquivo
+
+    Returns:
+        True se o arquivo foi apagado do disco
+    """
+    from app import db
+    from models import StoredFile
+
+    if not file_path:
+        return False
+
+    stored = StoredFile.query.filter_by(file_path=file_path).first()
+    if stored is None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            return True
+        return False
+
+    stored_id, sha256 = stored.id, stored.sha256
+    StoredFile.query.filter_by(id=stored_id).update({
+        StoredFile.ref_count: StoredFile.ref_count - 1
+    }, synchronize_session=False)
+    # Só remove se ninguém adquiriu nova referência entre as duas instruções
+    deleted = StoredFile.query.filter(
+        StoredFile.id == stored_id,
+        StoredFile.ref_count <= 0
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    if deleted and os.path.exists(file_path):
+        os.remove(file_path)
+        logger.info(f"Arquivo sem referências removido: {sha256[:12]}")
+        return True
+    return False
+
+
+def ensure_private_copy(file_path, target_folder):
+    """
+    Garante que o arquivo possa ser alterado no próprio lugar.
+
+    Arquivos do armazenamento por conteúdo podem ser compartilhados entre
+    vários registros e nunca devem ser modificados. Antes de editar, o
+    conteúdo é copiado para um arquivo exclusivo e a referência é liberada.
+    Arquivos que não pertencem ao armazenamento são devolvidos sem cópia.
+
+    Args:
+        file_path: Caminho atual do arquivo
+        target_folder: Pasta onde a cópia exclusiva será criada
+
+    Returns:
+        Caminho do arquivo que pode ser alterado
+    """
+    from models import StoredFile
+
+    if not file_path or StoredFile.query.filter_by(file_path=file_path).first() is None:
+        return file_path
+
+    os.makedirs(target_folder, exist_ok=True)
+    private_path = os.path.join(target_folder, f"{uuid.uuid4().hex}{_file_extension(file_path)}")
+    shutil.copyfile(file_path, private_path)
+    release_file(file_path)
+    return private_path
+
+
+# ---------------------------------------------------------------------------
+# Uploads em partes (retomáveis)
+# ---------------------------------------------------------------------------
+
+class _SessionLock:
+    """Trava por sessão (arquivo criado com O_EXCL), válida entre processos; aguarda a liberação."""
+
+    def __init__(self, upload_id):
+        self.path = os.path.join(_chunked_root(), f"{upload_id}.lock")
+
+    def __enter__(self):
+        deadline = time.monotonic() + SESSION_LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.path)
+                except FileNotFoundError:
+                    continue
+                if age >= SESSION_LOCK_STALE_SECONDS:
+                    logger.warning(f"Removendo trava abandonada de upload: {self.path}")
+                    try:
+                        os.remove(self.path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if time.monotonic() >= deadline:
+                    raise UploadError('Sessão de upload em uso; tente novamente')
+                time.sleep(0.05)
+                continue
+            os.close(fd)
+            return self
+
+    def __exit__(self, *exc_info):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _session_paths(upload_id):
+    if not upload_id or not _UPLOAD_ID_RE.match(upload_id):
+        raise UploadError('Identificador de upload inválido')
+    root = _chunked_root()
+    return os.path.join(root, f"{upload_id}.json"), os.path.join(root, f"{upload_id}.part")
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _load_session(upload_id, user_id):
+    meta_path, part_path = _session_paths(upload_id)
+    if not os.path.exists(meta_path) or not os.path.exists(part_path):
+        raise UploadError('Sessão de upload não encontrada ou expirada')
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('user_id') != user_id:
+        raise UploadError('Sessão de upload não encontrada ou expirada')
+    return meta, meta_path, part_path
+
+
+def _session_status(meta, part_path):
+    received = os.path.getsize(part_path)
+    return {
+        'upload_id': meta['upload_id'],
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'received': received,
+        'chunk_size': meta['chunk_size'],
+        'complete': received == meta['size']
+    }
+
+
+def start_chunked_upload(user_id, filename, total_size):
+    """
+    Abre uma sessão de upload em partes.
+
+    Args:
+        user_id: ID do usuário que envia o arquivo
+        filename: Nome original do arquivo
+        total_size: Tamanho total em bytes
+
+    Returns:
+        Dicionário com o estado da sessão (upload_id, chunk_size, received...)
+    """
+    from utils.file_handler import allowed_file
+
+    if not filename or not allowed_file(filename):
+        raise UploadError('Tipo de arquivo não permitido')
+    max_size = current_app.config.get('MAX_CHUNKED_UPLOAD_SIZE', DEFAULT_MAX_CHUNKED_SIZE)
+    if total_size <= 0 or total_size > max_size:
+        raise UploadError(f"Tamanho de arquivo inválido (máximo {max_size // (1024 * 1024)}MB)")
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = _session_paths(upload_id)
+    meta = {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'filename': filename,
+        'size': total_size,
+        'chunk_size': current_app.config.get('UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+        'created_at': time.time()
+    }
+    open(part_path, 'wb').close()
+    _write_meta(meta_path, meta)
+    logger.info(f"Upload em partes iniciado: {filename} ({total_size} bytes) [{upload_id}]")
+    return _session_status(meta, part_path)
+
+
+def chunked_upload_status(upload_id, user_id):
+    """Retorna o estado de uma sessão (usado para retomar o envio)."""
+    meta, _, part_path = _load_session(upload_id, user_id)
+    return _session_status(meta, part_path)
+
+
+def append_chunk(upload_id, user_id, offset, stream):
+    """
+    Acrescenta um bloco à sessão.
+
+    O bloco é recebido inteiro em arquivo temporário e só então, sob a trava
+    da sessão, acrescentado ao arquivo parcial se o deslocamento coincidir
+    com o total já recebido. Assim um bloco reenviado após falha de rede (ou
+    enviado ao mesmo tempo que o original) não é gravado em duplicidade, e
+    um bloco recusado não deixa bytes no arquivo.
+
+    Args:
+        upload_id: Identificador da sessão
+        user_id: ID do usuário dono da sessão
+        offset: Posição do bloco no arquivo
+        stream: Corpo da requisição
+
+    Returns:
+        Dicionário com o estado atualizado da sessão
+    """
+    meta, _, part_path = _load_session(upload_id, user_id)
+    remaining = meta['size'] - offset
+    if remaining < 0:
+        raise UploadError(f"Deslocamento inesperado: esperado {os.path.getsize(part_path)}, recebido {offset}")
+
+    fd, chunk_path = tempfile.mkstemp(prefix=f"{upload_id}.", suffix='.chunk', dir=_chunked_root())
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            length = 0
+            while True:
+                chunk = stream.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                length += len(chunk)
+                if length > remaining:
+                    raise UploadError('O bloco excede o tamanho declarado do arquivo')
+                tmp.write(chunk)
+
+        with _SessionLock(upload_id):
+            if not os.path.exists(part_path):
+                raise UploadError('Sessão de upload não encontrada ou expirada')
+            received = os.path.getsize(part_path)
+            if offset != received:
+                raise UploadError(f"Deslocamento inesperado: esperado {received}, recebido {offset}")
+            with open(chunk_path, 'rb') as source, open(part_path, 'ab') as f:
+                shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+            return _session_status(meta, part_path)
+    finally:
+        os.remove(chunk_path)
+
+
+def cancel_chunked_upload(upload_id, user_id):
+    """Descarta uma sessão de upload em partes."""
+    _, meta_path, part_path = _load_session(upload_id, user_id)
+    with _SessionLock(upload_id):
+        for path in (part_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def store_chunked_upload(upload_id, user_id):
+    """
+    Incorpora ao armazenamento o arquivo montado por uma sessão completa.
+
+    Args:
+        upload_id: Identificador da sessão
+        user_id: ID do usuário dono da sessão
+
+    Returns:
+        StoredUpload com os dados do arquivo armazenado
+    """
+    meta, meta_path, part_path = _load_session(upload_id, user_id)
+    with _SessionLock(upload_id):
+        if not os.path.exists(part_path):
+            raise UploadError('Sessão de upload não encontrada ou expirada')
+        received = os.path.getsize(part_path)
+        if received != meta['size']:
+            raise UploadError(f"Upload incompleto: {received} de {meta['size']} bytes recebidos")
+
+        sha256, size = _hash_file(part_path)
+        file_path, deduplicated = _acquire_blob(part_path, sha256, size, meta['filename'])
+        os.remove(meta_path)
+    logger.info(f"Upload em partes concluído: {meta['filename']} -> {sha256[:12]}")
+
+    return StoredUpload(os.path.basename(file_path), file_path, meta['filename'], size, sha256, deduplicated)
+
+
+def cleanup_stale_chunked_uploads(max_age=None):
+    """
+    Remove sessões de upload em partes abandonadas.
+
+    Args:
+        max_age: Idade máxima em segundos (padrão: CHUNKED_UPLOAD_MAX_AGE)
+
+    Returns:
+        Número de sessões removidas
+    """
+    if max_age is None:
+        max_age = current_app.config.get('CHUNKED_UPLOAD_MAX_AGE', DEFAULT_CHUNKED_MAX_AGE)
+    root = _chunked_root()
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                if name.endswith('.json'):
+                    removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,246 @@
+"""
+Linhagens de versões de laudos (Report) e documentos técnicos (TechnicalDocument).
+
+As versões formam cadeias por parent_id. Percorrer a cadeia pelo
+relacionamento custa uma consulta por versão; aqui cada registro tem uma
+linha em VersionChainEntry com o id da raiz da cadeia (lineage_id), o número
+da versão e is_latest. As linhas são gravadas a cada flush, na mesma
+transação, e o histórico completo ou a versão atual saem de uma consulta
+indexada por linhagem.
+
+Registros ainda sem linha (anteriores à implantação ou gravados em massa)
+são localizados por uma CTE recursiva sobre parent_id; o comando
+`flask version-chains-rebuild` preenche a tabela a partir dela.
+"""
+
+import logging
+
+from sqlalchemy import and_, event, func, insert, inspect, literal, select, update
+from sqlalchemy.orm import Session
+
+# Configuração de logging
+logger = logging.getLogger('zelopack.version_chain')
+
+VERSIONED_MODELS = ('Report', 'TechnicalDocument')
+
+# Limite de profundidade ao subir a cadeia (protege contra ciclos em parent_id)
+MAX_DEPTH = 1000
+
+
+def _versioned_model(name):
+    import models
+    return getattr(models, name)
+
+
+def _entries():
+    from models import VersionChainEntry
+    return VersionChainEntry.__table__
+
+
+# CTE recursiva ---------------------------------------------------------------
+
+def _root_query(table, record_id):
+    """id da raiz da cadeia de record_id: sobe por parent_id e fica com o mais distante."""
+    parent = table.alias('parent')
+    ancestors = select(table.c.id, table.c.parent_id, literal(0).label('depth')) \
+        .where(table.c.id == record_id).cte('ancestors', recursive=True)
+    ancestors = ancestors.union_all(
+        select(parent.c.id, parent.c.parent_id, ancestors.c.depth + 1)
+        .where(parent.c.id == ancestors.c.parent_id, ancestors.c.depth < MAX_DEPTH)
+    )
+    return select(ancestors.c.id).order_by(ancestors.c.depth.desc()).limit(1)
+
+
+def lineage_ids_query(model, record_id):
+    """
+    Consulta (uma única instrução) com os ids de toda a linhagem de record_id.
+
+    Sobe por parent_id até a raiz e desce da raiz por todas as versões.
+    """
+    table = model.__table__
+    root_id = _root_query(table, record_id).scalar_subquery()
+
+    child = table.alias('child')
+    descendants = select(table.c.id).where(table.c.id == root_id).cte('descendants', recursive=True)
+    descendants = descendants.union(select(child.c.id).where(child.c.parent_id == descendants.c.id))
+    return select(descendants.c.id)
+
+
+# Consultas -------------------------------------------------------------------
+
+def lineage(session, model, record_id):
+    """
+    Todas as versões da linhagem de um registro, da primeira à mais recente.
+
+    Args:
+        session: Sessão do SQLAlchemy
+        model: Report ou TechnicalDocument
+        record_id: id de qualquer versão da linhagem
+
+    Returns:
+        Lista de instâncias do modelo ordenada por versão
+    """
+    from models import VersionChainEntry as Entry
+
+    name = model.__name__
+    lineage_id = select(Entry.lineage_id) \
+        .where(Entry.entity_type == name, Entry.entity_id == record_id).scalar_subquery()
+    versions = session.query(model) \
+        .join(Entry, and_(Entry.entity_type == name, Entry.entity_id == model.id)) \
+        .filter(Entry.lineage_id == lineage_id) \
+        .order_by(Entry.version, model.id).all()
+    if versions:
+        return versions
+    # Registro sem linha na tabela de linhagens: percorre parent_id
+    return session.query(model).filter(model.id.in_(lineage_ids_query(model, record_id))) \
+        .order_by(model.version, model.id).all()
+
+
+def latest(session, model, record_id):
+    """Versão mais recente da linhagem de record_id (ou None se o registro não existir)."""
+    from models import VersionChainEntry as Entry
+
+    name = model.__name__
+    lineage_id = select(Entry.lineage_id) \
+        .where(Entry.entity_type == name, Entry.entity_id == record_id).scalar_subquery()
+    current = session.query(model) \
+        .join(Entry, and_(Entry.entity_type == name, Entry.entity_id == model.id)) \
+        .filter(Entry.lineage_id == lineage_id, Entry.is_latest.is_(True)).first()
+    if current is not None:
+        return current
+    return session.query(model).filter(model.id.in_(lineage_ids_query(model, record_id))) \
+        .order_by(func.coalesce(model.version, 1).desc(), model.id.desc()).first()
+
+
+def current_filter(model):
+    """
+    Condição "somente a versão atual" para consultas do modelo.
+
+    Exclui as versões substituídas; registros sem linha na tabela de
+    linhagens continuam visíveis.
+    """
+    from models import VersionChainEntry as Entry
+
+    return ~model.id.in_(
+        select(Entry.entity_id).where(Entry.entity_type == model.__name__, Entry.is_latest.is_(False))
+    )
+
+
+# Manutenção a cada gravação ------------------------------------------------
+
+def refresh_latest(connection, name, lineage_ids=None):
+    """Marca em cada linhagem a versão mais recente (maior versão; empate pelo maior id)."""
+    entries = _entries()
+    other = entries.alias('other')
+    latest_id = select(other.c.entity_id) \
+        .where(other.c.entity_type == entries.c.entity_type, other.c.lineage_id == entries.c.lineage_id) \
+        .order_by(other.c.version.desc(), other.c.entity_id.desc()).limit(1).scalar_subquery()
+    statement = update(entries).where(entries.c.entity_type == name) \
+        .values(is_latest=(entries.c.entity_id == latest_id))
+    if lineage_ids is not None:
+        statement = statement.where(entries.c.lineage_id.in_(lineage_ids))
+    connection.execute(statement)
+
+
+def _lineage_of(connection, name, model, parent_id, known):
+    if parent_id in known:
+        return known[parent_id]
+    entries = _entries()
+    lineage_id = connection.execute(
+        select(entries.c.lineage_id).where(entries.c.entity_type == name, entries.c.entity_id == parent_id)
+    ).scalar()
+    if lineage_id is None:
+        lineage_id = connection.execute(_root_query(model.__table__, parent_id)).scalar() or parent_id
+    known[parent_id] = lineage_id
+    return lineage_id
+
+
+def _after_flush(session, flush_context):
+    added, removed = [], []
+    for obj in session.new:
+        if type(obj).__name__ in VERSIONED_MODELS:
+            added.append(obj)
+    for obj in session.dirty:
+        if type(obj).__name__ in VERSIONED_MODELS:
+            attrs = inspect(obj).attrs
+            # Mudança de versão ou de versão anterior: a linha é refeita
+            if attrs.parent_id.history.has_changes() or attrs.version.history.has_changes():
+                removed.append(obj)
+                added.append(obj)
+    for obj in session.deleted:
+        if type(obj).__name__ in VERSIONED_MODELS:
+            removed.append(obj)
+    if not added and not removed:
+        return
+
+    connection = session.connection()
+    entries = _entries()
+    touched = {}
+    for obj in removed:
+        name = type(obj).__name__
+        lineage_id = connection.execute(
+            select(entries.c.lineage_id).where(entries.c.entity_type == name, entries.c.entity_id == obj.id)
+        ).scalar()
+        connection.execute(entries.delete().where(entries.c.entity_type == name, entries.c.entity_id == obj.id))
+        if lineage_id is not None:
+            touched.setdefault(name, set()).add(lineage_id)
+
+    known = {}
+    # Ids crescentes: a versão anterior gravada no mesmo flush vem antes da nova
+    for obj in sorted(added, key=lambda item: item.id):
+        name = type(obj).__name__
+        lineage_id = _lineage_of(connection, name, type(obj), obj.parent_id, known) if obj.parent_id else obj.id
+        known[obj.id] = lineage_id
+        connection.execute(insert(entries).values(
+            entity_type=name, entity_id=obj.id, lineage_id=lineage_id, version=obj.version or 1, is_latest=False
+        ))
+        touched.setdefault(name, set()).add(lineage_id)
+
+    for name, lineage_ids in touched.items():
+        refresh_latest(connection, name, lineage_ids)
+
+
+def rebuild(session):
+    """
+    Recalcula as linhagens de todos os registros versionados (uso único).
+
+    Uma instrução INSERT ... SELECT por modelo, a partir de uma CTE recursiva
+    que desce de cada raiz (sem parent_id ou com parent_id inexistente).
+
+    Returns:
+        Dicionário modelo -> registros processados
+    """
+    entries = _entries()
+    connection = session.connection()
+    processed = {}
+    for name in VERSIONED_MODELS:
+        table = _versioned_model(name).__table__
+        existing = table.alias('existing')
+        child = table.alias('child')
+        chains = select(table.c.id, table.c.id.label('lineage_id')).where(
+            (table.c.parent_id.is_(None)) | (~table.c.parent_id.in_(select(existing.c.id)))
+        ).cte('chains', recursive=True)
+        chains = chains.union_all(
+            select(child.c.id, chains.c.lineage_id).where(child.c.parent_id == chains.c.id)
+        )
+        versioned = table.alias('versioned')
+        rows = select(
+            literal(name), chains.c.id, chains.c.lineage_id, func.coalesce(versioned.c.version, 1), literal(False)
+        ).join_from(chains, versioned, versioned.c.id == chains.c.id)
+
+        connection.execute(entries.delete().where(entries.c.entity_type == name))
+        connection.execute(insert(entries).from_select(
+            ['entity_type', 'entity_id', 'lineage_id', 'version', 'is_latest'], rows
+        ))
+        refresh_latest(connection, name)
+        processed[name] = connection.execute(
+            select(func.count()).select_from(entries).where(entries.c.entity_type == name)
+        ).scalar()
+    session.commit()
+    return processed
+
+
+def init_app(app):
+    """Passa a manter as linhagens a cada gravação de laudos e documentos."""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
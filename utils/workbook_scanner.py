@@ -0,0 +1,175 @@
+"""
+Varredura de planilhas para detecção de campos de formulário.
+
+Motor único usado pelo preenchimento de formulários, pelo editor online e
+pelos extratores de estrutura. A planilha é aberta em modo somente leitura
+(streaming) e cada aba é lida uma única vez com iter_rows(values_only=True);
+todas as regras de detecção são aplicadas na mesma passagem e os campos são
+devolvidos por um gerador.
+"""
+
+import re
+from collections import namedtuple
+
+# Regras de detecção de campos
+RULE_BLANK = 'blank'                # Sublinhados para preenchimento (___)
+RULE_PLACEHOLDER = 'placeholder'    # {{campo}}, [campo] ou linha longa (______)
+RULE_LABEL = 'label'                # Rótulos: ":", parênteses, perguntas, palavras-chave no início
+RULE_LABEL_STRICT = 'label_strict'  # Rótulos terminados em ":" ou em palavra-chave
+RULE_HEADER = 'header'              # Texto em negrito na área de cabeçalho
+
+ALL_RULES = (RULE_BLANK, RULE_PLACEHOLDER, RULE_LABEL, RULE_LABEL_STRICT)
+
+_PARENTHESES_RE = re.compile(r'\(.*\)')
+_LABEL_STRICT_RE = re.compile(r'(Data|Nome|Valor|Quantidade|Observação|Responsável)$', re.IGNORECASE)
+_LABEL_PREFIXES = ('nome', 'data', 'valor', 'quantidade', 'observações')
+
+# Campo encontrado: aba, linha e coluna (base 1), texto original da célula,
+# regras atendidas e valor da célula vizinha (à direita, ou abaixo na última coluna)
+WorkbookField = namedtuple('WorkbookField', ['sheet', 'row', 'column', 'value', 'kinds', 'neighbor'])
+
+
+def classify_text(text, rules=ALL_RULES):
+    """
+    Aplica as regras de detecção a um texto de célula.
+
+    Args:
+        text: Valor da célula (string)
+        rules: Regras a verificar
+
+    Returns:
+        frozenset com as regras atendidas (vazio se nenhuma)
+    """
+    kinds = []
+    stripped = text.strip()
+
+    if RULE_BLANK in rules and '___' in text:
+        kinds.append(RULE_BLANK)
+
+    if RULE_PLACEHOLDER in rules and (
+        (text.startswith('{{') and text.endswith('}}')) or
+        (text.startswith('[') and text.endswith(']')) or
+        '______' in text
+    ):
+        kinds.append(RULE_PLACEHOLDER)
+
+    if RULE_LABEL in rules and stripped and (
+        ':' in stripped or
+        _PARENTHESES_RE.search(stripped) or
+        stripped.endswith('?') or
+        stripped.lower().startswith(_LABEL_PREFIXES)
+    ):
+        kinds.append(RULE_LABEL)
+
+    if RULE_LABEL_STRICT in rules and (stripped.endswith(':') or _LABEL_STRICT_RE.search(stripped)):
+        kinds.append(RULE_LABEL_STRICT)
+
+    return frozenset(kinds)
+
+
+def _limit(dimension, cap):
+    if cap is None:
+        return dimension
+    if dimension is None:
+        return cap
+    return min(dimension, cap)
+
+
+def _scan_headers(sheet_name, worksheet, header_zone):
+    # Estilos só estão disponíveis nas células completas; a área de
+    # cabeçalho é pequena e o streaming para ao atingir a última linha dela
+    header_rows, header_cols = header_zone
+    for cells in worksheet.iter_rows(max_row=header_rows, max_col=header_cols):
+        for cell in cells:
+            value = cell.value
+            if value and isinstance(value, str) and cell.font is not None and cell.font.bold:
+                yield WorkbookField(sheet_name, cell.row, cell.column, value, frozenset((RULE_HEADER,)), None)
+
+
+def _scan_sheet(sheet_name, worksheet, rules, max_row, max_col, neighbors, on_row):
+    row_limit = _limit(worksheet.max_row, max_row)
+    col_limit = _limit(worksheet.max_column, max_col)
+
+    # Rótulos na última coluna aguardando o valor da célula abaixo
+    pending = []
+
+    for row_index, values in enumerate(
+        worksheet.iter_rows(max_row=row_limit, max_col=col_limit, values_only=True), start=1
+    ):
+        if on_row is not None:
+            on_row(sheet_name, row_index, values)
+
+        if pending:
+            for match in pending:
+                below = values[match.column - 1] if match.column <= len(values) else None
+                yield match._replace(neighbor=below)
+            pending = []
+
+        last_column = len(values)
+        for column_index, value in enumerate(values, start=1):
+            if not value or not isinstance(value, str):
+                continue
+            kinds = classify_text(value, rules)
+            if not kinds:
+                continue
+
+            match = WorkbookField(sheet_name, row_index, column_index, value, kinds, None)
+            if neighbors:
+                if column_index < last_column:
+                    match = match._replace(neighbor=values[column_index])
+                else:
+                    pending.append(match)
+                    continue
+            yield match
+
+    yield from pending
+
+
+def scan_workbook(file_path, rules=ALL_RULES, sheets=None, active_only=False, max_row=None, max_col=None,
+                  data_only=True, neighbors=False, header_zone=None, on_sheet=None, on_row=None):
+    """
+    Percorre a planilha e devolve os campos detectados.
+
+    Apenas as abas solicitadas são lidas; cada uma é percorrida uma única vez.
+
+    Args:
+        file_path: Caminho do arquivo .xlsx
+        rules: Regras de detecção a aplicar (ver RULE_*)
+        sheets: Nomes das abas a percorrer (None para todas)
+        active_only: Percorrer somente a aba ativa
+        max_row: Limite de linhas por aba
+        max_col: Limite de colunas por aba
+        data_only: Ler valores calculados em vez de fórmulas
+        neighbors: Preencher o valor da célula vizinha de cada campo
+        header_zone: Tupla (linhas, colunas) onde procurar cabeçalhos em negrito
+        on_sheet: Função chamada com (nome_aba, aba) antes de percorrer cada aba
+        on_row: Função chamada com (nome_aba, linha, valores) para cada linha lida
+
+    Yields:
+        WorkbookField para cada célula que atende a pelo menos uma regra
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=data_only)
+    try:
+        if active_only:
+            active = workbook.active
+            sheet_names = [active.title] if active is not None else []
+        elif sheets is not None:
+            sheet_names = [name for name in workbook.sheetnames if name in sheets]
+        else:
+            sheet_names = workbook.sheetnames
+
+        for sheet_name in sheet_names:
+            worksheet = workbook[sheet_name]
+            if not hasattr(worksheet, 'iter_rows'):
+                # Abas de gráfico não possuem células
+                continue
+
+            if on_sheet is not None:
+                on_sheet(sheet_name, worksheet)
+            if header_zone:
+                yield from _scan_headers(sheet_name, worksheet, header_zone)
+            yield from _scan_sheet(sheet_name, worksheet, rules, max_row, max_col, neighbors, on_row)
+    finally:
+        workbook.close()